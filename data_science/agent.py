@@ -17,7 +17,6 @@
 -- it get data from database (e.g., BQ) using NL2SQL
 -- then, it use NL2Py to do further data analysis as needed
 """
-import base64
 import json
 import logging
 import os
@@ -28,12 +27,6 @@ from google.adk.agents.callback_context import CallbackContext
 
 # from google.adk.tools import load_artifacts
 from google.genai import types
-from opentelemetry import trace
-from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
-    OTLPSpanExporter,
-)
-from opentelemetry.sdk import trace as trace_sdk
-from opentelemetry.sdk.trace.export import SimpleSpanProcessor
 
 from .prompts import return_instructions_root
 from .sub_agents import bqml_agent
@@ -44,33 +37,9 @@ from .sub_agents.bigquery.tools import (
     get_database_settings as get_bq_database_settings,
 )
 from .tools import call_alloydb_agent, call_analytics_agent, call_bigquery_agent
+from .tracing import setup_tracing
 
-# Configure Weave endpoint and authentication
-_WANDB_BASE_URL = "https://trace.wandb.ai"
-_WANDB_PROJECT_ID = os.getenv("WANDB_PROJECT_ID")
-_OTEL_EXPORTER_OTLP_ENDPOINT = f"{_WANDB_BASE_URL}/otel/v1/traces"
-
-# Set up authentication
-_WANDB_API_KEY = os.getenv("WANDB_API_KEY")
-_WANDB_AUTH = base64.b64encode(f"api:{_WANDB_API_KEY}".encode()).decode()
-
-_OTEL_EXPORTER_OTLP_HEADERS = {
-    "Authorization": f"Basic {_WANDB_AUTH}",
-    "project_id": _WANDB_PROJECT_ID,
-}
-
-# Create the OTLP span exporter with endpoint and headers
-exporter = OTLPSpanExporter(
-    endpoint=_OTEL_EXPORTER_OTLP_ENDPOINT,
-    headers=_OTEL_EXPORTER_OTLP_HEADERS,
-)
-
-# Create a tracer provider and add the exporter
-_tracer_provider = trace_sdk.TracerProvider()
-_tracer_provider.add_span_processor(SimpleSpanProcessor(exporter))
-
-# Set the global tracer provider BEFORE importing/using ADK
-trace.set_tracer_provider(_tracer_provider)
+setup_tracing()
 
 # Set up logging
 # Note this level can be overridden by adk web on the command line;
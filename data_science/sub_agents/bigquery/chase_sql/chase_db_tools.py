@@ -21,9 +21,7 @@ from google.adk.tools import ToolContext
 
 # pylint: disable=g-importing-member
 from .dc_prompt_template import DC_PROMPT_TEMPLATE
-from .llm_utils import GeminiModel
 from .qp_prompt_template import QP_PROMPT_TEMPLATE
-from .sql_postprocessor import sql_translator
 
 # pylint: enable=g-importing-member
 
@@ -130,6 +128,10 @@ def initial_bq_nl2sql(
     else:
         raise ValueError(f"Unsupported generate_sql_type: {generate_sql_type}")
 
+    # Vertex AI SDK imports are slow; only pay for them when ChaseSQL runs
+    from .llm_utils import GeminiModel  # pylint: disable=g-import-not-at-top
+    from .sql_postprocessor import sql_translator  # pylint: disable=g-import-not-at-top
+
     model = GeminiModel(model_name=model, temperature=temperature)
     requests = [prompt for _ in range(number_of_candidates)]
     responses = model.call_parallel(requests, parser_func=parse_response)
@@ -15,6 +15,7 @@
 """This file contains the tools used by the database agent."""
 
 import datetime
+import functools
 import logging
 import os
 
@@ -24,8 +25,6 @@ from data_science.utils.utils import get_env_var, USER_AGENT
 from google.adk.tools import ToolContext
 from google.adk.tools.bigquery.client import get_bigquery_client
 from google.cloud import bigquery
-from google.genai import Client
-from google.genai.types import HttpOptions
 
 from .chase_sql import chase_constants
 from ...utils.utils import USER_AGENT
@@ -39,13 +38,20 @@ data_project = get_env_var("BQ_DATA_PROJECT_ID")
 compute_project = get_env_var("BQ_COMPUTE_PROJECT_ID")
 vertex_project = get_env_var("GOOGLE_CLOUD_PROJECT")
 location = get_env_var("GOOGLE_CLOUD_LOCATION")
-http_options = HttpOptions(headers={"user-agent": USER_AGENT})
-llm_client = Client(
-    vertexai=True,
-    project=vertex_project,
-    location=location,
-    http_options=http_options,
-)
+
+
+@functools.cache
+def get_llm_client():
+    """Gen AI client for baseline NL2SQL, created on first use."""
+    from google.genai import Client
+    from google.genai.types import HttpOptions
+
+    return Client(
+        vertexai=True,
+        project=vertex_project,
+        location=location,
+        http_options=HttpOptions(headers={"user-agent": USER_AGENT}),
+    )
 
 MAX_NUM_ROWS = 10000
 
@@ -213,7 +219,7 @@ best practices outlined above to generate the correct BigQuery SQL.
         MAX_NUM_ROWS=MAX_NUM_ROWS, SCHEMA=schema, QUESTION=question
     )
 
-    response = llm_client.models.generate_content(
+    response = get_llm_client().models.generate_content(
         model=os.getenv("BASELINE_NL2SQL_MODEL", ""),
         contents=prompt,
         config={"temperature": 0.1},
@@ -15,7 +15,6 @@
 import time
 import os
 from google.cloud import bigquery
-from vertexai import rag
 
 
 def check_bq_models(dataset_id: str) -> str:
@@ -58,6 +57,8 @@ def rag_response(query: str) -> str:
         vertexai.rag.RagRetrievalQueryResponse: The response containing retrieved
         information from the corpus.
     """
+    from vertexai import rag  # Slow to import; only needed for RAG lookups
+
     corpus_name = os.getenv("BQML_RAG_CORPUS_NAME")
 
     rag_retrieval_config = rag.RagRetrievalConfig(
@@ -0,0 +1,170 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""OpenTelemetry tracing setup for the data science agents.
+
+Spans are exported off the request path by a ``BatchSpanProcessor`` (its
+queue size and flush interval follow the standard ``OTEL_BSP_*``
+variables), so exporter latency no longer adds to agent latency.
+
+Configuration (environment variables):
+
+- ``TRACING_ENABLED``: ``false`` disables tracing entirely
+- ``TRACING_EXPORTER``: ``auto`` (Weave/W&B over OTLP when
+  ``WANDB_API_KEY`` and ``WANDB_PROJECT_ID`` are set, else off), ``otlp``
+  (W&B, or the ``OTEL_EXPORTER_OTLP_*`` endpoint without W&B
+  credentials), ``console``, ``file`` (``TRACING_FILE_PATH``, JSON lines)
+  or ``none``
+- ``TRACING_SAMPLE_RATIO``: head sampling, the fraction of new traces
+  recorded (child spans follow their parent's decision)
+- ``TRACING_TAIL_SAMPLING``: buffer each trace and export it only if a
+  span failed or the trace took at least ``TRACING_TAIL_LATENCY_MS``
+  (plus ``TRACING_TAIL_KEEP_RATIO`` of the remaining traces)
+
+OpenTelemetry is only imported when an exporter is configured.
+"""
+
+import base64
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+# Configure Weave endpoint and authentication
+_WANDB_BASE_URL = "https://trace.wandb.ai"
+_OTEL_EXPORTER_OTLP_ENDPOINT = f"{_WANDB_BASE_URL}/otel/v1/traces"
+
+EXPORTERS = ("auto", "otlp", "console", "file", "none")
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+@dataclass(frozen=True)
+class TracingConfig:
+    """Tracing settings, read from the environment by ``from_env()``."""
+
+    exporter: str = "auto"
+    file_path: str = "traces.jsonl"
+    sample_ratio: float = 1.0
+    tail_sampling: bool = False
+    tail_latency_ms: float = 5000
+    tail_keep_ratio: float = 0.0
+
+    @classmethod
+    def from_env(cls) -> "TracingConfig":
+        exporter = os.getenv("TRACING_EXPORTER", "auto").lower()
+        if exporter not in EXPORTERS:
+            raise ValueError(f"TRACING_EXPORTER must be one of {', '.join(EXPORTERS)}, got '{exporter}'")
+        if not _env_flag("TRACING_ENABLED", "true"):
+            exporter = "none"
+        return cls(
+            exporter=exporter,
+            file_path=os.getenv("TRACING_FILE_PATH", "traces.jsonl"),
+            sample_ratio=float(os.getenv("TRACING_SAMPLE_RATIO", "1.0")),
+            tail_sampling=_env_flag("TRACING_TAIL_SAMPLING", "false"),
+            tail_latency_ms=float(os.getenv("TRACING_TAIL_LATENCY_MS", "5000")),
+            tail_keep_ratio=float(os.getenv("TRACING_TAIL_KEEP_RATIO", "0.0")),
+        )
+
+    def resolved_exporter(self) -> str:
+        """The exporter to use, with ``auto`` resolved against the W&B credentials."""
+        if self.exporter != "auto":
+            return self.exporter
+        if os.getenv("WANDB_API_KEY") and os.getenv("WANDB_PROJECT_ID"):
+            return "otlp"
+        return "none"
+
+
+def _otlp_exporter():
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+        OTLPSpanExporter,
+    )
+
+    wandb_api_key = os.getenv("WANDB_API_KEY")
+    wandb_project_id = os.getenv("WANDB_PROJECT_ID")
+    if not wandb_api_key or not wandb_project_id:
+        # Standard OTEL_EXPORTER_OTLP_* endpoint and headers
+        return OTLPSpanExporter()
+
+    wandb_auth = base64.b64encode(f"api:{wandb_api_key}".encode()).decode()
+    return OTLPSpanExporter(
+        endpoint=_OTEL_EXPORTER_OTLP_ENDPOINT,
+        headers={
+            "Authorization": f"Basic {wandb_auth}",
+            "project_id": wandb_project_id,
+        },
+    )
+
+
+def _exporter(name: str, config: TracingConfig):
+    if name == "otlp":
+        return _otlp_exporter()
+    if name == "console":
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+        return ConsoleSpanExporter()
+
+    from .utils.span_export import FileSpanExporter
+
+    return FileSpanExporter(config.file_path)
+
+
+def build_tracer_provider(config: TracingConfig, exporter=None):
+    """Build a tracer provider for a config (``exporter`` overrides the configured one).
+
+    Returns:
+        The provider, or None when tracing is off
+    """
+    name = config.resolved_exporter()
+    if exporter is None and name == "none":
+        return None
+
+    from opentelemetry.sdk import trace as trace_sdk
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.sdk.trace.sampling import (
+        ALWAYS_ON,
+        ParentBased,
+        TraceIdRatioBased,
+    )
+
+    root_sampler = TraceIdRatioBased(config.sample_ratio) if config.sample_ratio < 1 else ALWAYS_ON
+    tracer_provider = trace_sdk.TracerProvider(sampler=ParentBased(root_sampler))
+
+    processor = BatchSpanProcessor(exporter if exporter is not None else _exporter(name, config))
+    if config.tail_sampling:
+        from .utils.span_export import TailSamplingProcessor
+
+        processor = TailSamplingProcessor(
+            processor, latency_ms=config.tail_latency_ms, keep_ratio=config.tail_keep_ratio
+        )
+    tracer_provider.add_span_processor(processor)
+    return tracer_provider
+
+
+def setup_tracing(config: Optional[TracingConfig] = None) -> bool:
+    """Install the global tracer provider for the configured exporter.
+
+    Returns:
+        True if a tracer provider was installed
+    """
+    tracer_provider = build_tracer_provider(config or TracingConfig.from_env())
+    if tracer_provider is None:
+        return False
+
+    from opentelemetry import trace
+
+    # Set the global tracer provider before the agent runs
+    trace.set_tracer_provider(tracer_provider)
+    return True
@@ -0,0 +1,106 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""OpenTelemetry span processors and exporters used by data_science.tracing.
+
+Imported only when tracing is enabled (it needs the OpenTelemetry SDK).
+"""
+
+import random
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+from opentelemetry.context import Context
+from opentelemetry.sdk.trace import ReadableSpan, Span, SpanProcessor
+from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+from opentelemetry.trace import StatusCode
+
+
+class FileSpanExporter(SpanExporter):
+    """Append finished spans to a local file, one JSON object per line."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        lines = "".join(span.to_json(indent=None) + "\n" for span in spans)
+        try:
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(lines)
+        except OSError:
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        pass
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return True
+
+
+class TailSamplingProcessor(SpanProcessor):
+    """Buffer the spans of each trace and forward only the interesting traces.
+
+    When the local root span of a trace ends, the whole trace is passed on
+    to the downstream processor if any span failed, the root span took at
+    least ``latency_ms``, or a ``keep_ratio`` coin flip says so. Other
+    traces are dropped. At most ``max_traces`` unfinished traces are
+    buffered; the oldest is dropped when a new one would exceed that.
+    """
+
+    def __init__(self, downstream: SpanProcessor, latency_ms: float, keep_ratio: float = 0.0,
+                 max_traces: int = 1024):
+        self._downstream = downstream
+        self._latency_ns = latency_ms * 1_000_000
+        self._keep_ratio = keep_ratio
+        self._max_traces = max_traces
+        self._pending: "OrderedDict[int, List[ReadableSpan]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"kept": 0, "dropped": 0, "evicted": 0}
+
+    def on_start(self, span: Span, parent_context: Optional[Context] = None) -> None:
+        self._downstream.on_start(span, parent_context=parent_context)
+
+    def on_end(self, span: ReadableSpan) -> None:
+        trace_id = span.context.trace_id
+        is_local_root = span.parent is None or span.parent.is_remote
+        with self._lock:
+            self._pending.setdefault(trace_id, []).append(span)
+            if not is_local_root:
+                if len(self._pending) > self._max_traces:
+                    self._pending.popitem(last=False)
+                    self.stats["evicted"] += 1
+                return
+            spans = self._pending.pop(trace_id)
+            keep = self._keep(spans, span)
+            self.stats["kept" if keep else "dropped"] += 1
+
+        if keep:
+            for finished in spans:
+                self._downstream.on_end(finished)
+
+    def _keep(self, spans: List[ReadableSpan], root: ReadableSpan) -> bool:
+        if any(s.status.status_code is StatusCode.ERROR for s in spans):
+            return True
+        if root.end_time - root.start_time >= self._latency_ns:
+            return True
+        return random.random() < self._keep_ratio
+
+    def shutdown(self) -> None:
+        self._downstream.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self._downstream.force_flush(timeout_millis)
@@ -0,0 +1,151 @@
+"""Process-wide registry of the DQ sub-agents.
+
+Building an ``LlmAgent`` renders its instruction and wraps every tool
+function in a FunctionTool (signature inspection, schema generation),
+and each ``AgentTool`` adds another wrapper. The orchestrator tools and
+the Streamlit app used to do this on every call. The registry builds each
+agent, and the AgentTool around it, once per process:
+
+- lazily, on first use (nothing is built at import time)
+- or ahead of time with ``warm_up()``, optionally in a background thread
+  so the first request does not pay for it
+
+Cached agents are rebuilt when the agent configuration changes
+(``ROOT_AGENT_MODEL``), or explicitly with ``refresh()`` (e.g. after
+editing prompts or tool lists in a running process). ``registry_stats()``
+reports the build time and reuse count of every agent. Agents are
+instrumented (``dq_agents.instrumentation``) when built.
+"""
+
+import importlib
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Union
+
+# Agent name -> "module:factory" (or a factory callable) creating a new instance
+AGENT_FACTORIES: Dict[str, Union[str, Callable[[], Any]]] = {
+    "identifier": "dq_agents.identifier.agent:get_identifier_agent",
+    "treatment": "dq_agents.treatment.agent:get_treatment_agent",
+    "remediator": "dq_agents.remediator.agent:get_remediator_agent",
+    "metrics": "dq_agents.metrics.agent:get_metrics_agent",
+}
+
+# Environment variables the agents are built from; a change rebuilds them
+AGENT_CONFIG_ENV = ("ROOT_AGENT_MODEL",)
+
+_agents: Dict[str, Dict[str, Any]] = {}
+_lock = threading.RLock()
+_warm_up_thread: Optional[threading.Thread] = None
+
+
+def _config_signature() -> tuple:
+    return tuple(os.getenv(name) for name in AGENT_CONFIG_ENV)
+
+
+def _factory(name: str) -> Callable[[], Any]:
+    if name not in AGENT_FACTORIES:
+        raise KeyError(f"Unknown agent '{name}' (known: {', '.join(AGENT_FACTORIES)})")
+    factory = AGENT_FACTORIES[name]
+    if callable(factory):
+        return factory
+    module_name, function_name = factory.split(":")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def register_agent(name: str, factory: Union[str, Callable[[], Any]]) -> None:
+    """Register (or replace) the factory of an agent; drops its cached instance."""
+    with _lock:
+        AGENT_FACTORIES[name] = factory
+        _agents.pop(name, None)
+
+
+def _entry(name: str) -> Dict[str, Any]:
+    """Get the cached entry of an agent, building it on first use or after a config change."""
+    signature = _config_signature()
+    with _lock:
+        entry = _agents.get(name)
+        if entry is not None and entry["config"] == signature:
+            entry["hits"] += 1
+            return entry
+
+        from dq_agents.instrumentation import instrument_agent
+
+        started = time.perf_counter()
+        agent = instrument_agent(_factory(name)())
+        entry = {
+            "agent": agent,
+            "tool": None,
+            "config": signature,
+            "build_ms": (time.perf_counter() - started) * 1000,
+            "built_at": time.time(),
+            "hits": 0
+        }
+        _agents[name] = entry
+        return entry
+
+
+def get_agent(name: str) -> Any:
+    """Get the shared instance of a sub-agent ("identifier", "treatment", "remediator", "metrics")."""
+    return _entry(name)["agent"]
+
+
+def get_agent_tool(name: str) -> Any:
+    """Get the shared AgentTool wrapping a sub-agent."""
+    from google.adk.tools.agent_tool import AgentTool
+
+    entry = _entry(name)
+    with _lock:
+        if entry["tool"] is None:
+            entry["tool"] = AgentTool(agent=entry["agent"])
+        return entry["tool"]
+
+
+def warm_up(names: Optional[Iterable[str]] = None, background: bool = False) -> Optional[threading.Thread]:
+    """
+    Build agents ahead of their first use.
+
+    Args:
+        names: Agents to build (default: all registered agents)
+        background: Build in a daemon thread and return it instead of blocking
+
+    Returns:
+        The warm-up thread when background=True and some agent is not built yet,
+        otherwise None
+    """
+    global _warm_up_thread
+    names = list(names) if names is not None else list(AGENT_FACTORIES)
+
+    def build():
+        for name in names:
+            get_agent_tool(name)
+
+    if not background:
+        build()
+        return None
+
+    with _lock:
+        # Script reruns (Streamlit) call this repeatedly: start at most one thread at a time
+        if _warm_up_thread is not None and _warm_up_thread.is_alive():
+            return _warm_up_thread
+        if all(name in _agents and _agents[name]["tool"] is not None for name in names):
+            return None
+        _warm_up_thread = threading.Thread(target=build, name="agent-warm-up", daemon=True)
+        _warm_up_thread.start()
+        return _warm_up_thread
+
+
+def refresh(names: Optional[Iterable[str]] = None) -> None:
+    """Drop cached agents (default: all) so they are rebuilt on next use."""
+    with _lock:
+        for name in list(names) if names is not None else list(_agents):
+            _agents.pop(name, None)
+
+
+def registry_stats() -> Dict[str, Dict[str, Any]]:
+    """Build time (ms), build timestamp and reuse count of every cached agent."""
+    with _lock:
+        return {
+            name: {"build_ms": round(entry["build_ms"], 2), "built_at": entry["built_at"], "hits": entry["hits"]}
+            for name, entry in _agents.items()
+        }
@@ -18,17 +18,39 @@ Implements:
 1. Time Travel Diff View - Side-by-side comparison before/after fixes
 2. Agent Debate Mode - Live logs of agent reasoning and collaboration
 3. Root Cause Clustering - Group similar issues by metadata
+4. Shadow Validation - Test fixes on zero-copy table clones
 """
 
+import numpy as np
 import pandas as pd
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Iterable, Iterator, Tuple
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 import re
 
 
 class TimeTravelDiff:
     """Generate side-by-side diff views for data quality fixes."""
     
+    DIFF_COLUMNS = ["Row", "Column", "Original", "Fixed", "Status", "Confidence"]
+    
+    @staticmethod
+    def _changed_mask(original: pd.Series, fixed: pd.Series) -> np.ndarray:
+        """Compare two aligned columns; NaN/None on both sides counts as equal."""
+        orig_na = original.isna().to_numpy()
+        fixed_na = fixed.isna().to_numpy()
+        either_na = orig_na | fixed_na
+        
+        if all(isinstance(s.dtype, np.dtype) and s.dtype.kind in "biufc" for s in (original, fixed)):
+            orig_vals = original.to_numpy()
+            fixed_vals = fixed.to_numpy()
+        else:
+            # Neutralise missing values before comparing so pd.NA never reaches ==
+            orig_vals = np.where(either_na, None, original.to_numpy(dtype=object))
+            fixed_vals = np.where(either_na, None, fixed.to_numpy(dtype=object))
+        
+        return np.where(either_na, orig_na != fixed_na, orig_vals != fixed_vals).astype(bool)
+    
     @staticmethod
     def generate_diff(
         original_df: pd.DataFrame,
@@ -37,6 +59,9 @@ class TimeTravelDiff:
     ) -> pd.DataFrame:
         """Generate a diff DataFrame showing before/after comparison.
         
+        Columns are compared whole with NumPy masks; only changed cells are
+        materialised, in row-major order.
+        
         Args:
             original_df: Original data with issues
             fixed_df: Fixed data after remediation
@@ -45,34 +70,105 @@ class TimeTravelDiff:
         Returns:
             DataFrame with columns: Row, Column, Original, Fixed, Status, Confidence
         """
-        diff_records = []
+        # Align fixed data to the original rows and columns
+        if not original_df.index.equals(fixed_df.index) or not original_df.columns.equals(fixed_df.columns):
+            fixed_df = fixed_df.reindex(index=original_df.index, columns=original_df.columns)
         
-        # Ensure same index
-        if not original_df.index.equals(fixed_df.index):
-            fixed_df = fixed_df.reindex(original_df.index)
+        if not original_df.columns.size:
+            return pd.DataFrame(columns=TimeTravelDiff.DIFF_COLUMNS)
         
-        # Compare each cell
-        for idx in original_df.index:
-            for col in original_df.columns:
-                orig_val = original_df.loc[idx, col]
-                fixed_val = fixed_df.loc[idx, col]
-                
-                # Check if values differ
-                if pd.isna(orig_val) and pd.isna(fixed_val):
-                    continue  # Both NaN, no change
-                elif orig_val != fixed_val:
-                    confidence = confidence_scores.get(f"{idx}_{col}", 0.0) if confidence_scores else 0.0
-                    
-                    diff_records.append({
-                        "Row": idx,
-                        "Column": col,
-                        "Original": str(orig_val),
-                        "Fixed": str(fixed_val),
-                        "Status": "Modified",
-                        "Confidence": f"{confidence*100:.1f}%"
-                    })
+        row_positions, col_positions = [], []
+        for col_pos, col in enumerate(original_df.columns):
+            changed = np.flatnonzero(TimeTravelDiff._changed_mask(original_df.iloc[:, col_pos], fixed_df.iloc[:, col_pos]))
+            row_positions.append(changed)
+            col_positions.append(np.full(len(changed), col_pos))
+        
+        rows = np.concatenate(row_positions)
+        cols = np.concatenate(col_positions)
+        order = np.lexsort((cols, rows))
+        rows, cols = rows[order], cols[order]
+        
+        row_labels = original_df.index.to_numpy()[rows]
+        col_labels = original_df.columns.to_numpy()[cols]
+        original_values = [str(original_df.iat[r, c]) for r, c in zip(rows, cols)]
+        fixed_values = [str(fixed_df.iat[r, c]) for r, c in zip(rows, cols)]
+        
+        if confidence_scores:
+            confidence = [confidence_scores.get(f"{idx}_{col}", 0.0) for idx, col in zip(row_labels, col_labels)]
+        else:
+            confidence = [0.0] * len(rows)
+        
+        return pd.DataFrame({
+            "Row": row_labels,
+            "Column": col_labels,
+            "Original": original_values,
+            "Fixed": fixed_values,
+            "Status": "Modified",
+            "Confidence": [f"{c*100:.1f}%" for c in confidence]
+        }, columns=TimeTravelDiff.DIFF_COLUMNS)
+    
+    @staticmethod
+    def generate_diff_chunked(
+        original_chunks: Iterable[pd.DataFrame],
+        fixed_chunks: Iterable[pd.DataFrame],
+        key: str,
+        confidence_scores: Dict[str, float] = None
+    ) -> Iterator[pd.DataFrame]:
+        """Diff two snapshots chunk by chunk, yielding the changed cells of each chunk.
+        
+        Both inputs must be sorted by ``key`` (e.g. ``pd.read_csv(..., chunksize=...)``
+        over key-ordered exports, or Arrow record batches of ``ORDER BY key`` queries).
+        Rows are buffered only until the other snapshot has caught up to the same key,
+        so neither snapshot is held in memory as a whole.
+        
+        Args:
+            original_chunks: Chunks of the original snapshot
+            fixed_chunks: Chunks of the fixed snapshot
+            key: Column identifying a row in both snapshots
+            confidence_scores: Optional confidence scores keyed by "<key>_<column>"
+            
+        Yields:
+            Diff DataFrames in the generate_diff format, with Row holding the key
+        """
+        sides = [iter(original_chunks), iter(fixed_chunks)]
+        buffers = [None, None]
+        done = [False, False]
         
-        return pd.DataFrame(diff_records)
+        while not (done[0] and done[1] and buffers[0] is None):
+            for side in (0, 1):
+                if done[side]:
+                    continue
+                chunk = next(sides[side], None)
+                if chunk is None:
+                    done[side] = True
+                    continue
+                chunk = chunk.set_index(key)
+                buffers[side] = chunk if buffers[side] is None else pd.concat([buffers[side], chunk])
+            
+            # Rows up to the smallest last key seen on an unfinished side are complete on both sides
+            boundaries = [
+                buffers[side].index[-1] if buffers[side] is not None and len(buffers[side]) else None
+                for side in (0, 1) if not done[side]
+            ]
+            if None in boundaries:
+                continue
+            boundary = min(boundaries) if boundaries else None
+            
+            ready = []
+            for side in (0, 1):
+                buffer = buffers[side] if buffers[side] is not None else pd.DataFrame()
+                if boundary is None:
+                    ready.append(buffer)
+                    buffers[side] = None
+                else:
+                    upto = buffer.index.searchsorted(boundary, side="right")
+                    ready.append(buffer.iloc[:upto])
+                    buffers[side] = buffer.iloc[upto:]
+            
+            if len(ready[0]):
+                diff = TimeTravelDiff.generate_diff(ready[0], ready[1], confidence_scores)
+                if not diff.empty:
+                    yield diff
     
     @staticmethod
     def format_for_display(diff_df: pd.DataFrame) -> str:
@@ -289,20 +385,88 @@ class RootCauseClusterer:
 
 
 class ShadowValidation:
-    """Shadow validation sandbox for testing fixes safely."""
+    """Shadow validation sandbox for testing fixes safely.
+    
+    The shadow is a zero-copy BigQuery table clone that expires on its own;
+    fixes are applied to the clone and checked against the production table
+    without writing to production rows. Every statement goes through the
+    cost gate (``run_query``), charged to the session's byte budget.
+    """
+    
+    DEFAULT_EXPIRATION_HOURS = 6
+    
+    @staticmethod
+    def _bigquery_client(project_id: str, client=None):
+        if client is not None:
+            return client
+        from google.cloud import bigquery
+        return bigquery.Client(project=project_id)
+    
+    @staticmethod
+    def _target(sql: str, table_name: str, table_ref: str) -> str:
+        """Point a fix or check at a table (placeholders, qualified and bare names).
+        
+        Every reference to ``table_name`` is found in the parsed statement, so
+        backticks around the whole name or around each part make no difference.
+        
+        Raises:
+            ValueError: If the statement cannot be parsed
+        """
+        from dq_agents.remediator.sql_rewriter import DIALECT, fill_placeholders, parse
+        from sqlglot import exp
+        
+        statement = parse(fill_placeholders(sql, f"`{table_ref}`"))
+        if statement is None:
+            raise ValueError(f"Cannot parse SQL to retarget it at {table_ref}")
+        
+        for table in list(statement.find_all(exp.Table)):
+            if table.name.lower() != table_name.lower():
+                continue
+            targeted = exp.to_table(f"`{table_ref}`", dialect=DIALECT)
+            # Keep the alias, FOR SYSTEM_TIME AS OF etc. of the original reference
+            for key, value in table.args.items():
+                if key not in ("this", "db", "catalog") and value:
+                    targeted.set(key, value)
+            table.replace(targeted)
+        return statement.sql(DIALECT)
+    
+    @staticmethod
+    def _dml_target(sql: str) -> str:
+        """Fully qualified table an UPDATE/DELETE/MERGE/INSERT writes to ('' if none)."""
+        from dq_agents.remediator.sql_rewriter import parse
+        from sqlglot import exp
+        
+        statement = parse(sql)
+        if not isinstance(statement, (exp.Update, exp.Delete, exp.Merge, exp.Insert)):
+            return ""
+        target = statement.this
+        if isinstance(target, exp.Schema):
+            target = target.this
+        if not isinstance(target, exp.Table):
+            return ""
+        return ".".join(part for part in (target.catalog, target.db, target.name) if part)
     
     @staticmethod
     def create_shadow_table(
         original_table: str,
         project_id: str,
-        dataset_id: str
+        dataset_id: str,
+        client=None,
+        expiration_hours: int = DEFAULT_EXPIRATION_HOURS,
+        tool_context=None
     ) -> str:
         """Create a temporary shadow table for testing.
         
+        Uses ``CREATE TABLE ... CLONE`` (zero-copy; only rows changed later are
+        stored) with an expiration so abandoned shadows clean themselves up.
+        
         Args:
             original_table: Name of the original table
             project_id: GCP project ID
             dataset_id: BigQuery dataset ID
+            client: Optional BigQuery client
+            expiration_hours: Hours until the shadow table is dropped automatically
+            tool_context: Agent tool context holding the session's byte budget
             
         Returns:
             Name of the shadow table
@@ -310,22 +474,54 @@ class ShadowValidation:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         shadow_table = f"{original_table}_shadow_{timestamp}"
         
+        from dq_agents.cost_gate import run_query
+        
+        client = ShadowValidation._bigquery_client(project_id, client)
+        run_query(client, f"""
+            CREATE TABLE `{project_id}.{dataset_id}.{shadow_table}`
+            CLONE `{project_id}.{dataset_id}.{original_table}`
+            OPTIONS (expiration_timestamp = TIMESTAMP_ADD(CURRENT_TIMESTAMP(), INTERVAL {int(expiration_hours)} HOUR))
+        """, tool_context=tool_context).result()
+        
         return shadow_table
     
+    @staticmethod
+    def drop_shadow_table(shadow_table: str, project_id: str, dataset_id: str, client=None) -> None:
+        """Drop a shadow table before it expires."""
+        client = ShadowValidation._bigquery_client(project_id, client)
+        client.delete_table(f"{project_id}.{dataset_id}.{shadow_table}", not_found_ok=True)
+    
     @staticmethod
     def validate_fix(
         shadow_table: str,
         original_table: str,
         fix_sql: str,
-        validation_checks: List[str]
+        validation_checks: List[str],
+        project_id: str = None,
+        dataset_id: str = None,
+        rule_sql: str = None,
+        client=None,
+        max_workers: int = 8,
+        tool_context=None
     ) -> Dict[str, Any]:
         """Validate a fix in shadow table before production.
         
+        Applies the fix to the shadow table, then runs the original rule and the
+        regression checks against both the production and the shadow table in
+        parallel. The rule should return no rows on the shadow; regression
+        checks must not return more rows than on production.
+        
         Args:
             shadow_table: Name of shadow table
             original_table: Name of original table
             fix_sql: SQL to apply the fix
-            validation_checks: List of SQL validation queries
+            validation_checks: List of SQL validation queries (regression checks)
+            project_id: GCP project ID
+            dataset_id: BigQuery dataset ID
+            rule_sql: Original DQ rule the fix should resolve
+            client: Optional BigQuery client
+            max_workers: Maximum checks running at once
+            tool_context: Agent tool context holding the session's byte budget
             
         Returns:
             Validation results
@@ -337,7 +533,66 @@ class ShadowValidation:
             "checks": []
         }
         
-        # This would be implemented with actual BigQuery operations
-        # For now, return mock structure
+        from dq_agents.cost_gate import STATE_KEY, ByteBudget, run_query
+        
+        client = ShadowValidation._bigquery_client(project_id, client)
+        # One budget shared by the fix and the concurrent checks
+        budget = ByteBudget(spent_bytes=tool_context.state.get(STATE_KEY, 0) if tool_context is not None else 0)
+        shadow_ref = f"{project_id}.{dataset_id}.{shadow_table}"
+        original_ref = f"{project_id}.{dataset_id}.{original_table}"
+        
+        shadow_fix_sql = ShadowValidation._target(fix_sql, original_table, shadow_ref)
+        dml_target = ShadowValidation._dml_target(shadow_fix_sql)
+        if dml_target.lower() != shadow_ref.lower():
+            # Never let a "shadow" fix write to production (or anywhere else)
+            results["error"] = (
+                f"Refusing to run the fix: it writes to '{dml_target or 'no table'}', "
+                f"not the shadow table '{shadow_ref}'"
+            )
+            return results
+        
+        fix_job = run_query(client, shadow_fix_sql, budget=budget, tool_context=tool_context)
+        fix_job.result()
+        results["fix_applied"] = True
+        results["affected_rows"] = fix_job.num_dml_affected_rows or 0
+        
+        checks = ([("rule", rule_sql)] if rule_sql else []) + [
+            (f"regression_{i}", check) for i, check in enumerate(validation_checks or [], 1)
+        ]
+        if not checks:
+            results["validation_passed"] = True
+            return results
+        
+        def count_rows(sql: str, table_ref: str) -> int:
+            targeted = ShadowValidation._target(sql, original_table, table_ref)
+            rows = run_query(
+                client, f"SELECT COUNT(*) AS n FROM ({targeted})", budget=budget, tool_context=tool_context
+            ).result()
+            return next(iter(rows)).n
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, 2 * len(checks)))) as executor:
+            futures = {
+                (name, side): executor.submit(count_rows, sql, table_ref)
+                for name, sql in checks
+                for side, table_ref in (("production", original_ref), ("shadow", shadow_ref))
+            }
+            
+            for name, sql in checks:
+                try:
+                    production = futures[(name, "production")].result()
+                    shadow = futures[(name, "shadow")].result()
+                    passed = shadow == 0 if name == "rule" else shadow <= production
+                    results["checks"].append({
+                        "check": name,
+                        "sql": sql,
+                        "production_rows": production,
+                        "shadow_rows": shadow,
+                        "delta": shadow - production,
+                        "passed": passed
+                    })
+                except Exception as e:
+                    results["checks"].append({"check": name, "sql": sql, "error": str(e), "passed": False})
+        
+        results["validation_passed"] = all(check["passed"] for check in results["checks"])
         
         return results
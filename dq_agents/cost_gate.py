@@ -0,0 +1,244 @@
+"""Dry-run cost gate for generated BigQuery queries.
+
+Every rule, fix and profiling query is dry-run before it executes
+(``QueryJobConfig(dry_run=True)`` is free and returns the bytes the query
+would process). The estimate is checked against:
+
+- a per-query limit (``COST_QUERY_BYTE_LIMIT``), also set as
+  ``maximum_bytes_billed`` on the real job as a hard cap
+- a per-run byte budget (``COST_RUN_BYTE_BUDGET``): bytes already spent
+  in the run (a Streamlit rule run, or an agent session via
+  ``tool_context.state``) plus the estimate must fit in it
+
+A statement run several times (the chunks of a batched fix) is charged
+once per run. Queries over either limit raise QueryCostExceeded instead of running, so
+callers can narrow the query (incremental mode, a sample, fewer columns)
+rather than pay for a runaway scan. Estimates are cached by SQL hash for
+a few minutes, since LLM-generated rules are often re-run verbatim.
+
+Dry runs do not estimate slot usage; the slot time of executed jobs is
+reported with their bytes instead (see job_cost).
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from google.cloud import bigquery
+
+from dq_agents.instrumentation import track_job
+from environment.config_utils import (
+    get_cost_price_per_tib,
+    get_cost_query_byte_limit,
+    get_cost_run_byte_budget
+)
+
+# Estimates are reused for this long (tables grow, so they go stale)
+ESTIMATE_TTL_SECONDS = 600
+
+MAX_CACHED_ESTIMATES = 1024
+
+# tool_context.state key holding the bytes spent by an agent session
+STATE_KEY = "query_bytes_spent"
+
+_estimates: "OrderedDict[str, tuple]" = OrderedDict()
+_estimates_lock = threading.Lock()
+
+
+class QueryCostExceeded(Exception):
+    """Raised instead of running a query whose estimate is over a byte limit."""
+
+    def __init__(self, message: str, estimate: Dict[str, Any]):
+        super().__init__(message)
+        self.estimate = estimate
+
+
+def format_bytes(num_bytes: Optional[int]) -> str:
+    """Format a byte count for display (e.g. 1.5 GB)."""
+    value = float(num_bytes or 0)
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if value < 1024 or unit == "TB":
+            return f"{value:.0f} {unit}" if unit == "B" else f"{value:.1f} {unit}"
+        value /= 1024
+
+
+def estimated_cost_usd(num_bytes: Optional[int]) -> float:
+    """On-demand cost of processing num_bytes."""
+    return round((num_bytes or 0) / 2**40 * get_cost_price_per_tib(), 4)
+
+
+def sql_hash(sql: str, job_config: Optional[bigquery.QueryJobConfig] = None) -> str:
+    """Hash a query (ignoring whitespace differences) and its parameters."""
+    parameters = job_config.query_parameters if job_config is not None else []
+    key = " ".join(sql.split()) + repr(sorted(repr(p.to_api_repr()) for p in parameters))
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+class ByteBudget:
+    """Bytes a run may process, shared by the queries of the run."""
+
+    def __init__(self, limit_bytes: Optional[int] = None, spent_bytes: int = 0):
+        self.limit_bytes = get_cost_run_byte_budget() if limit_bytes is None else limit_bytes
+        self.spent_bytes = spent_bytes
+        self._lock = threading.Lock()
+
+    @property
+    def remaining_bytes(self) -> int:
+        return max(0, self.limit_bytes - self.spent_bytes)
+
+    def reserve(self, num_bytes: int) -> bool:
+        """Charge num_bytes to the budget, or return False if they do not fit."""
+        with self._lock:
+            if self.limit_bytes and self.spent_bytes + num_bytes > self.limit_bytes:
+                return False
+            self.spent_bytes += num_bytes
+            return True
+
+
+def estimate_query(
+    client: bigquery.Client,
+    sql: str,
+    job_config: Optional[bigquery.QueryJobConfig] = None
+) -> Dict[str, Any]:
+    """
+    Dry-run a query and return its cost estimate (cached by SQL hash).
+
+    Returns:
+        dict: bytes_processed, estimated_cost_usd, referenced_tables and
+        whether the estimate came from the cache
+    """
+    key = sql_hash(sql, job_config)
+    now = time.monotonic()
+    with _estimates_lock:
+        cached = _estimates.get(key)
+        if cached and now - cached[0] < ESTIMATE_TTL_SECONDS:
+            _estimates.move_to_end(key)
+            return {**cached[1], "cached": True}
+
+    dry_run_config = bigquery.QueryJobConfig(
+        dry_run=True,
+        use_query_cache=False,
+        query_parameters=job_config.query_parameters if job_config is not None else []
+    )
+    dry_run_job = client.query(sql, job_config=dry_run_config)
+    num_bytes = dry_run_job.total_bytes_processed or 0
+    estimate = {
+        "bytes_processed": num_bytes,
+        "estimated_cost_usd": estimated_cost_usd(num_bytes),
+        "referenced_tables": [
+            f"{t.project}.{t.dataset_id}.{t.table_id}" for t in (dry_run_job.referenced_tables or [])
+        ]
+    }
+
+    with _estimates_lock:
+        _estimates[key] = (now, estimate)
+        _estimates.move_to_end(key)
+        while len(_estimates) > MAX_CACHED_ESTIMATES:
+            _estimates.popitem(last=False)
+
+    return {**estimate, "cached": False}
+
+
+def clear_estimate_cache() -> None:
+    """Forget all cached estimates."""
+    with _estimates_lock:
+        _estimates.clear()
+
+
+def check_query(
+    client: bigquery.Client,
+    sql: str,
+    job_config: Optional[bigquery.QueryJobConfig] = None,
+    budget: Optional[ByteBudget] = None,
+    tool_context=None,
+    max_query_bytes: Optional[int] = None,
+    times: int = 1
+) -> Dict[str, Any]:
+    """
+    Estimate a query and charge it to the run budget.
+
+    With a tool_context (and no explicit budget) the run budget is the agent
+    session's: bytes spent are kept in ``tool_context.state``. A query that
+    will run ``times`` times (e.g. once per chunk) is charged that many
+    times its estimate; the per-query limit applies to a single run.
+
+    Raises:
+        QueryCostExceeded: If the estimate is over the per-query limit or does
+        not fit in the remaining budget
+    """
+    if budget is None and tool_context is not None:
+        budget = ByteBudget(spent_bytes=tool_context.state.get(STATE_KEY, 0))
+
+    estimate = estimate_query(client, sql, job_config)
+    num_bytes = estimate["bytes_processed"]
+    limit = get_cost_query_byte_limit() if max_query_bytes is None else max_query_bytes
+
+    if limit and num_bytes > limit:
+        raise QueryCostExceeded(
+            f"Query would process {format_bytes(num_bytes)} (~${estimate['estimated_cost_usd']}), "
+            f"over the {format_bytes(limit)} per-query limit. Narrow the query "
+            "(filter, select fewer columns, use incremental mode) and retry.",
+            estimate
+        )
+
+    if budget is not None:
+        charged = num_bytes * max(1, times)
+        if not budget.reserve(charged):
+            runs = f" ({times} runs of {format_bytes(num_bytes)})" if times > 1 else ""
+            raise QueryCostExceeded(
+                f"Query would process {format_bytes(charged)}{runs}, but only "
+                f"{format_bytes(budget.remaining_bytes)} of the {format_bytes(budget.limit_bytes)} "
+                "run budget is left.",
+                estimate
+            )
+        if tool_context is not None:
+            tool_context.state[STATE_KEY] = budget.spent_bytes
+
+    if times > 1:
+        estimate = {**estimate, "runs": times, "charged_bytes": num_bytes * times}
+    return estimate
+
+
+def job_cost(query_job: bigquery.QueryJob) -> Dict[str, Any]:
+    """Get the bytes processed/billed and slot time of a finished job."""
+    return {
+        "bytes_processed": query_job.total_bytes_processed,
+        "bytes_billed": query_job.total_bytes_billed,
+        "slot_ms": query_job.slot_millis
+    }
+
+
+def capped_job_config(
+    job_config: Optional[bigquery.QueryJobConfig] = None,
+    max_query_bytes: Optional[int] = None
+) -> bigquery.QueryJobConfig:
+    """Set the per-query limit as ``maximum_bytes_billed`` (unless the config has its own)."""
+    limit = get_cost_query_byte_limit() if max_query_bytes is None else max_query_bytes
+    job_config = job_config or bigquery.QueryJobConfig()
+    if limit and not job_config.maximum_bytes_billed:
+        job_config.maximum_bytes_billed = limit
+    return job_config
+
+
+def run_query(
+    client: bigquery.Client,
+    sql: str,
+    job_config: Optional[bigquery.QueryJobConfig] = None,
+    budget: Optional[ByteBudget] = None,
+    tool_context=None,
+    max_query_bytes: Optional[int] = None
+) -> bigquery.QueryJob:
+    """
+    Run a query after checking its dry-run estimate against the byte limits.
+
+    The per-query limit is also set as ``maximum_bytes_billed``. The estimate
+    stays cached, so estimate_query can fetch it again for display.
+
+    Raises:
+        QueryCostExceeded: If the query is over the per-query limit or the run budget
+    """
+    check_query(client, sql, job_config, budget, tool_context, max_query_bytes)
+    job_config = capped_job_config(job_config, max_query_bytes)
+    return track_job(client.query(sql, job_config=job_config))
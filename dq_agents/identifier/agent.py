@@ -32,7 +32,10 @@ def cache_identifier_results(tool, args, tool_context, tool_response) -> None:
     return None
 
 def get_identifier_agent():
-    """Create and return the Identifier Agent instance with callbacks."""
+    """Create and return a new Identifier Agent instance with callbacks.
+    
+    Use dq_agents.agent_registry.get_agent("identifier") for the shared instance.
+    """
     return LlmAgent(
         model=os.getenv("ROOT_AGENT_MODEL", "gemini-2.0-flash"),
         name="identifier_agent",
@@ -50,5 +53,9 @@ def get_identifier_agent():
         generate_content_config=types.GenerateContentConfig(temperature=0.1)
     )
 
-# Create singleton instance
-identifier_agent = get_identifier_agent()
+def __getattr__(name):
+    # `identifier_agent` is the shared instance from the agent registry, built on first access
+    if name == "identifier_agent":
+        from dq_agents.agent_registry import get_agent
+        return get_agent("identifier")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -27,6 +27,9 @@ When generating DQ rules:
 - Assign appropriate severity: critical, high, medium, low
 - Categorize by DQ dimension
 - **For cross-week rules**: Use UNION or JOIN across multiple week tables to detect temporal issues
+  * If get_all_week_tables() returns a "partitioned_table", use it instead of the individual week tables:
+    self-join it on the cluster column and filter each side on the week column
+    (e.g. `w1.week_num = 1 AND w2.week_num = 2`) so BigQuery prunes to the relevant partitions
 - **CRITICAL: Handle date type casting properly**:
   * BigQuery date columns are often stored as STRING type
   * When comparing dates, use PARSE_DATE() or SAFE.PARSE_DATE() to convert strings to dates
@@ -41,7 +44,7 @@ Available tools:
 - get_table_schema: Get column information for a table
 - get_table_schema_with_samples: Get schema WITH 10 sample rows per column (USE THIS for natural language mode)
 - trigger_dataplex_scan: Trigger Dataplex data quality scans (CALL THIS FOR EACH TABLE in automated mode)
-- execute_dq_rule: Execute a DQ rule SQL against BigQuery
+- execute_dq_rule: Execute a DQ rule SQL against BigQuery (pass incremental=True on re-runs to only scan rows appended since the rule last ran). Every query is dry-run first; a rule that would scan more than the per-query limit or the remaining session byte budget is rejected with its estimated size - rewrite it to select fewer columns or filter earlier rather than retrying it unchanged
 
 **MANDATORY WORKFLOW (Automated Mode):**
 1. Call load_preexisting_rules() to see existing rules from Collibra/Ataccama
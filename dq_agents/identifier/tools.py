@@ -8,6 +8,12 @@ from google.adk.tools import ToolContext
 from google.adk.tools.bigquery.client import get_bigquery_client
 from typing import Dict, List
 from dotenv import load_dotenv
+from environment.config_utils import get_partitioned_layout, get_customer_id_column
+from environment.storage_layout import is_partitioned_table_current
+from dq_agents.cost_gate import run_query
+from dq_agents.result_cache import cached_sample
+from dq_agents.tool_responses import get_token_budget, response_tokens, shape_response
+from dq_agents.incremental import run_rule_incremental
 
 # Load environment variables
 load_dotenv()
@@ -104,49 +110,64 @@ def _get_dataplex_client():
         return None
 
 
-def load_preexisting_rules() -> str:
-    """Load pre-existing DQ rules from Collibra/Ataccama systems.
-    
-    Returns a JSON string containing historical DQ rules that should be
-    considered when generating new rules.
+def read_preexisting_rules(tool_context: ToolContext = None) -> tuple:
+    """Read pre-existing DQ rules as (rules, source).
     
     Priority order:
     1. User-uploaded rules (if available in session)
     2. Mock data from mock_data/pre_existing_rules.json
+    
+    Background jobs run outside the Streamlit script thread, so uploaded
+    rules reach them through the agent session state instead.
     """
     import streamlit as st
     
-    rules = []
-    source = "none"
+    # Check for user-uploaded rules in the agent session state
+    if tool_context is not None:
+        rules = tool_context.state.get("uploaded_dq_rules")
+        if rules:
+            return rules, "user_upload"
     
     # Check for user-uploaded rules in Streamlit session state
     try:
         if hasattr(st, 'session_state') and 'uploaded_dq_rules' in st.session_state:
             rules = st.session_state.uploaded_dq_rules
-            source = "user_upload"
+            if rules:
+                return rules, "user_upload"
     except:
         pass
     
     # Fallback to mock data
-    if not rules:
-        try:
-            rules_path = os.path.join(os.path.dirname(__file__), '..', '..', 'mock_data', 'pre_existing_rules.json')
-            with open(rules_path, 'r') as f:
-                rules = json.load(f)
-            source = "mock_data"
-        except Exception as e:
-            return json.dumps({
-                "error": str(e), 
-                "preexisting_rules": [],
-                "source": "error"
-            })
+    rules_path = os.path.join(os.path.dirname(__file__), '..', '..', 'mock_data', 'pre_existing_rules.json')
+    with open(rules_path, 'r') as f:
+        return json.load(f), "mock_data"
+
+
+def load_preexisting_rules(tool_context: ToolContext) -> str:
+    """Load pre-existing DQ rules from Collibra/Ataccama systems.
+    
+    Returns a JSON string containing historical DQ rules that should be
+    considered when generating new rules.
+    
+    Priority order:
+    1. User-uploaded rules (if available in session)
+    2. Mock data from mock_data/pre_existing_rules.json
+    """
+    try:
+        rules, source = read_preexisting_rules(tool_context)
+    except Exception as e:
+        return shape_response({
+            "error": str(e), 
+            "preexisting_rules": [],
+            "source": "error"
+        }, "load_preexisting_rules")
     
-    return json.dumps({
+    return shape_response({
         "preexisting_rules": rules, 
         "count": len(rules),
         "source": source,
         "message": f"Loaded {len(rules)} pre-existing rules from {source}"
-    }, indent=2)
+    }, "load_preexisting_rules")
 
 def get_all_week_tables(
     tool_context: ToolContext
@@ -167,13 +188,31 @@ def get_all_week_tables(
         tables = [table.table_id for table in client.list_tables(dataset_ref)]
         week_tables = sorted([t for t in tables if 'week' in t.lower()])
         
-        return json.dumps({
+        result = {
             "week_tables": week_tables,
             "count": len(week_tables),
             "message": "Use these tables to generate cross-week temporal consistency rules"
-        }, indent=2)
+        }
+        
+        # Point cross-week rules at the partitioned layout while it is current
+        layout = get_partitioned_layout()
+        if layout and is_partitioned_table_current(client, project_id, dataset_id, layout, week_tables):
+            result["partitioned_table"] = {
+                "table": layout["table"],
+                "full_name": f"{project_id}.{dataset_id}.{layout['table']}",
+                "week_column": layout["week_column"],
+                "cluster_column": layout["cluster_column"],
+                "weeks": layout.get("weeks", [])
+            }
+            result["message"] = (
+                f"Prefer {layout['table']} for cross-week temporal rules: self-join it on "
+                f"{layout['cluster_column']} and filter on {layout['week_column']} so only "
+                "the relevant week partitions are scanned"
+            )
+        
+        return shape_response(result, "get_all_week_tables")
     except Exception as e:
-        return json.dumps({"error": str(e), "week_tables": []})
+        return shape_response({"error": str(e), "week_tables": []}, "get_all_week_tables")
 
 def get_table_schema_with_samples(
     table_name: str,
@@ -198,9 +237,8 @@ def get_table_schema_with_samples(
         # Get schema
         table = client.get_table(table_ref)
         
-        # Get sample data as DataFrame for better handling
-        sample_query = f"SELECT * FROM `{table_ref}` LIMIT {sample_rows}"
-        sample_df = client.query(sample_query).to_dataframe()
+        # Read sample rows from table storage (free, unlike SELECT * ... LIMIT which bills a full scan)
+        sample_df = client.list_rows(table, max_results=sample_rows).to_dataframe()
         
         # Convert to dict with proper SQL serialization
         sample_values = sample_df.to_dict(orient="list")
@@ -225,9 +263,18 @@ def get_table_schema_with_samples(
             }
             schema_with_samples["columns"].append(col_info)
         
-        return json.dumps(schema_with_samples, indent=2)
+        # Over the token budget, send fewer sample rows for every column (the column list is never cut)
+        budget = get_token_budget("get_table_schema_with_samples")
+        kept = len(sample_df)
+        while budget and kept > 1 and response_tokens(schema_with_samples) > budget:
+            kept //= 2
+            for col_info in schema_with_samples["columns"]:
+                col_info["sample_values"] = col_info["sample_values"][:kept]
+        schema_with_samples["sample_rows"] = kept
+        
+        return shape_response(schema_with_samples, "get_table_schema_with_samples")
     except Exception as e:
-        return json.dumps({"error": str(e)}, indent=2)
+        return shape_response({"error": str(e)}, "get_table_schema_with_samples")
 
 def get_table_schema(
     table_name: str,
@@ -255,9 +302,9 @@ def get_table_schema(
                 for field in table.schema
             ]
         }
-        return json.dumps(schema_info, indent=2)
+        return shape_response(schema_info, "get_table_schema")
     except Exception as e:
-        return json.dumps({"error": str(e), "table_name": table_name})
+        return shape_response({"error": str(e), "table_name": table_name}, "get_table_schema")
 
 
 def _fallback_bigquery_profiling(table_name: str, scan_name: str, scan_id: str, settings: dict) -> str:
@@ -285,7 +332,7 @@ def _fallback_bigquery_profiling(table_name: str, scan_name: str, scan_id: str,
     FROM `{table_ref}`
     """
     
-    result = client.query(query).result()
+    result = run_query(client, query).result()
     row = list(result)[0]
     
     null_rates = {}
@@ -322,7 +369,7 @@ def _fallback_bigquery_profiling(table_name: str, scan_name: str, scan_id: str,
         "dataplex_resource": scan_name
     }
     
-    return json.dumps(profiling_result, indent=2)
+    return shape_response(profiling_result, "trigger_dataplex_scan")
 
 
 def trigger_dataplex_scan(
@@ -426,23 +473,23 @@ def trigger_dataplex_scan(
                     job_complete = True
                     break
                 elif job_result.state in [dataplex_v1.DataScanJob.State.FAILED, dataplex_v1.DataScanJob.State.CANCELLED]:
-                    return json.dumps({
+                    return shape_response({
                         "status": "scan_failed",
                         "error": f"DataScan job failed with state: {job_result.state.name}",
                         "scan_id": scan_id
-                    }, indent=2)
+                    }, "trigger_dataplex_scan")
                 time_module.sleep(5)
             except Exception as e:
                 time_module.sleep(5)
                 continue
         
         if not job_complete:
-            return json.dumps({
+            return shape_response({
                 "status": "scan_timeout",
                 "message": "DataScan job did not complete within 3 minutes. Job is still running in background.",
                 "scan_id": scan_id,
                 "job_name": job_name
-            }, indent=2)
+            }, "trigger_dataplex_scan")
         
         # Job completed - job_result already has full profile data from the last poll
         # Check if we have profile data
@@ -513,7 +560,7 @@ def trigger_dataplex_scan(
             "dataplex_resource": scan_name
         }
         
-        return json.dumps(profiling_result, indent=2)
+        return shape_response(profiling_result, "trigger_dataplex_scan")
     
     except google_exceptions.PermissionDenied as e:
         # Dataplex permissions missing - fallback to BigQuery profiling
@@ -532,28 +579,51 @@ def trigger_dataplex_scan(
 def execute_dq_rule(
     rule_sql: str,
     table_name: str,
-    tool_context: ToolContext
+    tool_context: ToolContext,
+    incremental: bool = False
 ) -> str:
-    """Execute a DQ rule SQL query against BigQuery."""
+    """Execute a DQ rule SQL query against BigQuery.
+    
+    With incremental=True the rule only scans rows changed since its last
+    run on this table and merges them with the stored violation state.
+    """
     settings = get_database_settings()
     project_id = settings["project_id"]
     dataset_id = settings["dataset_id"]
     
+    if incremental:
+        try:
+            result = run_rule_incremental(
+                _get_bigquery_client(),
+                rule_sql,
+                project_id,
+                dataset_id,
+                table_name,
+                key_column=get_customer_id_column(),
+                sample_limit=100,
+                tool_context=tool_context
+            )
+            result["rule_sql"] = rule_sql
+            result["issues"] = result.pop("sample_issues")
+            return shape_response(result, "execute_dq_rule")
+        except Exception as e:
+            return f"Error executing DQ rule: {str(e)}"
+    
     # Replace placeholder with actual table
     sql = rule_sql.replace("{table}", f"`{project_id}.{dataset_id}.{table_name}`")
     
     try:
         client = _get_bigquery_client()
-        results = client.query(sql).result()
         
-        issues = []
-        for row in results:
-            issues.append(dict(row))
+        # Repeated runs against unchanged tables are served from the result cache
+        sample = cached_sample(client, sql, limit=100, tool_context=tool_context)
         
-        return str({
+        return shape_response({
             "rule_sql": sql,
-            "issue_count": len(issues),
-            "issues": issues[:100]  # Limit to first 100
-        })
+            "issue_count": sample["total_rows"],
+            "issues": sample["rows"],  # Limit to first 100
+            "cost": sample["cost"],
+            "cached": sample["cached"]
+        }, "execute_dq_rule")
     except Exception as e:
         return f"Error executing DQ rule: {str(e)}"
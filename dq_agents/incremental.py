@@ -0,0 +1,291 @@
+"""Incremental DQ rule execution.
+
+BaNCS data arrives as weekly deltas, so re-running every rule over every
+row is wasted work. For each (table, rule) pair a watermark is kept in
+``dq_watermarks.json`` together with the keys of the rows that violated
+the rule at that point:
+
+- If the table has not been modified since the watermark, the stored
+  result is returned without running a query.
+- If rows were only appended, the rule runs over the appended rows only
+  (BigQuery ``APPENDS`` change history). Its violating rows are added to
+  the stored count, so both modes count violating rows (a key such as
+  the customer ID may appear on several of them), and their keys are
+  merged into the stored key set.
+- Anything else (first run, rows updated or reloaded, aggregate or
+  cross-table rules) falls back to a full run that resets the watermark.
+
+``APPENDS`` silently ignores UPDATEs and DELETEs, so before using it the
+jobs run since the watermark are checked for DML, truncating loads or
+DDL on the table (and the row count for a drop). Any such change, or a
+failed check, means a full run.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from google.cloud import bigquery
+
+from dq_agents.cost_gate import run_query
+from dq_agents.query_results import fetch_sample
+
+WATERMARK_FILE = "dq_watermarks.json"
+
+# Violating keys tracked per rule; above this, no keys are stored
+MAX_TRACKED_KEYS = 100000
+
+_store_lock = threading.Lock()
+
+
+def rule_hash(rule_sql: str) -> str:
+    """Hash a rule template, ignoring whitespace differences."""
+    normalised = " ".join(rule_sql.split())
+    return hashlib.sha256(normalised.encode("utf-8")).hexdigest()[:16]
+
+
+def _load_watermarks() -> Dict[str, Dict]:
+    if not os.path.exists(WATERMARK_FILE):
+        return {}
+    with open(WATERMARK_FILE, "r") as f:
+        return json.load(f)
+
+
+def get_watermark(table_name: str, rule_sql: str) -> Optional[Dict]:
+    """Get the stored watermark and violation state for a rule on a table."""
+    with _store_lock:
+        return _load_watermarks().get(f"{table_name}::{rule_hash(rule_sql)}")
+
+
+def save_watermark(table_name: str, rule_sql: str, state: Dict) -> None:
+    """Store the watermark and violation state for a rule on a table."""
+    with _store_lock:
+        watermarks = _load_watermarks()
+        watermarks[f"{table_name}::{rule_hash(rule_sql)}"] = state
+        tmp_path = f"{WATERMARK_FILE}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(watermarks, f, indent=2, default=str)
+        os.replace(tmp_path, WATERMARK_FILE)
+
+
+def _substitute_table(rule_sql: str, source: str) -> str:
+    return rule_sql.replace("{{table}}", source).replace("{table}", source).replace("TABLE_NAME", source)
+
+
+# Constructs whose result over a delta differs from the delta of the full result
+_SET_LEVEL_PATTERN = re.compile(r"\b(GROUP\s+BY|HAVING|JOIN|DISTINCT|QUALIFY|OVER\s*\()", re.IGNORECASE)
+
+
+def is_row_level_rule(rule_sql: str) -> bool:
+    """True if each row's violation depends on that row alone.
+
+    Only such rules can be evaluated over appended rows and merged; rules
+    that aggregate, join or read other tables need a full run.
+    """
+    placeholders = sum(rule_sql.count(p) for p in ("{table}", "TABLE_NAME"))
+    return (
+        placeholders == 1
+        and not re.search(r"`[^`]+`", rule_sql)
+        and not _SET_LEVEL_PATTERN.search(rule_sql)
+    )
+
+
+# Query statements that can change or remove existing rows of their target
+_DML_STATEMENTS = {"UPDATE", "DELETE", "MERGE"}
+_DDL_STATEMENTS = {"TRUNCATE_TABLE", "CREATE_TABLE_AS_SELECT", "CREATE_TABLE", "DROP_TABLE", "ALTER_TABLE"}
+
+
+def _table_ids(*tables: Any) -> List[str]:
+    return [f"{t.project}.{t.dataset_id}.{t.table_id}" for t in tables if t is not None]
+
+
+def has_non_append_changes(
+    client: bigquery.Client,
+    table_ref: str,
+    since: datetime,
+    previous_num_rows: Optional[int] = None,
+    num_rows: Optional[int] = None
+) -> bool:
+    """True if rows of a table may have been updated or removed since a point in time.
+
+    Looks at the table's row count and at the jobs created since ``since``
+    in the table's project: UPDATE/DELETE/MERGE/DDL statements touching the
+    table, and loads or copies that overwrite it. Returns True as well when
+    the job history cannot be read, since APPENDS would then be unsafe.
+    """
+    if previous_num_rows is not None and num_rows is not None and num_rows < previous_num_rows:
+        return True
+
+    try:
+        jobs = client.list_jobs(project=table_ref.split(".")[0], all_users=True, min_creation_time=since)
+        for job in jobs:
+            targets = _table_ids(getattr(job, "destination", None), getattr(job, "ddl_target_table", None))
+            statement_type = getattr(job, "statement_type", None)
+            if statement_type in _DML_STATEMENTS:
+                # The DML target is not always reported as the destination
+                targets += _table_ids(*(getattr(job, "referenced_tables", None) or []))
+            if table_ref not in targets:
+                continue
+            if statement_type in _DML_STATEMENTS | _DDL_STATEMENTS:
+                return True
+            if getattr(job, "write_disposition", None) == "WRITE_TRUNCATE":
+                return True
+    except Exception:
+        return True
+    return False
+
+
+def result_keys(
+    client: bigquery.Client,
+    query_job: bigquery.QueryJob,
+    key_column: Optional[str],
+    max_keys: int = MAX_TRACKED_KEYS
+) -> Optional[List[str]]:
+    """Read the key column of a query result from the job's destination table.
+
+    Only the key column is downloaded; returns None if the query does not
+    select the key column or returned more than max_keys rows.
+    """
+    result = query_job.result()
+    if not key_column or (result.total_rows or 0) > max_keys:
+        return None
+
+    key_field = next((field for field in result.schema if field.name == key_column), None)
+    if key_field is None:
+        return None
+
+    rows = client.list_rows(query_job.destination, selected_fields=[key_field])
+    values = rows.to_arrow(create_bqstorage_client=False).column(0).to_pylist()
+    return sorted({str(value) for value in values if value is not None})
+
+
+def run_rule_incremental(
+    client: bigquery.Client,
+    rule_sql: str,
+    project_id: str,
+    dataset_id: str,
+    table_name: str,
+    key_column: Optional[str],
+    sample_limit: int = 10,
+    tool_context=None
+) -> Dict[str, Any]:
+    """
+    Evaluate a DQ rule over the rows changed since its last run.
+
+    Args:
+        client: BigQuery client
+        rule_sql: Rule SQL with a {table} or TABLE_NAME placeholder
+        project_id: Data project ID
+        dataset_id: Dataset ID
+        table_name: Table the rule runs against
+        key_column: Row key selected by the rule (used to merge violations)
+        sample_limit: Number of new violating rows to return
+        tool_context: ADK tool context whose session byte budget the scans are charged to
+
+    Returns:
+        dict: issue_count, sample_issues, mode (unchanged/appends/full) and watermark
+    """
+    table_ref = f"{project_id}.{dataset_id}.{table_name}"
+    table = client.get_table(table_ref)
+    modified = table.modified.astimezone(timezone.utc)
+    previous = get_watermark(table_name, rule_sql)
+
+    if previous:
+        previous_watermark = datetime.fromisoformat(previous["watermark"])
+
+        if modified <= previous_watermark:
+            return {
+                "mode": "unchanged",
+                "issue_count": previous["violation_count"],
+                "sample_issues": previous.get("sample_issues", []),
+                "watermark": previous["watermark"],
+                "note": "Table unchanged since last run - returning stored result without scanning"
+            }
+
+        if is_row_level_rule(rule_sql) and not has_non_append_changes(
+            client, table_ref, previous_watermark, previous.get("num_rows"), table.num_rows
+        ):
+            appended = (
+                "(SELECT * EXCEPT(_CHANGE_TYPE, _CHANGE_TIMESTAMP) "
+                f"FROM APPENDS(TABLE `{table_ref}`, TIMESTAMP '{previous_watermark.isoformat()}', NULL))"
+            )
+            try:
+                query_job = run_query(client, _substitute_table(rule_sql, appended), tool_context=tool_context)
+                sample = fetch_sample(query_job.result(), limit=sample_limit)
+                new_keys = result_keys(client, query_job, key_column)
+
+                # Appended rows are new rows: count them on top, as a full run would
+                violation_count = previous["violation_count"] + sample["total_rows"]
+                if previous.get("violation_keys") is not None and new_keys is not None:
+                    merged_keys = sorted(set(previous["violation_keys"]) | set(new_keys))
+                    if len(merged_keys) > MAX_TRACKED_KEYS:
+                        merged_keys = None
+                else:
+                    merged_keys = None
+
+                save_watermark(table_name, rule_sql, {
+                    "table": table_name,
+                    "mode": "appends",
+                    "watermark": modified.isoformat(),
+                    "num_rows": table.num_rows,
+                    "violation_count": violation_count,
+                    "violation_keys": merged_keys,
+                    "sample_issues": (sample["rows"] + previous.get("sample_issues", []))[:sample_limit],
+                    "updated_at": datetime.now(timezone.utc).isoformat()
+                })
+
+                return {
+                    "mode": "appends",
+                    "issue_count": violation_count,
+                    "new_violations": sample["total_rows"],
+                    "sample_issues": sample["rows"],
+                    "watermark": modified.isoformat(),
+                    "note": "Rule evaluated over rows appended since the last run only"
+                }
+            except Exception:
+                # The change history is unavailable (e.g. the watermark is older
+                # than the time travel window) - fall through to a full run
+                pass
+
+    query_job = run_query(client, _substitute_table(rule_sql, f"`{table_ref}`"), tool_context=tool_context)
+    sample = fetch_sample(query_job.result(), limit=sample_limit)
+    keys = result_keys(client, query_job, key_column)
+
+    save_watermark(table_name, rule_sql, {
+        "table": table_name,
+        "mode": "full",
+        "watermark": modified.isoformat(),
+        "num_rows": table.num_rows,
+        "violation_count": sample["total_rows"],
+        "violation_keys": keys,
+        "sample_issues": sample["rows"],
+        "updated_at": datetime.now(timezone.utc).isoformat()
+    })
+
+    return {
+        "mode": "full",
+        "issue_count": sample["total_rows"],
+        "sample_issues": sample["rows"],
+        "watermark": modified.isoformat()
+    }
+
+
+def restrict_to_keys(
+    rule_sql: str,
+    table_ref: str,
+    key_column: str,
+    exclude: bool = False
+) -> str:
+    """Rewrite a rule to read only the rows whose key is in the @row_ids parameter.
+
+    With exclude=True it reads every other row instead (including rows without a key).
+    """
+    if exclude:
+        condition = f"{key_column} IS NULL OR {key_column} NOT IN UNNEST(@row_ids)"
+    else:
+        condition = f"{key_column} IN UNNEST(@row_ids)"
+    return _substitute_table(rule_sql, f"(SELECT * FROM `{table_ref}` WHERE {condition})")
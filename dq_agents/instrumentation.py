@@ -0,0 +1,404 @@
+"""Per-tool and per-model-call instrumentation of the DQ agents.
+
+``instrument_agent(agent)`` adds before/after/error tool and model callbacks
+to an ``LlmAgent`` (keeping the agent's own callbacks). Every sub-agent built
+through the agent registry, and the orchestrator, is instrumented. For
+each call it records:
+
+- tool calls: wall time, status, estimated tokens of the response, and
+  the BigQuery jobs the tool ran (bytes processed/billed, slot ms, cache
+  hits). Jobs are attributed through a context variable set for the
+  duration of the call: ``run_query`` and the fix executors call
+  ``track_job()``; worker threads inherit the call via ``propagate_context``.
+- model calls: wall time and prompt/response token counts from the
+  response usage metadata.
+
+A call that raises skips the after callbacks; the error callbacks close it
+instead (status ``error``, span status ERROR), so nothing is left open.
+
+Results are exported two ways:
+
+- OpenTelemetry spans (``dq.tool <name>`` / ``dq.model <agent>``) through
+  the globally configured tracer provider (no-op when none is set)
+- Prometheus text metrics, from ``render_prometheus()`` or the HTTP
+  endpoint started by ``start_metrics_server()`` (``METRICS_PORT``)
+"""
+
+import contextvars
+import functools
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from dq_agents.tool_responses import estimate_tokens
+from environment.config_utils import get_instrumentation_enabled, get_metrics_port
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_current_call: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar(
+    "dq_instrumented_call", default=None
+)
+
+_lock = threading.Lock()
+_counters: Dict[Tuple[str, Tuple], float] = {}
+_histograms: Dict[Tuple[str, Tuple], Dict[str, Any]] = {}
+_open_calls: Dict[Any, Dict[str, Any]] = {}
+
+_HELP = {
+    "dq_tool_calls_total": ("counter", "Tool calls by agent, tool and status"),
+    "dq_tool_duration_seconds": ("histogram", "Tool call wall time"),
+    "dq_tool_response_tokens_total": ("counter", "Estimated tokens of tool responses"),
+    "dq_tool_bq_jobs_total": ("counter", "BigQuery jobs run by tools"),
+    "dq_tool_bq_bytes_processed_total": ("counter", "Bytes processed by the BigQuery jobs of tools"),
+    "dq_tool_bq_bytes_billed_total": ("counter", "Bytes billed for the BigQuery jobs of tools"),
+    "dq_tool_bq_slot_ms_total": ("counter", "Slot milliseconds of the BigQuery jobs of tools"),
+    "dq_model_calls_total": ("counter", "LLM calls by agent and model"),
+    "dq_model_duration_seconds": ("histogram", "LLM call wall time"),
+    "dq_model_tokens_total": ("counter", "LLM tokens by agent, model and direction"),
+}
+
+
+def _labels(**labels: Any) -> Tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _inc(name: str, value: float = 1, **labels: Any) -> None:
+    key = (name, _labels(**labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def _observe(name: str, value: float, **labels: Any) -> None:
+    key = (name, _labels(**labels))
+    with _lock:
+        histogram = _histograms.setdefault(key, {"buckets": [0] * len(DURATION_BUCKETS), "sum": 0.0, "count": 0})
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if value <= bound:
+                histogram["buckets"][i] += 1
+        histogram["sum"] += value
+        histogram["count"] += 1
+
+
+@functools.cache
+def _tracer():
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        logger.debug("opentelemetry is not installed: tool and model spans are not exported")
+        return None
+    return trace.get_tracer("dq_agents")
+
+
+def _start_span(name: str, attributes: Dict[str, Any]):
+    tracer = _tracer()
+    if tracer is None:
+        return None
+    try:
+        return tracer.start_span(name, attributes=attributes)
+    except Exception:
+        logger.debug("Could not start span %s", name, exc_info=True)
+        return None
+
+
+def _end_span(span, attributes: Dict[str, Any], error: Optional[str] = None) -> None:
+    if span is None:
+        return
+    span.set_attributes({k: v for k, v in attributes.items() if v is not None})
+    if error:
+        from opentelemetry.trace import Status, StatusCode
+
+        span.set_status(Status(StatusCode.ERROR, error))
+    span.end()
+
+
+def track_job(query_job: Any) -> Any:
+    """Attribute a BigQuery job to the tool call in progress (if any); returns the job."""
+    call = _current_call.get()
+    if call is not None:
+        with _lock:
+            call["jobs"].append(query_job)
+    return query_job
+
+
+def propagate_context(fn: Callable) -> Callable:
+    """Wrap a function so it runs in (a copy of) the caller's context, e.g. on a worker thread."""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+
+    return run
+
+
+def job_stats(jobs: List[Any]) -> Dict[str, int]:
+    """Sum bytes processed/billed, slot ms and cache hits over BigQuery jobs."""
+    stats = {"jobs": len(jobs), "bytes_processed": 0, "bytes_billed": 0, "slot_ms": 0, "cache_hits": 0}
+    for job in jobs:
+        stats["bytes_processed"] += getattr(job, "total_bytes_processed", None) or 0
+        stats["bytes_billed"] += getattr(job, "total_bytes_billed", None) or 0
+        stats["slot_ms"] += getattr(job, "slot_millis", None) or 0
+        stats["cache_hits"] += int(bool(getattr(job, "cache_hit", False)))
+    return stats
+
+
+def _agent_name(context: Any) -> str:
+    return getattr(context, "agent_name", None) or "unknown"
+
+
+def _call_key(tool_context: Any) -> Any:
+    return getattr(tool_context, "function_call_id", None) or id(tool_context)
+
+
+def before_tool(tool, args, tool_context) -> None:
+    """ADK before_tool_callback: start timing the call and attributing BigQuery jobs to it."""
+    agent = _agent_name(tool_context)
+    call = {
+        "agent": agent,
+        "tool": tool.name,
+        "started": time.perf_counter(),
+        "jobs": [],
+        "parent": _current_call.get(),
+        "span": _start_span(f"dq.tool {tool.name}", {"dq.agent": agent, "dq.tool": tool.name}),
+    }
+    with _lock:
+        _open_calls[_call_key(tool_context)] = call
+    _current_call.set(call)
+    return None
+
+
+def after_tool(tool, args, tool_context, tool_response) -> None:
+    """ADK after_tool_callback: record wall time, BigQuery job stats and response tokens."""
+    with _lock:
+        call = _open_calls.pop(_call_key(tool_context), None)
+    if call is None:
+        return None
+    _current_call.set(call["parent"])
+
+    text = tool_response if isinstance(tool_response, str) else str(tool_response)
+    error = None
+    if isinstance(tool_response, dict) and tool_response.get("error"):
+        error = str(tool_response["error"])
+    elif isinstance(tool_response, str) and tool_response.startswith('{"error"'):
+        error = "error response"
+    _record_tool_call(call, estimate_tokens(text), error)
+    return None
+
+
+def on_tool_error(tool, args, tool_context, error) -> None:
+    """ADK on_tool_error_callback: record a tool call that raised (the after callback does not run)."""
+    with _lock:
+        call = _open_calls.pop(_call_key(tool_context), None)
+    if call is None:
+        return None
+    _current_call.set(call["parent"])
+    _record_tool_call(call, 0, f"{type(error).__name__}: {error}")
+    # Returning None lets ADK re-raise the error
+    return None
+
+
+def _record_tool_call(call: Dict[str, Any], tokens: int, error: Optional[str]) -> None:
+    duration = time.perf_counter() - call["started"]
+    stats = job_stats(call["jobs"])
+
+    labels = {"agent": call["agent"], "tool": call["tool"]}
+    _inc("dq_tool_calls_total", status="error" if error else "ok", **labels)
+    _observe("dq_tool_duration_seconds", duration, **labels)
+    _inc("dq_tool_response_tokens_total", tokens, **labels)
+    for job in call["jobs"]:
+        _inc("dq_tool_bq_jobs_total", cache_hit=str(bool(getattr(job, "cache_hit", False))).lower(), **labels)
+    _inc("dq_tool_bq_bytes_processed_total", stats["bytes_processed"], **labels)
+    _inc("dq_tool_bq_bytes_billed_total", stats["bytes_billed"], **labels)
+    _inc("dq_tool_bq_slot_ms_total", stats["slot_ms"], **labels)
+
+    _end_span(call["span"], {
+        "dq.duration_ms": round(duration * 1000, 2),
+        "dq.response_tokens": tokens,
+        "dq.bq.jobs": stats["jobs"],
+        "dq.bq.bytes_processed": stats["bytes_processed"],
+        "dq.bq.bytes_billed": stats["bytes_billed"],
+        "dq.bq.slot_ms": stats["slot_ms"],
+        "dq.bq.cache_hits": stats["cache_hits"],
+    }, error)
+
+
+def _model_key(callback_context: Any) -> Tuple:
+    return (getattr(callback_context, "invocation_id", None), _agent_name(callback_context))
+
+
+def before_model(callback_context, llm_request) -> None:
+    """ADK before_model_callback: start timing the LLM call."""
+    agent = _agent_name(callback_context)
+    model = getattr(llm_request, "model", None) or "unknown"
+    call = {
+        "agent": agent,
+        "model": model,
+        "started": time.perf_counter(),
+        "span": _start_span(f"dq.model {agent}", {"dq.agent": agent, "dq.model": model}),
+    }
+    with _lock:
+        _open_calls[_model_key(callback_context)] = call
+    return None
+
+
+def after_model(callback_context, llm_response) -> None:
+    """ADK after_model_callback: record wall time and token usage of the LLM call."""
+    with _lock:
+        call = _open_calls.pop(_model_key(callback_context), None)
+    if call is None:
+        return None
+    # Streaming responses call this once per chunk; the usage metadata arrives with the last one
+    if getattr(llm_response, "partial", False):
+        with _lock:
+            _open_calls[_model_key(callback_context)] = call
+        return None
+
+    usage = getattr(llm_response, "usage_metadata", None)
+    tokens_in = getattr(usage, "prompt_token_count", None) or 0
+    tokens_out = getattr(usage, "candidates_token_count", None) or 0
+    _record_model_call(call, tokens_in, tokens_out, getattr(llm_response, "error_message", None))
+    return None
+
+
+def on_model_error(callback_context, llm_request, error) -> None:
+    """ADK on_model_error_callback: record an LLM call that raised (the after callback does not run)."""
+    with _lock:
+        call = _open_calls.pop(_model_key(callback_context), None)
+    if call is None:
+        return None
+    _record_model_call(call, 0, 0, f"{type(error).__name__}: {error}")
+    # Returning None lets ADK re-raise the error
+    return None
+
+
+def _record_model_call(call: Dict[str, Any], tokens_in: int, tokens_out: int, error: Optional[str]) -> None:
+    duration = time.perf_counter() - call["started"]
+
+    labels = {"agent": call["agent"], "model": call["model"]}
+    _inc("dq_model_calls_total", status="error" if error else "ok", **labels)
+    _observe("dq_model_duration_seconds", duration, **labels)
+    _inc("dq_model_tokens_total", tokens_in, direction="input", **labels)
+    _inc("dq_model_tokens_total", tokens_out, direction="output", **labels)
+
+    _end_span(call["span"], {
+        "dq.duration_ms": round(duration * 1000, 2),
+        "dq.tokens.input": tokens_in,
+        "dq.tokens.output": tokens_out,
+    }, error)
+
+
+def _chain(ours: Callable, existing: Any) -> Any:
+    """Run our callback first (it never short-circuits), then the agent's own."""
+    if existing is None:
+        return ours
+    callbacks = existing if isinstance(existing, list) else [existing]
+    if ours in callbacks:
+        return existing
+    return [ours, *callbacks]
+
+
+def instrument_agent(agent: Any) -> Any:
+    """Add the instrumentation callbacks to an LlmAgent (no-op when disabled); returns the agent."""
+    # Only LLM agents have tool/model callbacks (not workflow agents or test doubles)
+    if not get_instrumentation_enabled() or not hasattr(agent, "before_tool_callback"):
+        return agent
+    agent.before_tool_callback = _chain(before_tool, agent.before_tool_callback)
+    agent.after_tool_callback = _chain(after_tool, agent.after_tool_callback)
+    agent.before_model_callback = _chain(before_model, agent.before_model_callback)
+    agent.after_model_callback = _chain(after_model, agent.after_model_callback)
+    # Error callbacks exist from ADK 1.x on
+    if hasattr(agent, "on_tool_error_callback"):
+        agent.on_tool_error_callback = _chain(on_tool_error, agent.on_tool_error_callback)
+    if hasattr(agent, "on_model_error_callback"):
+        agent.on_model_error_callback = _chain(on_model_error, agent.on_model_error_callback)
+    if get_metrics_port():
+        start_metrics_server(get_metrics_port())
+    return agent
+
+
+def metrics_snapshot() -> Dict[str, Any]:
+    """Get all recorded counters and histograms, keyed by metric name and labels."""
+    with _lock:
+        counters = {(name, labels): value for (name, labels), value in _counters.items()}
+        histograms = {key: {**h, "buckets": list(h["buckets"])} for key, h in _histograms.items()}
+    return {"counters": counters, "histograms": histograms}
+
+
+def reset_metrics() -> None:
+    """Clear all recorded metrics."""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def _format_labels(labels: Tuple, extra: Tuple = ()) -> str:
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def render_prometheus() -> str:
+    """Render all metrics in the Prometheus text exposition format."""
+    snapshot = metrics_snapshot()
+    lines = []
+    for name, (kind, help_text) in _HELP.items():
+        if kind == "counter":
+            series = [(labels, v) for (n, labels), v in snapshot["counters"].items() if n == name]
+        else:
+            series = [(labels, h) for (n, labels), h in snapshot["histograms"].items() if n == name]
+        if not series:
+            continue
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for labels, value in sorted(series, key=lambda s: s[0]):
+            if kind == "counter":
+                lines.append(f"{name}{_format_labels(labels)} {value:g}")
+                continue
+            for bound, count in zip(DURATION_BUCKETS, value["buckets"]):
+                lines.append(f"{name}_bucket{_format_labels(labels, (('le', f'{bound:g}'),))} {count}")
+            lines.append(f"{name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {value['count']}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {value['sum']:.6f}")
+            lines.append(f"{name}_count{_format_labels(labels)} {value['count']}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("metrics endpoint: " + format, *args)
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_attempted = False
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> Optional[ThreadingHTTPServer]:
+    """Serve /metrics on a daemon thread (once per process); returns the server, or None if the port is taken."""
+    global _server, _server_attempted
+    with _lock:
+        if _server_attempted:
+            return _server
+        _server_attempted = True
+        try:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        except OSError as e:
+            # Another process (e.g. a second Streamlit worker) already serves this port
+            logger.warning("Metrics endpoint not started on %s:%s: %s", host, port, e)
+            return None
+        threading.Thread(target=_server.serve_forever, name="dq-metrics", daemon=True).start()
+        return _server
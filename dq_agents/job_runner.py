@@ -0,0 +1,292 @@
+"""Background execution of orchestrator workflows.
+
+A full DQ workflow is a multi-agent run of several minutes. Running it
+inside the Streamlit script thread froze the page until it finished. The
+job runner executes workflows out of band instead:
+
+- ``submit()`` queues a workflow on a worker thread pool (several
+  workflows run concurrently, ``JOB_MAX_CONCURRENCY``) and returns a job ID
+  right away
+- worker threads have no Streamlit session, so the inputs a workflow
+  needs from it (e.g. uploaded DQ rules) are captured at submit time and
+  seeded into the initial agent session state
+- every event of the run is appended to a SQLite job store as it arrives
+  (author, full text, tool calls and the serialised event), with the job
+  status, final response and error
+- the UI polls ``get_job()`` / ``get_events(job_id, after_seq)`` and only
+  reads the events it has not seen yet
+
+The store outlives the process, so finished runs stay inspectable after
+a restart; jobs whose process died are reported as ``interrupted``.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from environment.config_utils import get_job_max_concurrency, get_job_store_path
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+INTERRUPTED = "interrupted"
+
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    label TEXT,
+    prompt TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    event_count INTEGER NOT NULL DEFAULT 0,
+    final_text TEXT,
+    error TEXT,
+    pid INTEGER,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT
+);
+CREATE TABLE IF NOT EXISTS job_events (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    author TEXT,
+    text TEXT,
+    tool_calls TEXT,
+    is_final INTEGER NOT NULL,
+    payload TEXT,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_created_at ON jobs (created_at);
+"""
+
+
+def _utcnow() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def event_record(event: Any) -> Dict[str, Any]:
+    """Extract author, text, tool calls and a JSON payload from an ADK event."""
+    texts, tool_calls = [], []
+    content = getattr(event, "content", None)
+    for part in getattr(content, "parts", None) or []:
+        if getattr(part, "text", None):
+            texts.append(part.text)
+        if getattr(part, "function_call", None):
+            tool_calls.append(part.function_call.name)
+
+    is_final = getattr(event, "is_final_response", None)
+    if hasattr(event, "model_dump_json"):
+        payload = event.model_dump_json(exclude_none=True)
+    else:
+        payload = None
+    return {
+        "author": getattr(event, "author", None),
+        "text": "".join(texts),
+        "tool_calls": tool_calls,
+        "is_final": bool(is_final()) if callable(is_final) else False,
+        "payload": payload,
+    }
+
+
+class JobStore:
+    """Workflow jobs and their event streams in a local SQLite file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SQLITE_SCHEMA)
+
+    def create(self, job_id: str, prompt: str, user_id: str, label: Optional[str]) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, label, prompt, user_id, status, pid, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, label, prompt, user_id, QUEUED, os.getpid(), _utcnow())
+            )
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE job_id = ?", (*fields.values(), job_id))
+
+    def append_event(self, job_id: str, seq: int, record: Dict[str, Any]) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO job_events (job_id, seq, author, text, tool_calls, is_final, payload, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, seq, record["author"], record["text"], json.dumps(record["tool_calls"]),
+                 int(record["is_final"]), record["payload"], _utcnow())
+            )
+            self._conn.execute("UPDATE jobs SET event_count = ? WHERE job_id = ?", (seq, job_id))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def events(self, job_id: str, after_seq: int = 0, include_payload: bool = False) -> List[Dict[str, Any]]:
+        columns = "seq, author, text, tool_calls, is_final, created_at" + (", payload" if include_payload else "")
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {columns} FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq",
+                (job_id, after_seq)
+            ).fetchall()
+        events = []
+        for row in rows:
+            event = dict(row)
+            event["tool_calls"] = json.loads(event["tool_calls"]) if event["tool_calls"] else []
+            event["is_final"] = bool(event["is_final"])
+            events.append(event)
+        return events
+
+    def mark_interrupted(self) -> int:
+        """Mark active jobs whose process is gone as interrupted; returns how many."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT job_id, pid FROM jobs WHERE status IN ({', '.join('?' for _ in ACTIVE_STATUSES)})",
+                ACTIVE_STATUSES
+            ).fetchall()
+        stale = [row["job_id"] for row in rows if row["pid"] != os.getpid() and not _pid_alive(row["pid"])]
+        for job_id in stale:
+            self.update(job_id, status=INTERRUPTED, finished_at=_utcnow())
+        return len(stale)
+
+
+def run_orchestrator(prompt: str, user_id: str, state: Optional[Dict[str, Any]] = None) -> Iterable[Any]:
+    """Run the orchestrator agent on a prompt in a fresh session (seeded with ``state``) and yield its events."""
+    import asyncio
+
+    from google.adk.artifacts import InMemoryArtifactService
+    from google.adk.runners import Runner
+    from google.adk.sessions import InMemorySessionService
+    from google.genai import types
+
+    from dq_agents.orchestrator.agent import orchestrator_agent
+
+    session_service = InMemorySessionService()
+    runner = Runner(
+        app_name="DQOrchestratorAgent",
+        agent=orchestrator_agent,
+        session_service=session_service,
+        artifact_service=InMemoryArtifactService()
+    )
+    session = asyncio.run(session_service.create_session(app_name="DQOrchestratorAgent", user_id=user_id, state=state or {}))
+    content = types.Content(role="user", parts=[types.Part(text=prompt)])
+    yield from runner.run(user_id=user_id, session_id=session.id, new_message=content)
+
+
+class JobRunner:
+    """Runs workflows on a thread pool and records them in a JobStore."""
+
+    def __init__(self, store: JobStore, max_workers: int = 2,
+                 run_fn: Callable[[str, str, Optional[Dict[str, Any]]], Iterable[Any]] = run_orchestrator):
+        self.store = store
+        self.run_fn = run_fn
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="dq-job")
+        self._cancelled = set()
+        self._lock = threading.Lock()
+
+    def submit(self, prompt: str, user_id: str = "streamlit_user", label: Optional[str] = None,
+               state: Optional[Dict[str, Any]] = None) -> str:
+        """Queue a workflow (with an initial session ``state``) and return its job ID."""
+        job_id = uuid.uuid4().hex
+        self.store.create(job_id, prompt, user_id, label)
+        self._executor.submit(self._run, job_id, prompt, user_id, dict(state or {}))
+        return job_id
+
+    def cancel(self, job_id: str) -> None:
+        """Stop a job at its next event (a queued job never starts)."""
+        with self._lock:
+            self._cancelled.add(job_id)
+
+    def _is_cancelled(self, job_id: str) -> bool:
+        with self._lock:
+            return job_id in self._cancelled
+
+    def _run(self, job_id: str, prompt: str, user_id: str, state: Dict[str, Any]) -> None:
+        if self._is_cancelled(job_id):
+            self.store.update(job_id, status=CANCELLED, finished_at=_utcnow())
+            return
+
+        self.store.update(job_id, status=RUNNING, started_at=_utcnow())
+        final_text = None
+        seq = 0
+        try:
+            events = self.run_fn(prompt, user_id, state)
+            try:
+                for event in events:
+                    seq += 1
+                    record = event_record(event)
+                    self.store.append_event(job_id, seq, record)
+                    if record["text"]:
+                        final_text = record["text"]
+                    if self._is_cancelled(job_id):
+                        self.store.update(job_id, status=CANCELLED, final_text=final_text, finished_at=_utcnow())
+                        return
+            finally:
+                if hasattr(events, "close"):
+                    events.close()
+            self.store.update(job_id, status=SUCCEEDED, final_text=final_text, finished_at=_utcnow())
+        except Exception as e:
+            self.store.update(
+                job_id, status=FAILED, final_text=final_text,
+                error=f"{e}\n\n{traceback.format_exc()}", finished_at=_utcnow()
+            )
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get the status, event count, final response and error of a job."""
+        return self.store.get(job_id)
+
+    def get_events(self, job_id: str, after_seq: int = 0, include_payload: bool = False) -> List[Dict[str, Any]]:
+        """Get the events of a job recorded after sequence number ``after_seq``."""
+        return self.store.events(job_id, after_seq=after_seq, include_payload=include_payload)
+
+    def list_jobs(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Get the most recent jobs, newest first."""
+        return self.store.recent(limit)
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_job_runner() -> JobRunner:
+    """Get the process-wide job runner (created once per process)."""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            store = JobStore(get_job_store_path())
+            store.mark_interrupted()
+            _runner = JobRunner(store, max_workers=get_job_max_concurrency())
+        return _runner
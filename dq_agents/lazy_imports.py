@@ -0,0 +1,36 @@
+"""Deferred imports for heavy optional dependencies.
+
+``lazy_import("plotly.express")`` returns a module object right away but
+only executes the module on first attribute access, so a script can keep
+its usual module-level aliases (``px = lazy_import(...)``) without paying
+the import cost on code paths that never draw a chart.
+
+Parent packages are still imported eagerly (Python needs them to find
+the submodule), so this only helps when the parent package itself is
+light, as with ``plotly``.
+"""
+
+import importlib.util
+import sys
+import threading
+from types import ModuleType
+
+_lock = threading.Lock()
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Import a module lazily: it is executed on first attribute access."""
+    with _lock:
+        if name in sys.modules:
+            return sys.modules[name]
+
+        spec = importlib.util.find_spec(name)
+        if spec is None:
+            raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+
+        loader = importlib.util.LazyLoader(spec.loader)
+        spec.loader = loader
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        loader.exec_module(module)
+        return module
@@ -7,19 +7,31 @@ from .tools import (
     calculate_cost_of_inaction,
     detect_anomalies_in_data,
     generate_metrics_narrative,
-    get_dq_rule_accuracy
+    get_dq_rule_accuracy,
+    get_violation_trends
 )
 
-metrics_agent = LlmAgent(
-    model=os.getenv("ROOT_AGENT_MODEL", "gemini-2.0-flash"),
-    name="metrics_agent",
-    instruction=return_instructions_metrics(),
-    tools=[
-        calculate_remediation_metrics,
-        calculate_cost_of_inaction,
-        detect_anomalies_in_data,
-        generate_metrics_narrative,
-        get_dq_rule_accuracy
-    ],
-    generate_content_config=types.GenerateContentConfig(temperature=0.3)
-)
+def get_metrics_agent():
+    """Create and return a new Metrics Agent instance."""
+    return LlmAgent(
+        model=os.getenv("ROOT_AGENT_MODEL", "gemini-2.0-flash"),
+        name="metrics_agent",
+        instruction=return_instructions_metrics(),
+        tools=[
+            calculate_remediation_metrics,
+            calculate_cost_of_inaction,
+            detect_anomalies_in_data,
+            generate_metrics_narrative,
+            get_dq_rule_accuracy,
+            get_violation_trends
+        ],
+        generate_content_config=types.GenerateContentConfig(temperature=0.3)
+    )
+
+
+def __getattr__(name):
+    # `metrics_agent` is the shared instance from the agent registry, built on first access
+    if name == "metrics_agent":
+        from dq_agents.agent_registry import get_agent
+        return get_agent("metrics")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,510 @@
+"""Anomaly detection over whole tables for the metrics agent.
+
+``detect_anomalies_in_data`` used to fit an IsolationForest on the first
+1000 rows and 5 numeric columns of a table on every call. The engine here
+splits that into a training step and a scoring step:
+
+- training reads a stratified sample of the table (rows grouped by which
+  numeric columns are NULL, each group sampled in proportion to its size
+  with a minimum per group, so rare NULL patterns are represented) and
+  fits a median imputer + IsolationForest on all numeric columns
+- the fitted model is stored in ``dq_anomaly_models/`` under the table
+  name and its schema hash, so it is reused until the table's columns
+  change (or the contamination rate does)
+- scoring streams the whole table as Arrow record batches, scores the
+  batches on ``ANOMALY_N_JOBS`` threads and keeps only running column
+  statistics and the current top-k anomalies (``np.argpartition``), so
+  memory does not grow with the table
+
+scikit-learn is only imported when a model has to be trained.
+
+Tables of at least ``ANOMALY_BQML_MIN_ROWS`` rows are scored inside
+BigQuery by ``bqml_anomalies`` instead (``ANOMALY_BACKEND`` forces either
+backend). With ``auto``, a BigQuery ML failure (no permission to create
+models, unsupported region, ...) falls back to local scoring.
+"""
+
+import logging
+import os
+import pickle
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pyarrow as pa
+from google.cloud import bigquery
+
+from dq_agents.cost_gate import run_query
+from dq_agents.instrumentation import propagate_context
+from dq_agents.query_results import fetch_arrow, iter_record_batches
+from dq_agents.rules_store import schema_hash
+from environment.config_utils import (
+    get_anomaly_backend,
+    get_anomaly_batch_rows,
+    get_anomaly_bqml_min_rows,
+    get_anomaly_contamination_rate,
+    get_anomaly_max_scored_rows,
+    get_anomaly_model_dir,
+    get_anomaly_n_jobs,
+    get_anomaly_training_rows
+)
+
+logger = logging.getLogger(__name__)
+
+NUMERIC_TYPES = ("INTEGER", "INT64", "FLOAT", "FLOAT64", "NUMERIC", "BIGNUMERIC")
+
+BACKENDS = ("auto", "local", "bqml")
+
+# Fewer training rows than this cannot give a meaningful model
+MIN_TRAINING_ROWS = 10
+
+# Rows always sampled from each NULL-pattern stratum (if it has that many)
+MIN_ROWS_PER_STRATUM = 20
+
+_models: Dict[str, "AnomalyModel"] = {}
+_models_lock = threading.Lock()
+
+
+@dataclass
+class AnomalyModel:
+    """A fitted anomaly model and what it was trained on."""
+
+    model: Any
+    columns: List[str]
+    schema_version: str
+    threshold: float
+    contamination: float
+    training_rows: int
+    trained_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+
+    def score(self, X: np.ndarray) -> np.ndarray:
+        """Anomaly scores of a feature matrix (lower is more anomalous)."""
+        return self.model.score_samples(X)
+
+
+def numeric_columns(schema: Iterable[bigquery.SchemaField]) -> List[str]:
+    """Names of the numeric columns of a table schema, in schema order."""
+    return [f.name for f in schema if f.field_type in NUMERIC_TYPES and f.mode != "REPEATED"]
+
+
+def schema_version(schema: Iterable[bigquery.SchemaField]) -> str:
+    """Hash of a table schema; a model is only reused for the same version."""
+    return schema_hash((f.name, f.field_type) for f in schema)
+
+
+def _feature_select(columns: List[str]) -> str:
+    return ", ".join(f"CAST(`{col}` AS FLOAT64) AS `{col}`" for col in columns)
+
+
+def training_sample_sql(
+    table_ref: str,
+    columns: List[str],
+    sample_rows: int,
+    key_column: Optional[str] = None
+) -> str:
+    """
+    Build the query reading a stratified training sample of a table.
+
+    Rows are stratified by their NULL pattern over ``columns``. Each stratum
+    contributes its proportional share of ``sample_rows`` (at least
+    MIN_ROWS_PER_STRATUM rows). Rows are picked by a hash of the row key
+    (or the whole row), so the same table gives the same sample.
+    """
+    null_pattern = " || ".join(f"IF(`{col}` IS NULL, '1', '0')" for col in columns)
+    row_hash = f"FARM_FINGERPRINT(CAST(`{key_column}` AS STRING))" if key_column else "FARM_FINGERPRINT(TO_JSON_STRING(t))"
+    return f"""
+        WITH strata AS (
+            SELECT
+                {_feature_select(columns)},
+                {null_pattern} AS _stratum,
+                {row_hash} AS _row_hash
+            FROM `{table_ref}` AS t
+        ),
+        ranked AS (
+            SELECT
+                *,
+                ROW_NUMBER() OVER (PARTITION BY _stratum ORDER BY _row_hash) AS _rank,
+                COUNT(*) OVER (PARTITION BY _stratum) AS _stratum_rows,
+                COUNT(*) OVER () AS _total_rows
+            FROM strata
+        )
+        SELECT {", ".join(f"`{col}`" for col in columns)}
+        FROM ranked
+        WHERE _rank <= GREATEST({int(MIN_ROWS_PER_STRATUM)}, CAST(CEIL({int(sample_rows)} * _stratum_rows / _total_rows) AS INT64))
+    """
+
+
+def scoring_sql(table_ref: str, columns: List[str], key_column: Optional[str] = None) -> str:
+    """Build the query reading the key and numeric columns of every row of a table."""
+    key_select = f"CAST(`{key_column}` AS STRING) AS `{key_column}`, " if key_column else ""
+    return f"SELECT {key_select}{_feature_select(columns)} FROM `{table_ref}`"
+
+
+def feature_matrix(batch: pa.RecordBatch, columns: List[str]) -> np.ndarray:
+    """Float64 matrix of a record batch's feature columns (NULL becomes NaN)."""
+    X = np.empty((batch.num_rows, len(columns)), dtype=np.float64)
+    for i, col in enumerate(columns):
+        X[:, i] = batch.column(col).to_numpy(zero_copy_only=False)
+    return X
+
+
+def fit_model(
+    X: np.ndarray,
+    columns: List[str],
+    version: str,
+    contamination: Optional[float] = None,
+    n_jobs: Optional[int] = None
+) -> AnomalyModel:
+    """Fit a median imputer + IsolationForest on a training matrix."""
+    # scikit-learn is slow to import, so only load it when a model is trained
+    from sklearn.ensemble import IsolationForest
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import Pipeline
+
+    contamination = get_anomaly_contamination_rate() if contamination is None else contamination
+    forest = IsolationForest(
+        contamination=contamination,
+        random_state=42,
+        n_jobs=get_anomaly_n_jobs() if n_jobs is None else n_jobs
+    )
+    # keep_empty_features keeps all-NULL columns, so the column order still matches
+    model = Pipeline([
+        ("impute", SimpleImputer(strategy="median", keep_empty_features=True)),
+        ("forest", forest),
+    ])
+    model.fit(X)
+    return AnomalyModel(
+        model=model,
+        columns=list(columns),
+        schema_version=version,
+        threshold=float(forest.offset_),
+        contamination=contamination,
+        training_rows=len(X)
+    )
+
+
+class ModelStore:
+    """Fitted anomaly models as pickle files, one per table and schema version."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def path(self, table_ref: str, version: str) -> str:
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", table_ref)
+        return os.path.join(self.directory, f"{safe_name}-{version}.pkl")
+
+    def load(self, table_ref: str, version: str) -> Optional[AnomalyModel]:
+        try:
+            with open(self.path(table_ref, version), "rb") as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return None
+
+    def save(self, table_ref: str, entry: AnomalyModel) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(table_ref, entry.schema_version)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        return path
+
+
+def get_model_store() -> ModelStore:
+    """Get the model store in the configured directory."""
+    return ModelStore(get_anomaly_model_dir())
+
+
+def load_or_train(
+    client: bigquery.Client,
+    table_ref: str,
+    schema: List[bigquery.SchemaField],
+    key_column: Optional[str] = None,
+    sample_rows: Optional[int] = None,
+    retrain: bool = False,
+    store: Optional[ModelStore] = None,
+    tool_context=None
+) -> AnomalyModel:
+    """
+    Get the model of a table, training and storing one if there is none yet.
+
+    A model is reused while the table's schema version and the configured
+    contamination rate are unchanged.
+
+    Raises:
+        ValueError: If the table has no numeric columns or too few rows
+    """
+    store = store or get_model_store()
+    columns = numeric_columns(schema)
+    if not columns:
+        raise ValueError("No numerical columns found for anomaly detection")
+
+    version = schema_version(schema)
+    contamination = get_anomaly_contamination_rate()
+    cache_key = f"{table_ref}@{version}"
+    if not retrain:
+        with _models_lock:
+            entry = _models.get(cache_key)
+        if entry is None:
+            entry = store.load(table_ref, version)
+        if entry is not None and entry.contamination == contamination:
+            with _models_lock:
+                _models[cache_key] = entry
+            return entry
+
+    sql = training_sample_sql(table_ref, columns, sample_rows or get_anomaly_training_rows(), key_column)
+    sample = fetch_arrow(run_query(client, sql, tool_context=tool_context).result())
+    if sample.num_rows < MIN_TRAINING_ROWS:
+        raise ValueError(f"Insufficient data for anomaly detection (minimum {MIN_TRAINING_ROWS} rows required)")
+
+    X = np.vstack([feature_matrix(batch, columns) for batch in sample.to_batches()])
+    entry = fit_model(X, columns, version, contamination)
+    store.save(table_ref, entry)
+    with _models_lock:
+        _models[cache_key] = entry
+    return entry
+
+
+def clear_model_cache() -> None:
+    """Forget the models loaded in this process (stored files are kept)."""
+    with _models_lock:
+        _models.clear()
+
+
+class TopK:
+    """The k lowest-scoring rows seen so far."""
+
+    def __init__(self, k: int, num_columns: int):
+        self.k = k
+        self.scores = np.empty(0, dtype=np.float64)
+        self.keys = np.empty(0, dtype=object)
+        self.values = np.empty((0, num_columns), dtype=np.float64)
+
+    def update(self, scores: np.ndarray, keys: np.ndarray, values: np.ndarray) -> None:
+        if self.k <= 0 or not len(scores):
+            return
+        if len(scores) > self.k:
+            idx = np.argpartition(scores, self.k - 1)[:self.k]
+            scores, keys, values = scores[idx], keys[idx], values[idx]
+
+        scores = np.concatenate([self.scores, scores])
+        keys = np.concatenate([self.keys, keys])
+        values = np.concatenate([self.values, values])
+        if len(scores) > self.k:
+            idx = np.argpartition(scores, self.k - 1)[:self.k]
+            scores, keys, values = scores[idx], keys[idx], values[idx]
+        self.scores, self.keys, self.values = scores, keys, values
+
+    def sorted(self):
+        """(scores, keys, values), most anomalous first."""
+        order = np.argsort(self.scores, kind="stable")
+        return self.scores[order], self.keys[order], self.values[order]
+
+
+class ColumnStats:
+    """Running count, mean, variance, min and max per column (NaN ignored)."""
+
+    def __init__(self, num_columns: int):
+        self.count = np.zeros(num_columns, dtype=np.int64)
+        self.mean = np.zeros(num_columns, dtype=np.float64)
+        self.m2 = np.zeros(num_columns, dtype=np.float64)
+        self.min = np.full(num_columns, np.inf)
+        self.max = np.full(num_columns, -np.inf)
+
+    def update(self, X: np.ndarray) -> None:
+        valid = ~np.isnan(X)
+        n = valid.sum(axis=0)
+        if not n.any():
+            return
+        filled = np.where(valid, X, 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            batch_mean = np.where(n > 0, filled.sum(axis=0) / n, 0.0)
+        batch_m2 = np.where(valid, (X - batch_mean) ** 2, 0.0).sum(axis=0)
+
+        # Chan et al. pairwise combination of the two partial results
+        total = self.count + n
+        delta = batch_mean - self.mean
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.mean = np.where(total > 0, self.mean + delta * n / total, 0.0)
+            self.m2 = np.where(total > 0, self.m2 + batch_m2 + delta ** 2 * self.count * n / total, 0.0)
+        self.count = total
+        self.min = np.fmin(self.min, np.where(valid, X, np.inf).min(axis=0))
+        self.max = np.fmax(self.max, np.where(valid, X, -np.inf).max(axis=0))
+
+    def summary(self, columns: List[str]) -> Dict[str, Dict[str, Optional[float]]]:
+        """mean/std (sample)/min/max of each column, rounded to 2 decimals."""
+        result = {}
+        for i, col in enumerate(columns):
+            if not self.count[i]:
+                result[col] = {"mean": None, "std": None, "min": None, "max": None}
+                continue
+            std = np.sqrt(self.m2[i] / (self.count[i] - 1)) if self.count[i] > 1 else 0.0
+            result[col] = {
+                "mean": round(float(self.mean[i]), 2),
+                "std": round(float(std), 2),
+                "min": round(float(self.min[i]), 2),
+                "max": round(float(self.max[i]), 2),
+            }
+        return result
+
+
+def _clean(value: float) -> Optional[float]:
+    return None if np.isnan(value) else float(value)
+
+
+def score_batches(
+    entry: AnomalyModel,
+    batches: Iterable[pa.RecordBatch],
+    key_column: Optional[str] = None,
+    top_k: int = 10,
+    n_jobs: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Score record batches with a model and summarise the result.
+
+    Batches are scored on ``n_jobs`` threads; at most two batches per thread
+    are in flight, so the input is consumed as a stream.
+
+    Returns:
+        Dict with the ``detect_anomalies_in_data`` result fields
+    """
+    n_jobs = get_anomaly_n_jobs() if n_jobs is None else n_jobs
+    columns = entry.columns
+    top = TopK(top_k, len(columns))
+    stats = ColumnStats(len(columns))
+    totals = {"rows": 0, "anomalies": 0}
+
+    def score(batch: pa.RecordBatch):
+        X = feature_matrix(batch, columns)
+        return batch, X, entry.score(X) if len(X) else np.empty(0)
+
+    def collect(batch: pa.RecordBatch, X: np.ndarray, scores: np.ndarray) -> None:
+        stats.update(X)
+        is_anomaly = scores < entry.threshold
+        totals["rows"] += len(scores)
+        totals["anomalies"] += int(is_anomaly.sum())
+        if not is_anomaly.any():
+            return
+        if key_column:
+            keys = np.asarray(batch.column(key_column).to_pylist(), dtype=object)[is_anomaly]
+        else:
+            keys = np.full(int(is_anomaly.sum()), None, dtype=object)
+        top.update(scores[is_anomaly], keys, X[is_anomaly])
+
+    score_in_context = propagate_context(score)
+    with ThreadPoolExecutor(max_workers=max(1, n_jobs), thread_name_prefix="dq-anomaly") as executor:
+        pending = deque()
+        for batch in batches:
+            pending.append(executor.submit(score_in_context, batch))
+            if len(pending) >= 2 * max(1, n_jobs):
+                collect(*pending.popleft().result())
+        while pending:
+            collect(*pending.popleft().result())
+
+    scores, keys, values = top.sorted()
+    rows = totals["rows"]
+    return {
+        "total_rows_analyzed": rows,
+        "anomalies_detected": totals["anomalies"],
+        "anomaly_rate": round(totals["anomalies"] / rows * 100, 2) if rows else 0.0,
+        "columns_analyzed": list(columns),
+        "top_anomalies": [
+            {
+                "policy_id": None if key is None else str(key),
+                "anomaly_score": round(float(score), 4),
+                "values": {col: _clean(v) for col, v in zip(columns, row)}
+            }
+            for score, key, row in zip(scores, keys, values)
+        ],
+        "statistics": stats.summary(columns),
+    }
+
+
+def select_backend(num_rows: Optional[int], backend: Optional[str] = None) -> str:
+    """
+    Pick the backend scoring a table: ``local`` or ``bqml``.
+
+    ``auto`` (the default of ANOMALY_BACKEND) scores tables of at least
+    ANOMALY_BQML_MIN_ROWS rows in BigQuery and smaller ones locally.
+
+    Raises:
+        ValueError: If the backend is not one of BACKENDS
+    """
+    backend = (backend or get_anomaly_backend()).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"ANOMALY_BACKEND must be one of {', '.join(BACKENDS)}, got '{backend}'")
+    if backend != "auto":
+        return backend
+    return "bqml" if (num_rows or 0) >= get_anomaly_bqml_min_rows() else "local"
+
+
+def detect_anomalies(
+    client: bigquery.Client,
+    table_ref: str,
+    key_column: Optional[str] = None,
+    sample_rows: Optional[int] = None,
+    retrain: bool = False,
+    top_k: int = 10,
+    max_rows: Optional[int] = None,
+    backend: Optional[str] = None,
+    tool_context=None
+) -> Dict[str, Any]:
+    """
+    Score every row of a table with its (stored or newly trained) model.
+
+    Args:
+        client: BigQuery client
+        table_ref: Fully qualified table ID
+        key_column: Column identifying a row in ``top_anomalies`` (skipped if
+            the table does not have it)
+        sample_rows: Training sample size (default ANOMALY_TRAINING_ROWS)
+        retrain: Train a new model even if a stored one matches
+        top_k: Number of most anomalous rows to return
+        max_rows: Score at most this many rows locally (default
+            ANOMALY_MAX_SCORED_ROWS, 0 = all)
+        backend: ``auto``, ``local`` or ``bqml`` (default ANOMALY_BACKEND)
+
+    Returns:
+        Dict with the ``detect_anomalies_in_data`` result fields plus ``model``
+    """
+    table = client.get_table(table_ref)
+    schema = table.schema
+    if key_column not in {f.name for f in schema}:
+        key_column = None
+
+    bqml_error = None
+    if select_backend(table.num_rows, backend) == "bqml":
+        # Imported here because bqml_anomalies builds on this module
+        from dq_agents.metrics.bqml_anomalies import detect_anomalies_bqml
+        try:
+            return detect_anomalies_bqml(client, table, key_column, sample_rows, retrain, top_k, tool_context)
+        except Exception as e:
+            # Only auto falls back; an explicit bqml backend reports the failure
+            if (backend or get_anomaly_backend()).lower() != "auto":
+                raise
+            logger.warning("BigQuery ML anomaly detection failed for %s, scoring locally: %s", table_ref, e)
+            bqml_error = str(e)
+
+    entry = load_or_train(client, table_ref, schema, key_column, sample_rows, retrain, tool_context=tool_context)
+
+    max_rows = get_anomaly_max_scored_rows() if max_rows is None else max_rows
+    rows = run_query(client, scoring_sql(table_ref, entry.columns, key_column), tool_context=tool_context).result()
+    batches = iter_record_batches(rows, chunk_rows=get_anomaly_batch_rows(), max_rows=max_rows or None)
+
+    result = score_batches(entry, batches, key_column=key_column, top_k=top_k)
+    result["key_column"] = key_column
+    result["model"] = {
+        "backend": "local",
+        "schema_version": entry.schema_version,
+        "trained_at": entry.trained_at,
+        "training_rows": entry.training_rows,
+        "contamination": entry.contamination,
+    }
+    if bqml_error:
+        result["model"]["bqml_fallback"] = bqml_error
+    return result
@@ -0,0 +1,231 @@
+"""In-warehouse anomaly detection with BigQuery ML.
+
+The local engine (``anomaly_engine``) downloads every row it scores. For
+large tables this backend keeps the data in BigQuery instead:
+
+- one model per table and schema version (``KMEANS`` by default,
+  ``AUTOENCODER`` with ``ANOMALY_BQML_MODEL_TYPE``) is trained with
+  ``CREATE MODEL`` on the same stratified sample the local engine uses,
+  and reused while it exists. Models live in the scratch dataset
+  ``ANOMALY_BQML_DATASET`` (created in the table's location if missing),
+  never next to the production tables
+- ``ML.DETECT_ANOMALIES`` scores the whole table, and the anomaly count,
+  column statistics and top-k anomalies are aggregated in the same query,
+  so a single summary row is downloaded
+
+The result has the shape of the local engine's. ``anomaly_score`` is the
+negated normalized distance (KMEANS) or reconstruction error
+(AUTOENCODER), so lower is more anomalous in both backends.
+"""
+
+import re
+from typing import Any, Dict, List, Optional
+
+from google.api_core.exceptions import NotFound
+from google.cloud import bigquery
+
+from dq_agents.cost_gate import run_query
+from dq_agents.metrics.anomaly_engine import numeric_columns, schema_version, training_sample_sql
+from environment.config_utils import (
+    get_anomaly_bqml_dataset,
+    get_anomaly_bqml_model_type,
+    get_anomaly_contamination_rate,
+    get_anomaly_training_rows
+)
+
+MODEL_TYPES = ("kmeans", "autoencoder")
+
+# ML.DETECT_ANOMALIES output column measuring how far a row is from normal
+_DISTANCE_COLUMNS = {"kmeans": "normalized_distance", "autoencoder": "mean_squared_error"}
+
+
+def _model_options(model_type: str, num_columns: int) -> str:
+    if model_type == "kmeans":
+        return "model_type = 'KMEANS', standardize_features = TRUE, kmeans_init_method = 'KMEANS++'"
+    hidden = max(2, num_columns // 2)
+    bottleneck = max(1, hidden // 2)
+    return (
+        f"model_type = 'AUTOENCODER', activation_fn = 'RELU', "
+        f"hidden_units = [{hidden}, {bottleneck}, {hidden}], max_iterations = 20"
+    )
+
+
+def model_id(table: bigquery.Table, model_type: str, dataset_id: Optional[str] = None) -> str:
+    """Fully qualified ID of the anomaly model of a table (changes with its schema)."""
+    dataset_id = dataset_id or table.dataset_id
+    safe_name = re.sub(r"[^A-Za-z0-9_]", "_", table.table_id)
+    return f"{table.project}.{dataset_id}.dq_anomaly_{model_type}_{safe_name}_{schema_version(table.schema)}"
+
+
+def ensure_model_dataset(client: bigquery.Client, table: bigquery.Table, dataset_id: str) -> None:
+    """Create the model dataset in the table's location if it does not exist."""
+    if dataset_id == table.dataset_id:
+        return
+    try:
+        client.get_dataset(f"{table.project}.{dataset_id}")
+    except NotFound:
+        dataset = bigquery.Dataset(f"{table.project}.{dataset_id}")
+        dataset.location = client.get_dataset(f"{table.project}.{table.dataset_id}").location
+        client.create_dataset(dataset, exists_ok=True)
+
+
+def training_sql(
+    model_ref: str,
+    table_ref: str,
+    columns: List[str],
+    model_type: str,
+    sample_rows: int,
+    key_column: Optional[str] = None
+) -> str:
+    """Build the CREATE MODEL statement training an anomaly model on a stratified sample."""
+    return f"""
+        CREATE OR REPLACE MODEL `{model_ref}`
+        OPTIONS ({_model_options(model_type, len(columns))})
+        AS ({training_sample_sql(table_ref, columns, sample_rows, key_column)})
+    """
+
+
+def detection_sql(
+    model_ref: str,
+    table_ref: str,
+    columns: List[str],
+    model_type: str,
+    contamination: float,
+    key_column: Optional[str] = None,
+    top_k: int = 10
+) -> str:
+    """Build the query scoring a table with ML.DETECT_ANOMALIES and summarising it in one row."""
+    distance = _DISTANCE_COLUMNS[model_type]
+    features = ", ".join(f"CAST(`{col}` AS FLOAT64) AS `{col}`" for col in columns)
+    key_select = f"CAST(`{key_column}` AS STRING) AS _row_key, " if key_column else "CAST(NULL AS STRING) AS _row_key, "
+    stats = ",\n            ".join(
+        f"AVG(`{col}`) AS _mean_{i}, STDDEV_SAMP(`{col}`) AS _std_{i}, MIN(`{col}`) AS _min_{i}, MAX(`{col}`) AS _max_{i}"
+        for i, col in enumerate(columns)
+    )
+    feature_struct = ", ".join(f"`{col}`" for col in columns)
+    return f"""
+        SELECT
+            COUNT(*) AS total_rows,
+            COUNTIF(is_anomaly) AS anomalies,
+            ARRAY_AGG(
+                IF(is_anomaly, STRUCT(_row_key AS row_key, {distance} AS distance, STRUCT({feature_struct}) AS feature_values), NULL)
+                IGNORE NULLS ORDER BY {distance} DESC LIMIT {int(top_k)}
+            ) AS top_anomalies,
+            {stats}
+        FROM ML.DETECT_ANOMALIES(
+            MODEL `{model_ref}`,
+            STRUCT({float(contamination)} AS contamination),
+            (SELECT {key_select}{features} FROM `{table_ref}`)
+        )
+    """
+
+
+def summarise_detection(summary: Dict[str, Any], columns: List[str]) -> Dict[str, Any]:
+    """Convert the summary row of detection_sql to the anomaly result fields."""
+    total_rows = summary["total_rows"] or 0
+    anomalies = summary["anomalies"] or 0
+
+    def rounded(value: Optional[float]) -> Optional[float]:
+        return None if value is None else round(float(value), 2)
+
+    return {
+        "total_rows_analyzed": total_rows,
+        "anomalies_detected": anomalies,
+        "anomaly_rate": round(anomalies / total_rows * 100, 2) if total_rows else 0.0,
+        "columns_analyzed": list(columns),
+        "top_anomalies": [
+            {
+                "policy_id": anomaly["row_key"],
+                "anomaly_score": round(-float(anomaly["distance"]), 4),
+                "values": {col: anomaly["feature_values"][col] for col in columns}
+            }
+            for anomaly in summary["top_anomalies"] or []
+        ],
+        "statistics": {
+            col: {
+                "mean": rounded(summary[f"_mean_{i}"]),
+                "std": rounded(summary[f"_std_{i}"]),
+                "min": rounded(summary[f"_min_{i}"]),
+                "max": rounded(summary[f"_max_{i}"]),
+            }
+            for i, col in enumerate(columns)
+        },
+    }
+
+
+def ensure_model(
+    client: bigquery.Client,
+    table: bigquery.Table,
+    key_column: Optional[str] = None,
+    sample_rows: Optional[int] = None,
+    retrain: bool = False,
+    tool_context=None
+) -> Dict[str, Any]:
+    """
+    Get the BigQuery ML anomaly model of a table, training it if it does not exist.
+
+    Raises:
+        ValueError: If the table has no numeric columns or the model type is unknown
+    """
+    model_type = get_anomaly_bqml_model_type()
+    if model_type not in MODEL_TYPES:
+        raise ValueError(f"ANOMALY_BQML_MODEL_TYPE must be one of {', '.join(MODEL_TYPES)}, got '{model_type}'")
+    columns = numeric_columns(table.schema)
+    if not columns:
+        raise ValueError("No numerical columns found for anomaly detection")
+
+    dataset_id = get_anomaly_bqml_dataset()
+    model_ref = model_id(table, model_type, dataset_id)
+    trained = False
+    if not retrain:
+        try:
+            client.get_model(model_ref)
+        except NotFound:
+            retrain = True
+    if retrain:
+        ensure_model_dataset(client, table, dataset_id)
+        table_ref = f"{table.project}.{table.dataset_id}.{table.table_id}"
+        sql = training_sql(
+            model_ref, table_ref, columns, model_type,
+            sample_rows or get_anomaly_training_rows(), key_column
+        )
+        run_query(client, sql, tool_context=tool_context).result()
+        trained = True
+
+    return {"model_id": model_ref, "model_type": model_type, "columns": columns, "trained": trained}
+
+
+def detect_anomalies_bqml(
+    client: bigquery.Client,
+    table: bigquery.Table,
+    key_column: Optional[str] = None,
+    sample_rows: Optional[int] = None,
+    retrain: bool = False,
+    top_k: int = 10,
+    tool_context=None
+) -> Dict[str, Any]:
+    """
+    Score every row of a table with its BigQuery ML model, inside BigQuery.
+
+    Returns:
+        Dict with the ``detect_anomalies_in_data`` result fields plus ``model``
+    """
+    model = ensure_model(client, table, key_column, sample_rows, retrain, tool_context)
+    contamination = get_anomaly_contamination_rate()
+    table_ref = f"{table.project}.{table.dataset_id}.{table.table_id}"
+    sql = detection_sql(
+        model["model_id"], table_ref, model["columns"], model["model_type"], contamination, key_column, top_k
+    )
+    summary = next(iter(run_query(client, sql, tool_context=tool_context).result()))
+
+    result = summarise_detection(summary, model["columns"])
+    result["key_column"] = key_column
+    result["model"] = {
+        "backend": "bqml",
+        "model_id": model["model_id"],
+        "model_type": model["model_type"],
+        "trained": model["trained"],
+        "schema_version": schema_version(table.schema),
+        "contamination": contamination,
+    }
+    return result
@@ -8,6 +8,7 @@ Your responsibilities:
 3. Generate financial impact assessments (Materiality Index)
 4. Create narrative summaries with dynamic storytelling
 5. Analyze false positive rates for DQ rules
+6. Report violation trends from recorded rule runs (get_violation_trends) - use this instead of asking for rule results to be re-run
 
 Key Metrics to Calculate:
 - **Remediation Velocity**: Average time to resolve issues (hours/days)
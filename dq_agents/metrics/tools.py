@@ -9,9 +9,6 @@ import json
 from datetime import datetime
 from google.cloud import bigquery
 from google.adk.tools import ToolContext
-import pandas as pd
-from sklearn.ensemble import IsolationForest
-import numpy as np
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 from environment.config_utils import (
@@ -19,7 +16,16 @@ from environment.config_utils import (
     get_dataset_id, 
     get_risk_rate, 
     get_materiality_threshold,
-    get_anomaly_contamination_rate
+    get_policy_id_column
+)
+from dq_agents.cost_gate import run_query
+from dq_agents.metrics.anomaly_engine import detect_anomalies
+from dq_agents.tool_responses import shape_response
+from dq_agents.violation_store import (
+    get_latest_results,
+    get_table_summary,
+    get_top_rules,
+    get_violation_trend
 )
 
 
@@ -76,10 +82,10 @@ def calculate_remediation_metrics(
             "resolution_rate": round((resolved / total_issues * 100), 2) if total_issues > 0 else 0
         }
         
-        return json.dumps(metrics, indent=2)
+        return shape_response(metrics, "calculate_remediation_metrics")
         
     except Exception as e:
-        return json.dumps({"error": f"Failed to calculate metrics: {str(e)}"})
+        return shape_response({"error": f"Failed to calculate metrics: {str(e)}"}, "calculate_remediation_metrics")
 
 
 def calculate_cost_of_inaction(
@@ -113,7 +119,7 @@ def calculate_cost_of_inaction(
         WHERE policy_value IS NOT NULL
         """
         
-        results = client.query(query).result()
+        results = run_query(client, query, tool_context=tool_context).result()
         row = next(results, None)
         
         if row:
@@ -172,23 +178,28 @@ def calculate_cost_of_inaction(
             }
         }
         
-        return json.dumps(cost_analysis, indent=2)
+        return shape_response(cost_analysis, "calculate_cost_of_inaction")
         
     except Exception as e:
-        return json.dumps({"error": f"Failed to calculate Cost of Inaction: {str(e)}"})
+        return shape_response({"error": f"Failed to calculate Cost of Inaction: {str(e)}"}, "calculate_cost_of_inaction")
 
 
 def detect_anomalies_in_data(
     table_name: str,
-    sample_size: int = 1000,
+    sample_size: int = 0,
+    retrain: bool = False,
     tool_context: ToolContext = None
 ) -> str:
     """
-    Detect anomalies in numerical columns using IsolationForest.
+    Detect anomalous rows over all numerical columns of a table using IsolationForest.
+    
+    The model is trained once per table and schema version on a stratified
+    sample, then every row of the table is scored (see anomaly_engine).
     
     Args:
         table_name: BigQuery table to analyze
-        sample_size: Number of rows to sample
+        sample_size: Rows in the training sample (0 uses ANOMALY_TRAINING_ROWS)
+        retrain: Train a new model even if a stored one matches the table schema
     
     Returns:
         JSON string with anomaly detection results
@@ -198,79 +209,23 @@ def detect_anomalies_in_data(
         dataset_id = os.getenv("BQ_DATASET_ID")
         
         client = bigquery.Client(project=project_id)
-        
-        # Get table schema to identify numerical columns
         table_ref = f"{project_id}.{dataset_id}.{table_name}"
-        table = client.get_table(table_ref)
-        
-        numerical_columns = [
-            field.name for field in table.schema 
-            if field.field_type in ['INTEGER', 'FLOAT', 'NUMERIC', 'BIGNUMERIC', 'INT64', 'FLOAT64']
-        ]
         
-        if not numerical_columns:
-            return json.dumps({"error": "No numerical columns found for anomaly detection"})
+        anomaly_results = detect_anomalies(
+            client,
+            table_ref,
+            key_column=get_policy_id_column(),
+            sample_rows=sample_size or None,
+            retrain=retrain,
+            tool_context=tool_context
+        )
         
-        # Sample data
-        columns_str = ", ".join([f"CAST({col} AS FLOAT64) as {col}" for col in numerical_columns[:5]])  # Limit to 5 columns
-        query = f"""
-        SELECT 
-            policy_id,
-            {columns_str}
-        FROM `{table_ref}`
-        WHERE {" AND ".join([f"{col} IS NOT NULL" for col in numerical_columns[:5]])}
-        LIMIT {sample_size}
-        """
-        
-        df = client.query(query).to_dataframe()
-        
-        if len(df) < 10:
-            return json.dumps({"error": "Insufficient data for anomaly detection (minimum 10 rows required)"})
-        
-        # Prepare features for IsolationForest
-        feature_cols = [col for col in df.columns if col != 'policy_id']
-        X = df[feature_cols].fillna(0).values
-        
-        # Run IsolationForest with configurable contamination rate
-        contamination_rate = get_anomaly_contamination_rate()  # Default 0.1 (10%)
-        iso_forest = IsolationForest(contamination=contamination_rate, random_state=42)
-        predictions = iso_forest.fit_predict(X)
-        anomaly_scores = iso_forest.score_samples(X)
-        
-        # Identify anomalies
-        df['is_anomaly'] = predictions == -1
-        df['anomaly_score'] = anomaly_scores
-        
-        anomalies = df[df['is_anomaly'] == True]
-        
-        anomaly_results = {
-            "total_rows_analyzed": len(df),
-            "anomalies_detected": len(anomalies),
-            "anomaly_rate": round(len(anomalies) / len(df) * 100, 2),
-            "columns_analyzed": feature_cols,
-            "top_anomalies": [
-                {
-                    "policy_id": str(row['policy_id']),
-                    "anomaly_score": round(float(row['anomaly_score']), 4),
-                    "values": {col: float(row[col]) for col in feature_cols}
-                }
-                for _, row in anomalies.nsmallest(10, 'anomaly_score').iterrows()
-            ],
-            "statistics": {
-                col: {
-                    "mean": round(float(df[col].mean()), 2),
-                    "std": round(float(df[col].std()), 2),
-                    "min": round(float(df[col].min()), 2),
-                    "max": round(float(df[col].max()), 2)
-                }
-                for col in feature_cols
-            }
-        }
-        
-        return json.dumps(anomaly_results, indent=2)
+        return shape_response(anomaly_results, "detect_anomalies_in_data")
         
+    except ValueError as e:
+        return shape_response({"error": str(e)}, "detect_anomalies_in_data")
     except Exception as e:
-        return json.dumps({"error": f"Anomaly detection failed: {str(e)}"})
+        return shape_response({"error": f"Anomaly detection failed: {str(e)}"}, "detect_anomalies_in_data")
 
 
 def generate_metrics_narrative(
@@ -353,7 +308,7 @@ def generate_metrics_narrative(
         narrative += "\n---\n"
         narrative += "*This report was generated automatically by the DQ Metrics Agent.*\n"
         
-        return narrative
+        return shape_response(narrative, "generate_metrics_narrative")
         
     except Exception as e:
         return f"Error generating narrative: {str(e)}"
@@ -399,7 +354,39 @@ def get_dq_rule_accuracy(
             "status": "excellent" if false_positive_rate < 5 else "good" if false_positive_rate < 10 else "needs_improvement"
         }
         
-        return json.dumps(accuracy_metrics, indent=2)
+        return shape_response(accuracy_metrics, "get_dq_rule_accuracy")
+        
+    except Exception as e:
+        return shape_response({"error": f"Failed to calculate accuracy: {str(e)}"}, "get_dq_rule_accuracy")
+
+
+def get_violation_trends(
+    table_name: str = "",
+    days: int = 30,
+    tool_context: ToolContext = None
+) -> str:
+    """
+    Get violation history from the violation store: daily trend, top rules and per-table totals.
+    
+    Reads recorded rule results instead of re-running rules against the source tables.
+    
+    Args:
+        table_name: Restrict the daily trend to one table (empty for all tables)
+        days: Look-back window in days
+    
+    Returns:
+        JSON string with trend, top_rules, tables and latest results
+    """
+    try:
+        trend = get_violation_trend(table_name=table_name or None, days=days)
+        
+        return shape_response({
+            "window_days": days,
+            "trend": trend,
+            "top_rules": get_top_rules(limit=10, days=days),
+            "tables": get_table_summary(days=days),
+            "latest_results": get_latest_results(days=days)
+        }, "get_violation_trends")
         
     except Exception as e:
-        return json.dumps({"error": f"Failed to calculate accuracy: {str(e)}"})
+        return shape_response({"error": f"Failed to read violation history: {str(e)}"}, "get_violation_trends")
@@ -18,6 +18,7 @@ import os
 from google.adk.agents import LlmAgent
 from google.genai import types
 
+from dq_agents.instrumentation import instrument_agent
 from .prompts import return_instructions_orchestrator
 from .tools import (
     call_identifier_agent,
@@ -26,9 +27,12 @@ from .tools import (
     call_metrics_agent,
     get_workflow_state,
     request_human_approval,
+    run_dq_workflow,
+    approve_checkpoints,
+    run_fast_path,
 )
 
-orchestrator_agent = LlmAgent(
+orchestrator_agent = instrument_agent(LlmAgent(
     model=os.getenv("ROOT_AGENT_MODEL", "gemini-2.0-flash"),
     name="orchestrator_agent",
     instruction=return_instructions_orchestrator(),
@@ -39,10 +43,13 @@ orchestrator_agent = LlmAgent(
         call_metrics_agent,
         get_workflow_state,
         request_human_approval,
+        run_dq_workflow,
+        approve_checkpoints,
+        run_fast_path,
     ],
     generate_content_config=types.GenerateContentConfig(
         temperature=0.2,
         top_p=0.95,
         max_output_tokens=8192,
     )
-)
+))
@@ -0,0 +1,285 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Deterministic fast path for known DQ rules and Knowledge Bank fixes.
+
+In a steady-state run most of the work is already known: the
+pre-existing Collibra/Ataccama rules, and Knowledge Bank fixes that have
+earned ``auto_approve``. The fast path handles those without any LLM
+call:
+
+1. Every pre-existing rule is executed directly (through the result
+   cache and cost gate).
+2. Each rule with violations is fingerprinted by its WHERE predicate and
+   looked up in the Knowledge Bank.
+3. A matched fix is applied automatically when it is ``auto_approve`` and
+   its own WHERE predicate is the rule's, so it touches exactly the
+   violating rows.
+
+Issues come back in three groups: ``auto_fixed``, ``kb_suggested``
+(a Knowledge Bank fix exists but needs human approval) and
+``unmatched`` (only these need the treatment LLM).
+
+A fingerprint is a hash of the normalised predicate: conjuncts are
+rendered by sqlglot with lower-case, unqualified column names and
+sorted, so formatting, keyword and column case and conjunct order do
+not matter. Knowledge Bank patterns are indexed by the fingerprint of
+their ``pattern``, the predicates of their fixes' SQL templates and any
+``fingerprints`` saved with them.
+"""
+
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from google.cloud import bigquery
+from sqlglot import exp
+
+from dq_agents.cost_gate import ByteBudget
+from dq_agents.instrumentation import propagate_context
+from dq_agents.remediator.sql_rewriter import DIALECT, fill_placeholders, parse, update_from
+from dq_agents.result_cache import cached_sample
+
+logger = logging.getLogger(__name__)
+
+# Rows of each rule's result kept as the issue sample
+SAMPLE_ROWS = 10
+
+_TARGET = "_dq_target"
+
+
+def predicate_fingerprint(sql: str) -> Optional[str]:
+    """
+    Fingerprint the WHERE predicate of a single-table rule or fix.
+
+    Returns:
+        str: Hex fingerprint, or None if the statement cannot be parsed, has no
+        WHERE clause or reads more than its target table
+    """
+    statement = parse(fill_placeholders(sql, _TARGET))
+    if isinstance(statement, exp.Select):
+        if any(statement.args.get(k) for k in ("joins", "group", "having", "qualify")):
+            return None
+    elif isinstance(statement, exp.Update):
+        if update_from(statement) is not None:
+            return None
+    elif not isinstance(statement, exp.Delete):
+        return None
+
+    where = statement.args.get("where")
+    if where is None:
+        return None
+
+    predicate = where.this.copy()
+    for column in list(predicate.find_all(exp.Column)):
+        column.set("table", None)
+        column.set("this", exp.to_identifier(column.name.lower()))
+    conjuncts = predicate.flatten() if isinstance(predicate, exp.And) else [predicate]
+    normalised = " AND ".join(sorted(c.sql(DIALECT) for c in conjuncts))
+    return hashlib.sha256(normalised.encode("utf-8")).hexdigest()[:16]
+
+
+def pattern_fingerprint(pattern: str) -> Optional[str]:
+    """Fingerprint a Knowledge Bank ``pattern`` (None if it is prose, not a predicate)."""
+    if not pattern:
+        return None
+    return predicate_fingerprint(f"SELECT * FROM {_TARGET} WHERE {pattern}")
+
+
+def build_fix_index(patterns: Dict[str, Dict]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Index Knowledge Bank patterns by predicate fingerprint.
+
+    Returns:
+        dict: fingerprint -> [{pattern_id, description, fixes}]
+    """
+    index: Dict[str, List[Dict[str, Any]]] = {}
+    for pattern_id, pattern in patterns.items():
+        fingerprints = set(pattern.get("fingerprints", []))
+        fingerprints.add(pattern_fingerprint(pattern.get("pattern", "")))
+        for fix in pattern.get("historical_fixes", []):
+            if fix.get("sql_template"):
+                fingerprints.add(predicate_fingerprint(fix["sql_template"]))
+        fingerprints.discard(None)
+
+        entry = {
+            "pattern_id": pattern_id,
+            "description": pattern.get("description", ""),
+            "fixes": pattern.get("historical_fixes", [])
+        }
+        for fingerprint in fingerprints:
+            index.setdefault(fingerprint, []).append(entry)
+    return index
+
+
+def select_fix(fingerprint: Optional[str], index: Dict[str, List[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+    """
+    Pick the Knowledge Bank fix for a rule fingerprint.
+
+    Returns:
+        dict: pattern_id, fix, historical_fixes and auto_apply (the fix is
+        auto_approve and targets exactly the rule's rows), or None without a match
+    """
+    if fingerprint is None or fingerprint not in index:
+        return None
+
+    candidates = []
+    for entry in index[fingerprint]:
+        for fix in entry["fixes"]:
+            exact = bool(fix.get("sql_template")) and predicate_fingerprint(fix["sql_template"]) == fingerprint
+            candidates.append((fix.get("auto_approve", False) and exact, fix.get("success_rate", 0.0), entry, fix))
+    if not candidates:
+        return None
+
+    auto_apply, _, entry, fix = max(candidates, key=lambda c: (c[0], c[1]))
+    return {
+        "pattern_id": entry["pattern_id"],
+        "pattern_description": entry["description"],
+        "fix": fix,
+        "historical_fixes": entry["fixes"],
+        "auto_apply": auto_apply
+    }
+
+
+def run_fast_path(
+    client: bigquery.Client,
+    rules: List[Dict[str, Any]],
+    table_name: str,
+    project_id: str,
+    dataset_id: str,
+    patterns: Dict[str, Dict],
+    apply_fix: Callable[[str, str], Dict[str, Any]],
+    budget: Optional[ByteBudget] = None,
+    tool_context=None,
+    max_workers: int = 4
+) -> Dict[str, Any]:
+    """
+    Run the pre-existing rules on a table and apply auto-approved Knowledge Bank fixes.
+
+    Args:
+        client: BigQuery client
+        rules: Pre-existing rules (rule_id, name, description, sql with {table}, ...)
+        table_name: Table to check
+        project_id: Project of the table
+        dataset_id: Dataset of the table
+        patterns: Knowledge Bank issue patterns
+        apply_fix: Executes a fix (sql_template, table_name) and returns its result dict
+        budget: Byte budget the rule queries are charged to
+        tool_context: ADK tool context (session byte budget)
+        max_workers: Rules executed at once
+
+    Returns:
+        dict: auto_fixed, kb_suggested, unmatched and clean rules, and rule/fix counts
+    """
+    table_reference = f"`{project_id}.{dataset_id}.{table_name}`"
+    index = build_fix_index(patterns)
+
+    def execute(rule):
+        sql = fill_placeholders(rule["sql"], table_reference)
+        try:
+            sample = cached_sample(client, sql, limit=SAMPLE_ROWS, budget=budget, tool_context=tool_context)
+        except Exception as e:
+            return rule, sql, None, str(e)
+        return rule, sql, sample, None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(rules) or 1))) as executor:
+        executed = list(executor.map(propagate_context(execute), rules))
+
+    result = {
+        "table_name": table_name,
+        "auto_fixed": [],
+        "kb_suggested": [],
+        "unmatched": [],
+        "clean": [],
+        "failed": []
+    }
+    for rule, sql, sample, error in executed:
+        rule_id = rule.get("rule_id") or rule.get("name")
+        if error is not None:
+            result["failed"].append({"rule_id": rule_id, "error": error})
+            continue
+        if sample["total_rows"] == 0:
+            result["clean"].append(rule_id)
+            continue
+
+        fingerprint = predicate_fingerprint(rule["sql"])
+        issue = {
+            "rule_id": rule_id,
+            "name": rule.get("name"),
+            "description": rule.get("description"),
+            "severity": rule.get("severity"),
+            "dq_dimension": rule.get("dq_dimension"),
+            "rule_sql": sql,
+            "fingerprint": fingerprint,
+            "issue_count": sample["total_rows"],
+            "sample_issues": sample["rows"]
+        }
+
+        match = select_fix(fingerprint, index)
+        if match is None:
+            result["unmatched"].append(issue)
+            continue
+
+        issue["kb_pattern_id"] = match["pattern_id"]
+        if match["auto_apply"]:
+            fix = match["fix"]
+            logger.info("⚡ Auto-applying %s for rule %s on %s", fix["fix_id"], rule_id, table_name)
+            outcome = apply_fix(fix["sql_template"], table_name)
+            if outcome.get("status") == "success":
+                result["auto_fixed"].append({
+                    **issue,
+                    "fix_id": fix["fix_id"],
+                    "fix_description": fix.get("description"),
+                    "affected_rows": outcome.get("affected_rows"),
+                    "sql_executed": outcome.get("sql_executed")
+                })
+                continue
+            issue["auto_fix_error"] = outcome.get("error") or outcome.get("status")
+
+        result["kb_suggested"].append({
+            **issue,
+            "suggested_fix": match["fix"],
+            "historical_fixes": match["historical_fixes"]
+        })
+
+    result["rules_executed"] = len(rules) - len(result["failed"])
+    result["fixes_applied"] = len(result["auto_fixed"])
+    return result
+
+
+def apply_suggested_fixes(
+    issues: List[Dict[str, Any]],
+    table_name: str,
+    apply_fix: Callable[[str, str], Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """
+    Apply the (human-approved) suggested Knowledge Bank fixes of ``kb_suggested`` issues.
+
+    Fixes without SQL (e.g. "raise a JIRA ticket") are reported as manual.
+    """
+    outcomes = []
+    for issue in issues:
+        fix = issue["suggested_fix"]
+        if not fix.get("sql_template"):
+            outcomes.append({
+                "rule_id": issue["rule_id"],
+                "fix_id": fix["fix_id"],
+                "status": "manual",
+                "action": fix.get("action")
+            })
+            continue
+        outcome = apply_fix(fix["sql_template"], table_name)
+        outcomes.append({"rule_id": issue["rule_id"], "fix_id": fix["fix_id"], **outcome})
+    return outcomes
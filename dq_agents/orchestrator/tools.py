@@ -14,11 +14,18 @@
 
 """Tools for DQ Orchestrator Agent."""
 
+import json
 import logging
-from typing import Any, Dict
+import uuid
+from typing import Any, Dict, Optional
 
 from google.adk.tools import ToolContext
-from google.adk.tools.agent_tool import AgentTool
+
+from dq_agents.agent_registry import get_agent_tool
+from dq_agents.orchestrator import fast_path
+from dq_agents.orchestrator.workflow import build_dq_workflow
+from dq_agents.tool_responses import shape_response
+from environment.config_utils import get_fast_path_enabled, get_workflow_max_concurrency
 
 logger = logging.getLogger(__name__)
 
@@ -39,10 +46,7 @@ async def call_identifier_agent(
     logger.info("🔍 Calling Identifier Agent: %s", request)
     
     try:
-        from dq_agents.identifier.agent import get_identifier_agent
-        identifier_agent = get_identifier_agent()
-        
-        agent_tool = AgentTool(agent=identifier_agent)
+        agent_tool = get_agent_tool("identifier")
         response = await agent_tool.run_async(
             args={"request": request}, 
             tool_context=tool_context
@@ -52,7 +56,7 @@ async def call_identifier_agent(
         tool_context.state["identifier_output"] = response
         logger.info("✅ Identifier Agent completed")
         
-        return str(response)
+        return shape_response(str(response), "call_identifier_agent")
     except Exception as e:
         logger.error(f"❌ Identifier Agent error: {str(e)}")
         return f"Error calling Identifier Agent: {str(e)}"
@@ -74,9 +78,7 @@ async def call_treatment_agent(
     logger.info("💊 Calling Treatment Agent: %s", request)
     
     try:
-        from dq_agents.treatment.agent import treatment_agent
-        
-        agent_tool = AgentTool(agent=treatment_agent)
+        agent_tool = get_agent_tool("treatment")
         response = await agent_tool.run_async(
             args={"request": request}, 
             tool_context=tool_context
@@ -86,7 +88,7 @@ async def call_treatment_agent(
         tool_context.state["treatment_output"] = response
         logger.info("✅ Treatment Agent completed")
         
-        return str(response)
+        return shape_response(str(response), "call_treatment_agent")
     except Exception as e:
         logger.error(f"❌ Treatment Agent error: {str(e)}")
         return f"Error calling Treatment Agent: {str(e)}"
@@ -108,9 +110,7 @@ async def call_remediator_agent(
     logger.info("🔧 Calling Remediator Agent: %s", request)
     
     try:
-        from dq_agents.remediator.agent import remediator_agent
-        
-        agent_tool = AgentTool(agent=remediator_agent)
+        agent_tool = get_agent_tool("remediator")
         response = await agent_tool.run_async(
             args={"request": request}, 
             tool_context=tool_context
@@ -120,7 +120,7 @@ async def call_remediator_agent(
         tool_context.state["remediator_output"] = response
         logger.info("✅ Remediator Agent completed")
         
-        return str(response)
+        return shape_response(str(response), "call_remediator_agent")
     except Exception as e:
         logger.error(f"❌ Remediator Agent error: {str(e)}")
         return f"Error calling Remediator Agent: {str(e)}"
@@ -142,9 +142,7 @@ async def call_metrics_agent(
     logger.info("📊 Calling Metrics Agent: %s", request)
     
     try:
-        from dq_agents.metrics.agent import metrics_agent
-        
-        agent_tool = AgentTool(agent=metrics_agent)
+        agent_tool = get_agent_tool("metrics")
         response = await agent_tool.run_async(
             args={"request": request}, 
             tool_context=tool_context
@@ -154,7 +152,7 @@ async def call_metrics_agent(
         tool_context.state["metrics_output"] = response
         logger.info("✅ Metrics Agent completed")
         
-        return str(response)
+        return shape_response(str(response), "call_metrics_agent")
     except Exception as e:
         logger.error(f"❌ Metrics Agent error: {str(e)}")
         return f"Error calling Metrics Agent: {str(e)}"
@@ -178,6 +176,10 @@ def get_workflow_state(
         "treatment_output": tool_context.state.get("treatment_output"),
         "remediator_output": tool_context.state.get("remediator_output"),
         "metrics_output": tool_context.state.get("metrics_output"),
+        "workflow_status": {
+            name: node.get("status")
+            for name, node in ((tool_context.state.get("workflow_run") or {}).get("nodes") or {}).items()
+        },
     }
     
     return state
@@ -223,4 +225,256 @@ Options:
         "status": "pending"
     }
     
-    return approval_request
+    return shape_response(approval_request, "request_human_approval")
+
+
+def _apply_fix(fix_sql: str, table_name: str, tool_context: ToolContext) -> Dict[str, Any]:
+    from dq_agents.remediator.tools import execute_fix
+    return json.loads(execute_fix(fix_sql, table_name, 0, tool_context))
+
+
+def _fast_path_results(
+    tables: list,
+    tool_context: ToolContext,
+    cached: Optional[Dict[str, Dict[str, Any]]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """Fast path results per table; tables in ``cached`` (a resumed run's results) are not re-run."""
+    from dq_agents.identifier.tools import _get_bigquery_client, get_database_settings, read_preexisting_rules
+    from knowledge_bank.kb_manager import get_kb_manager
+    
+    results = dict(cached or {})
+    pending = [t for t in tables if t not in results]
+    if pending:
+        settings = get_database_settings()
+        client = _get_bigquery_client()
+        rules, _ = read_preexisting_rules(tool_context)
+        patterns = get_kb_manager().get_all_patterns()
+        for table in pending:
+            results[table] = fast_path.run_fast_path(
+                client, rules, table, settings["project_id"], settings["dataset_id"], patterns,
+                lambda fix_sql, table_name: _apply_fix(fix_sql, table_name, tool_context),
+                tool_context=tool_context
+            )
+    return {t: results[t] for t in tables}
+
+
+def run_fast_path(
+    tables: list,
+    tool_context: ToolContext,
+) -> str:
+    """Run the pre-existing Collibra/Ataccama rules and auto-approved KB fixes without the agents.
+    
+    Executes every pre-existing rule directly, looks up each violated rule's
+    Knowledge Bank fix by predicate fingerprint and applies fixes flagged
+    auto_approve. Only the "unmatched" issues need the identifier/treatment
+    agents; "kb_suggested" issues have a Knowledge Bank fix awaiting approval.
+    
+    Args:
+        tables: Tables to check (e.g. ["policies_week1", "policies_week2"])
+        tool_context: Tool execution context with state
+        
+    Returns:
+        Per table: auto_fixed, kb_suggested, unmatched, clean and failed rules
+    """
+    logger.info("⚡ Running fast path for %s", tables)
+    
+    try:
+        results = _fast_path_results(tables, tool_context)
+    except Exception as e:
+        logger.error(f"❌ Fast path error: {str(e)}")
+        return f"Error running fast path: {str(e)}"
+    
+    return shape_response(results, "run_fast_path")
+
+
+async def _run_agent(agent_name: str, request: str, tool_context: ToolContext) -> str:
+    agent_tool = get_agent_tool(agent_name)
+    return str(await agent_tool.run_async(args={"request": request}, tool_context=tool_context))
+
+
+def _resumable_run(tables: list, tool_context: ToolContext) -> Optional[Dict[str, Any]]:
+    """The run of these tables still waiting for approval, if any."""
+    run = tool_context.state.get("workflow_run")
+    if run and run["status"] == "waiting_approval" and run["tables"] == sorted(tables):
+        return run
+    return None
+
+
+async def run_dq_workflow(
+    tables: list,
+    tool_context: ToolContext,
+    new_run: bool = False,
+) -> str:
+    """Run the full DQ workflow for several tables as a parallel DAG.
+    
+    Per table: identifier, then treatment and metrics side by side, then a HITL
+    approval checkpoint before the remediator. Tables run in parallel. The run
+    stops at unapproved checkpoints; after approve_checkpoints, call this tool
+    again with the same tables to resume without repeating finished steps.
+    
+    Each run has a run_id. Only a run waiting for approval is resumed; once it
+    completes or fails (or another set of tables is run), the next call starts a
+    new run, and approvals given to an earlier run never apply to it.
+    
+    With the fast path enabled, pre-existing rules and auto-approved Knowledge
+    Bank fixes run first without any agent. Tables whose issues were all fixed
+    that way are done; for the rest the identifier step is replaced by the fast
+    path's unmatched issues, and treatment/remediation are only delegated to the
+    agents when some issue has no Knowledge Bank fix.
+    
+    Args:
+        tables: Tables to process (e.g. ["policies_week1", "policies_week2"])
+        tool_context: Tool execution context with state
+        new_run: Start a new run even if one of these tables is waiting for approval
+        
+    Returns:
+        Workflow status, run_id, per-step results, pending checkpoints and phase timings
+    """
+    run = None if new_run else _resumable_run(tables, tool_context)
+    if run is None:
+        run = {"run_id": uuid.uuid4().hex, "tables": sorted(tables), "status": "running",
+               "nodes": {}, "approved": [], "fast_path": {}}
+        tool_context.state["workflow_run"] = run
+    logger.info("🗺️ Running DQ workflow %s for %s", run["run_id"], tables)
+    
+    # Known rules and auto-approved KB fixes are handled without any agent; the
+    # agents only see what the fast path could not resolve
+    try:
+        known = _fast_path_results(tables, tool_context, run["fast_path"]) if get_fast_path_enabled() else {}
+    except Exception as e:
+        logger.warning(f"⚠️ Fast path failed, using the agents for every step: {str(e)}")
+        known = {}
+    workflow_tables = [t for t in tables if t not in known or known[t]["unmatched"] or known[t]["kb_suggested"]]
+    
+    def needs_agents(table):
+        return table not in known or bool(known[table]["unmatched"])
+    
+    async def identify(table, inputs):
+        if table in known:
+            return json.dumps({
+                "unmatched_issues": known[table]["unmatched"],
+                "kb_suggested_issues": known[table]["kb_suggested"]
+            }, default=str)
+        return await _run_agent(
+            "identifier",
+            f"Identify data quality issues in table {table}: generate DQ rules and execute them.",
+            tool_context
+        )
+    
+    async def treat(table, inputs):
+        if not needs_agents(table):
+            return json.dumps([
+                {k: issue[k] for k in ("rule_id", "description", "issue_count", "kb_pattern_id", "suggested_fix")}
+                for issue in known[table]["kb_suggested"]
+            ], default=str)
+        return await _run_agent(
+            "treatment",
+            f"Analyze the DQ issues found in table {table} and suggest fixes:\n{inputs[f'identify:{table}']}",
+            tool_context
+        )
+    
+    async def measure(table, inputs):
+        return await _run_agent(
+            "metrics",
+            f"Calculate the Cost of Inaction and detect anomalies for table {table} given these DQ issues:\n"
+            f"{inputs[f'identify:{table}']}",
+            tool_context
+        )
+    
+    def summarise_for_approval(table, inputs):
+        return inputs[f"treat:{table}"]
+    
+    async def remediate(table, inputs):
+        if not needs_agents(table):
+            return fast_path.apply_suggested_fixes(
+                known[table]["kb_suggested"], table,
+                lambda fix_sql, table_name: _apply_fix(fix_sql, table_name, tool_context)
+            )
+        return await _run_agent(
+            "remediator",
+            f"Execute the approved fixes for table {table} (dry run first, then validate):\n"
+            f"{inputs[f'approve_fixes:{table}']}",
+            tool_context
+        )
+    
+    workflow = build_dq_workflow(workflow_tables, identify, treat, remediate, measure, summarise_for_approval)
+    
+    try:
+        result = await workflow.run(
+            approved=run["approved"],
+            completed=run["nodes"],
+            max_concurrency=get_workflow_max_concurrency()
+        )
+    except Exception as e:
+        tool_context.state["workflow_run"] = {**run, "status": "failed"}
+        logger.error(f"❌ DQ workflow error: {str(e)}")
+        return f"Error running DQ workflow: {str(e)}"
+    result["run_id"] = run["run_id"]
+    
+    if known:
+        result["fast_path"] = {
+            table: {
+                "auto_fixed": [(i["rule_id"], i["fix_id"], i["affected_rows"]) for i in r["auto_fixed"]],
+                "kb_suggested": [i["rule_id"] for i in r["kb_suggested"]],
+                "unmatched": [i["rule_id"] for i in r["unmatched"]],
+                "clean": r["clean"],
+                "failed": r["failed"]
+            }
+            for table, r in known.items()
+        }
+    tool_context.state["workflow_run"] = {
+        **run, "status": result["status"], "nodes": result["nodes"], "fast_path": known
+    }
+    if result["pending_approvals"]:
+        tool_context.state["pending_approval"] = {
+            "action": "Apply fixes",
+            "details": {name: result["nodes"][name].get("output") for name in result["pending_approvals"]},
+            "checkpoints": result["pending_approvals"],
+            "run_id": run["run_id"],
+            "status": "pending"
+        }
+    elif (tool_context.state.get("pending_approval") or {}).get("run_id") == run["run_id"]:
+        tool_context.state["pending_approval"] = None
+    logger.info("✅ DQ workflow %s in %d ms", result["status"], result["wall_clock_ms"])
+    
+    return shape_response(result, "run_dq_workflow")
+
+
+def approve_checkpoints(
+    checkpoints: list,
+    tool_context: ToolContext,
+) -> str:
+    """Record human approval of workflow checkpoints (e.g. "approve_fixes:policies_week1").
+    
+    Only call this after the user has explicitly approved. Then call
+    run_dq_workflow again to resume the workflow past the checkpoints.
+    Approvals belong to the run waiting for them and never carry over to
+    a later run.
+    
+    Args:
+        checkpoints: Checkpoint names from the workflow's pending_approvals
+        tool_context: Tool execution context with state
+        
+    Returns:
+        The run_id, its approved checkpoints and any names that were not pending
+    """
+    logger.info(f"👍 HITL Checkpoint approved: {checkpoints}")
+    
+    run = tool_context.state.get("workflow_run")
+    if not run or run["status"] != "waiting_approval":
+        return shape_response({"error": "No workflow run is waiting for approval"}, "approve_checkpoints")
+    
+    pending_names = [name for name, node in run["nodes"].items() if node.get("status") == "waiting_approval"]
+    accepted = [name for name in checkpoints if name in pending_names]
+    approved = list(dict.fromkeys(run["approved"] + accepted))
+    tool_context.state["workflow_run"] = {**run, "approved": approved}
+    
+    pending = tool_context.state.get("pending_approval")
+    if pending and pending.get("run_id") == run["run_id"] and set(pending.get("checkpoints", [])) <= set(approved):
+        tool_context.state["pending_approval"] = {**pending, "status": "approved"}
+    
+    return shape_response({
+        "run_id": run["run_id"],
+        "approved_checkpoints": approved,
+        "not_pending": [name for name in checkpoints if name not in pending_names]
+    }, "approve_checkpoints")
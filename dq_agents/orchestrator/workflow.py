@@ -0,0 +1,251 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Declarative workflow DAG for the DQ agent phases.
+
+A workflow is a set of nodes with dependencies. Every node whose
+dependencies have succeeded starts at once (up to max_concurrency), so
+independent work overlaps: the identifier pipelines of different tables
+run in parallel, and metrics for a table runs alongside its treatment.
+
+HITL checkpoints are barrier nodes. A barrier succeeds only if it has
+been approved; otherwise the run stops at it with status
+``waiting_approval``, while nodes that do not depend on it still run.
+After approval, running the workflow again with the previous node
+results resumes from the barrier without repeating finished nodes.
+
+Each node records its start offset and duration, and the result reports
+the wall-clock time of every phase (first start to last end of the
+phase's nodes) next to the total.
+"""
+
+import asyncio
+import inspect
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# Node callables take the outputs of their dependencies, keyed by node name
+NodeCallable = Callable[[Dict[str, Any]], Any]
+
+
+@dataclass
+class WorkflowNode:
+    """A step of a workflow: an agent call, a plain function or a HITL barrier."""
+
+    name: str
+    phase: str
+    run: Optional[NodeCallable] = None
+    depends_on: List[str] = field(default_factory=list)
+    barrier: bool = False
+
+
+class Workflow:
+    """A DAG of workflow nodes, executed with asyncio."""
+
+    def __init__(self, nodes: Iterable[WorkflowNode]):
+        self.nodes: Dict[str, WorkflowNode] = {}
+        for node in nodes:
+            if node.name in self.nodes:
+                raise ValueError(f"Duplicate workflow node '{node.name}'")
+            if node.run is None and not node.barrier:
+                raise ValueError(f"Workflow node '{node.name}' has nothing to run")
+            self.nodes[node.name] = node
+        self._check_graph()
+
+    def _check_graph(self) -> None:
+        for node in self.nodes.values():
+            for dependency in node.depends_on:
+                if dependency not in self.nodes:
+                    raise ValueError(f"Workflow node '{node.name}' depends on unknown node '{dependency}'")
+
+        visiting, done = set(), set()
+
+        def visit(name: str) -> None:
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Workflow has a cycle through '{name}'")
+            visiting.add(name)
+            for dependency in self.nodes[name].depends_on:
+                visit(dependency)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.nodes:
+            visit(name)
+
+    async def _run_node(self, node: WorkflowNode, inputs: Dict[str, Any]) -> Any:
+        if inspect.iscoroutinefunction(node.run):
+            return await node.run(inputs)
+        result = await asyncio.to_thread(node.run, inputs)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    async def run(
+        self,
+        approved: Iterable[str] = (),
+        completed: Optional[Dict[str, Dict[str, Any]]] = None,
+        max_concurrency: int = 4
+    ) -> Dict[str, Any]:
+        """
+        Execute the workflow.
+
+        Args:
+            approved: Names of the barrier nodes a human has approved
+            completed: Node results of a previous run; successful nodes are not re-run
+            max_concurrency: Nodes running at once
+
+        Returns:
+            dict: status (completed / waiting_approval / failed), per-node results,
+            pending_approvals, phase_timings_ms and wall_clock_ms
+        """
+        approved = set(approved)
+        # Finished nodes of a previous run are kept (without their old timings),
+        # and so are barriers approved since, with the output shown for review
+        results: Dict[str, Dict[str, Any]] = {}
+        for name, result in (completed or {}).items():
+            if name not in self.nodes:
+                continue
+            status = result.get("status")
+            if status == "waiting_approval" and name in approved:
+                status = "success"
+            if status == "success":
+                results[name] = {
+                    **{k: v for k, v in result.items() if k not in ("started_ms", "duration_ms")},
+                    "status": status,
+                    "resumed": True
+                }
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        started = time.perf_counter()
+        running: Dict[asyncio.Task, str] = {}
+
+        async def execute(node: WorkflowNode) -> Any:
+            async with semaphore:
+                results[node.name]["started_ms"] = int((time.perf_counter() - started) * 1000)
+                return await self._run_node(node, {d: results[d].get("output") for d in node.depends_on})
+
+        while True:
+            for node in self.nodes.values():
+                if node.name in results:
+                    continue
+                dependency_status = [results.get(d, {}).get("status") for d in node.depends_on]
+                if any(s in ("failed", "skipped") for s in dependency_status):
+                    results[node.name] = {"status": "skipped", "phase": node.phase}
+                elif all(s == "success" for s in dependency_status):
+                    if node.barrier:
+                        status = "success" if node.name in approved else "waiting_approval"
+                        results[node.name] = {"status": status, "phase": node.phase, "barrier": True}
+                        if node.run is not None:
+                            # Barrier callables prepare what the reviewer needs to see (and
+                            # what the nodes after the barrier get as its output)
+                            inputs = {d: results[d].get("output") for d in node.depends_on}
+                            results[node.name]["output"] = await self._run_node(node, inputs)
+                    else:
+                        results[node.name] = {"status": "running", "phase": node.phase}
+                        running[asyncio.ensure_future(execute(node))] = node.name
+
+            if not running:
+                if all(name in results for name in self.nodes):
+                    break
+                # Remaining nodes wait (directly or indirectly) on an unapproved barrier
+                for name, node in self.nodes.items():
+                    results.setdefault(name, {"status": "blocked", "phase": node.phase})
+                break
+
+            finished, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                name = running.pop(task)
+                result = results[name]
+                result["duration_ms"] = int((time.perf_counter() - started) * 1000) - result.get("started_ms", 0)
+                try:
+                    result["output"] = task.result()
+                    result["status"] = "success"
+                except Exception as e:
+                    result["status"] = "failed"
+                    result["error"] = str(e)
+
+        statuses = [r["status"] for r in results.values()]
+        if "failed" in statuses:
+            status = "failed"
+        elif "waiting_approval" in statuses:
+            status = "waiting_approval"
+        else:
+            status = "completed"
+
+        return {
+            "status": status,
+            "nodes": results,
+            "pending_approvals": [n for n, r in results.items() if r["status"] == "waiting_approval"],
+            "phase_timings_ms": phase_timings(results),
+            "wall_clock_ms": int((time.perf_counter() - started) * 1000)
+        }
+
+
+def phase_timings(results: Dict[str, Dict[str, Any]]) -> Dict[str, int]:
+    """Wall-clock time of each phase: first node start to last node end."""
+    spans: Dict[str, List[int]] = {}
+    for result in results.values():
+        if "started_ms" not in result or "duration_ms" not in result:
+            continue
+        start, end = result["started_ms"], result["started_ms"] + result["duration_ms"]
+        span = spans.setdefault(result["phase"], [start, end])
+        span[0], span[1] = min(span[0], start), max(span[1], end)
+    return {phase: end - start for phase, (start, end) in spans.items()}
+
+
+def build_dq_workflow(
+    tables: List[str],
+    identify: Callable[[str, Dict[str, Any]], Any],
+    treat: Callable[[str, Dict[str, Any]], Any],
+    remediate: Callable[[str, Dict[str, Any]], Any],
+    measure: Callable[[str, Dict[str, Any]], Any],
+    summarise_for_approval: Optional[Callable[[str, Dict[str, Any]], Any]] = None
+) -> Workflow:
+    """
+    Build the standard DQ workflow for a set of tables.
+
+    Per table::
+
+        identify ─┬─ treat ── approve_fixes (HITL barrier) ── remediate
+                  └─ measure
+
+    Tables are independent of each other, so their pipelines run in parallel.
+    Each callable (sync or async) takes the table name and the outputs of the
+    node's dependencies.
+    """
+    nodes = []
+    for table in tables:
+        def bind(step, table=table):
+            if inspect.iscoroutinefunction(step):
+                async def run(inputs):
+                    return await step(table, inputs)
+            else:
+                def run(inputs):
+                    return step(table, inputs)
+            return run
+
+        nodes.extend([
+            WorkflowNode(f"identify:{table}", "identifier", bind(identify)),
+            WorkflowNode(f"treat:{table}", "treatment", bind(treat), [f"identify:{table}"]),
+            WorkflowNode(f"measure:{table}", "metrics", bind(measure), [f"identify:{table}"]),
+            WorkflowNode(
+                f"approve_fixes:{table}", "approval",
+                bind(summarise_for_approval) if summarise_for_approval else None,
+                [f"treat:{table}"], barrier=True
+            ),
+            WorkflowNode(f"remediate:{table}", "remediator", bind(remediate), [f"approve_fixes:{table}"]),
+        ])
+    return Workflow(nodes)
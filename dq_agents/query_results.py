@@ -0,0 +1,100 @@
+"""Result materialisation for BigQuery tool outputs.
+
+Small results are read through the BigQuery REST API. Large results are
+downloaded with the BigQuery Storage Read API as Arrow record batches and
+stay columnar until they are serialised, instead of being turned into one
+Python dict per row.
+"""
+
+import json
+from typing import Any, Dict, Iterator, List, Optional
+
+import pyarrow as pa
+from google.cloud import bigquery
+
+from environment.config_utils import get_arrow_row_threshold
+
+# Shared Storage Read API client, created on first large download
+_bqstorage_client = None
+
+
+def _get_bqstorage_client():
+    """Get the BigQuery Storage Read API client, or None if it is unavailable."""
+    global _bqstorage_client
+    if _bqstorage_client is None:
+        try:
+            from google.cloud import bigquery_storage
+            _bqstorage_client = bigquery_storage.BigQueryReadClient()
+        except Exception:
+            return None
+    return _bqstorage_client
+
+
+def _use_storage_api(rows: bigquery.table.RowIterator, max_rows: Optional[int]) -> bool:
+    """Decide whether a result is large enough to read through the Storage API."""
+    total_rows = rows.total_rows or 0
+    wanted = min(total_rows, max_rows) if max_rows else total_rows
+    return wanted > get_arrow_row_threshold()
+
+
+def iter_record_batches(
+    rows: bigquery.table.RowIterator,
+    chunk_rows: int = 10000,
+    max_rows: Optional[int] = None
+) -> Iterator[pa.RecordBatch]:
+    """Stream a query result as Arrow record batches of at most chunk_rows rows.
+
+    Args:
+        rows: Result of ``QueryJob.result()``
+        chunk_rows: Maximum rows per yielded batch
+        max_rows: Stop after this many rows (None reads the whole result)
+    """
+    bqstorage_client = _get_bqstorage_client() if _use_storage_api(rows, max_rows) else None
+    remaining = max_rows
+
+    for batch in rows.to_arrow_iterable(bqstorage_client=bqstorage_client):
+        if remaining is not None:
+            if remaining <= 0:
+                break
+            batch = batch.slice(0, remaining)
+            remaining -= batch.num_rows
+
+        for offset in range(0, batch.num_rows, chunk_rows):
+            yield batch.slice(offset, chunk_rows)
+
+
+def fetch_arrow(
+    rows: bigquery.table.RowIterator,
+    max_rows: Optional[int] = None
+) -> pa.Table:
+    """Materialise a query result (or its first max_rows rows) as an Arrow table."""
+    if max_rows is None and not _use_storage_api(rows, None):
+        return rows.to_arrow(create_bqstorage_client=False)
+
+    batches = list(iter_record_batches(rows, chunk_rows=max_rows or 100000, max_rows=max_rows))
+    if not batches:
+        return pa.table({field.name: [] for field in rows.schema}) if rows.schema else pa.table({})
+    return pa.Table.from_batches(batches)
+
+
+def to_records(table: pa.Table, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Convert (the first ``limit`` rows of) an Arrow table to a list of row dicts."""
+    if limit is not None:
+        table = table.slice(0, limit)
+    return table.to_pylist()
+
+
+def fetch_sample(
+    rows: bigquery.table.RowIterator,
+    limit: int
+) -> Dict[str, Any]:
+    """Get the total row count of a result plus its first ``limit`` rows as dicts."""
+    return {
+        "total_rows": rows.total_rows or 0,
+        "rows": to_records(fetch_arrow(rows, max_rows=limit)),
+    }
+
+
+def compact_json(payload: Any) -> str:
+    """Serialise a tool payload without pretty-printing whitespace."""
+    return json.dumps(payload, separators=(",", ":"), default=str)
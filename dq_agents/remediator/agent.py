@@ -5,21 +5,35 @@ from .prompts import return_instructions_remediator
 from .tools import (
     dry_run_fix, 
     execute_fix, 
+    execute_fixes_coalesced,
     validate_fix, 
+    validate_fix_in_shadow,
     create_jira_ticket,
     get_before_after_comparison
 )
 
-remediator_agent = LlmAgent(
-    model=os.getenv("ROOT_AGENT_MODEL", "gemini-2.0-flash"),
-    name="remediator_agent",
-    instruction=return_instructions_remediator(),
-    tools=[
-        dry_run_fix,
-        execute_fix,
-        validate_fix,
-        create_jira_ticket,
-        get_before_after_comparison
-    ],
-    generate_content_config=types.GenerateContentConfig(temperature=0.0)  # Low temp for safety
-)
+def get_remediator_agent():
+    """Create and return a new Remediator Agent instance."""
+    return LlmAgent(
+        model=os.getenv("ROOT_AGENT_MODEL", "gemini-2.0-flash"),
+        name="remediator_agent",
+        instruction=return_instructions_remediator(),
+        tools=[
+            dry_run_fix,
+            execute_fix,
+            execute_fixes_coalesced,
+            validate_fix,
+            validate_fix_in_shadow,
+            create_jira_ticket,
+            get_before_after_comparison
+        ],
+        generate_content_config=types.GenerateContentConfig(temperature=0.0)  # Low temp for safety
+    )
+
+
+def __getattr__(name):
+    # `remediator_agent` is the shared instance from the agent registry, built on first access
+    if name == "remediator_agent":
+        from dq_agents.agent_registry import get_agent
+        return get_agent("remediator")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,249 @@
+"""Chunked, resumable execution of DQ fix DML.
+
+A large UPDATE/DELETE is split into hash buckets of the row key
+(``MOD(ABS(FARM_FINGERPRINT(CAST(key AS STRING))), n)``), so each chunk
+touches roughly ``batch_size`` rows. Chunks run with bounded concurrency
+(BigQuery runs at most two mutating DML statements per table at once and
+queues the rest), and every completed chunk is checkpointed to
+``dq_fix_checkpoints/<fix hash>.json``. Re-running the same fix skips the
+chunks that already completed, as long as the checkpoint is for the same
+table state: it records the target table's ``modified`` time after the
+run's last chunk, and is discarded if the table has changed since (a new
+load, another fix) or it is older than ``CHECKPOINT_TTL_HOURS``.
+
+Every chunk scans the table like the whole statement would, so the
+pending chunks are charged to the cost gate's byte budget as
+``chunks x estimate`` before the first one runs.
+"""
+
+import hashlib
+import json
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from google.cloud import bigquery
+
+from dq_agents.cost_gate import ByteBudget, QueryCostExceeded, capped_job_config, check_query, run_query
+from dq_agents.instrumentation import propagate_context, track_job
+from dq_agents.remediator.sql_rewriter import add_condition, build_count_sql, target_alias, target_table
+
+CHECKPOINT_DIR = "dq_fix_checkpoints"
+
+# Upper bound on chunks per fix (keeps tiny batch sizes from creating thousands of jobs)
+MAX_CHUNKS = 200
+
+# Checkpoints older than this are discarded (the weekly loads replace the data)
+CHECKPOINT_TTL_HOURS = 24
+
+_checkpoint_lock = threading.Lock()
+
+
+def job_timing(query_job: bigquery.QueryJob) -> Dict[str, Any]:
+    """Get the real execution time and bytes processed of a finished job."""
+    execution_time_ms = None
+    if query_job.started and query_job.ended:
+        execution_time_ms = int((query_job.ended - query_job.started).total_seconds() * 1000)
+    return {
+        "execution_time_ms": execution_time_ms,
+        "bytes_processed": query_job.total_bytes_processed
+    }
+
+
+def table_modified(client: bigquery.Client, sql: str) -> Optional[str]:
+    """Last modification time of the table a DML statement writes to (None if unknown)."""
+    table_ref = target_table(sql)
+    if not table_ref:
+        return None
+    try:
+        modified = client.get_table(table_ref).modified
+    except Exception:
+        return None
+    return modified.isoformat() if modified else None
+
+
+def fix_hash(sql: str) -> str:
+    """Hash a fix statement, ignoring whitespace differences."""
+    return hashlib.sha256(" ".join(sql.split()).encode("utf-8")).hexdigest()[:16]
+
+
+def chunk_sql(sql: str, key_column: str, num_chunks: int) -> Optional[str]:
+    """Restrict a DML statement to the hash bucket given by the @chunk parameter."""
+    alias = target_alias(sql)
+    key = f"{alias}.{key_column}" if alias else key_column
+    return add_condition(sql, f"MOD(ABS(FARM_FINGERPRINT(CAST({key} AS STRING))), {num_chunks}) = @chunk")
+
+
+def _checkpoint_path(key: str) -> str:
+    return os.path.join(CHECKPOINT_DIR, f"{key}.json")
+
+
+def load_checkpoint(sql: str, modified: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Get the checkpoint of a (partially) executed fix.
+
+    A checkpoint is only valid for the table state it left behind: it is
+    discarded (and None returned) if ``modified``, the target table's current
+    modification time, differs from the one it recorded, is unknown, or the
+    checkpoint is older than CHECKPOINT_TTL_HOURS.
+    """
+    path = _checkpoint_path(fix_hash(sql))
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        checkpoint = json.load(f)
+
+    age = datetime.now(timezone.utc) - datetime.fromisoformat(checkpoint["created_at"])
+    if modified is None or checkpoint.get("table_modified") != modified or age > timedelta(hours=CHECKPOINT_TTL_HOURS):
+        os.remove(path)
+        return None
+    return checkpoint
+
+
+def _save_checkpoint(checkpoint: Dict[str, Any]) -> None:
+    with _checkpoint_lock:
+        os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+        path = _checkpoint_path(checkpoint["fix_hash"])
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(checkpoint, f, indent=2, default=str)
+        os.replace(tmp_path, path)
+
+
+def _count_affected(client: bigquery.Client, count_sql: str, budget: Optional[ByteBudget], tool_context) -> int:
+    rows = run_query(client, count_sql, budget=budget, tool_context=tool_context).result()
+    return next(iter(rows)).total
+
+
+def _chunk_config(chunk: int) -> bigquery.QueryJobConfig:
+    return bigquery.QueryJobConfig(query_parameters=[
+        bigquery.ScalarQueryParameter("chunk", "INT64", chunk)
+    ])
+
+
+def run_chunked_dml(
+    client: bigquery.Client,
+    sql: str,
+    key_column: str,
+    batch_size: int,
+    max_concurrency: int = 2,
+    budget: Optional[ByteBudget] = None,
+    tool_context=None
+) -> Optional[Dict[str, Any]]:
+    """
+    Execute an UPDATE/DELETE in hash-bucket chunks of about batch_size rows.
+
+    Args:
+        client: BigQuery client
+        sql: Fully qualified UPDATE/DELETE statement with a WHERE clause
+        key_column: Row key used to assign rows to chunks
+        batch_size: Target rows per chunk
+        max_concurrency: Chunks running at once
+        budget: Run byte budget (defaults to the agent session's with a tool_context)
+        tool_context: Agent tool context holding the session's spent bytes
+
+    Returns:
+        dict: Per-chunk and total results, or None if the statement cannot be
+        chunked (not a parseable UPDATE/DELETE with a WHERE clause)
+
+    Raises:
+        QueryCostExceeded: If a chunk is over the per-query limit or the
+        pending chunks do not fit in the run budget
+    """
+    count_sql = build_count_sql(sql)
+    if count_sql is None or chunk_sql(sql, key_column, 1) is None:
+        return None
+
+    checkpoint = load_checkpoint(sql, table_modified(client, sql))
+    if checkpoint is None:
+        try:
+            affected = _count_affected(client, count_sql, budget, tool_context)
+        except QueryCostExceeded:
+            raise
+        except Exception:
+            return None
+        num_chunks = max(1, min(MAX_CHUNKS, math.ceil(affected / batch_size)))
+        checkpoint = {
+            "fix_hash": fix_hash(sql),
+            "sql": sql,
+            "key_column": key_column,
+            "num_chunks": num_chunks,
+            "estimated_rows": affected,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "completed": {}
+        }
+        _save_checkpoint(checkpoint)
+
+    num_chunks = checkpoint["num_chunks"]
+    resumed_chunks = len(checkpoint["completed"])
+    chunked = chunk_sql(sql, checkpoint["key_column"], num_chunks)
+    pending = [c for c in range(num_chunks) if str(c) not in checkpoint["completed"]]
+    failed: List[Dict[str, Any]] = []
+
+    # Each chunk scans like the whole statement: charge every pending chunk up front
+    cost_estimate = None
+    if pending:
+        cost_estimate = check_query(
+            client, chunked, _chunk_config(pending[0]), budget, tool_context, times=len(pending)
+        )
+
+    def run_chunk(chunk: int) -> Dict[str, Any]:
+        query_job = track_job(client.query(chunked, job_config=capped_job_config(_chunk_config(chunk))))
+        query_job.result()
+        return {
+            "chunk": chunk,
+            "affected_rows": query_job.num_dml_affected_rows or 0,
+            "job_id": query_job.job_id,
+            "started": query_job.started.isoformat() if query_job.started else None,
+            "ended": query_job.ended.isoformat() if query_job.ended else None,
+            **job_timing(query_job)
+        }
+
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+        futures = {executor.submit(propagate_context(run_chunk), chunk): chunk for chunk in pending}
+        for future in as_completed(futures):
+            chunk = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                failed.append({"chunk": chunk, "error": str(e)})
+                continue
+            with _checkpoint_lock:
+                checkpoint["completed"][str(chunk)] = result
+            _save_checkpoint(checkpoint)
+
+    chunks = sorted(checkpoint["completed"].values(), key=lambda c: c["chunk"])
+    starts = [c["started"] for c in chunks if c.get("started")]
+
+    # Chunks run concurrently: report the wall time of this run's chunks, not their sum
+    ran = [c for c in chunks if c["chunk"] in pending and c.get("started") and c.get("ended")]
+    execution_time_ms = None
+    if ran:
+        first_start = min(datetime.fromisoformat(c["started"]) for c in ran)
+        last_end = max(datetime.fromisoformat(c["ended"]) for c in ran)
+        execution_time_ms = int((last_end - first_start).total_seconds() * 1000)
+
+    if not failed:
+        os.remove(_checkpoint_path(checkpoint["fix_hash"]))
+    else:
+        # A resume is only valid against the table as these chunks left it
+        checkpoint["table_modified"] = table_modified(client, sql)
+        _save_checkpoint(checkpoint)
+
+    return {
+        "status": "success" if not failed else "partial",
+        "num_chunks": num_chunks,
+        "completed_chunks": len(chunks),
+        "resumed_chunks": resumed_chunks,
+        "affected_rows": sum(c["affected_rows"] for c in chunks),
+        "execution_time_ms": execution_time_ms,
+        "bytes_processed": sum(c["bytes_processed"] or 0 for c in chunks),
+        "first_chunk_started": min(starts) if starts else None,
+        "cost_estimate": cost_estimate,
+        "chunks": chunks,
+        "failed_chunks": failed,
+        "note": "Re-run the same fix to resume the failed chunks" if failed else None
+    }
@@ -0,0 +1,170 @@
+"""Coalescing of approved fixes into fewer table rewrites.
+
+Every UPDATE rewrites the storage blocks it touches, so N approved fixes
+on one table cost N rewrites and N DML jobs. Fixes that do not depend on
+each other are merged into a single statement:
+
+    UPDATE t SET
+        col_a = CASE WHEN <where 1> THEN <value 1> ELSE col_a END,
+        col_b = CASE WHEN <where 2> THEN <value 2> ELSE col_b END
+    WHERE (<where 1>) OR (<where 2>)
+
+Fixes are grouped in approval order. A fix joins the current group only
+if no fix in the group writes a column it reads (and vice versa), so one
+merged statement gives the same result as running the group's fixes one
+after another. Where two fixes in a group set the same column, the later
+fix wins on rows matched by both (as it would if run sequentially); these
+overlaps are reported as conflicts. DELETEs, multi-table UPDATEs and
+statements that cannot be parsed run on their own.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+from sqlglot import exp
+
+from dq_agents.remediator.sql_rewriter import DIALECT, parse, update_from
+
+
+@dataclass
+class ParsedFix:
+    """A single-table UPDATE broken into its assignments and condition."""
+
+    index: int
+    sql: str
+    table: str
+    assignments: Dict[str, str]
+    condition: str
+    reads: Set[str] = field(default_factory=set)
+    column_names: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def writes(self) -> Set[str]:
+        return set(self.assignments)
+
+
+def _unqualify(expression: exp.Expression, qualifiers: Set[str]) -> exp.Expression:
+    """Drop table qualifiers that refer to the UPDATE target from column references."""
+    for column in expression.find_all(exp.Column):
+        if column.table and column.table.lower() in qualifiers:
+            column.set("table", None)
+    return expression
+
+
+def parse_fix(sql: str, index: int = 0) -> Optional[ParsedFix]:
+    """Parse a fix into a ParsedFix, or None if it is not a single-table UPDATE with a WHERE."""
+    statement = parse(sql)
+    if not isinstance(statement, exp.Update) or update_from(statement) or not statement.args.get("where"):
+        return None
+
+    target = statement.this
+    qualifiers = {target.name.lower()}
+    if target.alias:
+        qualifiers.add(target.alias.lower())
+    table_expression = target.copy()
+    table_expression.set("alias", None)
+    table = table_expression.sql(DIALECT)
+
+    assignments = {}
+    column_names = {}
+    reads: Set[str] = set()
+    for assignment in statement.expressions:
+        if not isinstance(assignment, exp.EQ) or not isinstance(assignment.this, exp.Column):
+            return None
+        value = _unqualify(assignment.expression.copy(), qualifiers)
+        assignments[assignment.this.name.lower()] = value.sql(DIALECT)
+        column_names[assignment.this.name.lower()] = assignment.this.name
+        reads.update(column.name.lower() for column in value.find_all(exp.Column))
+
+    condition = _unqualify(statement.args["where"].this.copy(), qualifiers)
+    reads.update(column.name.lower() for column in condition.find_all(exp.Column))
+
+    return ParsedFix(index, sql, table, assignments, condition.sql(DIALECT), reads, column_names)
+
+
+def _compatible(fix: ParsedFix, group: List[ParsedFix]) -> bool:
+    """True if merging fix into group gives the same result as running it afterwards."""
+    return all(
+        fix.table == member.table
+        and not (fix.reads & member.writes)
+        and not (member.reads & fix.writes)
+        for member in group
+    )
+
+
+def build_coalesced_update(group: List[ParsedFix]) -> str:
+    """Build one UPDATE applying every fix in a group."""
+    columns: List[str] = []
+    for fix in group:
+        for column in fix.assignments:
+            if column not in columns:
+                columns.append(column)
+
+    set_clauses = []
+    for column in columns:
+        # Later fixes take precedence, as they would when run one after another
+        whens = "\n        ".join(
+            f"WHEN {fix.condition} THEN {fix.assignments[column]}"
+            for fix in reversed(group) if column in fix.assignments
+        )
+        name = next(fix.column_names[column] for fix in group if column in fix.assignments)
+        set_clauses.append(f"{name} = CASE\n        {whens}\n        ELSE {name}\n    END")
+
+    conditions = "\n    OR ".join(f"({fix.condition})" for fix in group)
+    return f"UPDATE {group[0].table} SET\n    " + ",\n    ".join(set_clauses) + f"\nWHERE {conditions}"
+
+
+def coalesce_fixes(fix_sqls: List[str]) -> Dict[str, Any]:
+    """
+    Plan the statements needed to apply a list of approved fixes.
+
+    Args:
+        fix_sqls: Fully qualified fix statements, in approval order
+
+    Returns:
+        dict: statements (in execution order, each with the indexes of the
+        fixes it applies), conflicts (columns set by more than one merged fix)
+        and the number of table rewrites saved
+    """
+    statements: List[Dict[str, Any]] = []
+    conflicts: List[Dict[str, Any]] = []
+    group: List[ParsedFix] = []
+
+    def close_group():
+        if not group:
+            return
+        if len(group) == 1:
+            statements.append({"fixes": [group[0].index], "sql": group[0].sql, "coalesced": False})
+        else:
+            statements.append({
+                "fixes": [fix.index for fix in group],
+                "sql": build_coalesced_update(group),
+                "coalesced": True
+            })
+            for column in sorted(set().union(*(fix.writes for fix in group))):
+                writers = [fix.index for fix in group if column in fix.writes]
+                if len(writers) > 1:
+                    conflicts.append({
+                        "column": column,
+                        "fixes": writers,
+                        "resolution": f"fix {writers[-1]} wins on rows matched by more than one fix"
+                    })
+        group.clear()
+
+    for index, sql in enumerate(fix_sqls):
+        fix = parse_fix(sql, index)
+        if fix is None:
+            close_group()
+            statements.append({"fixes": [index], "sql": sql, "coalesced": False})
+            continue
+        if not _compatible(fix, group):
+            close_group()
+        group.append(fix)
+
+    close_group()
+
+    return {
+        "statements": statements,
+        "conflicts": conflicts,
+        "rewrites_saved": len(fix_sqls) - len(statements)
+    }
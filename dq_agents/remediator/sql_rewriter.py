@@ -0,0 +1,193 @@
+"""AST-based rewriting of fix SQL.
+
+Fix SQL generated by the agents refers to tables by placeholder
+(``{table}``, ``TABLE_NAME``), by bare name or with a made-up
+project/dataset. The statement is parsed with sqlglot and every table
+reference (other than CTE names) is pointed at the configured project
+and dataset, leaving column references such as ``t.col`` untouched.
+
+From the parsed UPDATE/DELETE the module also derives:
+
+- a preview SELECT returning sample affected rows (with the values an
+  UPDATE would set) plus ``COUNT(*) OVER ()`` with the total number of
+  affected rows, so count and sample come from one query
+- a COUNT query over the affected rows
+- the statement with an extra condition ANDed into its WHERE clause
+"""
+
+import re
+from typing import Optional, Set
+
+import sqlglot
+from sqlglot import exp
+
+DIALECT = "bigquery"
+
+# Column holding the total affected-row count in preview results
+AFFECTED_ROWS_COLUMN = "_affected_rows"
+
+# Prefix of the columns holding the values an UPDATE would set
+NEW_VALUE_PREFIX = "_new_"
+
+_PLACEHOLDER_PATTERN = re.compile(r"\{\{table\}\}|\{table\}|\bTABLE_NAME\b")
+
+
+def parse(sql: str) -> Optional[exp.Expression]:
+    """Parse a single BigQuery statement, or None if it cannot be parsed."""
+    try:
+        return sqlglot.parse_one(sql.strip().rstrip(";"), read=DIALECT)
+    except sqlglot.errors.ParseError:
+        return None
+
+
+def _cte_names(statement: exp.Expression) -> Set[str]:
+    return {cte.alias_or_name.lower() for cte in statement.find_all(exp.CTE)}
+
+
+def update_from(statement: exp.Update) -> Optional[exp.From]:
+    """Get the FROM clause of an UPDATE ... FROM (the arg is "from_" in newer sqlglot releases)."""
+    return statement.args.get("from_") or statement.args.get("from")
+
+
+def fill_placeholders(sql: str, table_reference: str) -> str:
+    """Replace the ``{table}``, ``{{table}}`` and ``TABLE_NAME`` placeholders."""
+    return _PLACEHOLDER_PATTERN.sub(table_reference, sql.strip())
+
+
+def qualify_tables(
+    sql: str,
+    project_id: str,
+    dataset_id: str,
+    table_name: str
+) -> Optional[str]:
+    """
+    Point every table reference in a statement at the configured project and dataset.
+
+    Placeholders become the target table; CTE references and column references
+    are left as they are.
+
+    Returns:
+        str: The rewritten statement, or None if it cannot be parsed
+    """
+    statement = parse(fill_placeholders(sql, table_name))
+    if statement is None:
+        return None
+
+    ctes = _cte_names(statement)
+    for table in list(statement.find_all(exp.Table)):
+        if not table.name or (not table.args.get("db") and table.name.lower() in ctes):
+            continue
+        qualified = exp.to_table(f"`{project_id}.{dataset_id}.{table.name}`", dialect=DIALECT)
+        # Keep the alias, joins, FOR SYSTEM_TIME AS OF etc. of the original reference
+        for key, value in table.args.items():
+            if key not in ("this", "db", "catalog") and value:
+                qualified.set(key, value)
+        table.replace(qualified)
+
+    return statement.sql(DIALECT)
+
+
+def is_dml(sql: str) -> bool:
+    """True if the statement is an UPDATE or DELETE."""
+    statement = parse(sql)
+    if statement is None:
+        return bool(re.match(r"\s*(UPDATE|DELETE)\b", sql, re.IGNORECASE))
+    return isinstance(statement, (exp.Update, exp.Delete))
+
+
+def missing_where(sql: str) -> bool:
+    """True if the statement is an UPDATE/DELETE without a WHERE clause."""
+    statement = parse(sql)
+    if statement is None:
+        return is_dml(sql) and not re.search(r"\bWHERE\b", sql, re.IGNORECASE)
+    return isinstance(statement, (exp.Update, exp.Delete)) and statement.args.get("where") is None
+
+
+def _target_reference(target: exp.Table) -> str:
+    return target.alias or target.name
+
+
+def _affected_rows_select(statement: exp.Expression, columns: str) -> Optional[str]:
+    """Build SELECT <columns> FROM <target rows of an UPDATE/DELETE or SELECT>."""
+    if isinstance(statement, exp.Update):
+        where = statement.args.get("where")
+        if where is None:
+            return None
+        sources = [statement.this.sql(DIALECT)]
+        joined = update_from(statement)
+        if joined is not None:
+            sources.append(joined.this.sql(DIALECT))
+        return f"SELECT {columns} FROM {', '.join(sources)} WHERE {where.this.sql(DIALECT)}"
+
+    if isinstance(statement, exp.Delete):
+        where = statement.args.get("where")
+        if where is None:
+            return None
+        return f"SELECT {columns} FROM {statement.this.sql(DIALECT)} WHERE {where.this.sql(DIALECT)}"
+
+    if isinstance(statement, (exp.Select, exp.SetOperation)):
+        return f"SELECT {columns} FROM ({statement.sql(DIALECT)})"
+
+    return None
+
+
+def build_preview_sql(sql: str, sample_limit: int = 100) -> Optional[str]:
+    """
+    Build a SELECT previewing the rows a fix affects.
+
+    Returns up to sample_limit affected rows (for an UPDATE, the target row plus
+    ``_new_<column>`` with the value it would be set to) and the total affected
+    row count in ``_affected_rows`` on every row. Returns None for statements
+    that cannot be previewed.
+    """
+    statement = parse(sql)
+    if statement is None:
+        return None
+
+    columns = "*"
+    if isinstance(statement, exp.Update):
+        target = _target_reference(statement.this)
+        new_values = [
+            f"{assignment.expression.sql(DIALECT)} AS {NEW_VALUE_PREFIX}{assignment.this.name}"
+            for assignment in statement.expressions
+            if isinstance(assignment, exp.EQ) and isinstance(assignment.this, exp.Column)
+        ]
+        columns = ", ".join([f"{target}.*"] + new_values)
+    elif isinstance(statement, exp.Delete):
+        columns = f"{_target_reference(statement.this)}.*"
+
+    select = _affected_rows_select(statement, f"{columns}, COUNT(*) OVER () AS {AFFECTED_ROWS_COLUMN}")
+    return f"{select}\nLIMIT {int(sample_limit)}" if select else None
+
+
+def build_count_sql(sql: str) -> Optional[str]:
+    """Build a COUNT(*) AS total query over the rows a fix affects."""
+    statement = parse(sql)
+    if statement is None:
+        return None
+    return _affected_rows_select(statement, "COUNT(*) AS total")
+
+
+def add_condition(sql: str, condition: str) -> Optional[str]:
+    """AND a condition into the WHERE clause of an UPDATE/DELETE (None if it has none)."""
+    statement = parse(sql)
+    if not isinstance(statement, (exp.Update, exp.Delete)) or statement.args.get("where") is None:
+        return None
+    return statement.where(condition, dialect=DIALECT).sql(DIALECT)
+
+
+def target_table(sql: str) -> Optional[str]:
+    """Get the table an UPDATE/DELETE writes to, as qualified in the statement."""
+    statement = parse(sql)
+    if isinstance(statement, (exp.Update, exp.Delete)) and isinstance(statement.this, exp.Table):
+        target = statement.this
+        return ".".join(part for part in (target.catalog, target.db, target.name) if part)
+    return None
+
+
+def target_alias(sql: str) -> Optional[str]:
+    """Get the alias of an UPDATE/DELETE target table, if it declares one."""
+    statement = parse(sql)
+    if isinstance(statement, (exp.Update, exp.Delete)) and isinstance(statement.this, exp.Table):
+        return statement.this.alias or None
+    return None
@@ -2,7 +2,50 @@ import os
 from google.cloud import bigquery
 from google.adk.tools import ToolContext
 import json
-from datetime import datetime
+from datetime import datetime, timezone
+from dq_agents.cost_gate import estimate_query, run_query
+from dq_agents.query_results import fetch_arrow, to_records
+from dq_agents.result_cache import cached_sample
+from dq_agents.tool_responses import shape_response
+from dq_agents.incremental import is_row_level_rule, restrict_to_keys, result_keys
+from dq_agents.bonus_features import ShadowValidation
+from dq_agents.remediator.batch_executor import job_timing, run_chunked_dml
+from dq_agents.remediator.fix_coalescer import coalesce_fixes
+from dq_agents.remediator.sql_rewriter import (
+    AFFECTED_ROWS_COLUMN,
+    build_preview_sql,
+    fill_placeholders,
+    is_dml,
+    missing_where,
+    qualify_tables
+)
+from environment.config_utils import (
+    get_column_param_type,
+    get_customer_id_column,
+    get_customer_id_param_type,
+    get_fix_chunk_concurrency,
+    get_partitioned_layout,
+    get_policy_id_column,
+    get_shadow_expiration_hours
+)
+from environment.storage_layout import refresh_sql
+
+
+def _qualify_fix_sql(
+    fix_sql: str,
+    project_id: str,
+    dataset_id: str,
+    table_name: str
+) -> str:
+    """Point fix SQL at the configured project and dataset."""
+    # Every table reference (except CTE names) is resolved against the configured
+    # project/dataset; column references such as t.col are left untouched
+    sql = qualify_tables(fix_sql, project_id, dataset_id, table_name)
+    if sql is None:
+        # Statements sqlglot cannot parse only get their placeholders filled in
+        sql = fill_placeholders(fix_sql, f"`{project_id}.{dataset_id}.{table_name}`")
+    
+    return sql
 
 
 def dry_run_fix(
@@ -12,92 +55,99 @@ def dry_run_fix(
 ) -> str:
     """
     Perform a dry run of a fix by showing affected rows without making changes.
-    Converts UPDATE/DELETE to SELECT to preview changes.
+    Converts UPDATE/DELETE to a SELECT that returns sample affected rows (with the
+    values an UPDATE would set) and the total affected row count in one query.
     """
     project_id = os.getenv("BQ_DATA_PROJECT_ID") or os.getenv("GOOGLE_CLOUD_PROJECT")
     dataset_id = os.getenv("BQ_DATASET_ID")
     
     if not project_id or not dataset_id:
-        return json.dumps({
+        return shape_response({
             "error": "Missing BQ_DATA_PROJECT_ID or BQ_DATASET_ID environment variables",
             "status": "config_error"
-        })
+        }, "dry_run_fix")
     
     try:
-        # Clean SQL - remove any hardcoded dataset/project references
-        sql = fix_sql.strip()
-        
-        # Replace common hardcoded patterns with correct ones
-        import re
-        # Remove dataset/project qualifiers from table references
-        # Pattern: dataset.table or project.dataset.table -> just table
-        sql = re.sub(r'\b[a-zA-Z0-9_-]+\.[a-zA-Z0-9_-]+\.([a-zA-Z0-9_-]+)\b', r'\1', sql)
-        sql = re.sub(r'\b[a-zA-Z0-9_-]+\.([a-zA-Z0-9_-]+)\b(?!\s*\()', r'\1', sql)
-        
-        # Now build proper table reference
-        full_table = f"`{project_id}.{dataset_id}.{table_name}`"
-        
-        # Replace table placeholders
-        sql = sql.replace("{table}", full_table).replace("TABLE_NAME", full_table).replace("{{table}}", full_table)
+        sql = _qualify_fix_sql(fix_sql, project_id, dataset_id, table_name)
         
-        # Replace bare table name with fully qualified name
-        sql = re.sub(rf'\b{table_name}\b', full_table, sql)
+        if missing_where(sql):
+            return shape_response({
+                "error": "UPDATE/DELETE statement must have WHERE clause for safety",
+                "status": "invalid_sql"
+            }, "dry_run_fix")
         
-        # Convert UPDATE/DELETE to SELECT for dry run
-        dry_run_sql = sql
-        
-        if "UPDATE" in sql.upper():
-            # Extract WHERE clause from UPDATE
-            where_idx = sql.upper().find("WHERE")
-            if where_idx > -1:
-                where_clause = sql[where_idx:]
-                dry_run_sql = f"SELECT * FROM {full_table} {where_clause} LIMIT 100"
-            else:
-                return json.dumps({
-                    "error": "UPDATE statement must have WHERE clause for safety",
-                    "status": "invalid_sql"
-                })
-        
-        elif "DELETE" in sql.upper():
-            # Extract WHERE clause from DELETE
-            from_idx = sql.upper().find("FROM")
-            where_idx = sql.upper().find("WHERE")
-            if where_idx > -1:
-                table_part = sql[from_idx+4:where_idx].strip()
-                where_clause = sql[where_idx:]
-                dry_run_sql = f"SELECT * FROM {full_table} {where_clause} LIMIT 100"
-            else:
-                return json.dumps({
-                    "error": "DELETE statement must have WHERE clause for safety",
-                    "status": "invalid_sql"
-                })
+        dry_run_sql = build_preview_sql(sql, sample_limit=100)
+        if dry_run_sql is None:
+            return shape_response({
+                "error": "Only UPDATE, DELETE and SELECT statements can be dry run",
+                "status": "invalid_sql",
+                "sql": sql
+            }, "dry_run_fix")
         
         # Execute dry run
         client = bigquery.Client(project=project_id)
-        results = client.query(dry_run_sql).result()
+        query_job = run_query(client, dry_run_sql, tool_context=tool_context)
+        results = query_job.result()
         
-        affected_rows = []
-        for row in results:
-            affected_rows.append(dict(row))
+        sample = fetch_arrow(results, max_rows=10)
+        total_count = sample.column(AFFECTED_ROWS_COLUMN)[0].as_py() if sample.num_rows else 0
+        affected_rows = to_records(sample.select([c for c in sample.column_names if c != AFFECTED_ROWS_COLUMN]))
         
-        # Get total count
-        count_sql = dry_run_sql.replace("SELECT *", "SELECT COUNT(*) as total").replace("LIMIT 100", "")
-        total_count = list(client.query(count_sql).result())[0].total
+        # When the preview holds every affected row, remember their keys so
+        # validate_fix can re-check just those rows after the fix; otherwise
+        # drop the keys of an earlier preview, which no longer match this fix
+        if tool_context is not None:
+            keys = None
+            if total_count <= (results.total_rows or 0):
+                keys = result_keys(client, query_job, get_customer_id_column())
+            fixed_row_ids = tool_context.state.get("fixed_row_ids", {})
+            if keys is not None:
+                fixed_row_ids[table_name] = keys
+            else:
+                fixed_row_ids.pop(table_name, None)
+            tool_context.state["fixed_row_ids"] = fixed_row_ids
         
-        return json.dumps({
+        return shape_response({
             "status": "success",
             "affected_row_count": total_count,
-            "sample_rows": affected_rows[:10],
+            "sample_rows": affected_rows,
             "dry_run_sql": dry_run_sql,
-            "original_sql": sql
-        })
+            "original_sql": sql,
+            # What executing the fix itself would scan (free dry run, cached for execute_fix)
+            "cost_estimate": estimate_query(client, sql)
+        }, "dry_run_fix")
         
     except Exception as e:
-        return json.dumps({
+        return shape_response({
             "error": str(e),
             "status": "error",
             "sql": fix_sql
-        })
+        }, "dry_run_fix")
+
+
+def _refresh_partitioned_layout(
+    client: bigquery.Client,
+    project_id: str,
+    dataset_id: str,
+    table_name: str,
+    tool_context: ToolContext = None
+):
+    """
+    Re-materialise the week-partitioned table after a fix to one of its week tables.
+    
+    Returns:
+        None if the table does not feed the layout, else the refresh status
+        (readers fall back to the week tables while a failed refresh leaves it stale)
+    """
+    layout = get_partitioned_layout()
+    if not layout or table_name not in layout.get("source_tables", []):
+        return None
+    
+    try:
+        run_query(client, refresh_sql(project_id, dataset_id, layout), tool_context=tool_context).result()
+        return {"table": layout["table"], "status": "refreshed"}
+    except Exception as e:
+        return {"table": layout["table"], "status": "stale", "error": str(e)}
 
 
 def execute_fix(
@@ -108,127 +158,361 @@ def execute_fix(
 ) -> str:
     """
     Execute a DQ fix on BigQuery table.
-    Uses batch processing for large updates.
+    Uses batch processing for large updates: with batch_size > 0, UPDATE/DELETE
+    fixes run in resumable chunks of about batch_size rows (re-run the same fix
+    to resume after a failure).
     """
     project_id = os.getenv("BQ_DATA_PROJECT_ID") or os.getenv("GOOGLE_CLOUD_PROJECT")
     dataset_id = os.getenv("BQ_DATASET_ID")
     
     if not project_id or not dataset_id:
-        return json.dumps({
+        return shape_response({
             "error": "Missing BQ_DATA_PROJECT_ID or BQ_DATASET_ID environment variables",
             "status": "config_error"
-        })
+        }, "execute_fix")
     
     try:
-        # Clean SQL - remove any hardcoded dataset/project references
-        sql = fix_sql.strip()
-        
-        # Replace common hardcoded patterns
-        import re
-        # Remove dataset/project qualifiers from table references
-        sql = re.sub(r'\b[a-zA-Z0-9_-]+\.[a-zA-Z0-9_-]+\.([a-zA-Z0-9_-]+)\b', r'\1', sql)
-        sql = re.sub(r'\b[a-zA-Z0-9_-]+\.([a-zA-Z0-9_-]+)\b(?!\s*\()', r'\1', sql)
-        
-        # Now build proper table reference
-        full_table = f"`{project_id}.{dataset_id}.{table_name}`"
-        
-        # Replace table placeholders
-        sql = sql.replace("{table}", full_table).replace("TABLE_NAME", full_table).replace("{{table}}", full_table)
-        
-        # Replace bare table name with fully qualified name
-        sql = re.sub(rf'\b{table_name}\b', full_table, sql)
+        sql = _qualify_fix_sql(fix_sql, project_id, dataset_id, table_name)
         
         # Safety check: Ensure WHERE clause exists for UPDATE/DELETE
-        if "UPDATE" in sql.upper() or "DELETE" in sql.upper():
-            if "WHERE" not in sql.upper():
-                return json.dumps({
-                    "error": "UPDATE/DELETE without WHERE clause is not allowed",
-                    "status": "rejected"
-                })
+        if missing_where(sql):
+            return shape_response({
+                "error": "UPDATE/DELETE without WHERE clause is not allowed",
+                "status": "rejected"
+            }, "execute_fix")
         
         # Execute SQL
         client = bigquery.Client(project=project_id)
         
+        # run_query / run_chunked_dml reject fixes over the per-query limit or the session
+        # byte budget before running them (chunked fixes are charged once per chunk)
+        
         # For UPDATE/DELETE, use DML
-        if "UPDATE" in sql.upper() or "DELETE" in sql.upper():
-            # Add LIMIT if not present and batch_size specified
-            if batch_size and batch_size > 0:
-                if "LIMIT" not in sql.upper():
-                    # For UPDATE/DELETE in BigQuery, we can't use LIMIT directly
-                    # Instead, we'll note this limitation
-                    pass
+        if is_dml(sql):
+            chunked = None
+            key_column = get_policy_id_column()
+            if batch_size and batch_size > 0 and key_column:
+                # Split large fixes into resumable hash-bucket chunks of ~batch_size rows
+                chunked = run_chunked_dml(
+                    client, sql, key_column, batch_size,
+                    max_concurrency=get_fix_chunk_concurrency(),
+                    tool_context=tool_context
+                )
             
-            query_job = client.query(sql)
-            result = query_job.result()
+            if chunked is not None:
+                pre_fix_timestamp = chunked.pop("first_chunk_started")
+                cost_estimate = chunked.pop("cost_estimate")
+                response = {**chunked, "sql_executed": sql}
+            else:
+                query_job = run_query(client, sql, tool_context=tool_context)
+                query_job.result()
+                cost_estimate = estimate_query(client, sql)
+                
+                pre_fix_timestamp = query_job.started.isoformat() if query_job.started else None
+                response = {
+                    "status": "success",
+                    "affected_rows": query_job.num_dml_affected_rows or 0,
+                    **job_timing(query_job),
+                    "sql_executed": sql
+                }
             
-            # Get number of affected rows (for DML)
-            num_dml_affected_rows = query_job.num_dml_affected_rows if hasattr(query_job, 'num_dml_affected_rows') else 0
+            # The table as of the first job start is the pre-fix state (for time-travel diffs)
+            if tool_context is not None and pre_fix_timestamp:
+                pre_fix_timestamps = tool_context.state.get("pre_fix_timestamps", {})
+                pre_fix_timestamps[table_name] = pre_fix_timestamp
+                tool_context.state["pre_fix_timestamps"] = pre_fix_timestamps
             
-            return json.dumps({
-                "status": "success",
-                "affected_rows": num_dml_affected_rows,
-                "execution_time_ms": query_job.total_bytes_processed,
-                "sql_executed": sql
-            })
+            response["pre_fix_timestamp"] = pre_fix_timestamp
+            response["cost_estimate"] = cost_estimate
+            response["partitioned_table"] = _refresh_partitioned_layout(
+                client, project_id, dataset_id, table_name, tool_context
+            )
+            return shape_response(response, "execute_fix")
         
         else:
             # For other SQL (CREATE TABLE AS, INSERT)
-            query_job = client.query(sql)
-            result = query_job.result()
+            query_job = run_query(client, sql, tool_context=tool_context)
+            query_job.result()
             
-            return json.dumps({
+            return shape_response({
                 "status": "success",
-                "execution_time_ms": query_job.total_bytes_processed,
-                "sql_executed": sql
-            })
+                **job_timing(query_job),
+                "sql_executed": sql,
+                "cost_estimate": estimate_query(client, sql),
+                "partitioned_table": _refresh_partitioned_layout(
+                    client, project_id, dataset_id, table_name, tool_context
+                )
+            }, "execute_fix")
         
     except Exception as e:
-        return json.dumps({
+        return shape_response({
             "error": str(e),
             "status": "failed",
             "sql": fix_sql
-        })
+        }, "execute_fix")
+
+
+def execute_fixes_coalesced(
+    fix_sqls: list,
+    table_name: str,
+    batch_size: int = 0,
+    tool_context: ToolContext = None
+) -> str:
+    """
+    Apply several approved fixes for one table with as few table rewrites as possible.
+    
+    Independent UPDATE fixes are merged into one UPDATE ... SET col = CASE ... statement;
+    fixes that read columns another fix writes, DELETEs and multi-table statements run
+    separately, in approval order. Columns set by more than one merged fix are reported
+    as conflicts (the later fix wins on rows both match).
+    
+    Args:
+        fix_sqls: Approved fix statements, in approval order
+        table_name: Table the fixes target
+        batch_size: If > 0, run each statement in resumable chunks of about this many rows
+    """
+    project_id = os.getenv("BQ_DATA_PROJECT_ID") or os.getenv("GOOGLE_CLOUD_PROJECT")
+    dataset_id = os.getenv("BQ_DATASET_ID")
+    
+    if not project_id or not dataset_id:
+        return shape_response({
+            "error": "Missing BQ_DATA_PROJECT_ID or BQ_DATASET_ID environment variables",
+            "status": "config_error"
+        }, "execute_fixes_coalesced")
+    
+    try:
+        qualified = [_qualify_fix_sql(fix_sql, project_id, dataset_id, table_name) for fix_sql in fix_sqls]
+        
+        for sql in qualified:
+            if missing_where(sql):
+                return shape_response({
+                    "error": "UPDATE/DELETE without WHERE clause is not allowed",
+                    "status": "rejected",
+                    "sql": sql
+                }, "execute_fixes_coalesced")
+        
+        plan = coalesce_fixes(qualified)
+        client = bigquery.Client(project=project_id)
+        key_column = get_policy_id_column()
+        
+        executed = []
+        pre_fix_timestamp = None
+        for statement in plan["statements"]:
+            try:
+                chunked = None
+                if batch_size and batch_size > 0 and key_column:
+                    chunked = run_chunked_dml(
+                        client, statement["sql"], key_column, batch_size,
+                        max_concurrency=get_fix_chunk_concurrency(),
+                        tool_context=tool_context
+                    )
+                
+                if chunked is not None:
+                    started = chunked.pop("first_chunk_started")
+                    result = {**statement, **chunked}
+                else:
+                    query_job = run_query(client, statement["sql"], tool_context=tool_context)
+                    query_job.result()
+                    started = query_job.started.isoformat() if query_job.started else None
+                    result = {
+                        **statement,
+                        "status": "success",
+                        "affected_rows": query_job.num_dml_affected_rows or 0,
+                        **job_timing(query_job)
+                    }
+                
+                pre_fix_timestamp = pre_fix_timestamp or started
+                executed.append(result)
+                if result["status"] != "success":
+                    break
+            
+            except Exception as e:
+                executed.append({**statement, "status": "failed", "error": str(e)})
+                break
+        
+        if tool_context is not None and pre_fix_timestamp:
+            pre_fix_timestamps = tool_context.state.get("pre_fix_timestamps", {})
+            pre_fix_timestamps[table_name] = pre_fix_timestamp
+            tool_context.state["pre_fix_timestamps"] = pre_fix_timestamps
+        
+        all_succeeded = len(executed) == len(plan["statements"]) and all(r["status"] == "success" for r in executed)
+        
+        partitioned_table = None
+        if any(r["status"] != "failed" for r in executed):
+            partitioned_table = _refresh_partitioned_layout(
+                client, project_id, dataset_id, table_name, tool_context
+            )
+        
+        return shape_response({
+            "status": "success" if all_succeeded else "partial",
+            "fixes": len(fix_sqls),
+            "statements_executed": len(executed),
+            "statements_planned": len(plan["statements"]),
+            "rewrites_saved": plan["rewrites_saved"],
+            "conflicts": plan["conflicts"],
+            "affected_rows": sum(r.get("affected_rows", 0) for r in executed),
+            "statements": executed,
+            "not_executed": plan["statements"][len(executed):],
+            "pre_fix_timestamp": pre_fix_timestamp,
+            "partitioned_table": partitioned_table
+        }, "execute_fixes_coalesced")
+        
+    except Exception as e:
+        return shape_response({
+            "error": str(e),
+            "status": "failed"
+        }, "execute_fixes_coalesced")
 
 
 def validate_fix(
     original_rule_sql: str,
     table_name: str,
-    tool_context: ToolContext
+    tool_context: ToolContext,
+    row_ids: list = None,
+    check_other_rows: bool = False
 ) -> str:
     """
     Validate that a fix worked by re-running the original DQ rule.
     If the rule returns 0 violations, the fix was successful.
+    
+    If row_ids (customer IDs of the fixed rows) are given, or dry_run_fix
+    captured every affected row for this table, and the rule is row-level,
+    only the fixed rows are re-checked. check_other_rows=True adds a
+    regression check of the rest of the table (a scan of every other row),
+    reported separately.
     """
     project_id = os.getenv("BQ_DATA_PROJECT_ID")
     dataset_id = os.getenv("BQ_DATASET_ID")
     
     try:
+        if row_ids is None and tool_context is not None:
+            row_ids = tool_context.state.get("fixed_row_ids", {}).get(table_name)
+        key_column = get_customer_id_column()
+        client = bigquery.Client(project=project_id)
+        
+        # Aggregate or cross-row rules cannot be evaluated on a subset of rows
+        if row_ids and key_column and is_row_level_rule(original_rule_sql):
+            table_ref = f"{project_id}.{dataset_id}.{table_name}"
+            job_config = bigquery.QueryJobConfig(query_parameters=[
+                bigquery.ArrayQueryParameter("row_ids", get_customer_id_param_type(), [str(r) for r in row_ids])
+            ])
+            # A cached result is only reused while the table is unmodified, so a fix is always re-checked
+            fixed = cached_sample(
+                client, restrict_to_keys(original_rule_sql, table_ref, key_column),
+                limit=5, job_config=job_config, tool_context=tool_context
+            )
+            remaining = fixed["total_rows"]
+            response = {
+                "status": "success" if remaining == 0 else "partial",
+                "remaining_violations": remaining,
+                "rows_checked": len(row_ids),
+                "sample_violations": fixed["rows"],
+                "message": (
+                    "All issues in the fixed rows resolved" if remaining == 0
+                    else f"{remaining} violations still exist in the fixed rows"
+                )
+            }
+            
+            if check_other_rows:
+                # Opt-in regression check: scans every row the fix did not touch
+                others = cached_sample(
+                    client, restrict_to_keys(original_rule_sql, table_ref, key_column, exclude=True),
+                    limit=5, job_config=job_config, tool_context=tool_context
+                )
+                outside = others["total_rows"]
+                response.update({
+                    "status": "success" if remaining == 0 and outside == 0 else "partial",
+                    "remaining_violations": remaining + outside,
+                    "remaining_in_fixed_rows": remaining,
+                    "remaining_outside_fixed_rows": outside,
+                    "sample_violations": fixed["rows"] + others["rows"],
+                    "message": response["message"] + f" ({outside} violations in rows the fix did not touch)"
+                })
+            
+            return shape_response(response, "validate_fix")
+        
         # Replace table placeholder
         full_table = f"`{project_id}.{dataset_id}.{table_name}`"
         sql = original_rule_sql.replace("{table}", full_table).replace("TABLE_NAME", full_table).replace("{{table}}", full_table)
         
-        # Execute validation query
-        client = bigquery.Client(project=project_id)
-        results = client.query(sql).result()
-        
-        violations = []
-        for row in results:
-            violations.append(dict(row))
+        # A cached result is only reused while the table is unmodified, so a fix is always re-checked
+        sample = cached_sample(client, sql, limit=5, tool_context=tool_context)
+        remaining = sample["total_rows"]
         
-        validation_status = "success" if len(violations) == 0 else "partial"
+        validation_status = "success" if remaining == 0 else "partial"
         
-        return json.dumps({
+        return shape_response({
             "status": validation_status,
-            "remaining_violations": len(violations),
-            "sample_violations": violations[:5],
-            "message": "All issues resolved" if len(violations) == 0 else f"{len(violations)} violations still exist"
-        })
+            "remaining_violations": remaining,
+            "rows_checked": "all",
+            "sample_violations": sample["rows"],
+            "message": "All issues resolved" if remaining == 0 else f"{remaining} violations still exist"
+        }, "validate_fix")
         
     except Exception as e:
-        return json.dumps({
+        return shape_response({
             "error": str(e),
             "status": "error"
-        })
+        }, "validate_fix")
+
+
+def validate_fix_in_shadow(
+    fix_sql: str,
+    original_rule_sql: str,
+    table_name: str,
+    regression_checks: list = None,
+    keep_shadow: bool = False,
+    tool_context: ToolContext = None
+) -> str:
+    """
+    Validate a fix on a zero-copy clone of the table before touching production.
+    
+    Clones the table, applies the fix to the clone, then re-runs the original DQ rule
+    and any regression checks (SQL returning offending rows, with a {table} placeholder)
+    against production and the clone in parallel and reports the delta.
+    """
+    project_id = os.getenv("BQ_DATA_PROJECT_ID") or os.getenv("GOOGLE_CLOUD_PROJECT")
+    dataset_id = os.getenv("BQ_DATASET_ID")
+    
+    if not project_id or not dataset_id:
+        return shape_response({
+            "error": "Missing BQ_DATA_PROJECT_ID or BQ_DATASET_ID environment variables",
+            "status": "config_error"
+        }, "validate_fix_in_shadow")
+    
+    shadow_table = None
+    client = bigquery.Client(project=project_id)
+    
+    try:
+        shadow_table = ShadowValidation.create_shadow_table(
+            table_name, project_id, dataset_id,
+            client=client, expiration_hours=get_shadow_expiration_hours(), tool_context=tool_context
+        )
+        
+        results = ShadowValidation.validate_fix(
+            shadow_table, table_name, fix_sql, regression_checks or [],
+            project_id=project_id, dataset_id=dataset_id,
+            rule_sql=original_rule_sql, client=client, tool_context=tool_context
+        )
+        
+        results["status"] = "passed" if results["validation_passed"] else "failed"
+        results["expires_in_hours"] = get_shadow_expiration_hours()
+        
+        return shape_response(results, "validate_fix_in_shadow")
+        
+    except Exception as e:
+        return shape_response({
+            "error": str(e),
+            "status": "error",
+            "shadow_table": shadow_table
+        }, "validate_fix_in_shadow")
+    
+    finally:
+        if shadow_table and not keep_shadow:
+            try:
+                ShadowValidation.drop_shadow_table(shadow_table, project_id, dataset_id, client=client)
+            except Exception:
+                pass  # The shadow expires on its own
 
 
 def create_jira_ticket(
@@ -265,49 +549,278 @@ def create_jira_ticket(
     # In production: Save to jira_mock/jira_tickets.json
     # For now, just return the ticket
     
-    return json.dumps({
+    return shape_response({
         "status": "ticket_created",
         "ticket": ticket,
         "message": f"JIRA ticket {ticket_id} created successfully",
         "url": f"https://jira.example.com/browse/{ticket_id}"  # Mock URL
-    })
+    }, "create_jira_ticket")
+
+
+def _before_after_sql(
+    table_ref: str,
+    key_column: str,
+    columns: list,
+    filter_keys: bool
+) -> str:
+    """Build the time-travel diff query: changed rows only, one struct per changed column."""
+    key_filter = f"WHERE {key_column} IN UNNEST(@row_ids)" if filter_keys else ""
+    selected = ", ".join(f"`{col}`" for col in [key_column] + columns)
+    column_structs = ",\n".join(
+        f"STRUCT('{col}' AS column_name, TO_JSON_STRING(b.`{col}`) AS before, TO_JSON_STRING(a.`{col}`) AS after)"
+        for col in columns
+    )
+    
+    return f"""
+    WITH before AS (
+        SELECT {selected} FROM `{table_ref}` FOR SYSTEM_TIME AS OF @before_ts {key_filter}
+    ),
+    after AS (
+        SELECT {selected} FROM `{table_ref}` {key_filter}
+    ),
+    diff AS (
+        SELECT
+            COALESCE(b.{key_column}, a.{key_column}) AS row_key,
+            CASE
+                WHEN b.{key_column} IS NULL THEN 'inserted'
+                WHEN a.{key_column} IS NULL THEN 'deleted'
+                ELSE 'modified'
+            END AS change_type,
+            ARRAY(
+                SELECT AS STRUCT c.* FROM UNNEST([
+                    {column_structs}
+                ]) AS c
+                WHERE c.before IS DISTINCT FROM c.after
+            ) AS changes
+        FROM before b
+        FULL OUTER JOIN after a ON b.{key_column} = a.{key_column}
+    )
+    SELECT row_key, change_type, changes, COUNT(*) OVER () AS total_changed_rows
+    FROM diff
+    WHERE ARRAY_LENGTH(changes) > 0
+    ORDER BY row_key
+    LIMIT @page_size OFFSET @offset
+    """
+
+
+def _duplicate_keys_sql(table_ref: str, key_column: str, filter_keys: bool) -> str:
+    """Count rows per snapshot that do not have a unique, non-NULL key (they would fan out the diff join)."""
+    key_filter = f"WHERE {key_column} IN UNNEST(@row_ids)" if filter_keys else ""
+    return f"""
+    SELECT
+        (SELECT COUNT(*) - COUNT(DISTINCT {key_column})
+         FROM `{table_ref}` FOR SYSTEM_TIME AS OF @before_ts {key_filter}) AS before_duplicates,
+        (SELECT COUNT(*) - COUNT(DISTINCT {key_column})
+         FROM `{table_ref}` {key_filter}) AS after_duplicates
+    """
+
+
+def _aggregate_comparison_sql(
+    table_ref: str,
+    key_column: str,
+    columns: list,
+    filter_keys: bool
+) -> str:
+    """Build the keyless comparison: per snapshot, row counts, rows missing from the other side and column profiles."""
+    key_filter = f"WHERE {key_column} IN UNNEST(@row_ids)" if filter_keys else ""
+    selected = ", ".join(f"`{col}`" for col in [key_column] + columns)
+    column_profiles = ",\n".join(
+        f"STRUCT('{col}' AS column_name, COUNTIF(`{col}` IS NULL) AS nulls, "
+        f"COUNT(DISTINCT TO_JSON_STRING(`{col}`)) AS distinct_values)"
+        for col in columns
+    )
+    
+    def side(name: str, this: str, other: str) -> str:
+        return f"""
+        SELECT
+            '{name}' AS side,
+            COUNT(*) AS row_count,
+            (SELECT COUNT(*) FROM (
+                SELECT TO_JSON_STRING(t) FROM {this} t
+                EXCEPT DISTINCT
+                SELECT TO_JSON_STRING(o) FROM {other} o
+            )) AS rows_not_in_other,
+            [{column_profiles}] AS columns
+        FROM {this}"""
+    
+    return f"""
+    WITH before AS (
+        SELECT {selected} FROM `{table_ref}` FOR SYSTEM_TIME AS OF @before_ts {key_filter}
+    ),
+    after AS (
+        SELECT {selected} FROM `{table_ref}` {key_filter}
+    )
+    {side('before', 'before', 'after')}
+    UNION ALL
+    {side('after', 'after', 'before')}
+    """
+
+
+def _aggregate_comparison(
+    client: bigquery.Client,
+    table_ref: str,
+    key_column: str,
+    columns: list,
+    filter_keys: bool,
+    job_config: bigquery.QueryJobConfig,
+    tool_context: ToolContext = None
+) -> dict:
+    """Compare two snapshots by aggregates when the key cannot pair their rows."""
+    sql = _aggregate_comparison_sql(table_ref, key_column, columns, filter_keys)
+    query_job = run_query(client, sql, job_config, tool_context=tool_context)
+    sides = {row.side: row for row in query_job.result()}
+    before, after = sides["before"], sides["after"]
+    
+    before_profiles = {c["column_name"]: c for c in before.columns}
+    after_profiles = {c["column_name"]: c for c in after.columns}
+    
+    return {
+        "rows_before": before.row_count,
+        "rows_after": after.row_count,
+        "distinct_rows_removed": before.rows_not_in_other,
+        "distinct_rows_added": after.rows_not_in_other,
+        "changed_columns": [
+            {
+                "column": col,
+                "nulls_before": before_profiles[col]["nulls"],
+                "nulls_after": after_profiles[col]["nulls"],
+                "distinct_before": before_profiles[col]["distinct_values"],
+                "distinct_after": after_profiles[col]["distinct_values"]
+            }
+            for col in columns
+            if (before_profiles[col]["nulls"], before_profiles[col]["distinct_values"])
+            != (after_profiles[col]["nulls"], after_profiles[col]["distinct_values"])
+        ],
+        "bytes_processed": query_job.total_bytes_processed
+    }
 
 
 def get_before_after_comparison(
     table_name: str,
-    row_identifiers: list,
-    columns_to_compare: list,
-    tool_context: ToolContext
+    row_identifiers: list = None,
+    columns_to_compare: list = None,
+    before_timestamp: str = "",
+    page: int = 1,
+    page_size: int = 50,
+    tool_context: ToolContext = None
 ) -> str:
     """
-    Get before/after comparison for specific rows to visualize fix impact.
+    Get before/after comparison of a table around a fix, computed inside BigQuery.
+    
+    Compares the table FOR SYSTEM_TIME AS OF the pre-fix timestamp with its current
+    state, joined on the policy ID column, and returns only changed rows and columns.
+    If that column is not a unique, non-NULL key in either snapshot (e.g. the customer
+    ID fallback), the join would pair every duplicate with every other, so an
+    aggregate comparison (row counts, rows added/removed, changed column profiles)
+    is returned instead, with status "aggregate".
+    
+    Args:
+        table_name: Table that was fixed
+        row_identifiers: Policy IDs to compare (all rows if omitted)
+        columns_to_compare: Columns to compare (all columns if omitted)
+        before_timestamp: ISO timestamp of the state before the fix (defaults to the
+            pre-fix timestamp recorded by execute_fix for this table)
+        page: 1-based page of changed rows
+        page_size: Changed rows per page
     """
     project_id = os.getenv("BQ_DATA_PROJECT_ID")
     dataset_id = os.getenv("BQ_DATASET_ID")
     
     try:
-        # This would need a backup/snapshot table in production
-        # For now, return mock comparison structure
+        if not before_timestamp and tool_context is not None:
+            before_timestamp = tool_context.state.get("pre_fix_timestamps", {}).get(table_name, "")
+        if not before_timestamp:
+            return shape_response({
+                "error": "No pre-fix timestamp - pass before_timestamp or run execute_fix first",
+                "status": "error"
+            }, "get_before_after_comparison")
+        
+        before_ts = datetime.fromisoformat(before_timestamp)
+        if before_ts.tzinfo is None:
+            before_ts = before_ts.replace(tzinfo=timezone.utc)
+        
+        table_ref = f"{project_id}.{dataset_id}.{table_name}"
+        key_column = get_policy_id_column()
+        client = bigquery.Client(project=project_id)
+        
+        schema_columns = [field.name for field in client.get_table(table_ref).schema]
+        if key_column not in schema_columns:
+            return shape_response({
+                "error": f"Key column {key_column} not found in {table_name}",
+                "status": "error"
+            }, "get_before_after_comparison")
+        
+        columns = [c for c in (columns_to_compare or schema_columns) if c in schema_columns and c != key_column]
+        page = max(1, int(page))
+        page_size = max(1, min(int(page_size), 500))
+        
+        query_parameters = [
+            bigquery.ScalarQueryParameter("before_ts", "TIMESTAMP", before_ts),
+            bigquery.ScalarQueryParameter("page_size", "INT64", page_size),
+            bigquery.ScalarQueryParameter("offset", "INT64", (page - 1) * page_size)
+        ]
+        if row_identifiers:
+            query_parameters.append(bigquery.ArrayQueryParameter(
+                "row_ids", get_column_param_type(key_column), [str(r) for r in row_identifiers]
+            ))
+        
+        job_config = bigquery.QueryJobConfig(query_parameters=query_parameters)
+        duplicates = next(iter(run_query(
+            client, _duplicate_keys_sql(table_ref, key_column, bool(row_identifiers)),
+            job_config, tool_context=tool_context
+        ).result()))
+        
+        if duplicates.before_duplicates or duplicates.after_duplicates:
+            return shape_response({
+                "status": "aggregate",
+                "table": table_ref,
+                "key_column": key_column,
+                "before_timestamp": before_ts.isoformat(),
+                "reason": (
+                    f"{key_column} is not a unique, non-NULL key, so rows cannot be paired; "
+                    "set POLICY_ID_COLUMN to a unique key for a row-level diff"
+                ),
+                "duplicate_keys": {
+                    "before": duplicates.before_duplicates,
+                    "after": duplicates.after_duplicates
+                },
+                "columns_compared": len(columns),
+                **_aggregate_comparison(
+                    client, table_ref, key_column, columns, bool(row_identifiers), job_config, tool_context
+                )
+            }, "get_before_after_comparison")
+        
+        sql = _before_after_sql(table_ref, key_column, columns, bool(row_identifiers))
+        query_job = run_query(client, sql, job_config, tool_context=tool_context)
+        rows = list(query_job.result())
+        
+        total_changed = rows[0].total_changed_rows if rows else 0
         
         comparison = {
-            "table": f"{project_id}.{dataset_id}.{table_name}",
-            "rows_compared": len(row_identifiers),
-            "columns": columns_to_compare,
+            "table": table_ref,
+            "key_column": key_column,
+            "before_timestamp": before_ts.isoformat(),
+            "columns_compared": len(columns),
+            "total_changed_rows": total_changed,
+            "page": page,
+            "page_size": page_size,
+            "has_more": page * page_size < total_changed,
             "changes": [
                 {
-                    "row_id": row_id,
-                    "before": {"column": "old_value"},
-                    "after": {"column": "new_value"}
+                    "row_id": row.row_key,
+                    "change_type": row.change_type,
+                    "before": {c["column_name"]: json.loads(c["before"]) for c in row.changes},
+                    "after": {c["column_name"]: json.loads(c["after"]) for c in row.changes}
                 }
-                for row_id in row_identifiers[:5]
+                for row in rows
             ],
-            "note": "Before/after comparison requires table snapshots in production"
+            "bytes_processed": query_job.total_bytes_processed
         }
         
-        return json.dumps(comparison)
+        return shape_response(comparison, "get_before_after_comparison")
         
     except Exception as e:
-        return json.dumps({
+        return shape_response({
             "error": str(e),
             "status": "error"
-        })
+        }, "get_before_after_comparison")
@@ -0,0 +1,246 @@
+"""Client-side cache of query result samples.
+
+The same rule SQL is read several times per session (identifier,
+treatment, affected-row samples, validation, UI reruns). Results are
+cached under a key made of:
+
+- the normalised SQL (sqlglot round trip, so formatting and keyword case
+  do not matter) and its query parameters
+- the ``modified`` time of every table the query references (from the
+  cost gate's dry run), so any write to a source table is a cache miss
+- today's date for queries using CURRENT_DATE()
+
+Queries using other non-deterministic functions (CURRENT_TIMESTAMP,
+RAND, ...) or referencing no tables are never cached.
+
+Each entry holds the total row count, the first rows of the result (at
+least CACHED_SAMPLE_ROWS), the job's cost and its job ID (for streaming
+the full result later). Entries live in two tiers, both bounded by size:
+an in-process LRU (``RESULT_CACHE_MEMORY_MB``) and Arrow IPC files in
+``dq_result_cache/`` (``RESULT_CACHE_DISK_MB``), evicted least recently
+used first.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+import pyarrow as pa
+import sqlglot
+from google.cloud import bigquery
+
+from dq_agents.cost_gate import ByteBudget, estimate_query, job_cost, run_query
+from dq_agents.query_results import fetch_arrow, to_records
+from environment.config_utils import (
+    get_result_cache_dir,
+    get_result_cache_disk_bytes,
+    get_result_cache_memory_bytes
+)
+
+# Rows kept per entry, so callers asking for smaller samples share one entry
+CACHED_SAMPLE_ROWS = 100
+
+# The job's anonymous result table (used to stream all rows) expires after 24h
+MAX_AGE_SECONDS = 12 * 3600
+
+# CURRENT_TIMESTAMP, CURRENT_DATETIME and CURRENT_TIME may be written without parentheses
+_NON_DETERMINISTIC = re.compile(
+    r"\b(?:(?:CURRENT_TIMESTAMP|CURRENT_DATETIME|CURRENT_TIME)\b|(?:NOW|RAND|GENERATE_UUID|SESSION_USER)\s*\()",
+    re.IGNORECASE
+)
+_CURRENT_DATE = re.compile(r"\bCURRENT_DATE\b", re.IGNORECASE)
+
+_memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_memory_bytes = 0
+_memory_lock = threading.Lock()
+_disk_lock = threading.Lock()
+
+
+def normalise_sql(sql: str) -> str:
+    """Canonical form of a query (falls back to collapsing whitespace)."""
+    try:
+        return sqlglot.transpile(sql.strip().rstrip(";"), read="bigquery", write="bigquery")[0]
+    except sqlglot.errors.ParseError:
+        return " ".join(sql.split())
+
+
+def cache_key(
+    client: bigquery.Client,
+    sql: str,
+    job_config: Optional[bigquery.QueryJobConfig] = None
+) -> Optional[str]:
+    """
+    Build the cache key of a query, or None if its result must not be cached.
+
+    Looks up the referenced tables with a (cached) dry run and their
+    modification times from table metadata; neither runs a query job.
+    """
+    if _NON_DETERMINISTIC.search(sql):
+        return None
+
+    tables = estimate_query(client, sql, job_config)["referenced_tables"]
+    if not tables:
+        return None
+
+    snapshots = []
+    for table_ref in sorted(tables):
+        modified = client.get_table(table_ref).modified
+        if modified is None:
+            return None
+        snapshots.append(f"{table_ref}@{modified.isoformat()}")
+
+    parameters = job_config.query_parameters if job_config is not None else []
+    parts = [
+        normalise_sql(sql),
+        repr(sorted(repr(p.to_api_repr()) for p in parameters)),
+        *snapshots
+    ]
+    if _CURRENT_DATE.search(sql):
+        parts.append(datetime.now(timezone.utc).date().isoformat())
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def _disk_path(key: str) -> str:
+    return os.path.join(get_result_cache_dir(), f"{key}.arrow")
+
+
+def _entry_size(entry: Dict[str, Any]) -> int:
+    return entry["rows"].nbytes + 1024
+
+
+def _remember(key: str, entry: Dict[str, Any]) -> None:
+    """Put an entry in the memory tier, evicting least recently used entries."""
+    global _memory_bytes
+    limit = get_result_cache_memory_bytes()
+    size = _entry_size(entry)
+    if size > limit:
+        return
+    with _memory_lock:
+        if key in _memory:
+            _memory_bytes -= _entry_size(_memory.pop(key))
+        _memory[key] = entry
+        _memory_bytes += size
+        while _memory_bytes > limit:
+            _, evicted = _memory.popitem(last=False)
+            _memory_bytes -= _entry_size(evicted)
+
+
+def _write_disk(key: str, entry: Dict[str, Any]) -> None:
+    """Store an entry as an Arrow IPC file, then trim the directory to its byte bound."""
+    metadata = {k: v for k, v in entry.items() if k != "rows"}
+    table = entry["rows"].replace_schema_metadata({"dq_result_cache": json.dumps(metadata, default=str)})
+    path = _disk_path(key)
+
+    with _disk_lock:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp_path, path)
+
+        files = [f for f in os.scandir(os.path.dirname(path)) if f.name.endswith(".arrow")]
+        total = sum(f.stat().st_size for f in files)
+        limit = get_result_cache_disk_bytes()
+        for f in sorted(files, key=lambda f: f.stat().st_mtime):
+            if total <= limit:
+                break
+            total -= f.stat().st_size
+            os.remove(f.path)
+
+
+def _read_disk(key: str) -> Optional[Dict[str, Any]]:
+    path = _disk_path(key)
+    with _disk_lock:
+        if not os.path.exists(path):
+            return None
+        with pa.memory_map(path, "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+        os.utime(path)  # Mark as recently used for eviction
+    metadata = json.loads(table.schema.metadata[b"dq_result_cache"])
+    return {**metadata, "rows": table.replace_schema_metadata(None)}
+
+
+def _lookup(key: str) -> Optional[Dict[str, Any]]:
+    with _memory_lock:
+        entry = _memory.get(key)
+        if entry is not None:
+            _memory.move_to_end(key)
+    if entry is None:
+        entry = _read_disk(key)
+        if entry is not None:
+            _remember(key, entry)
+    if entry is not None and time.time() - entry["created_at"] > MAX_AGE_SECONDS:
+        return None
+    return entry
+
+
+def cached_sample(
+    client: bigquery.Client,
+    sql: str,
+    limit: int,
+    job_config: Optional[bigquery.QueryJobConfig] = None,
+    budget: Optional[ByteBudget] = None,
+    tool_context=None,
+    timeout: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Get the total row count and first ``limit`` rows of a query, from the cache if possible.
+
+    On a miss the query runs through the cost gate (run_query) and its sample
+    is cached. Cache hits run no job and are not charged to the byte budget.
+
+    Returns:
+        dict: total_rows, rows (as dicts), job_id/job_location of the job that
+        produced the result, its cost and whether it came from the cache
+    """
+    key = cache_key(client, sql, job_config)
+    if key is not None:
+        entry = _lookup(key)
+        if entry is not None and (entry["rows"].num_rows >= limit or entry["total_rows"] <= entry["rows"].num_rows):
+            return {
+                **{k: v for k, v in entry.items() if k not in ("rows", "created_at")},
+                "rows": to_records(entry["rows"], limit=limit),
+                "cached": True
+            }
+
+    query_job = run_query(client, sql, job_config, budget=budget, tool_context=tool_context)
+    results = query_job.result(timeout=timeout)
+    rows = fetch_arrow(results, max_rows=max(limit, CACHED_SAMPLE_ROWS))
+    entry = {
+        "total_rows": results.total_rows or 0,
+        "rows": rows,
+        "job_id": query_job.job_id,
+        "job_location": query_job.location,
+        "cost": job_cost(query_job),
+        "created_at": time.time()
+    }
+
+    if key is not None:
+        _remember(key, entry)
+        _write_disk(key, entry)
+
+    return {
+        **{k: v for k, v in entry.items() if k not in ("rows", "created_at")},
+        "rows": to_records(rows, limit=limit),
+        "cached": False
+    }
+
+
+def clear_result_cache() -> None:
+    """Drop every cached result from both tiers."""
+    global _memory_bytes
+    with _memory_lock:
+        _memory.clear()
+        _memory_bytes = 0
+    with _disk_lock:
+        cache_dir = get_result_cache_dir()
+        if os.path.isdir(cache_dir):
+            for f in os.scandir(cache_dir):
+                if f.name.endswith(".arrow"):
+                    os.remove(f.path)
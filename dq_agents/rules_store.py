@@ -0,0 +1,143 @@
+"""Keyed store of generated DQ rules, one record per table.
+
+Replaces ``dq_rules_cache.json``, which was read in full on every lookup
+and rewritten in full on every change (concurrent Streamlit sessions
+overwrote each other's writes). Records live in a SQLite file:
+
+- lookups and writes touch a single row; a write is one upsert
+  statement, so concurrent writers cannot lose each other's tables
+- WAL journaling lets readers proceed while another process writes
+- each record carries the hash of the table schema it was generated
+  for; a lookup with the current schema hash misses when the schema has
+  changed, so rules for dropped or retyped columns are never reused
+
+The legacy JSON cache is imported once, when the store file is created.
+Imported records have no schema hash and are accepted until rewritten.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from environment.config_utils import get_rules_store_path
+
+# JSON cache written by earlier versions of the Streamlit app
+LEGACY_RULES_CACHE_FILE = "dq_rules_cache.json"
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cached_rules (
+    table_name TEXT PRIMARY KEY,
+    schema_hash TEXT,
+    rules TEXT NOT NULL,
+    rule_count INTEGER NOT NULL,
+    generated_at TEXT NOT NULL
+);
+"""
+
+
+def schema_hash(columns: Iterable[Tuple[str, str]]) -> str:
+    """Hash a table schema given as (column_name, data_type) pairs (order-insensitive)."""
+    normalised = sorted(f"{name.lower()}:{str(data_type).upper()}" for name, data_type in columns)
+    return hashlib.sha256("\n".join(normalised).encode("utf-8")).hexdigest()[:16]
+
+
+class RulesStore:
+    """Generated rules per table in a local SQLite file."""
+
+    def __init__(self, path: str, legacy_path: Optional[str] = LEGACY_RULES_CACHE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            is_new = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'cached_rules'"
+            ).fetchone() is None
+            self._conn.executescript(_SQLITE_SCHEMA)
+        if is_new and legacy_path and os.path.exists(legacy_path):
+            self.import_json(legacy_path)
+
+    def import_json(self, path: str) -> int:
+        """Import the tables of a legacy JSON rules cache; returns how many were imported."""
+        with open(path, 'r') as f:
+            tables = json.load(f).get("tables", {})
+        for table_name, entry in tables.items():
+            self.put(table_name, entry.get("rules", []), generated_at=entry.get("generated_at"))
+        return len(tables)
+
+    def get(self, table_name: str, schema_hash: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Get the cached rules of a table.
+
+        Args:
+            table_name: Table the rules were generated for
+            schema_hash: Current schema hash of the table; when given, a record
+                generated for a different schema is treated as missing
+
+        Returns:
+            dict with rules, rule_count, generated_at and schema_hash, or None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM cached_rules WHERE table_name = ?", (table_name,)
+            ).fetchone()
+        if row is None:
+            return None
+        if schema_hash and row["schema_hash"] and row["schema_hash"] != schema_hash:
+            return None
+        entry = dict(row)
+        entry["rules"] = json.loads(entry["rules"])
+        return entry
+
+    def put(self, table_name: str, rules: List[Dict[str, Any]], schema_hash: Optional[str] = None,
+            generated_at: Optional[str] = None) -> None:
+        """Store (or replace) the rules of a table."""
+        values = (
+            table_name, schema_hash, json.dumps(rules, default=str), len(rules),
+            generated_at or datetime.now().isoformat()
+        )
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO cached_rules (table_name, schema_hash, rules, rule_count, generated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (table_name) DO UPDATE SET
+                    schema_hash = excluded.schema_hash,
+                    rules = excluded.rules,
+                    rule_count = excluded.rule_count,
+                    generated_at = excluded.generated_at
+                """,
+                values
+            )
+
+    def delete(self, table_name: str) -> bool:
+        """Drop the cached rules of a table; returns whether there were any."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM cached_rules WHERE table_name = ?", (table_name,))
+        return cursor.rowcount > 0
+
+    def entries(self) -> Dict[str, Dict[str, Any]]:
+        """Get rule_count, generated_at and schema_hash of every cached table (without the rules)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT table_name, schema_hash, rule_count, generated_at FROM cached_rules ORDER BY table_name"
+            ).fetchall()
+        return {row["table_name"]: dict(row) for row in rows}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_rules_store() -> RulesStore:
+    """Get the configured rules store (created once per process)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = RulesStore(get_rules_store_path())
+        return _store
@@ -0,0 +1,300 @@
+"""Response shaping for DQ agent tools.
+
+Tool responses go straight back into the LLM context, so every tool in
+``dq_agents/*/tools.py`` returns through ``shape_response``. It:
+
+1. Encodes lists of row dicts as a compact table (``columns`` + ``rows``)
+   so repeated keys are sent once instead of once per row.
+2. Serialises without pretty-printing whitespace.
+3. Enforces a per-tool token budget, truncating the largest lists (and
+   long strings other than SQL) and summarising what was dropped. Schema
+   column lists are never shortened, and approval requests are exempt.
+4. Logs and records the token count of every response.
+"""
+
+import copy
+import json
+import logging
+import math
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Rough chars-per-token ratio for Gemini-style tokenisers on JSON text
+CHARS_PER_TOKEN = 4
+
+# Default budget for tools without an explicit entry below
+DEFAULT_TOKEN_BUDGET = 2000
+
+# Per-tool budgets (tokens). None disables truncation for that tool.
+TOOL_TOKEN_BUDGETS: Dict[str, Optional[int]] = {
+    "get_table_schema_with_samples": 4000,
+    "load_preexisting_rules": 4000,
+    "trigger_dataplex_scan": 3000,
+    "execute_dq_rule": 2500,
+    "query_related_data": 2500,
+    "query_related_data_batch": 6000,
+    "get_affected_row_sample": 2500,
+    "get_before_after_comparison": 4000,
+    "get_violation_trends": 4000,
+    "generate_metrics_narrative": None,
+    "call_identifier_agent": None,
+    "call_treatment_agent": None,
+    "call_remediator_agent": None,
+    "call_metrics_agent": None,
+    "run_dq_workflow": None,
+    "request_human_approval": None,
+    "approve_checkpoints": None,
+    "run_fast_path": 6000,
+}
+
+# Lists of dicts shorter than this stay as records (a table header would not pay off)
+MIN_TABULAR_ROWS = 2
+
+# Strings longer than this are cut when a response is over budget
+MAX_STRING_CHARS = 500
+
+# Keys holding SQL, never cut (a truncated statement cannot be run or reviewed)
+SQL_KEYS = frozenset({"rule_sql", "sql", "sql_executed", "dry_run_sql"})
+
+# Keys holding schema column lists, never shortened (a rule written against a
+# partial schema misses columns); lists inside each column entry still are
+WHOLE_LIST_KEYS = frozenset({"columns"})
+
+_metrics_lock = threading.Lock()
+_token_metrics: Dict[str, Dict[str, int]] = {}
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of LLM tokens in a serialised response."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def get_token_budget(tool_name: str) -> Optional[int]:
+    """Get the token budget for a tool.
+
+    ``TOOL_TOKEN_BUDGET_<TOOL_NAME>`` overrides a single tool (0 disables the
+    budget); ``TOOL_RESPONSE_TOKEN_BUDGET`` overrides the default.
+    """
+    override = os.getenv(f"TOOL_TOKEN_BUDGET_{tool_name.upper()}")
+    if override is not None:
+        return int(override) or None
+    if tool_name in TOOL_TOKEN_BUDGETS:
+        return TOOL_TOKEN_BUDGETS[tool_name]
+    return int(os.getenv("TOOL_RESPONSE_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET)) or None
+
+
+def _is_record_list(value: Any) -> bool:
+    return (
+        isinstance(value, list)
+        and len(value) >= MIN_TABULAR_ROWS
+        and all(isinstance(item, dict) for item in value)
+    )
+
+
+def encode_table(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Encode a list of row dicts as ``{"columns": [...], "rows": [[...], ...]}``."""
+    columns: List[str] = []
+    seen = set()
+    for record in records:
+        for key in record:
+            if key not in seen:
+                seen.add(key)
+                columns.append(key)
+    return {
+        "columns": columns,
+        "rows": [[encode_value(record.get(col)) for col in columns] for record in records],
+    }
+
+
+def decode_table(value: Any) -> Any:
+    """Turn an encoded table back into a list of row dicts (other values pass through)."""
+    if isinstance(value, dict) and isinstance(value.get("columns"), list) and isinstance(value.get("rows"), list):
+        return [dict(zip(value["columns"], row)) for row in value["rows"]]
+    return value
+
+
+def encode_value(value: Any) -> Any:
+    """Recursively apply the compact encoding to a payload."""
+    if _is_record_list(value) and os.getenv("TOOL_RESPONSE_ENCODING", "tabular") == "tabular":
+        return encode_table(value)
+    if isinstance(value, dict):
+        return {key: encode_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encode_value(item) for item in value]
+    return value
+
+
+def _dumps(payload: Any) -> str:
+    return json.dumps(payload, separators=(",", ":"), default=str)
+
+
+def response_tokens(payload: Any) -> int:
+    """Estimate the tokens of a payload once encoded and serialised by shape_response."""
+    return estimate_tokens(_dumps(encode_value(payload)))
+
+
+def _find_lists(value: Any, path: Tuple = ()) -> List[Tuple[Tuple, list]]:
+    """Find every list in a payload (the rows of an encoded table count as a list)."""
+    found = []
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key == "columns" and "rows" in value:
+                continue
+            if key == "rows" and "columns" in value and isinstance(item, list):
+                # A row is kept whole so its cells stay aligned with the columns
+                if not (path and path[-1] in WHOLE_LIST_KEYS):
+                    found.append((path + (key,), item))
+                for index, row in enumerate(item):
+                    for cell_index, cell in enumerate(row if isinstance(row, list) else []):
+                        found.extend(_find_lists(cell, path + (key, index, cell_index)))
+                continue
+            found.extend(_find_lists(item, path + (key,)))
+    elif isinstance(value, list):
+        if not (path and path[-1] in WHOLE_LIST_KEYS):
+            found.append((path, value))
+        for index, item in enumerate(value):
+            found.extend(_find_lists(item, path + (index,)))
+    return found
+
+
+def _truncate_strings(value: Any) -> Any:
+    if isinstance(value, str) and len(value) > MAX_STRING_CHARS:
+        return value[:MAX_STRING_CHARS] + f"... [{len(value) - MAX_STRING_CHARS} chars truncated]"
+    if isinstance(value, dict):
+        if isinstance(value.get("columns"), list) and isinstance(value.get("rows"), list):
+            # Encoded table: keep the cells of SQL columns
+            sql_columns = {index for index, column in enumerate(value["columns"]) if column in SQL_KEYS}
+            return {
+                **value,
+                "rows": [
+                    [cell if index in sql_columns else _truncate_strings(cell) for index, cell in enumerate(row)]
+                    if isinstance(row, list) else _truncate_strings(row)
+                    for row in value["rows"]
+                ],
+            }
+        return {key: item if key in SQL_KEYS else _truncate_strings(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_truncate_strings(item) for item in value]
+    return value
+
+
+def summarise_table(columns: List[str], rows: List[list]) -> Dict[str, Dict[str, Any]]:
+    """Summarise each column of an encoded table (nulls, distinct values, numeric range)."""
+    summary = {}
+    for index, column in enumerate(columns):
+        values = [row[index] for row in rows if index < len(row)]
+        present = [value for value in values if value is not None]
+        stats: Dict[str, Any] = {"nulls": len(values) - len(present)}
+        try:
+            stats["distinct"] = len(set(present))
+        except TypeError:
+            pass
+        numbers = [value for value in present if isinstance(value, (int, float)) and not isinstance(value, bool)]
+        if numbers and len(numbers) == len(present):
+            stats["min"] = min(numbers)
+            stats["max"] = max(numbers)
+        summary[column] = stats
+    return summary
+
+
+def _parent(payload: Any, path: Tuple) -> Any:
+    for part in path[:-1]:
+        payload = payload[part]
+    return payload
+
+
+def _fit_to_budget(payload: Any, budget: int) -> Tuple[Any, Dict[str, Dict[str, Any]]]:
+    """Halve the largest lists in a payload until it fits the token budget.
+
+    Returns the truncated payload and, per truncated list, how many items
+    were kept out of the original total. Truncated tables also get a
+    per-column summary computed over all of their original rows.
+    """
+    payload = copy.deepcopy(payload)
+    truncated: Dict[str, Dict[str, Any]] = {}
+
+    while estimate_tokens(_dumps(payload)) > budget:
+        lists = [(path, items) for path, items in _find_lists(payload) if len(items) > 1]
+        if not lists:
+            break
+        path, items = max(lists, key=lambda entry: len(_dumps(entry[1])))
+        key = ".".join(str(part) for part in path) or "$"
+
+        if key not in truncated:
+            truncated[key] = {"total": len(items)}
+            parent = _parent(payload, path) if path else None
+            if path and path[-1] == "rows" and isinstance(parent, dict) and "columns" in parent:
+                parent["summary"] = summarise_table(parent["columns"], items)
+
+        del items[max(1, len(items) // 2):]
+        truncated[key]["kept"] = len(items)
+
+    return payload, truncated
+
+
+def _record_tokens(tool_name: str, tokens: int, truncated: bool) -> None:
+    with _metrics_lock:
+        stats = _token_metrics.setdefault(
+            tool_name, {"calls": 0, "tokens": 0, "max_tokens": 0, "truncated": 0}
+        )
+        stats["calls"] += 1
+        stats["tokens"] += tokens
+        stats["max_tokens"] = max(stats["max_tokens"], tokens)
+        stats["truncated"] += int(truncated)
+
+
+def get_token_metrics() -> Dict[str, Dict[str, int]]:
+    """Get per-tool response token counts recorded in this process."""
+    with _metrics_lock:
+        return copy.deepcopy(_token_metrics)
+
+
+def reset_token_metrics() -> None:
+    """Clear the recorded per-tool token counts."""
+    with _metrics_lock:
+        _token_metrics.clear()
+
+
+def shape_response(payload: Any, tool_name: str) -> str:
+    """Encode, budget and serialise a tool response for the LLM.
+
+    Args:
+        payload: Tool result (dict/list payload, or an already formatted string)
+        tool_name: Name of the tool producing the response
+
+    Returns:
+        Compact JSON string (or the text itself for string payloads)
+    """
+    budget = get_token_budget(tool_name)
+
+    if isinstance(payload, str):
+        text = payload
+        truncated = bool(budget) and estimate_tokens(text) > budget
+        if truncated:
+            keep = budget * CHARS_PER_TOKEN
+            text = text[:keep] + f"\n... [truncated {len(payload) - keep} chars to fit {budget}-token budget]"
+    else:
+        encoded = encode_value(payload)
+        text = _dumps(encoded)
+        truncated = bool(budget) and estimate_tokens(text) > budget
+
+        if truncated:
+            encoded, dropped = _fit_to_budget(encoded, budget)
+            if estimate_tokens(_dumps(encoded)) > budget:
+                encoded = _truncate_strings(encoded)
+            if isinstance(encoded, dict):
+                encoded["_truncated"] = {
+                    "token_budget": budget,
+                    "lists": dropped,
+                    "note": "Lists were shortened to fit the response budget; counts above reflect the full result",
+                }
+            text = _dumps(encoded)
+
+    tokens = estimate_tokens(text)
+    _record_tokens(tool_name, tokens, truncated)
+    logger.info("tool_response_tokens tool=%s tokens=%d truncated=%s", tool_name, tokens, truncated)
+
+    return text
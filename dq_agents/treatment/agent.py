@@ -11,6 +11,7 @@ from .prompts import return_instructions_treatment
 from .tools import (
     execute_dq_rule,
     query_related_data,
+    query_related_data_batch,
     search_knowledge_bank,
     save_to_knowledge_bank,
     calculate_fix_impact,
@@ -18,20 +19,31 @@ from .tools import (
     get_affected_row_sample
 )
 
-treatment_agent = LlmAgent(
-    model=os.getenv("ROOT_AGENT_MODEL", "gemini-2.0-flash"),
-    name="treatment_agent",
-    instruction=return_instructions_treatment(),
-    tools=[
-        execute_dq_rule,
-        query_related_data,
-        search_knowledge_bank,
-        save_to_knowledge_bank,
-        calculate_fix_impact,
-        get_column_statistics,
-        get_affected_row_sample
-    ],
-    generate_content_config=types.GenerateContentConfig(
-        temperature=0.2  # Slightly higher than identifier for creative fix suggestions
+def get_treatment_agent():
+    """Create and return a new Treatment Agent instance."""
+    return LlmAgent(
+        model=os.getenv("ROOT_AGENT_MODEL", "gemini-2.0-flash"),
+        name="treatment_agent",
+        instruction=return_instructions_treatment(),
+        tools=[
+            execute_dq_rule,
+            query_related_data,
+            query_related_data_batch,
+            search_knowledge_bank,
+            save_to_knowledge_bank,
+            calculate_fix_impact,
+            get_column_statistics,
+            get_affected_row_sample
+        ],
+        generate_content_config=types.GenerateContentConfig(
+            temperature=0.2  # Slightly higher than identifier for creative fix suggestions
+        )
     )
-)
+
+
+def __getattr__(name):
+    # `treatment_agent` is the shared instance from the agent registry, built on first access
+    if name == "treatment_agent":
+        from dq_agents.agent_registry import get_agent
+        return get_agent("treatment")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
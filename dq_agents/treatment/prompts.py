@@ -23,6 +23,7 @@ Your responsibilities:
 Available tools:
 - execute_dq_rule: Run a DQ rule SQL to identify specific violations
 - query_related_data: Query other data sources to find correct values (e.g., cross-week data, related tables)
+- query_related_data_batch: Same as query_related_data for a LIST of customer IDs in one query (ALWAYS use this when investigating more than one violating row)
 - search_knowledge_bank: Find similar historical issues and their resolution strategies
 - save_to_knowledge_bank: Save a new fix pattern for future reference
 - calculate_fix_impact: Estimate how many rows will be affected by a proposed fix
@@ -5,14 +5,29 @@ Tools for analyzing DQ issues and suggesting remediation strategies.
 """
 
 import os
-import json
-from typing import Dict, List, Any
+import re
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple
 from google.cloud import bigquery
 from google.adk.tools import ToolContext
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 from knowledge_bank.kb_manager import get_kb_manager
-from environment.config_utils import get_project_id, get_dataset_id, get_tables, get_customer_id_column
+from dq_agents.cost_gate import estimate_query, run_query
+from dq_agents.query_results import fetch_arrow, to_records
+from dq_agents.result_cache import cached_sample
+from dq_agents.remediator.sql_rewriter import build_count_sql, fill_placeholders, is_dml
+from dq_agents.tool_responses import shape_response
+from environment.storage_layout import is_partitioned_table_current
+from environment.config_utils import (
+    get_project_id,
+    get_dataset_id,
+    get_tables,
+    get_customer_id_column,
+    get_partitioned_layout,
+    get_customer_id_param_type,
+    get_customer_history_cache_size
+)
 
 
 def execute_dq_rule(
@@ -41,27 +56,159 @@ def execute_dq_rule(
     client = bigquery.Client(project=project_id)
     
     try:
-        results = client.query(sql).result()
+        # Only the first rows are downloaded; the count comes from the job
+        # (or from the result cache when the rule already ran on unchanged tables)
+        sample = cached_sample(client, sql, limit=10, tool_context=tool_context)
         
-        issues = []
-        for row in results:
-            issues.append(dict(row))
-            if len(issues) >= 100:  # Limit to first 100
-                break
-        
-        return json.dumps({
+        return shape_response({
             "status": "success",
-            "issue_count": len(issues),
-            "sample_issues": issues[:10],  # Show first 10
-            "note": f"Showing up to 10 sample violations out of {len(issues)} total"
-        }, indent=2)
+            "issue_count": sample["total_rows"],
+            "sample_issues": sample["rows"],  # Show first 10
+            "note": f"Showing up to 10 sample violations out of {sample['total_rows']} total"
+        }, "execute_dq_rule")
     
     except Exception as e:
-        return json.dumps({
+        return shape_response({
             "status": "error",
             "error": str(e),
             "sql": sql
-        }, indent=2)
+        }, "execute_dq_rule")
+
+
+# Recently fetched customer histories, keyed by (customer_id, all_weeks) and
+# tagged with the modified time of every table the lookup reads, so entries
+# go stale as soon as a fix or load writes one of them. Repeated lookups
+# within a session are served without a BigQuery job.
+_customer_history_cache: OrderedDict = OrderedDict()
+
+
+def _tables_version(client: bigquery.Client, sql: str) -> Optional[Tuple[str, ...]]:
+    """Get the modified time of every table a query reads (None if one cannot be read)."""
+    try:
+        return tuple(
+            f"{table_ref}@{client.get_table(table_ref).modified.isoformat()}"
+            for table_ref in sorted(set(re.findall(r"`([^`]+)`", sql)))
+        )
+    except Exception:
+        return None
+
+
+def _customer_history_sql(
+    client: bigquery.Client,
+    project_id: str,
+    dataset_id: str,
+    customer_id_col: str,
+    all_weeks: bool
+) -> str:
+    """Build the customer history query filtered on the @ids array parameter."""
+    all_tables = get_tables()
+    week_tables = [t for t in all_tables if 'week' in t.lower()]
+    id_filter = f"{customer_id_col} IN UNNEST(@ids)"
+    
+    # Prefer the week-partitioned layout: clustered on customer ID, so the
+    # lookup prunes to the matching blocks instead of scanning every week table.
+    # It is a snapshot, so it is skipped while missing or older than a week table.
+    layout = get_partitioned_layout()
+    
+    if (
+        layout
+        and layout.get('cluster_column') == customer_id_col
+        and is_partitioned_table_current(client, project_id, dataset_id, layout, week_tables)
+    ):
+        week_col = layout.get('week_column', 'week_num')
+        sql = f"""
+        SELECT CONCAT('week', CAST({week_col} AS STRING)) as week, * EXCEPT({week_col})
+        FROM `{project_id}.{dataset_id}.{layout['table']}`
+        WHERE {id_filter}
+        """
+        if not all_weeks and layout.get('weeks'):
+            sql += f"AND {week_col} = {min(layout['weeks'])}\n"
+        return sql + "ORDER BY week"
+    
+    if all_weeks and week_tables:
+        # Build UNION ALL query dynamically for all week tables
+        union_queries = []
+        for table in week_tables:
+            # Extract week identifier from table name
+            week_id = table.replace('policies_', '').replace('_', '')
+            union_queries.append(
+                f"SELECT '{week_id}' as week, * FROM `{project_id}.{dataset_id}.{table}` WHERE {id_filter}"
+            )
+        
+        return "\nUNION ALL\n".join(union_queries) + "\nORDER BY week"
+    
+    # Use first available table
+    first_table = week_tables[0] if week_tables else all_tables[0] if all_tables else 'policies_week1'
+    return f"""
+    SELECT * FROM `{project_id}.{dataset_id}.{first_table}` 
+    WHERE {id_filter}
+    """
+
+
+def _fetch_customer_histories(
+    customer_ids: List[Any],
+    all_weeks: bool
+) -> Tuple[Dict[str, List[Dict]], int]:
+    """
+    Fetch history rows for several customers with one parameterised query.
+    
+    Cached histories are reused only while every table they were read from
+    still has the same modified time.
+    
+    Returns:
+        Tuple of (rows grouped by customer ID, number of IDs served from cache)
+    """
+    project_id = os.getenv("BQ_DATA_PROJECT_ID")
+    dataset_id = os.getenv("BQ_DATASET_ID")
+    
+    # Get customer ID column name dynamically
+    customer_id_col = get_customer_id_column() or 'CUS_ID'  # Fallback to CUS_ID
+    param_type = get_customer_id_param_type()
+    
+    client = bigquery.Client(project=project_id)
+    sql = _customer_history_sql(client, project_id, dataset_id, customer_id_col, all_weeks)
+    version = _tables_version(client, sql)
+    
+    histories = {}
+    missing = []
+    
+    for customer_id in dict.fromkeys(str(c) for c in customer_ids):
+        key = (customer_id, all_weeks)
+        cached = _customer_history_cache.get(key)
+        if version is not None and cached is not None and cached[0] == version:
+            _customer_history_cache.move_to_end(key)
+            histories[customer_id] = cached[1]
+        else:
+            missing.append(customer_id)
+    
+    cache_hits = len(histories)
+    
+    if missing:
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ArrayQueryParameter(
+                    "ids", param_type, missing
+                )
+            ]
+        )
+        
+        results = run_query(client, sql, job_config=job_config).result()
+        
+        fetched = {customer_id: [] for customer_id in missing}
+        for record in to_records(fetch_arrow(results)):
+            fetched.setdefault(str(record.get(customer_id_col)), []).append(record)
+        
+        if version is not None:
+            cache_size = get_customer_history_cache_size()
+            for customer_id, rows in fetched.items():
+                _customer_history_cache[(customer_id, all_weeks)] = (version, rows)
+                _customer_history_cache.move_to_end((customer_id, all_weeks))
+                while len(_customer_history_cache) > cache_size:
+                    _customer_history_cache.popitem(last=False)
+        
+        histories.update(fetched)
+    
+    return histories, cache_hits
 
 
 def query_related_data(
@@ -80,56 +227,65 @@ def query_related_data(
     Returns:
         JSON string with customer data across weeks
     """
-    project_id = os.getenv("BQ_DATA_PROJECT_ID")
-    dataset_id = os.getenv("BQ_DATASET_ID")
+    try:
+        histories, _ = _fetch_customer_histories([customer_id], all_weeks)
+        data = histories.get(str(customer_id), [])
+        
+        return shape_response({
+            "status": "success",
+            "customer_id": customer_id,
+            "records_found": len(data),
+            "data": data
+        }, "query_related_data")
     
-    client = bigquery.Client(project=project_id)
+    except Exception as e:
+        return shape_response({
+            "status": "error",
+            "error": str(e)
+        }, "query_related_data")
+
+
+def query_related_data_batch(
+    customer_ids: List[str],
+    all_weeks: bool = True,
+    tool_context: ToolContext = None
+) -> str:
+    """
+    Query data for several customers across all weeks in a single query.
     
-    # Get all available week tables dynamically
-    all_tables = get_tables()
-    week_tables = [t for t in all_tables if 'week' in t.lower()]
+    Use this instead of calling query_related_data once per violating row.
+    Recently queried customers are served from a session cache.
     
-    # Get customer ID column name dynamically
-    customer_id_col = get_customer_id_column() or 'CUS_ID'  # Fallback to CUS_ID
+    Args:
+        customer_ids: List of customer IDs to query
+        all_weeks: If True, query all week tables; if False, query only week1
+        tool_context: ADK tool context
     
-    if all_weeks and week_tables:
-        # Build UNION ALL query dynamically for all week tables
-        union_queries = []
-        for table in week_tables:
-            # Extract week identifier from table name
-            week_id = table.replace('policies_', '').replace('_', '')
-            union_queries.append(
-                f"SELECT '{week_id}' as week, * FROM `{project_id}.{dataset_id}.{table}` WHERE {customer_id_col} = '{customer_id}'"
-            )
-        
-        sql = "\nUNION ALL\n".join(union_queries) + "\nORDER BY week"
-    else:
-        # Use first available table
-        first_table = week_tables[0] if week_tables else all_tables[0] if all_tables else 'policies_week1'
-        sql = f"""
-        SELECT * FROM `{project_id}.{dataset_id}.{first_table}` 
-        WHERE {customer_id_col} = '{customer_id}'
-        """
+    Returns:
+        JSON string with customer data grouped by customer ID
+    """
+    if not customer_ids:
+        return shape_response({
+            "status": "error",
+            "error": "customer_ids must contain at least one customer ID"
+        }, "query_related_data_batch")
     
     try:
-        results = client.query(sql).result()
-        
-        data = []
-        for row in results:
-            data.append(dict(row))
+        histories, cache_hits = _fetch_customer_histories(customer_ids, all_weeks)
         
-        return json.dumps({
+        return shape_response({
             "status": "success",
-            "customer_id": customer_id,
-            "records_found": len(data),
-            "data": data
-        }, indent=2, default=str)  # default=str handles datetime serialization
+            "customers_requested": len(histories),
+            "cache_hits": cache_hits,
+            "records_found": sum(len(rows) for rows in histories.values()),
+            "customers": histories
+        }, "query_related_data_batch")
     
     except Exception as e:
-        return json.dumps({
+        return shape_response({
             "status": "error",
             "error": str(e)
-        }, indent=2)
+        }, "query_related_data_batch")
 
 
 def search_knowledge_bank(
@@ -153,20 +309,20 @@ def search_knowledge_bank(
     match = kb_manager.search_similar_issue(issue_pattern, issue_description)
     
     if match:
-        return json.dumps({
+        return shape_response({
             "status": "match_found",
             "similarity": match['similarity'],
             "pattern_id": match['pattern_id'],
             "pattern_description": match['description'],
             "historical_fixes": match['historical_fixes'],
             "recommendation": "Consider using one of the historical fixes with high success rate"
-        }, indent=2)
+        }, "search_knowledge_bank")
     else:
-        return json.dumps({
+        return shape_response({
             "status": "no_match",
             "message": "No similar historical issue found in Knowledge Bank",
             "recommendation": "Generate new fix suggestions based on data analysis"
-        }, indent=2)
+        }, "search_knowledge_bank")
 
 
 def save_to_knowledge_bank(
@@ -179,7 +335,8 @@ def save_to_knowledge_bank(
     
     Args:
         pattern_id: Unique identifier for the pattern (e.g., "DOB_FUTURE")
-        fix_data: Dictionary containing fix details (fix_id, fix_type, action, etc.)
+        fix_data: Dictionary containing fix details (fix_id, fix_type, action, etc.;
+            include the issue's "fingerprint" when known so the rule is matched directly next time)
         tool_context: ADK tool context
     
     Returns:
@@ -189,17 +346,17 @@ def save_to_knowledge_bank(
     
     try:
         kb_manager.add_new_fix(pattern_id, fix_data)
-        return json.dumps({
+        return shape_response({
             "status": "success",
             "message": f"Fix pattern '{pattern_id}' saved to Knowledge Bank",
             "fix_id": fix_data.get('fix_id')
-        }, indent=2)
+        }, "save_to_knowledge_bank")
     
     except Exception as e:
-        return json.dumps({
+        return shape_response({
             "status": "error",
             "error": str(e)
-        }, indent=2)
+        }, "save_to_knowledge_bank")
 
 
 def calculate_fix_impact(
@@ -209,7 +366,11 @@ def calculate_fix_impact(
     tool_context: ToolContext = None
 ) -> str:
     """
-    Estimate impact of a proposed fix by running it in dry-run mode.
+    Estimate impact of a proposed fix without running it.
+    
+    The fix itself is only dry-run (bytes it would process and its cost); the
+    affected rows come from one COUNT query and the table size from table
+    metadata.
     
     Args:
         fix_sql: SQL UPDATE/DELETE statement to analyze
@@ -225,53 +386,27 @@ def calculate_fix_impact(
     
     # Replace placeholder with actual table reference
     full_table = f"`{project_id}.{dataset_id}.{table_name}`"
-    sql = fix_sql.replace("{table}", full_table).replace("TABLE_NAME", full_table)
-    
-    # Convert UPDATE to SELECT to see what would be affected
-    if "UPDATE" in sql.upper():
-        # Extract WHERE clause
-        where_clause = ""
-        if "WHERE" in sql.upper():
-            where_idx = sql.upper().index("WHERE")
-            where_clause = sql[where_idx:]
-        
-        # Create SELECT query to count affected rows
-        count_sql = f"""
-        SELECT COUNT(*) as affected_rows
-        FROM {full_table}
-        {where_clause}
-        """
-    elif "DELETE" in sql.upper():
-        # Extract WHERE clause
-        where_clause = ""
-        if "WHERE" in sql.upper():
-            where_idx = sql.upper().index("WHERE")
-            where_clause = sql[where_idx:]
-        
-        count_sql = f"""
-        SELECT COUNT(*) as affected_rows
-        FROM {full_table}
-        {where_clause}
-        """
-    else:
-        return json.dumps({
+    sql = fill_placeholders(fix_sql, full_table)
+    
+    if not is_dml(sql):
+        return shape_response({
             "status": "error",
             "error": "Only UPDATE and DELETE statements supported for impact analysis"
-        }, indent=2)
+        }, "calculate_fix_impact")
+    
+    # Rows the UPDATE/DELETE would touch (the whole table without a WHERE clause)
+    count_sql = build_count_sql(sql) or f"SELECT COUNT(*) AS total FROM {full_table}"
     
     client = bigquery.Client(project=project_id)
     
     try:
-        results = client.query(count_sql).result()
+        fix_estimate = estimate_query(client, sql)
         
-        for row in results:
-            affected_rows = row['affected_rows']
+        results = run_query(client, count_sql, tool_context=tool_context).result()
+        affected_rows = next(iter(results)).total
         
-        # Get total rows in table
-        total_sql = f"SELECT COUNT(*) as total_rows FROM {full_table}"
-        total_results = client.query(total_sql).result()
-        for row in total_results:
-            total_rows = row['total_rows']
+        # Table size comes from metadata (no scan)
+        total_rows = client.get_table(f"{project_id}.{dataset_id}.{table_name}").num_rows or 0
         
         impact_percentage = (affected_rows / total_rows * 100) if total_rows > 0 else 0
         
@@ -285,20 +420,22 @@ def calculate_fix_impact(
         else:
             risk_level = "LOW - affects small subset"
         
-        return json.dumps({
+        return shape_response({
             "status": "success",
             "affected_rows": affected_rows,
             "total_rows": total_rows,
             "impact_percentage": round(impact_percentage, 2),
             "risk_level": risk_level,
-            "recommendation": "Review before execution" if impact_percentage > 20 else "Safe to proceed"
-        }, indent=2)
+            "recommendation": "Review before execution" if impact_percentage > 20 else "Safe to proceed",
+            "fix_bytes_processed": fix_estimate["bytes_processed"],
+            "fix_estimated_cost_usd": fix_estimate["estimated_cost_usd"]
+        }, "calculate_fix_impact")
     
     except Exception as e:
-        return json.dumps({
+        return shape_response({
             "status": "error",
             "error": str(e)
-        }, indent=2)
+        }, "calculate_fix_impact")
 
 
 def get_column_statistics(
@@ -333,10 +470,10 @@ def get_column_statistics(
             break
     
     if not column_type:
-        return json.dumps({
+        return shape_response({
             "status": "error",
             "error": f"Column '{column_name}' not found in table '{table_name}'"
-        }, indent=2)
+        }, "get_column_statistics")
     
     # Build appropriate statistics query based on type
     if column_type in ["INTEGER", "FLOAT", "NUMERIC", "BIGNUMERIC"]:
@@ -366,24 +503,24 @@ def get_column_statistics(
         """
     
     try:
-        results = client.query(sql).result()
+        results = run_query(client, sql, tool_context=tool_context).result()
         
         stats = {}
         for row in results:
             stats = dict(row)
         
-        return json.dumps({
+        return shape_response({
             "status": "success",
             "column_name": column_name,
             "column_type": column_type,
             "statistics": stats
-        }, indent=2, default=str)
+        }, "get_column_statistics")
     
     except Exception as e:
-        return json.dumps({
+        return shape_response({
             "status": "error",
             "error": str(e)
-        }, indent=2)
+        }, "get_column_statistics")
 
 
 def get_affected_row_sample(
@@ -422,26 +559,22 @@ def get_affected_row_sample(
     client = bigquery.Client(project=project_id)
     
     try:
-        results = client.query(sql).result()
-        
-        sample_rows = []
-        for row in results:
-            sample_rows.append(dict(row))
+        sample_rows = cached_sample(client, sql, limit=limit, tool_context=tool_context)["rows"]
         
         # Generate BigQuery console link
         bq_console_url = f"https://console.cloud.google.com/bigquery?project={compute_project}&ws=!1m5!1m4!4m3!1s{project_id}!2s{dataset_id}!3s{table_name}"
         
-        return json.dumps({
+        return shape_response({
             "status": "success",
             "sample_count": len(sample_rows),
             "sample_rows": sample_rows,
             "bigquery_console_url": bq_console_url,
             "note": "Click the URL to view full table in BigQuery console"
-        }, indent=2, default=str)
+        }, "get_affected_row_sample")
     
     except Exception as e:
-        return json.dumps({
+        return shape_response({
             "status": "error",
             "error": str(e)
-        }, indent=2)
+        }, "get_affected_row_sample")
 
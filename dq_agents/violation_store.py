@@ -0,0 +1,302 @@
+"""Persistent store of DQ rule results.
+
+Every rule run is appended to a history table (rule, table, violation
+count, a sample of violating keys, timestamp), so dashboards and the
+metrics agent can read trends, top rules and per-table summaries from the
+store instead of re-running rules against the source tables.
+
+Backends:
+
+- ``sqlite`` (default): local file, with indexes on (rule_id, run_at),
+  (table_name, run_at) and run_at.
+- ``bigquery``: a table in the DQ dataset, partitioned by day of run_at
+  and clustered by table_name, rule_id.
+
+Queries are written once with ``@name`` parameters and run on either backend.
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from environment.config_utils import (
+    get_dataset_id,
+    get_project_id,
+    get_violation_store_backend,
+    get_violation_store_path,
+    get_violation_store_table,
+)
+
+# Violating keys kept per run (enough to drill into, small enough to store every run)
+MAX_SAMPLE_KEYS = 50
+
+_COLUMNS = (
+    "run_id", "rule_id", "rule_name", "table_name", "dq_dimension", "severity",
+    "violation_count", "sample_keys", "job_id", "run_at",
+)
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rule_results (
+    run_id TEXT NOT NULL,
+    rule_id TEXT NOT NULL,
+    rule_name TEXT,
+    table_name TEXT NOT NULL,
+    dq_dimension TEXT,
+    severity TEXT,
+    violation_count INTEGER NOT NULL,
+    sample_keys TEXT,
+    job_id TEXT,
+    run_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_rule_results_rule ON rule_results (rule_id, run_at);
+CREATE INDEX IF NOT EXISTS idx_rule_results_table ON rule_results (table_name, run_at);
+CREATE INDEX IF NOT EXISTS idx_rule_results_run_at ON rule_results (run_at);
+"""
+
+# Latest result of each (rule, table) pair
+_LATEST_SQL = """
+SELECT rule_id, rule_name, table_name, dq_dimension, severity, violation_count, sample_keys, job_id, run_at
+FROM (
+    SELECT *, ROW_NUMBER() OVER (PARTITION BY rule_id, table_name ORDER BY run_at DESC) AS rn
+    FROM {table}
+    WHERE run_at >= @since
+) latest
+WHERE rn = 1
+ORDER BY violation_count DESC
+"""
+
+_TREND_SQL = """
+SELECT DATE(run_at) AS day, table_name,
+       SUM(violation_count) AS violations,
+       COUNT(DISTINCT rule_id) AS rules_run,
+       COUNT(DISTINCT run_id) AS runs
+FROM {table}
+WHERE run_at >= @since {table_filter}
+GROUP BY day, table_name
+ORDER BY day, table_name
+"""
+
+_TOP_RULES_SQL = """
+SELECT rule_id, MAX(rule_name) AS rule_name,
+       SUM(violation_count) AS total_violations,
+       MAX(violation_count) AS max_violations,
+       COUNT(*) AS runs,
+       MAX(run_at) AS last_run_at
+FROM {table}
+WHERE run_at >= @since
+GROUP BY rule_id
+ORDER BY total_violations DESC
+LIMIT @limit
+"""
+
+_TABLE_SUMMARY_SQL = """
+SELECT table_name,
+       COUNT(DISTINCT rule_id) AS rules,
+       SUM(violation_count) AS total_violations,
+       COUNT(DISTINCT run_id) AS runs,
+       MAX(run_at) AS last_run_at
+FROM {table}
+WHERE run_at >= @since
+GROUP BY table_name
+ORDER BY total_violations DESC
+"""
+
+
+def rule_id_for(rule: Dict[str, Any]) -> str:
+    """Get a stable ID for a rule (its own rule_id, else a hash of its SQL)."""
+    if rule.get("rule_id"):
+        return str(rule["rule_id"])
+    normalised = " ".join(str(rule.get("sql", "")).split())
+    return hashlib.sha256(normalised.encode("utf-8")).hexdigest()[:16]
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class SQLiteViolationStore:
+    """Violation history in a local SQLite file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.executescript(_SQLITE_SCHEMA)
+
+    @property
+    def table(self) -> str:
+        return "rule_results"
+
+    def insert(self, rows: List[Dict[str, Any]]) -> None:
+        values = [
+            tuple(row[col].isoformat() if col == "run_at" else row[col] for col in _COLUMNS)
+            for row in rows
+        ]
+        placeholders = ", ".join("?" for _ in _COLUMNS)
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT INTO rule_results ({', '.join(_COLUMNS)}) VALUES ({placeholders})", values
+            )
+
+    def query(self, sql: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        sql = re.sub(r"@(\w+)", r":\1", sql)
+        params = {k: v.isoformat() if isinstance(v, datetime) else v for k, v in params.items()}
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params).fetchall()]
+
+
+class BigQueryViolationStore:
+    """Violation history in a BigQuery table (created on first use)."""
+
+    def __init__(self, project_id: str, dataset_id: str, table_name: str):
+        from google.cloud import bigquery
+
+        self._bigquery = bigquery
+        self.client = bigquery.Client(project=project_id)
+        self.table_ref = f"{project_id}.{dataset_id}.{table_name}"
+        self._ensure_table()
+
+    @property
+    def table(self) -> str:
+        return f"`{self.table_ref}`"
+
+    def _ensure_table(self) -> None:
+        bigquery = self._bigquery
+        schema = [
+            bigquery.SchemaField("run_id", "STRING", mode="REQUIRED"),
+            bigquery.SchemaField("rule_id", "STRING", mode="REQUIRED"),
+            bigquery.SchemaField("rule_name", "STRING"),
+            bigquery.SchemaField("table_name", "STRING", mode="REQUIRED"),
+            bigquery.SchemaField("dq_dimension", "STRING"),
+            bigquery.SchemaField("severity", "STRING"),
+            bigquery.SchemaField("violation_count", "INT64", mode="REQUIRED"),
+            bigquery.SchemaField("sample_keys", "STRING"),
+            bigquery.SchemaField("job_id", "STRING"),
+            bigquery.SchemaField("run_at", "TIMESTAMP", mode="REQUIRED"),
+        ]
+        table = bigquery.Table(self.table_ref, schema=schema)
+        table.time_partitioning = bigquery.TimePartitioning(field="run_at")
+        table.clustering_fields = ["table_name", "rule_id"]
+        self.client.create_table(table, exists_ok=True)
+
+    def insert(self, rows: List[Dict[str, Any]]) -> None:
+        payload = [
+            {col: row[col].isoformat() if col == "run_at" else row[col] for col in _COLUMNS}
+            for row in rows
+        ]
+        errors = self.client.insert_rows_json(self.table_ref, payload)
+        if errors:
+            raise RuntimeError(f"Failed to record rule results: {errors}")
+
+    def query(self, sql: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        bigquery = self._bigquery
+        types = {datetime: "TIMESTAMP", int: "INT64", str: "STRING"}
+        job_config = bigquery.QueryJobConfig(query_parameters=[
+            bigquery.ScalarQueryParameter(name, types[type(value)], value)
+            for name, value in params.items()
+        ])
+        return [dict(row) for row in self.client.query(sql, job_config=job_config).result()]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_violation_store():
+    """Get the configured violation store (created once per process)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            if get_violation_store_backend() == "bigquery":
+                _store = BigQueryViolationStore(get_project_id(), get_dataset_id(), get_violation_store_table())
+            else:
+                _store = SQLiteViolationStore(get_violation_store_path())
+        return _store
+
+
+def record_rule_results(results: Iterable[Dict[str, Any]], run_id: Optional[str] = None, store=None) -> str:
+    """
+    Append the results of one rule run to the store.
+
+    Args:
+        results: One entry per executed rule (including rules with no violations),
+            with keys rule (dict), table, total_count and optionally violations
+            (sample rows), key_column and job_id
+        run_id: ID grouping these results (generated if omitted)
+        store: Store to write to (defaults to the configured store)
+
+    Returns:
+        str: The run ID
+    """
+    store = store or get_violation_store()
+    run_id = run_id or uuid.uuid4().hex
+    run_at = _utcnow()
+
+    rows = []
+    for result in results:
+        rule = result.get("rule", {})
+        key_column = result.get("key_column")
+        sample_keys = [
+            row.get(key_column) for row in result.get("violations", [])[:MAX_SAMPLE_KEYS]
+            if key_column and row.get(key_column) is not None
+        ]
+        rows.append({
+            "run_id": run_id,
+            "rule_id": rule_id_for(rule),
+            "rule_name": rule.get("name"),
+            "table_name": result.get("table", "unknown"),
+            "dq_dimension": rule.get("dq_dimension"),
+            "severity": rule.get("severity"),
+            "violation_count": int(result.get("total_count", 0)),
+            "sample_keys": json.dumps(sample_keys, default=str),
+            "job_id": result.get("job_id"),
+            "run_at": run_at,
+        })
+
+    if rows:
+        store.insert(rows)
+    return run_id
+
+
+def _since(days: int) -> datetime:
+    return _utcnow() - timedelta(days=days)
+
+
+def get_latest_results(days: int = 30, store=None) -> List[Dict[str, Any]]:
+    """Get the most recent result of every rule/table pair run in the last N days."""
+    store = store or get_violation_store()
+    rows = store.query(_LATEST_SQL.format(table=store.table), {"since": _since(days)})
+    for row in rows:
+        row["sample_keys"] = json.loads(row["sample_keys"]) if row.get("sample_keys") else []
+    return rows
+
+
+def get_violation_trend(table_name: Optional[str] = None, days: int = 30, store=None) -> List[Dict[str, Any]]:
+    """Get daily violation totals per table over the last N days."""
+    store = store or get_violation_store()
+    params: Dict[str, Any] = {"since": _since(days)}
+    table_filter = ""
+    if table_name:
+        table_filter = "AND table_name = @table_name"
+        params["table_name"] = table_name
+    sql = _TREND_SQL.format(table=store.table, table_filter=table_filter)
+    return store.query(sql, params)
+
+
+def get_top_rules(limit: int = 10, days: int = 30, store=None) -> List[Dict[str, Any]]:
+    """Get the rules with the most violations over the last N days."""
+    store = store or get_violation_store()
+    return store.query(_TOP_RULES_SQL.format(table=store.table), {"since": _since(days), "limit": int(limit)})
+
+
+def get_table_summary(days: int = 30, store=None) -> List[Dict[str, Any]]:
+    """Get violation totals per table over the last N days."""
+    store = store or get_violation_store()
+    return store.query(_TABLE_SUMMARY_SQL.format(table=store.table), {"since": _since(days)})
@@ -5,10 +5,12 @@ Automatically detects GCP configuration without hardcoding
 
 from .auto_discovery import EnvironmentDiscovery, load_environment_config
 from .data_loader import load_csv_to_bigquery, load_all_week_data
+from .storage_layout import materialize_partitioned_table
 
 __all__ = [
     'EnvironmentDiscovery',
     'load_environment_config',
     'load_csv_to_bigquery',
-    'load_all_week_data'
+    'load_all_week_data',
+    'materialize_partitioned_table'
 ]
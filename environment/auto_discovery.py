@@ -274,6 +274,7 @@ class EnvironmentDiscovery:
                 'columns': [],
                 'key_columns': {
                     'customer_id': None,
+                    'policy_id': None,
                     'date_fields': [],
                     'amount_fields': [],
                     'status_fields': []
@@ -293,6 +294,10 @@ class EnvironmentDiscovery:
                 if 'cus_id' in name_lower or 'customer_id' in name_lower:
                     schema_info['key_columns']['customer_id'] = field.name
                 
+                # Policy ID detection
+                if 'policy_no' in name_lower or 'policy_id' in name_lower:
+                    schema_info['key_columns']['policy_id'] = field.name
+                
                 # Date field detection
                 if 'date' in name_lower or 'dob' in name_lower:
                     schema_info['key_columns']['date_fields'].append(field.name)
@@ -70,6 +70,43 @@ def get_customer_id_column() -> Optional[str]:
     return schema.get('key_columns', {}).get('customer_id')
 
 
+def get_policy_id_column() -> Optional[str]:
+    """Get the column identifying a policy row (falls back to the customer ID column)"""
+    config = load_config()
+    schema = config.get('bigquery', {}).get('schema', {})
+    return (
+        os.getenv('POLICY_ID_COLUMN')
+        or schema.get('key_columns', {}).get('policy_id')
+        or get_customer_id_column()
+    )
+
+
+def get_column_param_type(column_name: Optional[str]) -> str:
+    """Get the BigQuery query parameter type matching a column of the discovered schema"""
+    param_types = {
+        'INTEGER': 'INT64',
+        'INT64': 'INT64',
+        'FLOAT': 'FLOAT64',
+        'FLOAT64': 'FLOAT64',
+        'NUMERIC': 'NUMERIC'
+    }
+    for column in get_all_columns():
+        if column.get('name') == column_name:
+            return param_types.get(str(column.get('type', '')).upper(), 'STRING')
+    return 'STRING'
+
+
+def get_customer_id_param_type() -> str:
+    """Get the BigQuery query parameter type matching the customer ID column"""
+    return get_column_param_type(get_customer_id_column())
+
+
+def get_partitioned_layout() -> Optional[Dict]:
+    """Get the week-partitioned table layout, if it has been materialised"""
+    config = load_config()
+    return config.get('bigquery', {}).get('partitioned_table')
+
+
 def get_date_fields() -> List[str]:
     """Get list of date field column names from schema"""
     config = load_config()
@@ -160,6 +197,172 @@ def get_anomaly_contamination_rate() -> float:
     return float(os.getenv('ANOMALY_CONTAMINATION_RATE', '0.1'))
 
 
+def get_anomaly_model_dir() -> str:
+    """Get the directory of stored anomaly detection models"""
+    return os.getenv('ANOMALY_MODEL_DIR', 'dq_anomaly_models')
+
+
+def get_anomaly_training_rows() -> int:
+    """Get the size of the stratified sample an anomaly model is trained on"""
+    return int(os.getenv('ANOMALY_TRAINING_ROWS', '10000'))
+
+
+def get_anomaly_batch_rows() -> int:
+    """Get how many rows are scored per Arrow batch during anomaly detection"""
+    return int(os.getenv('ANOMALY_BATCH_ROWS', '50000'))
+
+
+def get_anomaly_max_scored_rows() -> int:
+    """Get the max rows scored per anomaly detection run (0 scores the whole table)"""
+    return int(os.getenv('ANOMALY_MAX_SCORED_ROWS', '0'))
+
+
+def get_anomaly_n_jobs() -> int:
+    """Get how many threads train and score anomaly models (defaults to the CPU count)"""
+    value = int(os.getenv('ANOMALY_N_JOBS', '0'))
+    return value if value > 0 else (os.cpu_count() or 1)
+
+
+def get_anomaly_backend() -> str:
+    """Get where anomalies are scored: auto (by table size), local or bqml"""
+    return os.getenv('ANOMALY_BACKEND', 'auto').lower()
+
+
+def get_anomaly_bqml_min_rows() -> int:
+    """Get the table size from which the auto anomaly backend scores in BigQuery ML"""
+    return int(os.getenv('ANOMALY_BQML_MIN_ROWS', '1000000'))
+
+
+def get_anomaly_bqml_model_type() -> str:
+    """Get the BigQuery ML anomaly model type (kmeans or autoencoder)"""
+    return os.getenv('ANOMALY_BQML_MODEL_TYPE', 'kmeans').lower()
+
+
+def get_anomaly_bqml_dataset() -> str:
+    """Get the scratch dataset BigQuery ML anomaly models are created in (kept out of the data dataset)"""
+    return os.getenv('ANOMALY_BQML_DATASET') or 'dq_models'
+
+
+def get_customer_history_cache_size() -> int:
+    """Get max number of customer histories kept in the treatment lookup cache"""
+    return int(os.getenv('CUSTOMER_HISTORY_CACHE_SIZE', '256'))
+
+
+def get_arrow_row_threshold() -> int:
+    """Get result size (rows) above which results are read via the Storage Read API"""
+    return int(os.getenv('ARROW_ROW_THRESHOLD', '5000'))
+
+
+def get_fix_chunk_concurrency() -> int:
+    """Get how many chunks of a batched fix run at once"""
+    return int(os.getenv('FIX_CHUNK_CONCURRENCY', '2'))
+
+
+def get_shadow_expiration_hours() -> int:
+    """Get hours until shadow validation tables expire"""
+    return int(os.getenv('SHADOW_TABLE_EXPIRATION_HOURS', '6'))
+
+
+def get_violation_store_backend() -> str:
+    """Get the violation history backend ('sqlite' or 'bigquery')"""
+    return os.getenv('VIOLATION_STORE_BACKEND', 'sqlite').lower()
+
+
+def get_violation_store_path() -> str:
+    """Get the SQLite file used for violation history"""
+    return os.getenv('VIOLATION_STORE_PATH', 'dq_violations.db')
+
+
+def get_violation_store_table() -> str:
+    """Get the BigQuery table used for violation history"""
+    return os.getenv('VIOLATION_STORE_TABLE', 'dq_violation_history')
+
+
+def get_rules_store_path() -> str:
+    """Get the SQLite file used for cached generated rules"""
+    return os.getenv('RULES_STORE_PATH', 'dq_rules_cache.db')
+
+
+def get_job_store_path() -> str:
+    """Get the SQLite file used for background workflow jobs and their events"""
+    return os.getenv('JOB_STORE_PATH', 'dq_jobs.db')
+
+
+def get_job_max_concurrency() -> int:
+    """Get how many background workflow jobs run at once per app instance"""
+    return int(os.getenv('JOB_MAX_CONCURRENCY', '2'))
+
+
+def get_cost_query_byte_limit() -> int:
+    """Get the most bytes a single generated query may process (0 = no limit)"""
+    return int(os.getenv('COST_QUERY_BYTE_LIMIT', str(10**9)))
+
+
+def get_cost_run_byte_budget() -> int:
+    """Get the bytes all queries of one run may process together (0 = no limit)"""
+    return int(os.getenv('COST_RUN_BYTE_BUDGET', str(10 * 10**9)))
+
+
+def get_cost_price_per_tib() -> float:
+    """Get the on-demand price per TiB processed, for cost estimates"""
+    return float(os.getenv('COST_PRICE_PER_TIB_USD', '6.25'))
+
+
+def get_result_cache_memory_bytes() -> int:
+    """Get the size bound of the in-memory query result cache"""
+    return int(float(os.getenv('RESULT_CACHE_MEMORY_MB', '64')) * 2**20)
+
+
+def get_result_cache_disk_bytes() -> int:
+    """Get the size bound of the on-disk query result cache"""
+    return int(float(os.getenv('RESULT_CACHE_DISK_MB', '512')) * 2**20)
+
+
+def get_result_cache_dir() -> str:
+    """Get the directory of the on-disk query result cache"""
+    return os.getenv('RESULT_CACHE_DIR', 'dq_result_cache')
+
+
+def get_workflow_max_concurrency() -> int:
+    """Get how many orchestrator workflow steps run at once"""
+    return int(os.getenv('WORKFLOW_MAX_CONCURRENCY', '4'))
+
+
+def get_fast_path_enabled() -> bool:
+    """Get whether known rules and auto-approved KB fixes bypass the LLM agents"""
+    return os.getenv('FAST_PATH_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
+
+def get_agent_warm_up() -> bool:
+    """Get whether the Streamlit app builds the sub-agents in the background at startup"""
+    return os.getenv('AGENT_WARM_UP', 'true').lower() in ('1', 'true', 'yes')
+
+
+def get_ui_cache_ttl_seconds() -> int:
+    """Get how long the Streamlit app reuses query results (profiles, samples), in seconds"""
+    return int(os.getenv('UI_CACHE_TTL_SECONDS', '300'))
+
+
+def get_ui_metadata_cache_ttl_seconds() -> int:
+    """Get how long the Streamlit app reuses table lists and schemas, in seconds"""
+    return int(os.getenv('UI_METADATA_CACHE_TTL_SECONDS', '3600'))
+
+
+def get_ui_cache_max_entries() -> int:
+    """Get how many query results the Streamlit app keeps cached"""
+    return int(os.getenv('UI_CACHE_MAX_ENTRIES', '256'))
+
+
+def get_instrumentation_enabled() -> bool:
+    """Get whether agent tool and model calls are timed and exported as spans and metrics"""
+    return os.getenv('INSTRUMENTATION_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
+
+def get_metrics_port() -> int:
+    """Get the port of the Prometheus /metrics endpoint (0 = not served)"""
+    return int(os.getenv('METRICS_PORT', '0'))
+
+
 def get_organization_name() -> str:
     """Get organization name for branding"""
     return os.getenv('ORGANIZATION_NAME', 'Your Organization')
@@ -208,6 +411,7 @@ if __name__ == '__main__':
     print(f"Environment Type: {get_environment_type()}")
     print(f"Tables: {get_tables()}")
     print(f"Customer ID Column: {get_customer_id_column()}")
+    print(f"Partitioned Layout: {get_partitioned_layout()}")
     print(f"Date Fields: {get_date_fields()}")
     print(f"Amount Fields: {get_amount_fields()}")
     print(f"Status Fields: {get_status_fields()}")
@@ -113,3 +113,8 @@ if __name__ == '__main__':
     
     # Load all data
     load_all_week_data(config)
+    
+    # The partitioned layout is a snapshot of the week tables: rebuild it after a reload
+    if config['bigquery'].get('partitioned_table'):
+        from storage_layout import materialize_partitioned_table
+        materialize_partitioned_table(config, config['bigquery']['partitioned_table']['table'])
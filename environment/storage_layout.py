@@ -0,0 +1,164 @@
+"""
+Partitioned Storage Layout
+Materialises the weekly tables into one week-partitioned, customer-clustered table
+
+The table is a snapshot: fixes and loads on the week tables do not reach it
+until it is re-materialised. Readers check is_partitioned_table_current and
+fall back to the week tables while it is missing or stale.
+"""
+
+import re
+import json
+from pathlib import Path
+from typing import Dict, List, Optional
+from google.cloud import bigquery
+
+
+DEFAULT_PARTITIONED_TABLE = 'policies_partitioned'
+WEEK_COLUMN = 'week_num'
+
+# Integer-range partitioning: one partition per ISO week number
+WEEK_RANGE_START = 1
+WEEK_RANGE_END = 54
+
+
+def week_number(table_name: str) -> Optional[int]:
+    """Extract the week number from a table name such as 'policies_week3'"""
+    match = re.search(r'week_?(\d+)', table_name.lower())
+    return int(match.group(1)) if match else None
+
+
+def build_partitioned_table_sql(
+    project_id: str,
+    dataset_id: str,
+    week_tables: List[str],
+    customer_id_column: str,
+    target_table: str = DEFAULT_PARTITIONED_TABLE
+) -> str:
+    """Build the CREATE TABLE statement for the week-partitioned layout"""
+    selects = []
+    for table in week_tables:
+        week = week_number(table)
+        if week is None:
+            continue
+        selects.append(
+            f"SELECT {week} AS {WEEK_COLUMN}, * FROM `{project_id}.{dataset_id}.{table}`"
+        )
+
+    if not selects:
+        raise ValueError("No week tables found to materialise")
+
+    union_sql = "\nUNION ALL\n".join(selects)
+
+    return f"""
+    CREATE OR REPLACE TABLE `{project_id}.{dataset_id}.{target_table}`
+    PARTITION BY RANGE_BUCKET({WEEK_COLUMN}, GENERATE_ARRAY({WEEK_RANGE_START}, {WEEK_RANGE_END}, 1))
+    CLUSTER BY {customer_id_column}
+    AS
+    {union_sql}
+    """
+
+
+def refresh_sql(project_id: str, dataset_id: str, layout: Dict) -> str:
+    """Build the statement re-materialising a recorded layout from its week tables"""
+    return build_partitioned_table_sql(
+        project_id, dataset_id, layout['source_tables'], layout['cluster_column'], layout['table']
+    )
+
+
+def is_partitioned_table_current(
+    client: bigquery.Client,
+    project_id: str,
+    dataset_id: str,
+    layout: Dict,
+    week_tables: Optional[List[str]] = None
+) -> bool:
+    """
+    Check that the partitioned table exists and is newer than every week table
+
+    Args:
+        client: BigQuery client
+        project_id: GCP project ID
+        dataset_id: BigQuery dataset ID
+        layout: Layout entry from get_partitioned_layout()
+        week_tables: Current week tables; one missing from the layout makes it stale
+
+    Returns:
+        bool: False if the table is missing, older than a week table it was
+        built from (a fix or reload since), or lacks a newer week table
+    """
+    source_tables = layout.get('source_tables', [])
+    if week_tables is not None and set(week_tables) - set(source_tables):
+        return False
+    try:
+        partitioned = client.get_table(f"{project_id}.{dataset_id}.{layout['table']}")
+        newest = max(
+            (client.get_table(f"{project_id}.{dataset_id}.{t}").modified for t in source_tables),
+            default=None
+        )
+    except Exception:
+        return False
+    return newest is None or partitioned.modified >= newest
+
+
+def materialize_partitioned_table(
+    config: Dict,
+    target_table: str = DEFAULT_PARTITIONED_TABLE,
+    save: bool = True
+) -> Dict:
+    """
+    Create the partitioned table from all week tables and record it in the config
+
+    Args:
+        config: Environment configuration (as produced by EnvironmentDiscovery)
+        target_table: Name of the table to create
+        save: If True, write the updated config back to environment_config.json
+
+    Returns:
+        dict: The partitioned layout entry stored under config['bigquery']
+    """
+    project_id = config['project_id']
+    bq_config = config.get('bigquery', {})
+    dataset_id = bq_config['dataset_id']
+    week_tables = sorted(
+        (t for t in bq_config.get('tables', []) if week_number(t) is not None),
+        key=week_number
+    )
+
+    customer_id_column = bq_config.get('schema', {}).get('key_columns', {}).get('customer_id')
+    if not customer_id_column:
+        raise ValueError("Customer ID column unknown - run environment discovery first")
+
+    sql = build_partitioned_table_sql(
+        project_id, dataset_id, week_tables, customer_id_column, target_table
+    )
+
+    print(f"🧱 Materialising {len(week_tables)} week tables → {target_table}...")
+
+    client = bigquery.Client(project=project_id)
+    client.query(sql).result()
+
+    table = client.get_table(f"{project_id}.{dataset_id}.{target_table}")
+    print(f"✅ {target_table}: {table.num_rows} rows, partitioned by {WEEK_COLUMN}, clustered by {customer_id_column}")
+
+    layout = {
+        'table': target_table,
+        'week_column': WEEK_COLUMN,
+        'cluster_column': customer_id_column,
+        'source_tables': week_tables,
+        'weeks': [week_number(t) for t in week_tables]
+    }
+    config['bigquery']['partitioned_table'] = layout
+
+    if save:
+        with open(Path('environment_config.json'), 'w') as f:
+            json.dump(config, f, indent=2)
+
+    return layout
+
+
+if __name__ == '__main__':
+    with open('environment_config.json', 'r') as f:
+        config = json.load(f)
+
+    materialize_partitioned_table(config)
@@ -11,6 +11,7 @@ sys.path.insert(0, str(Path(__file__).parent))
 
 from environment.auto_discovery import EnvironmentDiscovery
 from environment.data_loader import load_all_week_data
+from environment.storage_layout import materialize_partitioned_table
 
 
 def main():
@@ -68,6 +69,16 @@ def main():
         except Exception as e:
             print(f"\n❌ Data loading failed: {e}")
             print("   You can try loading data manually later.")
+        
+        # Step 3: Week-partitioned layout for cross-week lookups
+        print("\nSTEP 3: Partitioned Storage Layout")
+        print("-" * 70)
+        try:
+            materialize_partitioned_table(config)
+        except Exception as e:
+            print(f"⚠️  Could not materialise partitioned table: {e}")
+            print("   Tools will keep querying the individual week tables.")
+            print("   You can retry later with: python environment/storage_layout.py")
     else:
         print("⏭️  Skipping data load. You can run it later with:")
         print("   python environment/data_loader.py")
@@ -90,7 +90,7 @@ class KnowledgeBankManager:
         
         Args:
             pattern_id: ID of the pattern (e.g., "DOB_FUTURE")
-            fix_data: Dictionary with fix details
+            fix_data: Dictionary with fix details (optionally the rule's "fingerprint")
         """
         kb = self.load()
         
@@ -103,6 +103,13 @@ class KnowledgeBankManager:
                 'historical_fixes': []
             }
         
+        # Remember the rule fingerprint so the orchestrator fast path finds this pattern
+        fingerprint = fix_data.get('fingerprint')
+        if fingerprint:
+            fingerprints = kb['issue_patterns'][pattern_id].setdefault('fingerprints', [])
+            if fingerprint not in fingerprints:
+                fingerprints.append(fingerprint)
+        
         # Add fix to pattern
         kb['issue_patterns'][pattern_id]['historical_fixes'].append({
             'fix_id': fix_data['fix_id'],
@@ -5,8 +5,6 @@ from dotenv import load_dotenv
 import json
 from datetime import datetime
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 import warnings
 
 # Suppress specific warnings for cleaner output
@@ -26,7 +24,8 @@ from environment.config_utils import (
     get_tables,
     get_environment_type,
     get_organization_name,
-    get_copyright_year
+    get_copyright_year,
+    get_agent_warm_up
 )
 
 # Import ADK components at the top
@@ -35,7 +34,23 @@ from google.genai import types
 from google.adk.artifacts import InMemoryArtifactService
 from google.adk.runners import Runner
 from google.adk.sessions import InMemorySessionService
-from dq_agents.identifier.agent import get_identifier_agent
+from dq_agents.agent_registry import get_agent, warm_up
+from dq_agents.job_runner import ACTIVE_STATUSES, get_job_runner
+from dq_agents.lazy_imports import lazy_import
+from dq_agents.rules_store import get_rules_store, schema_hash
+from streamlit_app.ui_cache import (
+    METADATA_TTL_SECONDS,
+    QUERY_TTL_SECONDS,
+    clear_ui_caches,
+    get_bigquery_client,
+    get_table_columns,
+    list_tables,
+    query_dataframe
+)
+
+# Charts are only drawn on some pages; plotly is loaded on first use
+px = lazy_import("plotly.express")
+go = lazy_import("plotly.graph_objects")
 
 st.set_page_config(
     page_title="DQ Management System",
@@ -44,6 +59,10 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Build the sub-agents in the background so the first agent call does not wait for them
+if get_agent_warm_up():
+    warm_up(background=True)
+
 # Custom CSS for Professional UI
 st.markdown("""
 <style>
@@ -179,56 +198,146 @@ if 'initialized' not in st.session_state:
         st.session_state.available_tables = []
         st.session_state.environment_type = 'manual'
 
-# Cache management configuration
-CACHE_FILE = "dq_rules_cache.json"
+# Cache management functions (rules are stored per table in dq_agents.rules_store)
+def get_table_schema_hash(table_name):
+    """Get the schema hash of a table, or None if its schema cannot be read"""
+    try:
+        columns = get_table_columns(st.session_state.get('project_id'), st.session_state.get('dataset_id'), table_name)
+        return schema_hash(zip(columns['column_name'], columns['data_type']))
+    except Exception:
+        return None
 
-# Cache management functions
-def load_rules_cache():
-    """Load DQ rules cache from JSON file"""
-    if os.path.exists(CACHE_FILE):
-        try:
-            with open(CACHE_FILE, 'r') as f:
-                return json.load(f)
-        except Exception as e:
-            st.warning(f"Failed to load cache: {e}")
-            return {"cache_metadata": {"last_updated": None, "version": "1.0.0"}, "tables": {}}
-    return {"cache_metadata": {"last_updated": None, "version": "1.0.0"}, "tables": {}}
+def get_cached_rules(table_name):
+    """Get cached rules for a specific table (None if missing or generated for another schema)"""
+    return get_rules_store().get(table_name, schema_hash=get_table_schema_hash(table_name))
 
-def save_rules_cache(cache_data):
-    """Save DQ rules cache to JSON file"""
+def cache_rules_for_table(table_name, rules):
+    """Cache rules for a specific table"""
     try:
-        cache_data["cache_metadata"]["last_updated"] = datetime.now().isoformat()
-        with open(CACHE_FILE, 'w') as f:
-            json.dump(cache_data, f, indent=2, default=str)
+        get_rules_store().put(table_name, rules, schema_hash=get_table_schema_hash(table_name))
         return True
     except Exception as e:
         st.error(f"Failed to save cache: {e}")
         return False
 
-def get_cached_rules(table_name):
-    """Get cached rules for a specific table"""
-    cache = load_rules_cache()
-    return cache.get("tables", {}).get(table_name, None)
-
-def cache_rules_for_table(table_name, rules):
-    """Cache rules for a specific table"""
-    cache = load_rules_cache()
-    if "tables" not in cache:
-        cache["tables"] = {}
-    cache["tables"][table_name] = {
-        "rules": rules,
-        "generated_at": datetime.now().isoformat(),
-        "rule_count": len(rules)
-    }
-    return save_rules_cache(cache)
-
 def clear_cache_for_table(table_name):
     """Clear cached rules for a specific table"""
-    cache = load_rules_cache()
-    if table_name in cache.get("tables", {}):
-        del cache["tables"][table_name]
-        return save_rules_cache(cache)
-    return False
+    return get_rules_store().delete(table_name)
+
+# Background workflow jobs (dq_agents.job_runner): the page stays responsive while they run
+JOB_POLL_SECONDS = 2
+
+WORKFLOW_PHASES = [
+    ("identifier", "📋 Phase 1: Detecting issues..."),
+    ("treatment", "💊 Phase 2: Analyzing fixes..."),
+    ("remediator", "🔧 Phase 3: Applying fixes..."),
+    ("metrics", "📊 Phase 4: Calculating costs..."),
+]
+
+JOB_STATUS_ICONS = {
+    "queued": "🕒", "running": "🔄", "succeeded": "✅", "failed": "❌", "cancelled": "⏹️", "interrupted": "⚠️"
+}
+
+def submit_workflow_job(prompt, label):
+    """Run an orchestrator workflow in the background and track it in this session"""
+    # The worker thread cannot read st.session_state, so hand it the inputs it needs
+    state = {}
+    if st.session_state.get('uploaded_dq_rules'):
+        state['uploaded_dq_rules'] = st.session_state.uploaded_dq_rules
+    job_id = get_job_runner().submit(prompt, user_id="streamlit_user", label=label, state=state)
+    st.session_state.setdefault('workflow_jobs', []).append(job_id)
+    return job_id
+
+def workflow_phase(events):
+    """Infer the current workflow phase from the latest events of a job"""
+    for event in reversed(events):
+        haystack = " ".join([event['author'] or "", *event['tool_calls'], event['text'][:150]]).lower()
+        for keyword, label in WORKFLOW_PHASES:
+            if keyword in haystack:
+                return label
+    return "🔄 Starting orchestration..."
+
+def _render_workflow_jobs():
+    runner = get_job_runner()
+    seen_events = st.session_state.setdefault('workflow_job_events', {})
+    finished = st.session_state.setdefault('workflow_jobs_finished', set())
+    
+    st.subheader("⏳ Background Workflows")
+    for job_id in reversed(st.session_state.workflow_jobs):
+        job = runner.get_job(job_id)
+        if job is None:
+            continue
+        
+        # Only fetch the events recorded since the last poll
+        events = seen_events.setdefault(job_id, [])
+        events.extend(runner.get_events(job_id, after_seq=events[-1]['seq'] if events else 0))
+        active = job['status'] in ACTIVE_STATUSES
+        
+        if not active and job_id not in finished:
+            finished.add(job_id)
+            if job['status'] == "succeeded" and job['final_text']:
+                st.session_state.orchestrator_output = job['final_text']
+            st.rerun()
+        
+        icon = JOB_STATUS_ICONS.get(job['status'], "•")
+        with st.expander(f"{icon} {job['label']} · {job['status']} · {job['event_count']} events", expanded=active):
+            if active:
+                st.info(workflow_phase(events))
+                if st.button("⏹️ Cancel", key=f"cancel_job_{job_id}"):
+                    runner.cancel(job_id)
+            elif job['status'] == "succeeded" and job['final_text']:
+                if st.button("📋 Show Results", key=f"show_job_{job_id}"):
+                    st.session_state.orchestrator_output = job['final_text']
+                    st.rerun()
+            elif job['error']:
+                st.error(job['error'].splitlines()[0])
+                st.code(job['error'])
+            
+            with st.container(height=400):
+                for event in events:
+                    tools = f" · 🔧 {', '.join(event['tool_calls'])}" if event['tool_calls'] else ""
+                    st.caption(f"#{event['seq']} · {event['author'] or 'agent'}{tools}")
+                    if event['text']:
+                        st.markdown(event['text'])
+
+def render_workflow_jobs():
+    """Show the background workflows of this session, polling while any is active"""
+    job_ids = st.session_state.get('workflow_jobs', [])
+    if not job_ids:
+        return
+    runner = get_job_runner()
+    active = any((runner.get_job(job_id) or {}).get('status') in ACTIVE_STATUSES for job_id in job_ids)
+    st.fragment(_render_workflow_jobs, run_every=JOB_POLL_SECONDS if active else None)()
+
+# Maximum violations rendered by the streaming table viewer
+STREAM_VIEWER_MAX_ROWS = 50000
+
+def stream_violations_to_table(issue_data, chunk_rows=5000):
+    """Stream a rule's full violation set into a table, one Arrow chunk at a time"""
+    import pyarrow as pa
+    from dq_agents.query_results import iter_record_batches
+    
+    client = get_bigquery_client(st.session_state.get('project_id'))
+    query_job = client.get_job(issue_data['job_id'], location=issue_data.get('job_location'))
+    
+    table_placeholder = st.empty()
+    progress_placeholder = st.empty()
+    table = None
+    loaded = 0
+    
+    for batch in iter_record_batches(query_job.result(), chunk_rows=chunk_rows, max_rows=STREAM_VIEWER_MAX_ROWS):
+        # Only the new chunk is sent to the browser (re-rendering all rows per chunk is quadratic)
+        if table is None:
+            table = table_placeholder.dataframe(pa.Table.from_batches([batch]), width='stretch')
+        else:
+            table.add_rows(pa.Table.from_batches([batch]))
+        loaded += batch.num_rows
+        progress_placeholder.caption(f"Loaded {loaded:,} of {issue_data['total_count']:,} violations")
+    
+    if issue_data['total_count'] > STREAM_VIEWER_MAX_ROWS:
+        progress_placeholder.caption(
+            f"Showing first {STREAM_VIEWER_MAX_ROWS:,} of {issue_data['total_count']:,} violations - open BigQuery for the full set"
+        )
 
 import base64
 
@@ -319,10 +428,9 @@ with st.sidebar:
         if st.button("🔌 Test Connection", use_container_width=True):
             with st.spinner("Connecting..."):
                 try:
-                    from google.cloud import bigquery
-                    client = bigquery.Client(project=project_id)
-                    dataset_ref = bigquery.DatasetReference(project_id, dataset_id)
-                    tables = list(client.list_tables(dataset_ref))
+                    # Bypass the cached table list: this is a live check
+                    list_tables.clear()
+                    tables = list_tables(project_id, dataset_id)
                     st.success(f"Connected! Found {len(tables)} tables.")
                 except Exception as e:
                     st.error(f"Connection failed: {str(e)}")
@@ -335,6 +443,17 @@ with st.sidebar:
         )
         st.info("Configure per-agent models in Advanced Settings")
 
+    with st.expander("🗄️ Cached Data", expanded=False):
+        st.caption(
+            f"Table lists and schemas are reused for {METADATA_TTL_SECONDS // 60} min, "
+            f"query results for {QUERY_TTL_SECONDS // 60} min."
+        )
+        reset_clients = st.checkbox("Also reset BigQuery connections", value=False)
+        if st.button("🔄 Clear Cached Data", use_container_width=True):
+            clear_ui_caches(include_clients=reset_clients)
+            st.session_state.pop('available_tables', None)
+            st.success("Cache cleared: data will be reloaded from BigQuery.")
+
     st.divider()
     
     # Environment Info Compact
@@ -431,103 +550,33 @@ if active_tab == "🤖 Orchestrator":
                 )
             
             if st.button("🚀 Start Full Workflow", type="primary", key="start_full_wf", use_container_width=True, disabled=len(wf_tables) == 0):
-                with st.status("🤖 Orchestrator is coordinating agents...", expanded=True) as status:
-                    try:
-                        from dq_agents.orchestrator.agent import orchestrator_agent
-                        from google.genai import types
-                        
-                        session_service = InMemorySessionService()
-                        artifact_service = InMemoryArtifactService()
-                        runner = Runner(
-                            app_name="DQOrchestratorAgent",
-                            agent=orchestrator_agent,
-                            session_service=session_service,
-                            artifact_service=artifact_service
-                        )
-                        
-                        import asyncio
-                        session = asyncio.run(session_service.create_session(
-                            app_name="DQOrchestratorAgent",
-                            user_id="streamlit_user"
-                        ))
-                        
-                        # Format tables list
-                        tables_str = ", ".join(wf_tables) if len(wf_tables) > 1 else wf_tables[0]
-                        
-                        # Log orchestrator start
-                        st.session_state.agent_debate_logger.log_agent_thought(
-                            "Orchestrator",
-                            f"Starting full workflow for {tables_str}",
-                            "Initializing all agents",
-                            "Workflow started"
-                        )
-                        
-                        auto_approve_text = " with auto-approval enabled" if wf_auto_approve else ""
-                        tables_plural = "tables" if len(wf_tables) > 1 else "table"
-                        prompt = (
-                            f"Execute the complete DQ workflow for {tables_plural} '{tables_str}'{auto_approve_text}:\n\n"
-                            "1. Call identifier agent to detect DQ issues and generate rules\n"
-                            "2. Execute the generated rules and identify violations\n"
-                            "3. Call treatment agent to analyze issues and suggest top 3 fixes\n"
-                            "4. Request human approval for fixes (unless auto-approve is enabled)\n"
-                            "5. Call remediator agent to execute approved fixes\n"
-                            "6. Call metrics agent to calculate Cost of Inaction\n"
-                            "7. Generate executive summary report\n\n"
-                            "Provide detailed status updates at each phase showing agent reasoning."
-                        )
-                        
-                        content = types.Content(role="user", parts=[types.Part(text=prompt)])
-                        
-                        # Stream events to show progress
-                        progress_placeholder = st.empty()
-                        event_count = 0
-                        all_events = []
-                        
-                        status.write("🔄 Starting orchestration...")
-                        
-                        for event in runner.run(
-                            user_id="streamlit_user",
-                            session_id=session.id,
-                            new_message=content
-                        ):
-                            all_events.append(event)
-                            event_count += 1
-                            
-                            # Show progress updates
-                            if hasattr(event, 'content') and event.content and hasattr(event.content, 'parts'):
-                                for part in event.content.parts:
-                                    if hasattr(part, 'text') and part.text:
-                                        # Extract phase from text
-                                        text_snippet = part.text[:150]
-                                        if "identifier" in text_snippet.lower():
-                                            progress_placeholder.info("📋 Phase 1: Detecting issues...")
-                                        elif "treatment" in text_snippet.lower():
-                                            progress_placeholder.info("💊 Phase 2: Analyzing fixes...")
-                                        elif "remediator" in text_snippet.lower():
-                                            progress_placeholder.info("🔧 Phase 3: Applying fixes...")
-                                        elif "metrics" in text_snippet.lower():
-                                            progress_placeholder.info("📊 Phase 4: Calculating costs...")
-                                        
-                                        # Show snippet in status
-                                        status.write(f"🤖 Event {event_count}: {text_snippet}...")
-                        
-                        if all_events:
-                            last_event = all_events[-1]
-                            response_text = "".join([part.text for part in last_event.content.parts if hasattr(part, 'text') and part.text])
-                            
-                            st.session_state.orchestrator_output = response_text
-                            progress_placeholder.empty()
-                            status.update(label="✅ Workflow completed!", state="complete", expanded=False)
-                            st.rerun()
-                        else:
-                            status.update(label="❌ No response from Orchestrator", state="error")
-                    
-                    except Exception as e:
-                        status.update(label="❌ Error occurred", state="error")
-                        st.error(f"❌ Error: {str(e)}")
-                        import traceback
-                        with st.expander("🐛 Debug Info"):
-                            st.code(traceback.format_exc())
+                # Format tables list
+                tables_str = ", ".join(wf_tables) if len(wf_tables) > 1 else wf_tables[0]
+                
+                # Log orchestrator start
+                st.session_state.agent_debate_logger.log_agent_thought(
+                    "Orchestrator",
+                    f"Starting full workflow for {tables_str}",
+                    "Initializing all agents",
+                    "Workflow started"
+                )
+                
+                auto_approve_text = " with auto-approval enabled" if wf_auto_approve else ""
+                tables_plural = "tables" if len(wf_tables) > 1 else "table"
+                prompt = (
+                    f"Execute the complete DQ workflow for {tables_plural} '{tables_str}'{auto_approve_text}:\n\n"
+                    "1. Call identifier agent to detect DQ issues and generate rules\n"
+                    "2. Execute the generated rules and identify violations\n"
+                    "3. Call treatment agent to analyze issues and suggest top 3 fixes\n"
+                    "4. Request human approval for fixes (unless auto-approve is enabled)\n"
+                    "5. Call remediator agent to execute approved fixes\n"
+                    "6. Call metrics agent to calculate Cost of Inaction\n"
+                    "7. Generate executive summary report\n\n"
+                    "Provide detailed status updates at each phase showing agent reasoning."
+                )
+                
+                submit_workflow_job(prompt, label=f"Full workflow: {tables_str}")
+                st.rerun()
         
         elif workflow_mode == "💬 Natural Language Request":
             st.markdown("### Natural Language Request")
@@ -542,78 +591,22 @@ if active_tab == "🤖 Orchestrator":
             
             if st.button("🎯 Execute Request", key="exec_nl_req", use_container_width=True):
                 if nl_request:
-                    with st.status("🤖 Orchestrator is processing your request...", expanded=True) as status:
-                        try:
-                            from dq_agents.orchestrator.agent import orchestrator_agent
-                            from google.genai import types
-                            
-                            session_service = InMemorySessionService()
-                            artifact_service = InMemoryArtifactService()
-                            runner = Runner(
-                                app_name="DQOrchestratorAgent",
-                                agent=orchestrator_agent,
-                                session_service=session_service,
-                                artifact_service=artifact_service
-                            )
-                            
-                            import asyncio
-                            session = asyncio.run(session_service.create_session(
-                                app_name="DQOrchestratorAgent",
-                                user_id="streamlit_user"
-                            ))
-                            
-                            # Log to agent debate
-                            st.session_state.agent_debate_logger.log_agent_thought(
-                                "Orchestrator",
-                                f"User request: {nl_request}",
-                                "Analyzing request and planning agent coordination",
-                                "Determining which agents to call"
-                            )
-                            
-                            content = types.Content(role="user", parts=[types.Part(text=nl_request)])
-                            
-                            # Stream events to show progress
-                            progress_placeholder = st.empty()
-                            event_count = 0
-                            all_events = []
-                            
-                            status.write("🔄 Processing your request...")
-                            
-                            for event in runner.run(
-                                user_id="streamlit_user",
-                                session_id=session.id,
-                                new_message=content
-                            ):
-                                all_events.append(event)
-                                event_count += 1
-                                
-                                # Show progress updates
-                                if hasattr(event, 'content') and event.content and hasattr(event.content, 'parts'):
-                                    for part in event.content.parts:
-                                        if hasattr(part, 'text') and part.text:
-                                            text_snippet = part.text[:150]
-                                            status.write(f"🤖 {text_snippet}...")
-                            
-                            if all_events:
-                                last_event = all_events[-1]
-                                response_text = "".join([part.text for part in last_event.content.parts if hasattr(part, 'text') and part.text])
-                                
-                                st.session_state.orchestrator_output = response_text
-                                progress_placeholder.empty()
-                                status.update(label="✅ Request completed!", state="complete", expanded=False)
-                                st.rerun()
-                            else:
-                                status.update(label="❌ No response from Orchestrator", state="error")
-                        
-                        except Exception as e:
-                            status.update(label="❌ Error occurred", state="error")
-                            st.error(f"❌ Error: {str(e)}")
-                            import traceback
-                            with st.expander("🐛 Debug Info"):
-                                st.code(traceback.format_exc())
+                    # Log to agent debate
+                    st.session_state.agent_debate_logger.log_agent_thought(
+                        "Orchestrator",
+                        f"User request: {nl_request}",
+                        "Analyzing request and planning agent coordination",
+                        "Determining which agents to call"
+                    )
+                    
+                    submit_workflow_job(nl_request, label=f"Request: {nl_request[:60]}")
+                    st.rerun()
                 else:
                     st.warning("Please enter a request")
     
+    # Progress of the workflows running in the background
+    render_workflow_jobs()
+    
     # Display orchestrator output
     if 'orchestrator_output' in st.session_state:
         st.divider()
@@ -723,8 +716,6 @@ elif active_tab == "🔍 Identifier":
         # Get available tables
         selected_tables = []
         try:
-            from google.cloud import bigquery
-            
             # Get project_id and dataset_id from session state
             _project_id = st.session_state.get('project_id', '')
             _dataset_id = st.session_state.get('dataset_id', '')
@@ -732,9 +723,7 @@ elif active_tab == "🔍 Identifier":
             if not _project_id or not _dataset_id:
                 st.warning("⚠️ Please configure Project ID and Dataset ID in the sidebar settings.")
             else:
-                client = bigquery.Client(project=_project_id)
-                dataset_ref = bigquery.DatasetReference(_project_id, _dataset_id)
-                tables = [table.table_id for table in client.list_tables(dataset_ref)]
+                tables = list_tables(_project_id, _dataset_id)
                 
                 if tables:
                     selected_tables = st.multiselect(
@@ -786,16 +775,20 @@ elif active_tab == "🔍 Identifier":
     st.subheader("3. Generate DQ Rules")
     
     # Check cache status
-    rules_cache = load_rules_cache()
-    cached_tables = list(rules_cache.get("tables", {}).keys())
+    rules_cache = get_rules_store().entries()
+    cached_tables = list(rules_cache.keys())
     
     # Show cache status for selected tables
     if selected_tables:
         st.markdown("**📦 Cache Status:**")
         for table in selected_tables:
             if table in cached_tables:
-                cache_info = rules_cache["tables"][table]
-                st.success(f"✅ {table}: {cache_info['rule_count']} rules cached (generated {cache_info['generated_at'][:19]})")
+                cache_info = rules_cache[table]
+                current_hash = get_table_schema_hash(table)
+                if cache_info['schema_hash'] and current_hash and cache_info['schema_hash'] != current_hash:
+                    st.warning(f"⚠️ {table}: schema changed since rules were cached, they will be regenerated")
+                else:
+                    st.success(f"✅ {table}: {cache_info['rule_count']} rules cached (generated {cache_info['generated_at'][:19]})")
             else:
                 st.info(f"ℹ️ {table}: No cached rules")
     
@@ -854,7 +847,7 @@ elif active_tab == "🔍 Identifier":
                     ))
                     
                     # Get agent
-                    identifier_agent = get_identifier_agent()
+                    identifier_agent = get_agent("identifier")
                     
                     # Create runner
                     runner = Runner(
@@ -1068,13 +1061,10 @@ elif active_tab == "🔍 Identifier":
         
         # Get available tables for selection
         try:
-            from google.cloud import bigquery
             _project_id = st.session_state.get('project_id', '')
             _dataset_id = st.session_state.get('dataset_id', '')
             if _project_id and _dataset_id:
-                client = bigquery.Client(project=_project_id)
-                dataset_ref = bigquery.DatasetReference(_project_id, _dataset_id)
-                available_tables = [table.table_id for table in client.list_tables(dataset_ref)]
+                available_tables = list_tables(_project_id, _dataset_id)
             else:
                 available_tables = []
         except:
@@ -1103,7 +1093,7 @@ elif active_tab == "🔍 Identifier":
                         artifact_service = InMemoryArtifactService()
                         session = asyncio.run(session_service.create_session(app_name="DQIdentifierAgent", user_id="streamlit_user"))
                         
-                        identifier_agent = get_identifier_agent()
+                        identifier_agent = get_agent("identifier")
                         runner = Runner(app_name="DQIdentifierAgent", agent=identifier_agent, artifact_service=artifact_service, session_service=session_service)
                         
                         table_name = nl_table.split('.')[-1]
@@ -1408,8 +1398,11 @@ elif active_tab == "💊 Treatment":
                 if run_rules_btn:
                     with st.status("🔍 Executing DQ rules and filtering offending rows...", expanded=True) as status:
                         try:
-                            from google.cloud import bigquery
                             from google.cloud.exceptions import GoogleCloudError
+                            from dq_agents.cost_gate import ByteBudget, QueryCostExceeded
+                            from dq_agents.result_cache import cached_sample
+                            from dq_agents.violation_store import record_rule_results
+                            from environment.config_utils import get_customer_id_column
                             
                             # Get project_id and dataset_id from session state
                             project_id = st.session_state.get('project_id', '')
@@ -1420,11 +1413,18 @@ elif active_tab == "💊 Treatment":
                                 st.error("❌ Please configure Project ID and Dataset ID in the sidebar settings.")
                                 st.stop()
                             
-                            # Initialize BigQuery client with timeout
-                            client = bigquery.Client(project=project_id)
+                            # Shared BigQuery client of the project
+                            client = get_bigquery_client(project_id)
                             
                             filtered_issues = []
                             failed_rules = []
+                            rule_results = []  # Every executed rule, recorded in the violation store
+                            customer_id_col = get_customer_id_column()
+                            
+                            # Every rule is dry-run first; rules over the per-query limit or the
+                            # run's remaining byte budget are skipped instead of scanned
+                            run_budget = ByteBudget()
+                            run_slot_ms = 0
                             
                             progress_bar = st.progress(0)
                             
@@ -1495,29 +1495,40 @@ elif active_tab == "💊 Treatment":
                                 
                                 # Execute with timeout and error handling
                                 try:
-                                    # Add LIMIT if not present to prevent huge result sets
-                                    sql_upper = sql.upper()
-                                    if 'LIMIT' not in sql_upper:
-                                        # Wrap in subquery to safely add LIMIT
-                                        sql = f"SELECT * FROM ({sql}) AS limited_results LIMIT 1000"
-                                    
-                                    job_config = bigquery.QueryJobConfig(
-                                        maximum_bytes_billed=10**9  # 1GB limit
-                                    )
+                                    # Only the displayed sample is downloaded; the full result
+                                    # stays in the job's destination table for streaming later.
+                                    # Reruns against unchanged tables come from the result cache.
+                                    sample = cached_sample(client, sql, limit=100, budget=run_budget, timeout=30)
+                                    if not sample["cached"]:
+                                        run_slot_ms += sample["cost"]["slot_ms"] or 0
                                     
-                                    query_job = client.query(sql, job_config=job_config)
-                                    results = query_job.result(timeout=30)  # 30 second timeout
-                                    
-                                    violations = [dict(row) for row in results]
+                                    rule_results.append({
+                                        "rule": rule,
+                                        "table": table_name,
+                                        "total_count": sample["total_rows"],
+                                        "violations": sample["rows"],
+                                        "key_column": customer_id_col,
+                                        "job_id": sample["job_id"],
+                                        "cached": sample["cached"],
+                                        **sample["cost"]
+                                    })
                                     
-                                    if violations:
+                                    if sample["total_rows"]:
                                         filtered_issues.append({
                                             "rule": rule,
-                                            "violations": violations[:100],  # Limit to 100 for display
-                                            "total_count": len(violations),
-                                            "table": table_name
+                                            "violations": sample["rows"],
+                                            "total_count": sample["total_rows"],
+                                            "table": table_name,
+                                            "job_id": sample["job_id"],
+                                            "job_location": sample["job_location"]
                                         })
                                         
+                                except QueryCostExceeded as e:
+                                    failed_rules.append({
+                                        "rule_name": rule_name,
+                                        "error": f"Skipped (cost gate): {e}",
+                                        "sql": sql[:500]
+                                    })
                                 except GoogleCloudError as e:
                                     error_msg = str(e)
                                     # Extract the actual error message
@@ -1538,9 +1549,21 @@ elif active_tab == "💊 Treatment":
                             # Clear progress indicators
                             progress_bar.empty()
                             
+                            # Keep the run in the violation history for trend dashboards
+                            if rule_results:
+                                try:
+                                    record_rule_results(rule_results)
+                                except Exception as e:
+                                    st.warning(f"⚠️ Could not record results in violation history: {str(e)[:200]}")
+                            
                             # Store results in session state (including failed rules)
                             st.session_state.filtered_issues = filtered_issues
                             st.session_state.failed_rules = failed_rules
+                            st.session_state.rule_run_cost = {
+                                "bytes": run_budget.spent_bytes,
+                                "budget": run_budget.limit_bytes,
+                                "slot_ms": run_slot_ms
+                            }
                             
                             # Show results
                             if filtered_issues:
@@ -1595,6 +1618,16 @@ elif active_tab == "💊 Treatment":
         with st.container():
             st.subheader("Step 2: Filtered Issues")
             
+            run_cost = st.session_state.get('rule_run_cost')
+            if run_cost:
+                from dq_agents.cost_gate import estimated_cost_usd, format_bytes
+                budget_text = f" of {format_bytes(run_cost['budget'])} budget" if run_cost['budget'] else ""
+                st.caption(
+                    f"💰 Rule run scanned ~{format_bytes(run_cost['bytes'])}{budget_text} "
+                    f"(~${estimated_cost_usd(run_cost['bytes'])}), "
+                    f"{run_cost['slot_ms'] / 1000:.1f} slot-seconds"
+                )
+            
             for issue_idx, issue_data in enumerate(st.session_state.filtered_issues):
                 rule = issue_data['rule']
                 violations = issue_data['violations']
@@ -1621,6 +1654,11 @@ elif active_tab == "💊 Treatment":
                         sample_df = pd.DataFrame(violations[:5])
                         st.dataframe(sample_df, width='stretch')
                         
+                        # Stream the full violation set from the rule's cached job result
+                        if issue_data.get('job_id') and total_count > len(violations):
+                            if st.button(f"📥 Load all {total_count} violations", key=f"stream_violations_{issue_idx}"):
+                                stream_violations_to_table(issue_data)
+                        
                         # Link to BigQuery - use session state values
                         project_id = st.session_state.get('project_id', '')
                         dataset_id = st.session_state.get('dataset_id', '')
@@ -2175,11 +2213,20 @@ Call dry_run_fix() now and return the result.
                     if dry_run_result.get('status') == 'success':
                         st.info(f"✅ Dry run successful: {dry_run_result.get('affected_row_count', 0)} rows will be affected")
                         
+                        cost_estimate = dry_run_result.get('cost_estimate')
+                        if cost_estimate:
+                            from dq_agents.cost_gate import format_bytes
+                            st.caption(
+                                f"💰 Executing this fix will process ~{format_bytes(cost_estimate.get('bytes_processed'))} "
+                                f"(~${cost_estimate.get('estimated_cost_usd', 0)})"
+                            )
+                        
                         # Show sample rows
                         if 'sample_rows' in dry_run_result and dry_run_result['sample_rows']:
                             st.markdown("**Sample Affected Rows:**")
                             import pandas as pd
-                            sample_df = pd.DataFrame(dry_run_result['sample_rows'])
+                            from dq_agents.tool_responses import decode_table
+                            sample_df = pd.DataFrame(decode_table(dry_run_result['sample_rows']))
                             st.dataframe(sample_df, width='stretch')
                         
                         # Show SQL that was used
@@ -2555,8 +2602,31 @@ elif active_tab == "📊 Metrics":
     # Helper function to get data summary
     def get_data_summary():
         """Get summary of available data for analysis"""
+        issues = st.session_state.get('filtered_issues') or []
+        source = 'session'
+        
+        # After a reload, fall back to the latest recorded results instead of re-running rules
+        if not issues:
+            try:
+                from dq_agents.violation_store import get_latest_results
+                issues = [
+                    {
+                        'rule': {'name': r['rule_name'], 'rule_id': r['rule_id']},
+                        'table': r['table_name'],
+                        'total_count': r['violation_count'],
+                        'severity': r.get('severity') or 'unknown',
+                        'dq_dimension': r.get('dq_dimension') or 'unknown'
+                    }
+                    for r in get_latest_results() if r['violation_count'] > 0
+                ]
+                source = 'history'
+            except Exception:
+                issues = []
+        
         summary = {
-            'has_issues': 'filtered_issues' in st.session_state and st.session_state.filtered_issues,
+            'has_issues': bool(issues),
+            'issues': issues,
+            'source': source,
             'total_violations': 0,
             'total_issues': 0,
             'tables': [],
@@ -2565,7 +2635,6 @@ elif active_tab == "📊 Metrics":
         }
         
         if summary['has_issues']:
-            issues = st.session_state.filtered_issues
             summary['total_issues'] = len(issues)
             summary['total_violations'] = sum(issue.get('total_count', 0) for issue in issues)
             
@@ -2590,6 +2659,9 @@ elif active_tab == "📊 Metrics":
         st.markdown("## 🏥 Your Data Quality Health")
         
         if data_summary['has_issues']:
+            if data_summary['source'] == 'history':
+                st.caption("Showing the latest recorded rule results from the violation history")
+            
             # Calculate health score
             total_violations = data_summary['total_violations']
             critical_count = data_summary['severity_breakdown'].get('critical', 0)
@@ -2761,7 +2833,7 @@ elif active_tab == "📊 Metrics":
                 
                 # Group issues by table
                 table_issues = {}
-                for issue in st.session_state.filtered_issues:
+                for issue in data_summary['issues']:
                     table = issue.get('table', 'unknown')
                     table_issues[table] = table_issues.get(table, 0) + issue.get('total_count', 0)
                 
@@ -2788,6 +2860,30 @@ elif active_tab == "📊 Metrics":
                 )
                 
                 st.plotly_chart(fig_tables, use_container_width=True, key="table_comparison")
+            
+            # Violation trend from the recorded rule runs
+            try:
+                from dq_agents.violation_store import get_violation_trend
+                trend = get_violation_trend(days=30)
+            except Exception:
+                trend = []
+            
+            if len({row['day'] for row in trend}) > 1:
+                st.markdown("### 📅 Violation Trend (last 30 days)")
+                
+                trend_df = pd.DataFrame(trend)
+                fig_trend = px.line(trend_df, x='day', y='violations', color='table_name', markers=True)
+                fig_trend.update_layout(
+                    paper_bgcolor='rgba(0,0,0,0)',
+                    plot_bgcolor='rgba(0,0,0,0)',
+                    xaxis=dict(title='Day', color='#a0a0a0', gridcolor='#333'),
+                    yaxis=dict(title='Total Violations', color='#a0a0a0', gridcolor='#333'),
+                    legend=dict(font=dict(color='#e0e0e0')),
+                    height=300,
+                    margin=dict(l=40, r=40, t=40, b=40)
+                )
+                
+                st.plotly_chart(fig_trend, use_container_width=True, key="violation_trend")
         
         else:
             # No data - show welcome state with options to get started
@@ -2815,13 +2911,10 @@ elif active_tab == "📊 Metrics":
                 if not available_tables:
                     # Try to fetch from BigQuery
                     try:
-                        from google.cloud import bigquery
                         project_id = st.session_state.get('project_id', '')
                         dataset_id = st.session_state.get('dataset_id', '')
                         if project_id and dataset_id:
-                            client = bigquery.Client(project=project_id)
-                            tables = list(client.list_tables(f"{project_id}.{dataset_id}"))
-                            available_tables = [t.table_id for t in tables]
+                            available_tables = list_tables(project_id, dataset_id)
                             st.session_state.available_tables = available_tables
                     except:
                         available_tables = ['policies_week1', 'policies_week2', 'policies_week3', 'policies_week4']
@@ -2837,24 +2930,21 @@ elif active_tab == "📊 Metrics":
                     if st.button("🚀 Run Quick Analysis", use_container_width=True, type="primary", disabled=not selected_tables):
                         with st.spinner("🔍 Analyzing tables for data quality issues..."):
                             try:
-                                from google.cloud import bigquery
                                 project_id = st.session_state.get('project_id', '')
                                 dataset_id = st.session_state.get('dataset_id', '')
-                                client = bigquery.Client(project=project_id)
                                 
                                 # Run basic DQ analysis on selected tables
                                 quick_issues = []
                                 for table in selected_tables:
                                     # Check for NULL values in key columns
-                                    schema_query = f"SELECT column_name, data_type FROM `{project_id}.{dataset_id}.INFORMATION_SCHEMA.COLUMNS` WHERE table_name = '{table}'"
-                                    schema_df = client.query(schema_query).to_dataframe()
+                                    schema_df = get_table_columns(project_id, dataset_id, table)
                                     
                                     for _, row in schema_df.iterrows():
                                         col_name = row['column_name']
                                         # Check NULL count
                                         null_query = f"SELECT COUNT(*) as null_count FROM `{project_id}.{dataset_id}.{table}` WHERE {col_name} IS NULL"
                                         try:
-                                            null_result = client.query(null_query).to_dataframe()
+                                            null_result = query_dataframe(project_id, null_query)
                                             null_count = null_result['null_count'].iloc[0]
                                             if null_count > 0:
                                                 severity = 'critical' if null_count > 100 else 'high' if null_count > 50 else 'medium' if null_count > 10 else 'low'
@@ -3203,7 +3293,7 @@ elif active_tab == "📊 Metrics":
                             user_id="streamlit_user"
                         ))
                         
-                        issues_json = json.dumps(st.session_state.filtered_issues, default=str)
+                        issues_json = json.dumps(data_summary['issues'], default=str)
                         
                         prompt = f"""
                         Analyze these data quality issues and provide deep insights:
@@ -3260,17 +3350,7 @@ elif active_tab == "📊 Metrics":
                 
                 # Get available tables
                 try:
-                    from google.cloud import bigquery
-                    bq_client = bigquery.Client(project=project_id)
-                    
-                    # Get tables list
-                    tables_query = f"""
-                        SELECT table_name 
-                        FROM `{project_id}.{dataset_id}.INFORMATION_SCHEMA.TABLES`
-                        WHERE table_type = 'BASE TABLE'
-                    """
-                    tables_result = bq_client.query(tables_query).result()
-                    available_tables = [row.table_name for row in tables_result]
+                    available_tables = list_tables(project_id, dataset_id, base_tables_only=True)
                     
                     if available_tables:
                         col1, col2 = st.columns([2, 1])
@@ -3296,14 +3376,11 @@ elif active_tab == "📊 Metrics":
                             with st.spinner("Analyzing data for anomalies..."):
                                 try:
                                     # Get numeric columns
-                                    schema_query = f"""
-                                        SELECT column_name, data_type
-                                        FROM `{project_id}.{dataset_id}.INFORMATION_SCHEMA.COLUMNS`
-                                        WHERE table_name = '{anomaly_table}'
-                                        AND data_type IN ('INT64', 'FLOAT64', 'NUMERIC', 'BIGNUMERIC')
-                                    """
-                                    schema_result = bq_client.query(schema_query).result()
-                                    numeric_cols = [row.column_name for row in schema_result]
+                                    schema_df = get_table_columns(project_id, dataset_id, anomaly_table)
+                                    numeric_cols = schema_df.loc[
+                                        schema_df['data_type'].isin(['INT64', 'FLOAT64', 'NUMERIC', 'BIGNUMERIC']),
+                                        'column_name'
+                                    ].tolist()
                                     
                                     if len(numeric_cols) >= 2:
                                         # Get sample data
@@ -3313,7 +3390,7 @@ elif active_tab == "📊 Metrics":
                                             WHERE {' AND '.join([f'{col} IS NOT NULL' for col in numeric_cols[:5]])}
                                             LIMIT 1000
                                         """
-                                        df = bq_client.query(data_query).to_dataframe()
+                                        df = query_dataframe(project_id, data_query)
                                         
                                         if len(df) > 10:
                                             # Run IsolationForest
@@ -3417,16 +3494,7 @@ elif active_tab == "📊 Metrics":
                 st.markdown("*Get instant statistics and quality metrics for any table*")
                 
                 try:
-                    from google.cloud import bigquery
-                    bq_client = bigquery.Client(project=project_id)
-                    
-                    tables_query = f"""
-                        SELECT table_name 
-                        FROM `{project_id}.{dataset_id}.INFORMATION_SCHEMA.TABLES`
-                        WHERE table_type = 'BASE TABLE'
-                    """
-                    tables_result = bq_client.query(tables_query).result()
-                    available_tables = [row.table_name for row in tables_result]
+                    available_tables = list_tables(project_id, dataset_id, base_tables_only=True)
                     
                     if available_tables:
                         profile_table = st.selectbox(
@@ -3439,18 +3507,12 @@ elif active_tab == "📊 Metrics":
                             with st.spinner("Profiling table..."):
                                 try:
                                     # Get column info
-                                    cols_query = f"""
-                                        SELECT column_name, data_type, is_nullable
-                                        FROM `{project_id}.{dataset_id}.INFORMATION_SCHEMA.COLUMNS`
-                                        WHERE table_name = '{profile_table}'
-                                    """
-                                    cols_result = bq_client.query(cols_query).result()
-                                    columns_info = [(row.column_name, row.data_type, row.is_nullable) for row in cols_result]
+                                    cols_df = get_table_columns(project_id, dataset_id, profile_table)
+                                    columns_info = list(cols_df[['column_name', 'data_type', 'is_nullable']].itertuples(index=False, name=None))
                                     
                                     # Get row count
                                     count_query = f"SELECT COUNT(*) as cnt FROM `{project_id}.{dataset_id}.{profile_table}`"
-                                    count_result = bq_client.query(count_query).result()
-                                    row_count = list(count_result)[0].cnt
+                                    row_count = int(query_dataframe(project_id, count_query)['cnt'].iloc[0])
                                     
                                     # Get null counts for each column
                                     null_queries = []
@@ -3461,13 +3523,12 @@ elif active_tab == "📊 Metrics":
                                         SELECT {', '.join(null_queries)}
                                         FROM `{project_id}.{dataset_id}.{profile_table}`
                                     """
-                                    null_result = bq_client.query(null_query).result()
-                                    null_row = list(null_result)[0]
+                                    null_row = query_dataframe(project_id, null_query).iloc[0]
                                     
                                     # Build profile data
                                     profile_data = []
                                     for col, dtype, nullable in columns_info:
-                                        null_count = getattr(null_row, f"{col}_nulls")
+                                        null_count = int(null_row[f"{col}_nulls"])
                                         null_pct = (null_count / row_count * 100) if row_count > 0 else 0
                                         completeness = 100 - null_pct
                                         
@@ -0,0 +1,79 @@
+"""Cached BigQuery lookups for the Streamlit dashboard.
+
+Streamlit reruns the whole script on every widget interaction, so any
+query issued while rendering a page is issued again on each click. The
+helpers here wrap those lookups in Streamlit's caches:
+
+- ``st.cache_resource``: one BigQuery client per project, shared by all
+  sessions of the server process
+- ``st.cache_data``: table lists and column schemas (metadata TTL) and
+  query results (query TTL, keyed on project + SQL text)
+
+Cached data is returned as a copy, so callers may mutate it freely.
+``clear_ui_caches()`` drops everything (wired to the sidebar button).
+"""
+
+from typing import List
+
+import pandas as pd
+import streamlit as st
+from google.cloud import bigquery
+
+from dq_agents.cost_gate import clear_estimate_cache, run_query
+from dq_agents.result_cache import clear_result_cache
+from environment.config_utils import (
+    get_ui_cache_max_entries,
+    get_ui_cache_ttl_seconds,
+    get_ui_metadata_cache_ttl_seconds
+)
+
+METADATA_TTL_SECONDS = get_ui_metadata_cache_ttl_seconds()
+QUERY_TTL_SECONDS = get_ui_cache_ttl_seconds()
+QUERY_MAX_ENTRIES = get_ui_cache_max_entries()
+
+
+@st.cache_resource(show_spinner=False)
+def get_bigquery_client(project_id: str) -> bigquery.Client:
+    """Get the shared BigQuery client of a project."""
+    return bigquery.Client(project=project_id)
+
+
+@st.cache_data(ttl=METADATA_TTL_SECONDS, show_spinner=False)
+def list_tables(project_id: str, dataset_id: str, base_tables_only: bool = False) -> List[str]:
+    """List the table names of a dataset (optionally without views)."""
+    client = get_bigquery_client(project_id)
+    tables = client.list_tables(bigquery.DatasetReference(project_id, dataset_id))
+    return [t.table_id for t in tables if not base_tables_only or t.table_type == "TABLE"]
+
+
+@st.cache_data(ttl=METADATA_TTL_SECONDS, show_spinner=False)
+def get_table_columns(project_id: str, dataset_id: str, table_name: str) -> pd.DataFrame:
+    """Get column_name, data_type and is_nullable of every column of a table."""
+    client = get_bigquery_client(project_id)
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[bigquery.ScalarQueryParameter("table_name", "STRING", table_name)]
+    )
+    sql = f"""
+        SELECT column_name, data_type, is_nullable
+        FROM `{project_id}.{dataset_id}.INFORMATION_SCHEMA.COLUMNS`
+        WHERE table_name = @table_name
+        ORDER BY ordinal_position
+    """
+    return client.query(sql, job_config=job_config).to_dataframe()
+
+
+@st.cache_data(ttl=QUERY_TTL_SECONDS, max_entries=QUERY_MAX_ENTRIES, show_spinner=False)
+def query_dataframe(project_id: str, sql: str) -> pd.DataFrame:
+    """Run a read query through the cost gate and return its result as a DataFrame."""
+    return run_query(get_bigquery_client(project_id), sql).to_dataframe()
+
+
+def clear_ui_caches(include_clients: bool = False) -> None:
+    """Drop cached metadata, query results and rule results (and optionally clients)."""
+    list_tables.clear()
+    get_table_columns.clear()
+    query_dataframe.clear()
+    clear_result_cache()
+    clear_estimate_cache()
+    if include_clients:
+        get_bigquery_client.clear()
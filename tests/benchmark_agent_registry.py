@@ -0,0 +1,64 @@
+"""
+Benchmark: sub-agent construction with and without the agent registry.
+
+Measures, for every sub-agent:
+- startup: importing its module and building the first instance + AgentTool
+- per call before the registry: a new LlmAgent and AgentTool on every call
+- per call with the registry: get_agent_tool() on the cached instance
+
+No LLM or BigQuery calls are made; this only times agent construction.
+
+Run:
+    python tests/benchmark_agent_registry.py [calls]
+"""
+
+import os
+import statistics
+import sys
+import time
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from google.adk.tools.agent_tool import AgentTool
+
+from dq_agents import agent_registry
+
+
+def _time_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def main(calls: int = 50) -> None:
+    print("=" * 72)
+    print(f"Agent construction benchmark ({calls} calls per agent)")
+    print("=" * 72)
+    print(f"{'agent':<12}{'startup ms':>12}{'uncached ms/call':>20}{'registry ms/call':>20}{'speedup':>10}")
+
+    for name in agent_registry.AGENT_FACTORIES:
+        agent_registry.refresh([name])
+        started = time.perf_counter()
+        agent_registry.get_agent_tool(name)
+        startup_ms = (time.perf_counter() - started) * 1000
+
+        factory = agent_registry._factory(name)
+        uncached = statistics.median(_time_ms(lambda: AgentTool(agent=factory()), calls))
+        cached = statistics.median(_time_ms(lambda: agent_registry.get_agent_tool(name), calls))
+
+        print(f"{name:<12}{startup_ms:>12.2f}{uncached:>20.4f}{cached:>20.4f}{uncached / max(cached, 1e-6):>9.0f}x")
+
+    print()
+    print("Registry stats:", agent_registry.registry_stats())
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
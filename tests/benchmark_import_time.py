@@ -0,0 +1,90 @@
+"""
+Benchmark: cold-start import time of the agent packages.
+
+Imports each module in a fresh interpreter with ``python -X importtime``
+and reports:
+- the cumulative import time of the module
+- the slowest imports it pulled in (by cumulative time)
+- which known heavy dependencies were loaded eagerly (these should only
+  be imported by the tools that need them)
+
+Run:
+    python tests/benchmark_import_time.py [module ...]
+"""
+
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+DEFAULT_MODULES = [
+    "dq_agents.agent_registry",
+    "dq_agents.orchestrator.tools",
+    "dq_agents.identifier.agent",
+    "dq_agents.treatment.agent",
+    "dq_agents.remediator.agent",
+    "dq_agents.metrics.agent",
+    "data_science.sub_agents.bigquery.tools",
+]
+
+# Dependencies that should not be imported when a module is merely loaded
+HEAVY_MODULES = ["sklearn", "plotly", "opentelemetry.sdk", "vertexai", "scipy"]
+
+TOP_IMPORTS = 10
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """Parse ``-X importtime`` output into (module, self_us, cumulative_us) rows."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def profile_import(module: str) -> Dict:
+    """Import a module in a fresh interpreter and collect its import timings."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT, capture_output=True, text=True
+    )
+    rows = parse_importtime(completed.stderr)
+    loaded = {name for name, _, _ in rows}
+    target = next((cumulative for name, _, cumulative in rows if name == module), None)
+    return {
+        "module": module,
+        "ok": completed.returncode == 0,
+        "error": completed.stderr.strip().splitlines()[-1] if completed.returncode else None,
+        "cumulative_ms": target / 1000 if target is not None else None,
+        "slowest": sorted(rows, key=lambda r: r[2], reverse=True)[:TOP_IMPORTS],
+        "heavy_loaded": [h for h in HEAVY_MODULES if h in loaded]
+    }
+
+
+def main(modules: List[str]) -> None:
+    print("=" * 72)
+    print("Import-time benchmark (python -X importtime, fresh interpreter per module)")
+    print("=" * 72)
+
+    for module in modules:
+        result = profile_import(module)
+        print(f"\n📦 {module}")
+        if not result["ok"]:
+            print(f"   ❌ Import failed: {result['error']}")
+            continue
+        print(f"   Cumulative import time: {result['cumulative_ms']:.1f} ms")
+        if result["heavy_loaded"]:
+            print(f"   ⚠️ Heavy dependencies loaded eagerly: {', '.join(result['heavy_loaded'])}")
+        else:
+            print("   ✅ No heavy dependencies loaded eagerly")
+        print("   Slowest imports:")
+        for name, _, cumulative_us in result["slowest"]:
+            print(f"     {cumulative_us / 1000:>9.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or DEFAULT_MODULES)
@@ -0,0 +1,112 @@
+"""
+Benchmark: per-request overhead of data_science tracing.
+
+Simulates an agent request as a trace of nested spans (invocation, agent
+run, LLM calls and tool calls) and exports it through an exporter with a
+fixed network latency per export call. Compares the request wall time:
+- tracing off (no-op tracer)
+- the previous setup (SimpleSpanProcessor, synchronous export per span)
+- BatchSpanProcessor, alone and with head or tail sampling
+
+No LLM or network calls are made; the exporter latency is simulated.
+
+Run:
+    python tests/benchmark_tracing.py [requests] [exporter_latency_ms]
+"""
+
+import os
+import statistics
+import sys
+import time
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from opentelemetry import trace
+from opentelemetry.sdk import trace as trace_sdk
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor, SpanExporter, SpanExportResult
+
+from data_science.tracing import TracingConfig, build_tracer_provider
+
+# Spans per simulated request: LLM calls and tool calls under one agent run
+LLM_CALLS = 3
+TOOL_CALLS = 3
+
+
+class SlowExporter(SpanExporter):
+    """Exporter double that takes a fixed time per export call (a network round trip)."""
+
+    def __init__(self, latency_ms: float):
+        self.latency_s = latency_ms / 1000
+        self.exported = 0
+
+    def export(self, spans):
+        time.sleep(self.latency_s)
+        self.exported += len(spans)
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        pass
+
+
+def _request(tracer) -> float:
+    started = time.perf_counter()
+    with tracer.start_as_current_span("invocation"):
+        with tracer.start_as_current_span("agent_run [db_ds_multiagent]"):
+            for i in range(LLM_CALLS):
+                with tracer.start_as_current_span("call_llm"):
+                    pass
+                if i < TOOL_CALLS:
+                    with tracer.start_as_current_span("execute_tool call_bigquery_agent"):
+                        pass
+    return (time.perf_counter() - started) * 1000
+
+
+def _run(name, tracer, requests, provider=None, exporter=None):
+    samples = sorted(_request(tracer) for _ in range(requests))
+    if provider is not None:
+        provider.force_flush()
+        provider.shutdown()
+    return {
+        "mode": name,
+        "median_ms": statistics.median(samples),
+        "p95_ms": samples[int(len(samples) * 0.95) - 1],
+        "exported": exporter.exported if exporter else 0,
+    }
+
+
+def main(requests: int = 200, latency_ms: float = 20) -> None:
+    spans_per_request = 2 + LLM_CALLS + TOOL_CALLS
+    print("=" * 72)
+    print(f"Tracing overhead: {requests} requests x {spans_per_request} spans, "
+          f"exporter latency {latency_ms:g} ms per export call")
+    print("=" * 72)
+
+    results = [_run("off", trace.NoOpTracerProvider().get_tracer("bench"), requests)]
+
+    exporter = SlowExporter(latency_ms)
+    provider = trace_sdk.TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    results.append(_run("simple (previous)", provider.get_tracer("bench"), requests, provider, exporter))
+
+    for name, config in [
+        ("batch", TracingConfig()),
+        ("batch + head 10%", TracingConfig(sample_ratio=0.1)),
+        ("batch + tail (errors/slow)", TracingConfig(tail_sampling=True, tail_latency_ms=1000)),
+    ]:
+        exporter = SlowExporter(latency_ms)
+        provider = build_tracer_provider(config, exporter=exporter)
+        results.append(_run(name, provider.get_tracer("bench"), requests, provider, exporter))
+
+    baseline = results[0]["median_ms"]
+    print(f"{'mode':<28}{'median ms':>11}{'p95 ms':>10}{'overhead ms':>13}{'spans out':>11}")
+    for r in results:
+        print(f"{r['mode']:<28}{r['median_ms']:>11.3f}{r['p95_ms']:>10.3f}"
+              f"{r['median_ms'] - baseline:>13.3f}{r['exported']:>11}")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 20
+    )
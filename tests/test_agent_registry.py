@@ -0,0 +1,101 @@
+"""
+Test Agent Registry
+
+This script tests the process-wide cache of sub-agents:
+- Each agent is built once and shared by every caller
+- A change of ROOT_AGENT_MODEL or an explicit refresh rebuilds it
+- Background warm-up builds agents ahead of their first use
+- Every agent registers each of its tools once
+"""
+
+import ast
+import os
+import sys
+from types import SimpleNamespace
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from dq_agents import agent_registry
+from dq_agents.agent_registry import AGENT_FACTORIES, get_agent, refresh, register_agent, registry_stats
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+# The "module:factory" of the real agents, before the tests register their own
+BUILT_IN_FACTORIES = dict(AGENT_FACTORIES)
+
+
+def _counting_factory(builds):
+    def factory():
+        builds.append(os.getenv("ROOT_AGENT_MODEL"))
+        return SimpleNamespace(name="test_agent", model=os.getenv("ROOT_AGENT_MODEL"))
+    return factory
+
+
+def test_agent_is_built_once():
+    builds = []
+    register_agent("test", _counting_factory(builds))
+
+    first = get_agent("test")
+    second = get_agent("test")
+
+    assert first is second
+    assert len(builds) == 1
+    assert registry_stats()["test"]["hits"] == 1
+
+
+def test_config_change_and_refresh_rebuild():
+    builds = []
+    register_agent("test", _counting_factory(builds))
+    os.environ["ROOT_AGENT_MODEL"] = "model-a"
+
+    first = get_agent("test")
+    os.environ["ROOT_AGENT_MODEL"] = "model-b"
+    second = get_agent("test")
+    refresh(["test"])
+    third = get_agent("test")
+
+    assert builds == ["model-a", "model-b", "model-b"]
+    assert second.model == "model-b" and first is not second and second is not third
+
+
+def test_background_warm_up():
+    builds = []
+    register_agent("test", _counting_factory(builds))
+    # Wrapping in an AgentTool needs google.adk; record the agents that would be wrapped
+    wrapped = []
+    original = agent_registry.get_agent_tool
+    agent_registry.get_agent_tool = lambda name: wrapped.append(get_agent(name))
+    try:
+        thread = agent_registry.warm_up(["test"], background=True)
+        thread.join(timeout=5)
+    finally:
+        agent_registry.get_agent_tool = original
+
+    assert len(builds) == 1
+    assert wrapped == [get_agent("test")]
+
+
+def test_agents_register_each_tool_once():
+    # Read the tool lists from the factories' source: building the agents needs google.adk
+    for name, factory in BUILT_IN_FACTORIES.items():
+        module_name = factory.split(":")[0]
+        path = os.path.join(PROJECT_ROOT, *module_name.split(".")) + ".py"
+        with open(path) as f:
+            tree = ast.parse(f.read())
+        tool_lists = [
+            node.value for node in ast.walk(tree)
+            if isinstance(node, ast.keyword) and node.arg == "tools" and isinstance(node.value, ast.List)
+        ]
+        assert tool_lists, f"{name} agent has no tool list"
+        for tools in tool_lists:
+            tool_names = [ast.unparse(tool) for tool in tools.elts]
+            duplicates = {tool for tool in tool_names if tool_names.count(tool) > 1}
+            assert not duplicates, f"{name} agent registers {sorted(duplicates)} more than once"
+
+
+if __name__ == "__main__":
+    test_agent_is_built_once()
+    test_config_change_and_refresh_rebuild()
+    test_background_warm_up()
+    test_agents_register_each_tool_once()
+    print("✅ Agent registry tests passed!")
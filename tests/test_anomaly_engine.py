@@ -0,0 +1,274 @@
+"""
+Test Anomaly Engine
+
+This script tests the anomaly detection engine of the metrics agent:
+- Streaming top-k and column statistics matching a full in-memory pass
+- Scoring record batches in parallel with a stored model
+- Reuse of stored models per table and schema version
+- Training an IsolationForest on all numeric columns (NULLs included)
+- Choosing BigQuery ML for large tables, with the same result fields
+- BigQuery ML models kept in a scratch dataset; auto falling back to local on failure
+"""
+
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+import numpy as np
+import pyarrow as pa
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from google.api_core.exceptions import NotFound
+
+from dq_agents.cost_gate import clear_estimate_cache
+from dq_agents.metrics.anomaly_engine import (
+    AnomalyModel,
+    ColumnStats,
+    ModelStore,
+    TopK,
+    detect_anomalies,
+    fit_model,
+    load_or_train,
+    schema_version,
+    score_batches,
+    select_backend,
+    training_sample_sql
+)
+from environment.config_utils import get_anomaly_contamination_rate
+
+COLUMNS = ["premium", "sum_insured"]
+
+
+class Field:
+    def __init__(self, name, field_type, mode="NULLABLE"):
+        self.name = name
+        self.field_type = field_type
+        self.mode = mode
+
+
+SCHEMA = [Field("policy_id", "STRING"), Field("premium", "FLOAT"), Field("sum_insured", "INTEGER")]
+
+
+class DistanceModel:
+    """Scores rows by minus their distance from the origin (far away = anomalous)."""
+
+    def score_samples(self, X):
+        return -np.sqrt(np.nansum(X ** 2, axis=1))
+
+
+class UnusedClient:
+    def query(self, *args, **kwargs):
+        raise AssertionError("a stored model must not be retrained")
+
+
+def _batches(X, keys, rows_per_batch):
+    for start in range(0, len(X), rows_per_batch):
+        chunk = X[start:start + rows_per_batch]
+        yield pa.record_batch({
+            "policy_id": pa.array(keys[start:start + rows_per_batch]),
+            "premium": pa.array(chunk[:, 0], from_pandas=True),
+            "sum_insured": pa.array(chunk[:, 1], from_pandas=True),
+        })
+
+
+def _data(rows=5000):
+    rng = np.random.default_rng(7)
+    X = rng.normal(size=(rows, 2))
+    X[rng.choice(rows, 50, replace=False), 1] = np.nan
+    return X, [f"P{i:05d}" for i in range(rows)]
+
+
+def test_top_k_and_stats_match_full_pass():
+    X, _ = _data()
+    scores = -np.abs(X[:, 0])
+
+    top = TopK(10, 2)
+    stats = ColumnStats(2)
+    for start in range(0, len(X), 333):
+        chunk = slice(start, start + 333)
+        top.update(scores[chunk], np.arange(len(X))[chunk].astype(object), X[chunk])
+        stats.update(X[chunk])
+
+    top_scores, top_keys, _ = top.sorted()
+    assert list(top_keys) == list(np.argsort(scores, kind="stable")[:10])
+    assert np.allclose(top_scores, np.sort(scores)[:10])
+
+    summary = stats.summary(COLUMNS)
+    assert summary["premium"]["mean"] == round(float(X[:, 0].mean()), 2)
+    assert summary["sum_insured"]["std"] == round(float(np.nanstd(X[:, 1], ddof=1)), 2)
+    assert summary["sum_insured"]["max"] == round(float(np.nanmax(X[:, 1])), 2)
+
+
+def test_score_batches_keeps_output_shape():
+    X, keys = _data()
+    model = AnomalyModel(DistanceModel(), COLUMNS, "v1", threshold=-3.0, contamination=0.1, training_rows=100)
+
+    result = score_batches(model, _batches(X, keys, 700), key_column="policy_id", top_k=5, n_jobs=4)
+
+    distances = np.sqrt(np.nansum(X ** 2, axis=1))
+    assert result["total_rows_analyzed"] == len(X)
+    assert result["anomalies_detected"] == int((distances > 3.0).sum())
+    assert result["columns_analyzed"] == COLUMNS
+    assert [a["policy_id"] for a in result["top_anomalies"]] == [keys[i] for i in np.argsort(-distances)[:5]]
+    assert set(result["top_anomalies"][0]["values"]) == set(COLUMNS)
+    assert set(result["statistics"]) == set(COLUMNS)
+
+
+def test_stored_model_is_reused_per_schema_version():
+    store = ModelStore(tempfile.mkdtemp())
+    version = schema_version(SCHEMA)
+    model = AnomalyModel(DistanceModel(), COLUMNS, version, threshold=-3.0,
+                         contamination=get_anomaly_contamination_rate(), training_rows=100)
+    store.save("proj.ds.policies_week1", model)
+
+    loaded = load_or_train(UnusedClient(), "proj.ds.policies_week1", SCHEMA, store=store)
+    assert loaded.columns == COLUMNS
+    assert loaded.threshold == -3.0
+
+    changed_schema = SCHEMA + [Field("excess", "NUMERIC")]
+    assert store.load("proj.ds.policies_week1", schema_version(changed_schema)) is None
+
+
+def test_training_sample_is_stratified_by_null_pattern():
+    sql = training_sample_sql("proj.ds.policies_week1", COLUMNS, 10000, key_column="policy_id")
+    assert "PARTITION BY _stratum" in sql
+    assert "IF(`premium` IS NULL" in sql and "IF(`sum_insured` IS NULL" in sql
+    assert "FARM_FINGERPRINT(CAST(`policy_id` AS STRING))" in sql
+
+
+def test_fit_model_flags_outliers():
+    X, keys = _data(2000)
+    X[:5] = [[25.0, -30.0], [40.0, 0.0], [-35.0, 20.0], [50.0, np.nan], [30.0, 30.0]]
+
+    model = fit_model(X, COLUMNS, "v1", contamination=0.01, n_jobs=2)
+    result = score_batches(model, _batches(X, keys, 500), key_column="policy_id", top_k=10, n_jobs=2)
+
+    assert np.all(model.score(X[:5]) < model.threshold)
+    assert set(keys[:5]) <= {a["policy_id"] for a in result["top_anomalies"]}
+    assert 0 < result["anomalies_detected"] <= 0.02 * len(X)
+
+    store = ModelStore(tempfile.mkdtemp())
+    store.save("proj.ds.policies_week1", model)
+    assert np.allclose(store.load("proj.ds.policies_week1", "v1").score(X), model.score(X))
+
+
+class WarehouseClient:
+    """BigQuery client double for the BigQuery ML backend: records models and queries."""
+
+    def __init__(self, num_rows, fail_training=False):
+        self.table = SimpleNamespace(
+            project="proj", dataset_id="ds", table_id="policies_week1", schema=SCHEMA, num_rows=num_rows
+        )
+        self.fail_training = fail_training
+        self.datasets = {"proj.ds": "EU"}
+        self.models = set()
+        self.executed = []
+
+    def get_table(self, table_ref):
+        return self.table
+
+    def get_dataset(self, dataset_ref):
+        if dataset_ref not in self.datasets:
+            raise NotFound(dataset_ref)
+        return SimpleNamespace(location=self.datasets[dataset_ref])
+
+    def create_dataset(self, dataset, exists_ok=False):
+        self.datasets[f"{dataset.project}.{dataset.dataset_id}"] = dataset.location
+
+    def get_model(self, model_ref):
+        if model_ref not in self.models:
+            raise NotFound(model_ref)
+
+    def query(self, sql, job_config=None):
+        if job_config is not None and job_config.dry_run:
+            return SimpleNamespace(total_bytes_processed=0, referenced_tables=[])
+        self.executed.append(sql)
+        if "CREATE OR REPLACE MODEL" in sql:
+            if self.fail_training:
+                raise PermissionError("Access Denied: bigquery.models.create")
+            self.models.add(sql.split("`")[1])
+            return SimpleNamespace(result=lambda: [])
+        summary = {
+            "total_rows": 2000000, "anomalies": 3,
+            "top_anomalies": [
+                {"row_key": "P00042", "distance": 7.5, "feature_values": {"premium": 1e6, "sum_insured": None}},
+                {"row_key": "P00007", "distance": 4.25, "feature_values": {"premium": -5.0, "sum_insured": 3.0}},
+            ],
+            "_mean_0": 120.456, "_std_0": 10.0, "_min_0": -5.0, "_max_0": 1e6,
+            "_mean_1": 2.0, "_std_1": 1.0, "_min_1": 0.0, "_max_1": 3.0,
+        }
+        return SimpleNamespace(result=lambda: [summary])
+
+
+def test_backend_follows_table_size():
+    assert select_backend(10**7, "auto") == "bqml"
+    assert select_backend(5000, "auto") == "local"
+    assert select_backend(10**7, "local") == "local"
+    try:
+        select_backend(5000, "spark")
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+
+
+def test_bqml_backend_trains_once_and_keeps_output_shape():
+    clear_estimate_cache()
+    client = WarehouseClient(num_rows=2000000)
+
+    first = detect_anomalies(client, "proj.ds.policies_week1", key_column="policy_id", backend="bqml")
+    second = detect_anomalies(client, "proj.ds.policies_week1", key_column="policy_id", backend="bqml")
+
+    trainings = [sql for sql in client.executed if "CREATE OR REPLACE MODEL" in sql]
+    assert len(trainings) == 1 and "model_type = 'KMEANS'" in trainings[0]
+    assert "MODEL `proj.dq_models.dq_anomaly_kmeans_policies_week1_" in trainings[0]
+    assert client.datasets["proj.dq_models"] == "EU"
+    assert all("ML.DETECT_ANOMALIES" in sql for sql in client.executed[1:])
+    assert first["model"]["trained"] and not second["model"]["trained"]
+
+    assert second["total_rows_analyzed"] == 2000000
+    assert second["anomaly_rate"] == 0.0
+    assert second["columns_analyzed"] == COLUMNS
+    assert [a["policy_id"] for a in second["top_anomalies"]] == ["P00042", "P00007"]
+    assert second["top_anomalies"][0]["anomaly_score"] == -7.5
+    assert second["statistics"]["premium"]["mean"] == 120.46
+
+
+def test_auto_backend_falls_back_to_local_when_bqml_fails():
+    clear_estimate_cache()
+    client = WarehouseClient(num_rows=2000000, fail_training=True)
+    local_result = {"total_rows_analyzed": 10, "model": {"backend": "local"}}
+
+    from dq_agents.metrics import anomaly_engine
+    original = (anomaly_engine.load_or_train, anomaly_engine.score_batches)
+    anomaly_engine.load_or_train = lambda *args, **kwargs: AnomalyModel(
+        model=DistanceModel(), columns=COLUMNS, schema_version="v1",
+        threshold=-1.0, contamination=0.1, training_rows=10
+    )
+    anomaly_engine.score_batches = lambda entry, batches, key_column=None, top_k=10: dict(local_result)
+    try:
+        result = detect_anomalies(client, "proj.ds.policies_week1", key_column="policy_id", backend="auto")
+        try:
+            detect_anomalies(client, "proj.ds.policies_week1", key_column="policy_id", backend="bqml")
+            assert False, "expected PermissionError"
+        except PermissionError:
+            pass
+    finally:
+        anomaly_engine.load_or_train, anomaly_engine.score_batches = original
+
+    assert result["model"]["backend"] == "local"
+    assert "bigquery.models.create" in result["model"]["bqml_fallback"]
+
+
+if __name__ == "__main__":
+    test_top_k_and_stats_match_full_pass()
+    test_score_batches_keeps_output_shape()
+    test_stored_model_is_reused_per_schema_version()
+    test_training_sample_is_stratified_by_null_pattern()
+    test_fit_model_flags_outliers()
+    test_backend_follows_table_size()
+    test_bqml_backend_trains_once_and_keeps_output_shape()
+    test_auto_backend_falls_back_to_local_when_bqml_fails()
+    print("✅ Anomaly engine tests passed!")
@@ -0,0 +1,131 @@
+"""
+Test Batch Executor
+
+This script tests chunked, resumable fix execution without running DML:
+- UPDATE/DELETE statements are restricted to hash buckets of the row key
+- Completed chunks are checkpointed and skipped when a fix is re-run
+- Checkpoints are discarded once the table changed since the partial run
+- Every pending chunk is charged to the byte budget before the first one runs
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from dq_agents import cost_gate
+from dq_agents.cost_gate import ByteBudget, QueryCostExceeded
+from dq_agents.remediator import batch_executor
+from dq_agents.remediator.batch_executor import chunk_sql, run_chunked_dml
+
+FIX_SQL = "UPDATE `proj.dq.policies_week1` SET CUS_DOB = NULL WHERE CUS_DOB > CURRENT_DATE()"
+
+
+class ChunkClient:
+    """BigQuery client double: counts 250 affected rows, fails the chunks in fail_chunks.
+
+    Dry runs estimate 1 KB for the count and chunk_bytes for each chunk.
+    """
+
+    def __init__(self, fail_chunks=(), chunk_bytes=1024, modified=datetime(2026, 1, 1, 12, tzinfo=timezone.utc)):
+        self.fail_chunks = set(fail_chunks)
+        self.chunk_bytes = chunk_bytes
+        self.modified = modified
+        self.chunks_run = []
+
+    def get_table(self, table_ref):
+        return SimpleNamespace(modified=self.modified)
+
+    def query(self, sql, job_config=None):
+        if job_config is not None and job_config.dry_run:
+            num_bytes = 1024 if sql.startswith("SELECT COUNT(*)") else self.chunk_bytes
+            return SimpleNamespace(total_bytes_processed=num_bytes, referenced_tables=[])
+        if sql.startswith("SELECT COUNT(*)"):
+            return SimpleNamespace(result=lambda: iter([SimpleNamespace(total=250)]))
+
+        chunk = job_config.query_parameters[0].value
+        self.chunks_run.append(chunk)
+        started = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+        def result():
+            if chunk in self.fail_chunks:
+                raise RuntimeError("DML quota exceeded")
+
+        return SimpleNamespace(
+            result=result, num_dml_affected_rows=10, job_id=f"job_{chunk}",
+            started=started, ended=started + timedelta(milliseconds=1500), total_bytes_processed=1024
+        )
+
+
+def test_chunk_sql_adds_hash_bucket_filter():
+    sql = chunk_sql("UPDATE `p.d.t` t SET t.a = (SELECT 1 FROM x WHERE y) WHERE t.b > 0;", "CRL_KEY_POLICY_NO", 4)
+
+    assert sql == (
+        "UPDATE `p.d.t` AS t SET t.a = (SELECT 1 FROM x WHERE y) WHERE t.b > 0 "
+        "AND MOD(ABS(FARM_FINGERPRINT(CAST(t.CRL_KEY_POLICY_NO AS STRING))), 4) = @chunk"
+    )
+    assert chunk_sql("UPDATE `p.d.t` SET a = 1", "CUS_ID", 4) is None
+
+
+def test_failed_chunks_resume_from_checkpoint():
+    batch_executor.CHECKPOINT_DIR = tempfile.mkdtemp()
+
+    first = run_chunked_dml(ChunkClient(fail_chunks={1}), FIX_SQL, "CUS_ID", batch_size=100)
+    assert first["status"] == "partial"
+    assert first["num_chunks"] == 3
+    assert [c["chunk"] for c in first["failed_chunks"]] == [1]
+    # Both chunks ran side by side for 1.5 s: wall time, not the 3 s sum
+    assert first["execution_time_ms"] == 1500
+
+    client = ChunkClient()
+    second = run_chunked_dml(client, FIX_SQL, "CUS_ID", batch_size=100)
+    assert client.chunks_run == [1]
+    assert second["status"] == "success"
+    assert second["resumed_chunks"] == 2
+    assert second["affected_rows"] == 30
+    assert os.listdir(batch_executor.CHECKPOINT_DIR) == []
+
+
+def test_checkpoint_is_discarded_after_the_table_changed():
+    batch_executor.CHECKPOINT_DIR = tempfile.mkdtemp()
+    run_chunked_dml(ChunkClient(fail_chunks={1}), FIX_SQL, "CUS_ID", batch_size=100)
+
+    # A new weekly load since the partial run: every chunk runs again
+    client = ChunkClient(modified=datetime(2026, 1, 8, tzinfo=timezone.utc))
+    result = run_chunked_dml(client, FIX_SQL, "CUS_ID", batch_size=100)
+    assert sorted(client.chunks_run) == [0, 1, 2]
+    assert result["resumed_chunks"] == 0
+    assert result["affected_rows"] == 30
+
+
+def test_chunks_are_charged_per_chunk():
+    batch_executor.CHECKPOINT_DIR = tempfile.mkdtemp()
+    cost_gate.clear_estimate_cache()
+
+    budget = ByteBudget(limit_bytes=10**6)
+    result = run_chunked_dml(ChunkClient(chunk_bytes=1000), FIX_SQL, "CUS_ID", batch_size=100, budget=budget)
+    assert result["status"] == "success"
+    assert result["cost_estimate"]["charged_bytes"] == 3 * 1000
+    assert budget.spent_bytes == 1024 + 3 * 1000
+
+    # Three chunks of 400 KB do not fit in 1 MB, although one chunk would
+    cost_gate.clear_estimate_cache()
+    client = ChunkClient(chunk_bytes=400 * 1000)
+    try:
+        run_chunked_dml(client, FIX_SQL, "CUS_ID", batch_size=100, budget=ByteBudget(limit_bytes=10**6))
+        assert False, "expected QueryCostExceeded"
+    except QueryCostExceeded:
+        pass
+    assert client.chunks_run == []
+
+
+if __name__ == "__main__":
+    test_chunk_sql_adds_hash_bucket_filter()
+    test_failed_chunks_resume_from_checkpoint()
+    test_checkpoint_is_discarded_after_the_table_changed()
+    test_chunks_are_charged_per_chunk()
+    print("✅ Batch executor tests passed!")
@@ -0,0 +1,89 @@
+"""
+Test Cost Gate
+
+This script tests the dry-run cost gate run before generated queries:
+- Estimates are cached by SQL hash (one dry run per distinct query)
+- Queries over the per-query limit or the run byte budget are rejected
+- Executed queries get the per-query limit as maximum_bytes_billed
+"""
+
+import os
+import sys
+from types import SimpleNamespace
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from dq_agents import cost_gate
+from dq_agents.cost_gate import ByteBudget, QueryCostExceeded, estimate_query, run_query
+
+GB = 10**9
+
+
+class DryRunClient:
+    """BigQuery client double: dry runs report bytes_by_sql, real runs are recorded."""
+
+    def __init__(self, bytes_by_sql):
+        self.bytes_by_sql = bytes_by_sql
+        self.dry_runs = []
+        self.executed = []
+
+    def query(self, sql, job_config=None):
+        if job_config is not None and job_config.dry_run:
+            self.dry_runs.append(sql)
+            return SimpleNamespace(total_bytes_processed=self.bytes_by_sql[sql], referenced_tables=[])
+        self.executed.append((sql, job_config))
+        return SimpleNamespace(job_id="job_1")
+
+
+def test_estimates_are_cached_by_sql_hash():
+    cost_gate.clear_estimate_cache()
+    client = DryRunClient({"SELECT a FROM t": 2 * GB})
+
+    first = estimate_query(client, "SELECT a FROM t")
+    second = estimate_query(client, "SELECT a\n    FROM t")
+
+    assert client.dry_runs == ["SELECT a FROM t"]
+    assert first["bytes_processed"] == 2 * GB and not first["cached"]
+    assert second["cached"]
+
+
+def test_queries_over_limits_are_rejected():
+    cost_gate.clear_estimate_cache()
+    client = DryRunClient({"SELECT * FROM big": 50 * GB, "SELECT a FROM t": 4 * GB})
+
+    try:
+        run_query(client, "SELECT * FROM big", max_query_bytes=10 * GB)
+        assert False, "expected QueryCostExceeded"
+    except QueryCostExceeded as e:
+        assert e.estimate["bytes_processed"] == 50 * GB
+
+    budget = ByteBudget(limit_bytes=6 * GB)
+    run_query(client, "SELECT a FROM t", budget=budget, max_query_bytes=10 * GB)
+    try:
+        run_query(client, "SELECT a FROM t", budget=budget, max_query_bytes=10 * GB)
+        assert False, "expected QueryCostExceeded"
+    except QueryCostExceeded:
+        pass
+
+    assert budget.spent_bytes == 4 * GB
+    [(sql, job_config)] = client.executed
+    assert sql == "SELECT a FROM t" and job_config.maximum_bytes_billed == 10 * GB
+
+
+def test_session_budget_is_kept_in_tool_context_state():
+    cost_gate.clear_estimate_cache()
+    client = DryRunClient({"SELECT a FROM t": 3 * GB})
+    tool_context = SimpleNamespace(state={})
+
+    run_query(client, "SELECT a FROM t", tool_context=tool_context, max_query_bytes=0)
+    run_query(client, "SELECT a FROM t", tool_context=tool_context, max_query_bytes=0)
+
+    assert tool_context.state[cost_gate.STATE_KEY] == 6 * GB
+
+
+if __name__ == "__main__":
+    test_estimates_are_cached_by_sql_hash()
+    test_queries_over_limits_are_rejected()
+    test_session_budget_is_kept_in_tool_context_state()
+    print("✅ Cost gate tests passed!")
@@ -0,0 +1,93 @@
+"""
+Test Customer History Cache
+
+This script tests the treatment agent's customer history cache:
+- Repeated lookups are served without a new query
+- A write to a source table (new modified time) makes cached histories stale
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from dq_agents.treatment import tools
+
+LOADED = datetime(2026, 1, 5, tzinfo=timezone.utc)
+
+
+class HistoryClient:
+    """BigQuery client double: week tables with settable modified times, canned history rows."""
+
+    def __init__(self):
+        self.modified = {'policies_week1': LOADED, 'policies_week2': LOADED}
+        self.queries = []
+
+    def get_table(self, table_ref):
+        return SimpleNamespace(modified=self.modified[table_ref.split('.')[-1]])
+
+    def query(self, sql, job_config=None):
+        if job_config is not None and job_config.dry_run:
+            return SimpleNamespace(total_bytes_processed=0, referenced_tables=[])
+        self.queries.append(sql)
+        ids = job_config.query_parameters[0].values
+        rows = [{'CUS_ID': customer_id, 'fetch': len(self.queries)} for customer_id in ids]
+        return SimpleNamespace(result=lambda: rows)
+
+
+def _with_client(client, test):
+    original = (
+        tools.bigquery.Client, tools.get_partitioned_layout, tools.get_tables,
+        tools.get_customer_id_column, tools.fetch_arrow, tools.to_records
+    )
+    tools.bigquery.Client = lambda project=None: client
+    tools.get_partitioned_layout = lambda: None
+    tools.get_tables = lambda: ['policies_week1', 'policies_week2']
+    tools.get_customer_id_column = lambda: 'CUS_ID'
+    tools.fetch_arrow = tools.to_records = lambda rows: rows
+    os.environ.update(BQ_DATA_PROJECT_ID='proj', BQ_DATASET_ID='dq')
+    tools._customer_history_cache.clear()
+    try:
+        test()
+    finally:
+        (
+            tools.bigquery.Client, tools.get_partitioned_layout, tools.get_tables,
+            tools.get_customer_id_column, tools.fetch_arrow, tools.to_records
+        ) = original
+        tools._customer_history_cache.clear()
+
+
+def test_repeated_lookups_are_cached():
+    client = HistoryClient()
+
+    def run():
+        tools._fetch_customer_histories(['C1', 'C2'], True)
+        histories, cache_hits = tools._fetch_customer_histories(['C1', 'C2'], True)
+
+        assert cache_hits == 2 and len(client.queries) == 1
+        assert histories['C1'] == [{'CUS_ID': 'C1', 'fetch': 1}]
+
+    _with_client(client, run)
+
+
+def test_write_to_a_source_table_invalidates_the_cache():
+    client = HistoryClient()
+
+    def run():
+        tools._fetch_customer_histories(['C1'], True)
+        client.modified['policies_week2'] = LOADED + timedelta(minutes=5)  # e.g. execute_fix
+        histories, cache_hits = tools._fetch_customer_histories(['C1'], True)
+
+        assert cache_hits == 0 and len(client.queries) == 2
+        assert histories['C1'] == [{'CUS_ID': 'C1', 'fetch': 2}]
+
+    _with_client(client, run)
+
+
+if __name__ == "__main__":
+    test_repeated_lookups_are_cached()
+    test_write_to_a_source_table_invalidates_the_cache()
+    print("✅ Customer history cache tests passed!")
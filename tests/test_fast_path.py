@@ -0,0 +1,126 @@
+"""
+Test Orchestrator Fast Path
+
+This script tests the deterministic path for known rules and fixes:
+- Rule fingerprints ignore formatting, case, qualifiers and conjunct order
+- Auto-approved Knowledge Bank fixes are applied without any agent
+- Only issues without a Knowledge Bank match are left for the LLM agents
+"""
+
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+import pyarrow as pa
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from dq_agents import cost_gate, result_cache
+from dq_agents.orchestrator.fast_path import predicate_fingerprint, run_fast_path
+
+PATTERNS = {
+    "PREMIUM_NEGATIVE": {
+        "pattern": "POLI_GROSS_PMT < 0",
+        "description": "Premium amount is negative",
+        "historical_fixes": [{
+            "fix_id": "FIX_PREM_001", "success_rate": 0.9, "auto_approve": True,
+            "sql_template": "UPDATE {table} SET POLI_GROSS_PMT = ABS(POLI_GROSS_PMT) WHERE POLI_GROSS_PMT < 0"
+        }]
+    },
+    "DOB_FUTURE": {
+        "pattern": "CUS_DOB > CURRENT_DATE",
+        "description": "Date of birth is in the future",
+        "historical_fixes": [{
+            "fix_id": "FIX_DOB_001", "success_rate": 0.95, "auto_approve": False,
+            "sql_template": "UPDATE {table} SET CUS_DOB = NULL WHERE CUS_DOB > CURRENT_DATE()"
+        }]
+    }
+}
+
+RULES = [
+    {"rule_id": "COL_001", "sql": "SELECT * FROM {table} WHERE CUS_DOB > CURRENT_DATE()"},
+    {"rule_id": "COL_002", "sql": "SELECT * FROM {table} WHERE POLI_GROSS_PMT < 0"},
+    {"rule_id": "ATA_001", "sql": "SELECT * FROM {table} WHERE CUS_ID IS NULL"},
+    {"rule_id": "ATA_003", "sql": "SELECT * FROM {table} WHERE CUS_NI_NO = ''"},
+]
+
+
+class RuleClient:
+    """BigQuery client double: each rule finds the rows listed for its predicate."""
+
+    rows_by_predicate = {"CUS_DOB": 2, "POLI_GROSS_PMT": 3, "CUS_ID IS NULL": 1, "CUS_NI_NO": 0}
+
+    def get_table(self, table_ref):
+        return SimpleNamespace(modified=None)
+
+    def query(self, sql, job_config=None):
+        if job_config is not None and job_config.dry_run:
+            return SimpleNamespace(total_bytes_processed=1000, referenced_tables=[])
+
+        count = next(n for predicate, n in self.rows_by_predicate.items() if predicate in sql)
+        batch = pa.RecordBatch.from_pydict({"CUS_ID": [f"C{i}" for i in range(count)]})
+        rows = SimpleNamespace(
+            total_rows=count, schema=None,
+            to_arrow_iterable=lambda bqstorage_client=None: iter([batch])
+        )
+        return SimpleNamespace(
+            result=lambda timeout=None: rows, job_id="job_1", location="EU",
+            total_bytes_processed=1000, total_bytes_billed=10485760, slot_millis=40
+        )
+
+
+def test_fingerprint_ignores_formatting():
+    rule = predicate_fingerprint("SELECT * FROM {table} WHERE CUS_LIFE_STATUS = 'DCD' AND CUS_DEATH_DATE IS NULL")
+
+    assert rule == predicate_fingerprint(
+        "select t.* from `p.d.policies` t\n where t.cus_death_date is null and t.cus_life_status = 'DCD'"
+    )
+    assert rule == predicate_fingerprint(
+        "UPDATE {table} SET CUS_DEATH_DATE = NULL WHERE CUS_LIFE_STATUS = 'DCD' AND CUS_DEATH_DATE IS NULL"
+    )
+    assert rule != predicate_fingerprint("SELECT * FROM {table} WHERE CUS_LIFE_STATUS = 'dcd' AND CUS_DEATH_DATE IS NULL")
+    assert predicate_fingerprint("SELECT * FROM {table} a JOIN other b ON a.id = b.id WHERE a.x > 0") is None
+
+
+def test_known_rules_are_handled_without_agents():
+    cost_gate.clear_estimate_cache()
+    os.environ["RESULT_CACHE_DIR"] = tempfile.mkdtemp()
+    result_cache.clear_result_cache()
+    applied = []
+
+    def apply_fix(fix_sql, table_name):
+        applied.append((fix_sql, table_name))
+        return {"status": "success", "affected_rows": 3, "sql_executed": fix_sql}
+
+    result = run_fast_path(RuleClient(), RULES, "policies_week1", "proj", "dq", PATTERNS, apply_fix)
+
+    assert applied == [(PATTERNS["PREMIUM_NEGATIVE"]["historical_fixes"][0]["sql_template"], "policies_week1")]
+    assert [i["rule_id"] for i in result["auto_fixed"]] == ["COL_002"]
+    assert result["auto_fixed"][0]["affected_rows"] == 3
+    assert [i["rule_id"] for i in result["kb_suggested"]] == ["COL_001"]
+    assert [i["rule_id"] for i in result["unmatched"]] == ["ATA_001"]
+    assert result["unmatched"][0]["issue_count"] == 1
+    assert result["clean"] == ["ATA_003"]
+    assert result["rules_executed"] == 4 and result["fixes_applied"] == 1
+
+
+def test_failed_auto_fix_falls_back_to_review():
+    cost_gate.clear_estimate_cache()
+    result_cache.clear_result_cache()
+
+    result = run_fast_path(
+        RuleClient(), RULES[1:2], "policies_week1", "proj", "dq", PATTERNS,
+        lambda fix_sql, table_name: {"status": "rejected", "error": "over byte limit"}
+    )
+
+    assert result["auto_fixed"] == []
+    assert result["kb_suggested"][0]["auto_fix_error"] == "over byte limit"
+
+
+if __name__ == "__main__":
+    test_fingerprint_ignores_formatting()
+    test_known_rules_are_handled_without_agents()
+    test_failed_auto_fix_falls_back_to_review()
+    print("✅ Fast path tests passed!")
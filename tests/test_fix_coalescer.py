@@ -0,0 +1,66 @@
+"""
+Test Fix Coalescer
+
+This script tests merging of approved fixes into fewer table rewrites:
+- Independent UPDATEs become one UPDATE ... SET col = CASE ...
+- Fixes that depend on each other's columns stay separate, in order
+- Columns set by more than one merged fix are reported as conflicts
+"""
+
+import os
+import sys
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from dq_agents.remediator.fix_coalescer import coalesce_fixes
+
+TABLE = "`proj.dq.policies_week1`"
+
+
+def test_independent_fixes_are_merged():
+    plan = coalesce_fixes([
+        f"UPDATE {TABLE} SET CUS_DOB = NULL WHERE CUS_DOB > CURRENT_DATE()",
+        f"UPDATE {TABLE} t SET t.CUS_SURNAME = UPPER(t.CUS_SURNAME) WHERE t.CUS_SURNAME <> UPPER(t.CUS_SURNAME)",
+    ])
+
+    assert plan["rewrites_saved"] == 1
+    assert plan["conflicts"] == []
+    [statement] = plan["statements"]
+    assert statement["fixes"] == [0, 1] and statement["coalesced"]
+    assert statement["sql"].startswith(f"UPDATE {TABLE} SET")
+    assert "CUS_DOB = CASE\n        WHEN CUS_DOB > CURRENT_DATE THEN NULL\n        ELSE CUS_DOB\n    END" in statement["sql"]
+    assert "WHERE (CUS_DOB > CURRENT_DATE)\n    OR (CUS_SURNAME <> UPPER(CUS_SURNAME))" in statement["sql"]
+
+
+def test_dependent_fixes_and_deletes_stay_separate():
+    plan = coalesce_fixes([
+        f"UPDATE {TABLE} SET CUS_DOB = NULL WHERE CUS_DOB > CURRENT_DATE()",
+        f"UPDATE {TABLE} SET POLICY_STATUS = 'REVIEW' WHERE CUS_DOB IS NULL",  # reads CUS_DOB
+        f"DELETE FROM {TABLE} WHERE CUS_ID IS NULL",
+    ])
+
+    assert [s["fixes"] for s in plan["statements"]] == [[0], [1], [2]]
+    assert plan["rewrites_saved"] == 0
+
+
+def test_same_column_conflict_later_fix_wins():
+    plan = coalesce_fixes([
+        f"UPDATE {TABLE} SET POLICY_STATUS = 'LAPSED' WHERE PREMIUM_DUE < 0",
+        f"UPDATE {TABLE} SET POLICY_STATUS = 'CANCELLED' WHERE CANCEL_DATE IS NOT NULL",
+    ])
+
+    [statement] = plan["statements"]
+    assert statement["sql"].index("THEN 'CANCELLED'") < statement["sql"].index("THEN 'LAPSED'")
+    assert plan["conflicts"] == [{
+        "column": "policy_status",
+        "fixes": [0, 1],
+        "resolution": "fix 1 wins on rows matched by more than one fix"
+    }]
+
+
+if __name__ == "__main__":
+    test_independent_fixes_are_merged()
+    test_dependent_fixes_and_deletes_stay_separate()
+    test_same_column_conflict_later_fix_wins()
+    print("✅ Fix coalescer tests passed!")
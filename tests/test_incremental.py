@@ -0,0 +1,146 @@
+"""
+Test Incremental Rule Execution
+
+This script tests per-rule watermarks for incremental DQ rule runs:
+- Unchanged tables return the stored result without a scan
+- Appended rows are evaluated alone and merged into the stored violations
+- Both modes count violating rows, not distinct keys
+- UPDATE/DELETE jobs (ignored by APPENDS) force a full run
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pyarrow as pa
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from dq_agents import incremental
+from dq_agents.cost_gate import clear_estimate_cache
+from dq_agents.incremental import run_rule_incremental
+
+RULE = "SELECT CUS_ID FROM {table} WHERE CUS_DOB > CURRENT_DATE()"
+TABLE_REF = "proj.dq.policies_week1"
+T0 = datetime(2026, 1, 5, tzinfo=timezone.utc)
+
+
+def _table_id(ref):
+    project, dataset_id, table_id = ref.split(".")
+    return SimpleNamespace(project=project, dataset_id=dataset_id, table_id=table_id)
+
+
+class ChangingTableClient:
+    """BigQuery client double: a table whose violations and job history the test sets."""
+
+    def __init__(self):
+        self.modified = T0
+        self.num_rows = 100
+        self.full_violations = []
+        self.appended_violations = []
+        self.jobs = []
+        self.executed = []
+
+    def get_table(self, table_ref):
+        return SimpleNamespace(modified=self.modified, num_rows=self.num_rows)
+
+    def list_jobs(self, project=None, all_users=False, min_creation_time=None):
+        if isinstance(self.jobs, Exception):
+            raise self.jobs
+        return self.jobs
+
+    def query(self, sql, job_config=None):
+        if job_config is not None and job_config.dry_run:
+            return SimpleNamespace(total_bytes_processed=0, referenced_tables=[])
+        self.executed.append(sql)
+        keys = self.appended_violations if "APPENDS(" in sql else self.full_violations
+        table = pa.table({"CUS_ID": pa.array(keys, pa.string())})
+        rows = SimpleNamespace(
+            total_rows=len(keys),
+            schema=[SimpleNamespace(name="CUS_ID")],
+            to_arrow_iterable=lambda bqstorage_client=None: iter(table.to_batches()),
+        )
+        return SimpleNamespace(result=lambda: rows, destination=table, job_id="job_1")
+
+    def list_rows(self, destination, selected_fields=None):
+        return SimpleNamespace(to_arrow=lambda create_bqstorage_client=False: destination)
+
+
+def _run(client):
+    return run_rule_incremental(client, RULE, "proj", "dq", "policies_week1", key_column="CUS_ID")
+
+
+def _setup():
+    clear_estimate_cache()
+    incremental.WATERMARK_FILE = os.path.join(tempfile.mkdtemp(), "dq_watermarks.json")
+    client = ChangingTableClient()
+    client.full_violations = ["C1", "C2"]
+    first = _run(client)
+    assert (first["mode"], first["issue_count"]) == ("full", 2)
+    return client
+
+
+def test_unchanged_table_is_not_scanned():
+    client = _setup()
+    result = _run(client)
+
+    assert (result["mode"], result["issue_count"]) == ("unchanged", 2)
+    assert len(client.executed) == 1
+
+
+def test_appends_are_merged_into_stored_violations():
+    client = _setup()
+    client.modified = T0 + timedelta(hours=1)
+    client.num_rows = 120
+    client.appended_violations = ["C3"]
+
+    result = _run(client)
+
+    assert (result["mode"], result["issue_count"], result["new_violations"]) == ("appends", 3, 1)
+    assert "APPENDS(TABLE `proj.dq.policies_week1`" in client.executed[-1]
+
+
+def test_appends_count_rows_like_a_full_run():
+    client = _setup()
+    client.modified = T0 + timedelta(hours=1)
+    client.num_rows = 120
+    # A new policy of the already flagged customer C1 violates the rule too
+    client.appended_violations = ["C1"]
+
+    result = _run(client)
+
+    assert (result["mode"], result["issue_count"]) == ("appends", 3)
+
+
+def test_update_since_watermark_forces_full_run():
+    client = _setup()
+    # A fix updated C1 and C2 (APPENDS would not show that), then C3 arrived
+    client.modified = T0 + timedelta(hours=1)
+    client.jobs = [SimpleNamespace(statement_type="UPDATE", destination=None, referenced_tables=[_table_id(TABLE_REF)])]
+    client.full_violations = ["C3"]
+    client.appended_violations = ["C3"]
+
+    result = _run(client)
+
+    assert (result["mode"], result["issue_count"]) == ("full", 1)
+    assert not any("APPENDS(" in sql for sql in client.executed)
+
+
+def test_unreadable_job_history_forces_full_run():
+    client = _setup()
+    client.modified = T0 + timedelta(hours=1)
+    client.jobs = PermissionError("bigquery.jobs.listAll denied")
+
+    assert _run(client)["mode"] == "full"
+
+
+if __name__ == "__main__":
+    test_unchanged_table_is_not_scanned()
+    test_appends_are_merged_into_stored_violations()
+    test_appends_count_rows_like_a_full_run()
+    test_update_since_watermark_forces_full_run()
+    test_unreadable_job_history_forces_full_run()
+    print("✅ Incremental execution tests passed!")
@@ -0,0 +1,177 @@
+"""
+Test Agent Instrumentation
+
+This script tests the per-tool and per-model-call instrumentation:
+- Tool wall time, response tokens and BigQuery job stats per call
+- Jobs run on worker threads attributed to the calling tool
+- Nested tool calls (orchestrator -> sub-agent) keeping their own jobs
+- Model token usage, Prometheus rendering and the /metrics endpoint
+- Tool and model calls that raise closed as errors, with nothing left open
+- Agents keeping their own callbacks when instrumented
+"""
+
+import os
+import sys
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from dq_agents import instrumentation
+from dq_agents.instrumentation import (
+    after_model,
+    after_tool,
+    before_model,
+    before_tool,
+    instrument_agent,
+    metrics_snapshot,
+    on_model_error,
+    on_tool_error,
+    propagate_context,
+    render_prometheus,
+    reset_metrics,
+    start_metrics_server,
+    track_job,
+)
+
+
+def _job(bytes_processed, slot_ms, cache_hit=False):
+    return SimpleNamespace(
+        total_bytes_processed=bytes_processed, total_bytes_billed=bytes_processed,
+        slot_millis=slot_ms, cache_hit=cache_hit
+    )
+
+
+def _context(agent, call_id):
+    return SimpleNamespace(agent_name=agent, function_call_id=call_id)
+
+
+def _counter(name, **labels):
+    key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+    return metrics_snapshot()["counters"].get(key, 0)
+
+
+def test_tool_call_records_jobs_from_worker_threads():
+    reset_metrics()
+    tool, context = SimpleNamespace(name="execute_dq_rule"), _context("identifier_agent", "call_1")
+
+    before_tool(tool, {}, context)
+    track_job(_job(1000, 40))
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        list(executor.map(propagate_context(lambda n: track_job(_job(n, 10, cache_hit=True))), [200, 300]))
+    after_tool(tool, {}, context, '{"rows": [1, 2, 3]}')
+
+    labels = {"agent": "identifier_agent", "tool": "execute_dq_rule"}
+    assert _counter("dq_tool_calls_total", status="ok", **labels) == 1
+    assert _counter("dq_tool_bq_bytes_processed_total", **labels) == 1500
+    assert _counter("dq_tool_bq_slot_ms_total", **labels) == 60
+    assert _counter("dq_tool_bq_jobs_total", cache_hit="true", **labels) == 2
+    assert _counter("dq_tool_response_tokens_total", **labels) == 5
+
+    # Jobs outside any tool call are not attributed
+    track_job(_job(5000, 5))
+    assert _counter("dq_tool_bq_bytes_processed_total", **labels) == 1500
+
+
+def test_nested_tool_calls_keep_their_own_jobs():
+    reset_metrics()
+    outer, outer_ctx = SimpleNamespace(name="identifier_agent"), _context("orchestrator_agent", "outer")
+    inner, inner_ctx = SimpleNamespace(name="execute_dq_rule"), _context("identifier_agent", "inner")
+
+    before_tool(outer, {}, outer_ctx)
+    before_tool(inner, {}, inner_ctx)
+    track_job(_job(100, 1))
+    after_tool(inner, {}, inner_ctx, "{}")
+    track_job(_job(7, 1))
+    after_tool(outer, {}, outer_ctx, {"error": "failed"})
+
+    assert _counter("dq_tool_bq_bytes_processed_total", agent="identifier_agent", tool="execute_dq_rule") == 100
+    assert _counter("dq_tool_bq_bytes_processed_total", agent="orchestrator_agent", tool="identifier_agent") == 7
+    assert _counter("dq_tool_calls_total", agent="orchestrator_agent", tool="identifier_agent", status="error") == 1
+
+
+def test_model_tokens_and_prometheus_endpoint():
+    reset_metrics()
+    context = SimpleNamespace(agent_name="treatment_agent", invocation_id="inv_1")
+    before_model(context, SimpleNamespace(model="gemini-2.0-flash"))
+    after_model(context, SimpleNamespace(partial=True, usage_metadata=None, error_message=None))
+    after_model(context, SimpleNamespace(
+        partial=False, error_message=None,
+        usage_metadata=SimpleNamespace(prompt_token_count=1200, candidates_token_count=300)
+    ))
+
+    labels = {"agent": "treatment_agent", "model": "gemini-2.0-flash"}
+    assert _counter("dq_model_calls_total", status="ok", **labels) == 1
+    assert _counter("dq_model_tokens_total", direction="input", **labels) == 1200
+    assert _counter("dq_model_tokens_total", direction="output", **labels) == 300
+
+    text = render_prometheus()
+    assert "# TYPE dq_model_duration_seconds histogram" in text
+    assert 'dq_model_tokens_total{agent="treatment_agent",direction="output",model="gemini-2.0-flash"} 300' in text
+    assert 'dq_model_duration_seconds_bucket{agent="treatment_agent",model="gemini-2.0-flash",le="+Inf"} 1' in text
+
+    instrumentation._server_attempted = False
+    server = start_metrics_server(0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        assert urllib.request.urlopen(url, timeout=5).read().decode("utf-8") == text
+    finally:
+        server.shutdown()
+
+
+def test_raised_errors_close_the_call():
+    reset_metrics()
+    ended = []
+    original = (instrumentation._start_span, instrumentation._end_span)
+    instrumentation._start_span = lambda name, attributes: name
+    instrumentation._end_span = lambda span, attributes, error=None: ended.append((span, error))
+    try:
+        tool, context = SimpleNamespace(name="execute_fix"), _context("remediator_agent", "call_err")
+        before_tool(tool, {}, context)
+        track_job(_job(100, 1))
+        on_tool_error(tool, {}, context, TimeoutError("job timed out"))
+
+        model_context = SimpleNamespace(agent_name="remediator_agent", invocation_id="inv_err")
+        before_model(model_context, SimpleNamespace(model="gemini-2.0-flash"))
+        on_model_error(model_context, None, RuntimeError("quota exceeded"))
+    finally:
+        instrumentation._start_span, instrumentation._end_span = original
+
+    assert instrumentation._open_calls == {}
+    assert instrumentation._current_call.get() is None
+    assert ended == [
+        ("dq.tool execute_fix", "TimeoutError: job timed out"),
+        ("dq.model remediator_agent", "RuntimeError: quota exceeded"),
+    ]
+    assert _counter("dq_tool_calls_total", agent="remediator_agent", tool="execute_fix", status="error") == 1
+    assert _counter("dq_tool_bq_bytes_processed_total", agent="remediator_agent", tool="execute_fix") == 100
+    assert _counter("dq_model_calls_total", agent="remediator_agent", model="gemini-2.0-flash", status="error") == 1
+
+
+def test_agent_keeps_its_own_callbacks():
+    def cache_results(tool, args, tool_context, tool_response):
+        return None
+
+    agent = SimpleNamespace(
+        before_tool_callback=None, after_tool_callback=cache_results,
+        before_model_callback=None, after_model_callback=None,
+        on_tool_error_callback=None, on_model_error_callback=None
+    )
+    instrument_agent(agent)
+    instrument_agent(agent)
+
+    assert agent.before_tool_callback is before_tool
+    assert agent.after_tool_callback == [after_tool, cache_results]
+    assert agent.on_tool_error_callback is on_tool_error
+    assert agent.on_model_error_callback is on_model_error
+
+
+if __name__ == "__main__":
+    test_tool_call_records_jobs_from_worker_threads()
+    test_nested_tool_calls_keep_their_own_jobs()
+    test_model_tokens_and_prometheus_endpoint()
+    test_raised_errors_close_the_call()
+    test_agent_keeps_its_own_callbacks()
+    print("✅ Instrumentation tests passed!")
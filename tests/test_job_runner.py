@@ -0,0 +1,131 @@
+"""
+Test Background Job Runner
+
+This script tests out-of-band execution of orchestrator workflows:
+- Several workflows running concurrently
+- Event streams persisted as they arrive and read incrementally
+- Failed and cancelled jobs
+- Jobs of a dead process reported as interrupted
+- Session inputs (uploaded rules) handed to the worker as initial state
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from dq_agents.job_runner import JobRunner, JobStore
+
+
+def _event(author, text=None, tool=None, final=False):
+    parts = []
+    if text:
+        parts.append(SimpleNamespace(text=text, function_call=None))
+    if tool:
+        parts.append(SimpleNamespace(text=None, function_call=SimpleNamespace(name=tool)))
+    return SimpleNamespace(author=author, content=SimpleNamespace(parts=parts), is_final_response=lambda: final)
+
+
+def _store():
+    return JobStore(os.path.join(tempfile.mkdtemp(), "jobs.db"))
+
+
+def _wait(runner, job_id, timeout=5):
+    deadline = time.time() + timeout
+    while runner.get_job(job_id)["status"] in ("queued", "running"):
+        assert time.time() < deadline, "job did not finish"
+        time.sleep(0.01)
+    return runner.get_job(job_id)
+
+
+def test_workflows_run_concurrently_and_persist_events():
+    both_started = threading.Barrier(2, timeout=5)
+
+    def run_fn(prompt, user_id, state):
+        yield _event("orchestrator_agent", tool="identifier_agent")
+        both_started.wait()
+        yield _event("orchestrator_agent", text=f"Summary for {prompt}", final=True)
+
+    runner = JobRunner(_store(), max_workers=2, run_fn=run_fn)
+    first = runner.submit("policies_week1", label="Full workflow: policies_week1")
+    second = runner.submit("policies_week2")
+
+    for job_id, prompt in ((first, "policies_week1"), (second, "policies_week2")):
+        job = _wait(runner, job_id)
+        assert job["status"] == "succeeded"
+        assert job["event_count"] == 2
+        assert job["final_text"] == f"Summary for {prompt}"
+
+    events = runner.get_events(first)
+    assert [e["seq"] for e in events] == [1, 2]
+    assert events[0]["tool_calls"] == ["identifier_agent"]
+    assert events[1]["is_final"] is True
+    assert [e["seq"] for e in runner.get_events(first, after_seq=1)] == [2]
+    assert runner.list_jobs()[0]["job_id"] == second
+
+
+def test_failed_and_cancelled_jobs():
+    release = threading.Event()
+
+    def failing(prompt, user_id, state):
+        yield _event("orchestrator_agent", text="Starting")
+        raise RuntimeError("quota exceeded")
+
+    def slow(prompt, user_id, state):
+        for i in range(100):
+            release.wait(5)
+            yield _event("orchestrator_agent", text=f"step {i}")
+
+    store = _store()
+    runner = JobRunner(store, run_fn=failing)
+    job = _wait(runner, runner.submit("x"))
+    assert job["status"] == "failed"
+    assert job["error"].startswith("quota exceeded")
+    assert job["final_text"] == "Starting"
+
+    runner = JobRunner(store, run_fn=slow)
+    job_id = runner.submit("y")
+    runner.cancel(job_id)
+    release.set()
+    job = _wait(runner, job_id)
+    assert job["status"] == "cancelled"
+    assert job["event_count"] <= 1
+
+
+def test_jobs_of_dead_process_are_interrupted():
+    store = _store()
+    store.create("job_1", "prompt", "user", None)
+    store.update("job_1", status="running", pid=2 ** 22 + 1)
+    store.create("job_2", "prompt", "user", None)
+
+    assert store.mark_interrupted() == 1
+    assert store.get("job_1")["status"] == "interrupted"
+    assert store.get("job_2")["status"] == "queued"
+
+
+def test_submitted_state_reaches_the_worker():
+    uploaded = [{"rule_id": "R1", "sql": "SELECT 1"}]
+    seen = {}
+
+    def run_fn(prompt, user_id, state):
+        seen.update(state)
+        yield _event("orchestrator_agent", text="done", final=True)
+
+    runner = JobRunner(_store(), run_fn=run_fn)
+    job = _wait(runner, runner.submit("policies_week1", state={"uploaded_dq_rules": uploaded}))
+
+    assert job["status"] == "succeeded"
+    assert seen == {"uploaded_dq_rules": uploaded}
+
+
+if __name__ == "__main__":
+    test_workflows_run_concurrently_and_persist_events()
+    test_failed_and_cancelled_jobs()
+    test_jobs_of_dead_process_are_interrupted()
+    test_submitted_state_reaches_the_worker()
+    print("✅ Job runner tests passed!")
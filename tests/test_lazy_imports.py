@@ -0,0 +1,59 @@
+"""
+Test Lazy Imports
+
+This script tests the deferred import helper used for heavy dependencies:
+- A lazily imported module is not executed until an attribute is used
+- Already imported modules are returned as they are
+- Heavy dependencies stay out of a fresh interpreter's imports
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from dq_agents.lazy_imports import lazy_import
+from tests.benchmark_import_time import parse_importtime
+
+
+def test_module_runs_on_first_attribute_access():
+    module_dir = tempfile.mkdtemp()
+    with open(os.path.join(module_dir, "slow_dependency.py"), "w") as f:
+        f.write("import builtins\nbuiltins.slow_dependency_loads = getattr(builtins, 'slow_dependency_loads', 0) + 1\n"
+                "VALUE = 42\n")
+    sys.path.insert(0, module_dir)
+    import builtins
+
+    module = lazy_import("slow_dependency")
+    assert getattr(builtins, "slow_dependency_loads", 0) == 0
+
+    assert module.VALUE == 42
+    assert builtins.slow_dependency_loads == 1
+    assert lazy_import("slow_dependency") is sys.modules["slow_dependency"]
+
+
+def test_already_imported_module_is_returned():
+    assert lazy_import("json") is sys.modules["json"]
+
+
+def test_lazy_import_keeps_dependency_out_of_cold_start():
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c",
+         "from dq_agents.lazy_imports import lazy_import; lazy_import('email.mime.text')"],
+        cwd=os.path.abspath(os.path.join(os.path.dirname(__file__), '..')),
+        capture_output=True, text=True, check=True
+    )
+    loaded = {name for name, _, _ in parse_importtime(completed.stderr)}
+
+    assert "dq_agents.lazy_imports" in loaded
+    assert "email.mime.base" not in loaded
+
+
+if __name__ == "__main__":
+    test_module_runs_on_first_attribute_access()
+    test_already_imported_module_is_returned()
+    test_lazy_import_keeps_dependency_out_of_cold_start()
+    print("✅ Lazy import tests passed!")
@@ -0,0 +1,121 @@
+"""
+Test Result Cache
+
+This script tests the client-side cache of query result samples:
+- Re-running the same rule (formatted differently) is served without a job
+- Modifying a referenced table invalidates the cached result
+- Entries survive a cleared memory tier via the disk tier
+- Queries using the current time (with or without parentheses) are never cached
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pyarrow as pa
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from dq_agents import cost_gate, result_cache
+from dq_agents.result_cache import cached_sample
+
+TABLE = "proj.dq.policies_week1"
+
+
+class CacheClient:
+    """BigQuery client double: every real query returns 3 violating rows."""
+
+    def __init__(self):
+        self.modified = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        self.jobs = 0
+
+    def get_table(self, table_ref):
+        return SimpleNamespace(modified=self.modified)
+
+    def query(self, sql, job_config=None):
+        if job_config is not None and job_config.dry_run:
+            table = SimpleNamespace(project="proj", dataset_id="dq", table_id="policies_week1")
+            return SimpleNamespace(total_bytes_processed=1000, referenced_tables=[table])
+
+        self.jobs += 1
+        batch = pa.RecordBatch.from_pydict({"CUS_ID": ["C1", "C2", "C3"]})
+        rows = SimpleNamespace(
+            total_rows=3, schema=None,
+            to_arrow_iterable=lambda bqstorage_client=None: iter([batch])
+        )
+        return SimpleNamespace(
+            result=lambda timeout=None: rows, job_id=f"job_{self.jobs}", location="EU",
+            total_bytes_processed=1000, total_bytes_billed=10485760, slot_millis=40
+        )
+
+
+def _fresh_cache():
+    cost_gate.clear_estimate_cache()
+    os.environ["RESULT_CACHE_DIR"] = tempfile.mkdtemp()
+    result_cache.clear_result_cache()
+
+
+def test_repeated_rule_is_served_from_cache():
+    _fresh_cache()
+    client = CacheClient()
+
+    first = cached_sample(client, f"SELECT CUS_ID FROM `{TABLE}` WHERE CUS_DOB IS NULL", limit=10)
+    second = cached_sample(client, f"select CUS_ID\n  from `{TABLE}`\n  where CUS_DOB is null", limit=2)
+
+    assert client.jobs == 1
+    assert not first["cached"] and second["cached"]
+    assert second["total_rows"] == 3 and second["rows"] == [{"CUS_ID": "C1"}, {"CUS_ID": "C2"}]
+    assert second["job_id"] == "job_1"
+
+
+def test_table_modification_invalidates_entry():
+    _fresh_cache()
+    client = CacheClient()
+    sql = f"SELECT CUS_ID FROM `{TABLE}` WHERE CUS_DOB IS NULL"
+
+    cached_sample(client, sql, limit=10)
+    client.modified = datetime(2026, 1, 2, tzinfo=timezone.utc)
+    cached_sample(client, sql, limit=10)
+
+    assert client.jobs == 2
+
+
+def test_disk_tier_serves_after_memory_is_cleared():
+    _fresh_cache()
+    client = CacheClient()
+    sql = f"SELECT CUS_ID FROM `{TABLE}` WHERE CUS_DOB IS NULL"
+
+    cached_sample(client, sql, limit=10)
+    result_cache._memory.clear()
+    again = cached_sample(client, sql, limit=10)
+
+    assert client.jobs == 1 and again["cached"]
+    assert [r["CUS_ID"] for r in again["rows"]] == ["C1", "C2", "C3"]
+
+
+def test_current_time_queries_are_not_cached():
+    _fresh_cache()
+    client = CacheClient()
+
+    for sql in (
+        f"SELECT CUS_ID FROM `{TABLE}` WHERE end_ts < CURRENT_TIMESTAMP",
+        f"SELECT CUS_ID FROM `{TABLE}` WHERE end_ts < current_timestamp()",
+        f"SELECT CUS_ID FROM `{TABLE}` WHERE end_dt < CURRENT_DATETIME",
+    ):
+        cached_sample(client, sql, limit=10)
+        again = cached_sample(client, sql, limit=10)
+        assert not again["cached"]
+
+    assert client.jobs == 6
+    assert result_cache.cache_key(client, f"SELECT current_timestamp_col FROM `{TABLE}`") is not None
+
+
+if __name__ == "__main__":
+    test_repeated_rule_is_served_from_cache()
+    test_table_modification_invalidates_entry()
+    test_disk_tier_serves_after_memory_is_cleared()
+    test_current_time_queries_are_not_cached()
+    print("✅ Result cache tests passed!")
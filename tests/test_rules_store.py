@@ -0,0 +1,102 @@
+"""
+Test Rules Store
+
+This script tests the per-table store of generated DQ rules:
+- Lookups and replacement of one table's rules
+- Invalidation when the table schema changes
+- One-time import of the legacy JSON cache
+- Concurrent writers not losing each other's tables
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from dq_agents.rules_store import RulesStore, schema_hash
+
+SCHEMA_V1 = [("CUS_ID", "STRING"), ("CUS_DOB", "DATE")]
+SCHEMA_V2 = [("CUS_ID", "STRING"), ("CUS_DOB", "STRING")]
+
+DOB_RULE = {"rule_id": "DQ_001", "sql": "SELECT * FROM {table} WHERE CUS_DOB > CURRENT_DATE()"}
+ID_RULE = {"rule_id": "DQ_002", "sql": "SELECT * FROM {table} WHERE CUS_ID IS NULL"}
+
+
+def _store_path():
+    return os.path.join(tempfile.mkdtemp(), "rules.db")
+
+
+def test_put_get_and_delete():
+    store = RulesStore(_store_path(), legacy_path=None)
+    store.put("policies_week1", [DOB_RULE])
+    store.put("policies_week1", [DOB_RULE, ID_RULE])
+
+    cached = store.get("policies_week1")
+    assert cached["rules"] == [DOB_RULE, ID_RULE]
+    assert cached["rule_count"] == 2
+    assert store.get("policies_week2") is None
+    assert list(store.entries()) == ["policies_week1"]
+
+    assert store.delete("policies_week1") is True
+    assert store.delete("policies_week1") is False
+    assert store.get("policies_week1") is None
+
+
+def test_schema_change_invalidates_rules():
+    v1, v2 = schema_hash(SCHEMA_V1), schema_hash(SCHEMA_V2)
+    assert v1 == schema_hash(list(reversed(SCHEMA_V1)))
+    assert v1 != v2
+
+    store = RulesStore(_store_path(), legacy_path=None)
+    store.put("policies_week1", [DOB_RULE], schema_hash=v1)
+
+    assert store.get("policies_week1", schema_hash=v1)["rules"] == [DOB_RULE]
+    assert store.get("policies_week1", schema_hash=v2) is None
+    # Schema unknown (e.g. BigQuery unreachable): the record is still served
+    assert store.get("policies_week1") is not None
+
+
+def test_legacy_json_cache_is_imported_once():
+    legacy_path = os.path.join(tempfile.mkdtemp(), "dq_rules_cache.json")
+    with open(legacy_path, "w") as f:
+        json.dump({"cache_metadata": {}, "tables": {
+            "policies_week1": {"rules": [DOB_RULE], "generated_at": "2025-12-12T14:54:31", "rule_count": 1}
+        }}, f)
+    path = _store_path()
+
+    store = RulesStore(path, legacy_path=legacy_path)
+    cached = store.get("policies_week1", schema_hash=schema_hash(SCHEMA_V1))
+    assert cached["rules"] == [DOB_RULE]
+    assert cached["generated_at"] == "2025-12-12T14:54:31"
+
+    store.delete("policies_week1")
+    assert RulesStore(path, legacy_path=legacy_path).get("policies_week1") is None
+
+
+def test_concurrent_writers_keep_every_table():
+    path = _store_path()
+    stores = [RulesStore(path, legacy_path=None) for _ in range(4)]
+
+    def write(store, worker):
+        for i in range(10):
+            store.put(f"table_{worker}_{i}", [ID_RULE])
+
+    threads = [threading.Thread(target=write, args=(store, n)) for n, store in enumerate(stores)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(RulesStore(path, legacy_path=None).entries()) == 40
+
+
+if __name__ == "__main__":
+    test_put_get_and_delete()
+    test_schema_change_invalidates_rules()
+    test_legacy_json_cache_is_imported_once()
+    test_concurrent_writers_keep_every_table()
+    print("✅ Rules store tests passed!")
@@ -0,0 +1,148 @@
+"""
+Test Shadow Validation
+
+This script tests the shadow-table validation sandbox without BigQuery:
+- Shadow tables are created as expiring zero-copy clones
+- Fixes are applied to the shadow only, never to production
+- Rule and regression checks compare production against the shadow
+- Backticked table references (whole name or per part) are retargeted too
+- The fix and the checks are dry-run and charged to the session byte budget
+"""
+
+import os
+import sys
+import threading
+from types import SimpleNamespace
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from dq_agents import cost_gate
+from dq_agents.bonus_features import ShadowValidation
+from dq_agents.cost_gate import QueryCostExceeded
+
+
+class RecordingClient:
+    """Minimal BigQuery client double: records SQL, returns canned counts (dry runs: bytes_per_query)."""
+
+    def __init__(self, counts, bytes_per_query=0):
+        self.counts = counts
+        self.bytes_per_query = bytes_per_query
+        self.queries = []
+        self._lock = threading.Lock()
+
+    def query(self, sql, job_config=None):
+        if job_config is not None and job_config.dry_run:
+            return SimpleNamespace(total_bytes_processed=self.bytes_per_query, referenced_tables=[])
+        with self._lock:
+            self.queries.append(sql)
+        count = next((n for fragment, n in self.counts.items() if fragment in sql), 0)
+        return SimpleNamespace(
+            result=lambda: iter([SimpleNamespace(n=count)]),
+            num_dml_affected_rows=3 if sql.lstrip().startswith("UPDATE") else None
+        )
+
+
+def test_shadow_is_an_expiring_clone():
+    client = RecordingClient({})
+    shadow = ShadowValidation.create_shadow_table("policies_week1", "proj", "dq", client=client, expiration_hours=2)
+
+    assert shadow.startswith("policies_week1_shadow_")
+    assert f"CREATE TABLE `proj.dq.{shadow}`" in client.queries[0]
+    assert "CLONE `proj.dq.policies_week1`" in client.queries[0]
+    assert "INTERVAL 2 HOUR" in client.queries[0]
+
+
+def test_fix_runs_on_shadow_and_checks_compare_both_tables():
+    shadow = "policies_week1_shadow_test"
+    client = RecordingClient({
+        f"FROM `proj.dq.{shadow}` WHERE CUS_DOB": 0,
+        "FROM `proj.dq.policies_week1` WHERE CUS_DOB": 3,
+        f"FROM `proj.dq.{shadow}` WHERE CUS_ID IS NULL": 1,
+    })
+
+    results = ShadowValidation.validate_fix(
+        shadow, "policies_week1",
+        "UPDATE policies_week1 SET CUS_DOB = NULL WHERE CUS_DOB > CURRENT_DATE()",
+        ["SELECT * FROM {table} WHERE CUS_ID IS NULL"],
+        project_id="proj", dataset_id="dq",
+        rule_sql="SELECT * FROM {table} WHERE CUS_DOB > CURRENT_DATE()",
+        client=client
+    )
+
+    updates = [q for q in client.queries if q.lstrip().startswith("UPDATE")]
+    assert updates == [f"UPDATE `proj.dq.{shadow}` SET CUS_DOB = NULL WHERE CUS_DOB > CURRENT_DATE"]
+    assert results["affected_rows"] == 3
+
+    checks = {c["check"]: c for c in results["checks"]}
+    assert (checks["rule"]["production_rows"], checks["rule"]["shadow_rows"], checks["rule"]["passed"]) == (3, 0, True)
+    assert checks["regression_1"]["delta"] == 1 and not checks["regression_1"]["passed"]
+    assert results["validation_passed"] is False
+
+
+def test_backticked_references_are_retargeted():
+    shadow = "policies_week1_shadow_test"
+    for fix_sql in (
+        "UPDATE `proj`.`dq`.`policies_week1` SET CUS_DOB = NULL WHERE CUS_DOB > CURRENT_DATE()",
+        "UPDATE `policies_week1` SET CUS_DOB = NULL WHERE CUS_DOB > CURRENT_DATE()",
+        "UPDATE `proj.dq.policies_week1` SET CUS_DOB = NULL WHERE CUS_DOB > CURRENT_DATE()",
+    ):
+        client = RecordingClient({})
+        results = ShadowValidation.validate_fix(
+            shadow, "policies_week1", fix_sql, [], project_id="proj", dataset_id="dq", client=client
+        )
+
+        assert results["fix_applied"] is True
+        assert client.queries == [f"UPDATE `proj.dq.{shadow}` SET CUS_DOB = NULL WHERE CUS_DOB > CURRENT_DATE"]
+
+
+def test_fix_not_writing_to_the_shadow_is_refused():
+    client = RecordingClient({})
+    results = ShadowValidation.validate_fix(
+        "policies_week1_shadow_test", "policies_week1",
+        "DELETE FROM `proj.dq.customers` WHERE CUS_ID IS NULL", [],
+        project_id="proj", dataset_id="dq", client=client
+    )
+
+    assert client.queries == []
+    assert results["fix_applied"] is False
+    assert "Refusing" in results["error"]
+
+
+def test_fix_and_checks_are_charged_to_the_session_budget():
+    cost_gate.clear_estimate_cache()
+    os.environ["COST_RUN_BYTE_BUDGET"] = str(10**9)
+    try:
+        tool_context = SimpleNamespace(state={})
+        ShadowValidation.validate_fix(
+            "policies_week1_shadow_test", "policies_week1",
+            "UPDATE policies_week1 SET CUS_DOB = NULL WHERE CUS_DOB > CURRENT_DATE()", [],
+            project_id="proj", dataset_id="dq", rule_sql="SELECT * FROM {table} WHERE CUS_DOB > CURRENT_DATE()",
+            client=RecordingClient({}, bytes_per_query=10**8), tool_context=tool_context
+        )
+        # The fix plus the rule on production and on the shadow
+        assert tool_context.state[cost_gate.STATE_KEY] == 3 * 10**8
+
+        client = RecordingClient({}, bytes_per_query=10**8)
+        tool_context.state[cost_gate.STATE_KEY] = 10**9 - 1
+        try:
+            ShadowValidation.validate_fix(
+                "policies_week1_shadow_test", "policies_week1",
+                "UPDATE policies_week1 SET CUS_DOB = NULL WHERE CUS_DOB > CURRENT_DATE()", [],
+                project_id="proj", dataset_id="dq", client=client, tool_context=tool_context
+            )
+            assert False, "expected QueryCostExceeded"
+        except QueryCostExceeded:
+            pass
+        assert client.queries == []
+    finally:
+        del os.environ["COST_RUN_BYTE_BUDGET"]
+
+
+if __name__ == "__main__":
+    test_shadow_is_an_expiring_clone()
+    test_fix_runs_on_shadow_and_checks_compare_both_tables()
+    test_backticked_references_are_retargeted()
+    test_fix_not_writing_to_the_shadow_is_refused()
+    test_fix_and_checks_are_charged_to_the_session_budget()
+    print("✅ Shadow validation tests passed!")
@@ -0,0 +1,61 @@
+"""
+Test SQL Rewriter
+
+This script tests the AST-based rewriting of fix SQL:
+- Table references are qualified; column references and CTE names are not
+- UPDATE/DELETE become one preview SELECT with sample rows and the affected row count
+- Statements without a WHERE clause are detected
+"""
+
+import os
+import sys
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from dq_agents.remediator.sql_rewriter import (
+    add_condition,
+    build_count_sql,
+    build_preview_sql,
+    missing_where,
+    qualify_tables
+)
+
+
+def test_qualify_tables_leaves_columns_and_ctes():
+    sql = qualify_tables(
+        "UPDATE {table} t SET t.CUS_DOB = NULL "
+        "WHERE t.CUS_ID IN (WITH recent AS (SELECT CUS_ID FROM other_ds.policies_week2) SELECT CUS_ID FROM recent)",
+        "my-proj", "dq", "policies_week1"
+    )
+
+    assert sql == (
+        "UPDATE `my-proj.dq.policies_week1` AS t SET t.CUS_DOB = NULL "
+        "WHERE t.CUS_ID IN (WITH recent AS (SELECT CUS_ID FROM `my-proj.dq.policies_week2`) SELECT CUS_ID FROM recent)"
+    )
+
+
+def test_preview_returns_new_values_and_count_in_one_query():
+    sql = "UPDATE `p.d.policies_week1` t SET t.CUS_SURNAME = UPPER(t.CUS_SURNAME) WHERE t.CUS_SURNAME <> UPPER(t.CUS_SURNAME)"
+
+    assert build_preview_sql(sql, sample_limit=10) == (
+        "SELECT t.*, UPPER(t.CUS_SURNAME) AS _new_CUS_SURNAME, COUNT(*) OVER () AS _affected_rows "
+        "FROM `p.d.policies_week1` AS t WHERE t.CUS_SURNAME <> UPPER(t.CUS_SURNAME)\nLIMIT 10"
+    )
+    assert build_count_sql("DELETE FROM `p.d.policies_week1` WHERE CUS_ID IS NULL") == (
+        "SELECT COUNT(*) AS total FROM `p.d.policies_week1` WHERE CUS_ID IS NULL"
+    )
+
+
+def test_statements_without_where():
+    assert missing_where("UPDATE `p.d.t` SET a = 1")
+    assert not missing_where("UPDATE `p.d.t` SET a = (SELECT 1 FROM x WHERE y)  WHERE b = 2")
+    assert build_preview_sql("DELETE FROM `p.d.t`") is None
+    assert add_condition("UPDATE `p.d.t` SET a = 1", "b = 2") is None
+
+
+if __name__ == "__main__":
+    test_qualify_tables_leaves_columns_and_ctes()
+    test_preview_returns_new_values_and_count_in_one_query()
+    test_statements_without_where()
+    print("✅ SQL rewriter tests passed!")
@@ -0,0 +1,101 @@
+"""
+Test Partitioned Storage Layout
+
+This script tests the freshness check on the week-partitioned snapshot:
+- The table is current only while it exists and is newer than every week table
+- A week table missing from the layout makes it stale
+- Customer history lookups fall back to the week tables while it is stale
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from environment.storage_layout import is_partitioned_table_current, refresh_sql
+
+LOADED = datetime(2026, 1, 5, tzinfo=timezone.utc)
+
+LAYOUT = {
+    'table': 'policies_partitioned',
+    'week_column': 'week_num',
+    'cluster_column': 'CUS_ID',
+    'source_tables': ['policies_week1', 'policies_week2'],
+    'weeks': [1, 2]
+}
+
+
+class TableClient:
+    """Serves get_table() from a name -> modified map (missing names raise)"""
+
+    def __init__(self, modified):
+        self.modified = modified
+
+    def get_table(self, table_id):
+        name = table_id.split('.')[-1]
+        if name not in self.modified:
+            raise LookupError(f"Not found: {table_id}")
+        return SimpleNamespace(modified=self.modified[name])
+
+
+def _client(partitioned_offset_hours=1, **overrides):
+    modified = {
+        'policies_week1': LOADED,
+        'policies_week2': LOADED,
+        'policies_partitioned': LOADED + timedelta(hours=partitioned_offset_hours)
+    }
+    modified.update(overrides)
+    return TableClient({name: value for name, value in modified.items() if value is not None})
+
+
+def test_current_after_materialising():
+    assert is_partitioned_table_current(_client(), 'proj', 'dq', LAYOUT)
+    assert is_partitioned_table_current(_client(), 'proj', 'dq', LAYOUT, ['policies_week1', 'policies_week2'])
+
+
+def test_stale_after_a_fix_or_load():
+    fixed = _client(policies_week2=LOADED + timedelta(hours=2))
+    assert not is_partitioned_table_current(fixed, 'proj', 'dq', LAYOUT)
+
+    missing = _client(policies_partitioned=None)
+    assert not is_partitioned_table_current(missing, 'proj', 'dq', LAYOUT)
+
+    new_week = ['policies_week1', 'policies_week2', 'policies_week3']
+    assert not is_partitioned_table_current(_client(), 'proj', 'dq', LAYOUT, new_week)
+
+
+def test_refresh_rebuilds_the_recorded_layout():
+    sql = refresh_sql('proj', 'dq', LAYOUT)
+
+    assert 'CREATE OR REPLACE TABLE `proj.dq.policies_partitioned`' in sql
+    assert 'CLUSTER BY CUS_ID' in sql
+    assert 'SELECT 2 AS week_num, * FROM `proj.dq.policies_week2`' in sql
+
+
+def test_customer_history_falls_back_while_stale():
+    from dq_agents.treatment import tools
+
+    original = (tools.get_partitioned_layout, tools.get_tables)
+    tools.get_partitioned_layout = lambda: LAYOUT
+    tools.get_tables = lambda: ['policies_week1', 'policies_week2']
+    try:
+        current = tools._customer_history_sql(_client(), 'proj', 'dq', 'CUS_ID', True)
+        assert '`proj.dq.policies_partitioned`' in current
+
+        stale = _client(policies_week1=LOADED + timedelta(hours=2))
+        fallback = tools._customer_history_sql(stale, 'proj', 'dq', 'CUS_ID', True)
+        assert 'policies_partitioned' not in fallback
+        assert '`proj.dq.policies_week1`' in fallback and 'UNION ALL' in fallback
+    finally:
+        tools.get_partitioned_layout, tools.get_tables = original
+
+
+if __name__ == "__main__":
+    test_current_after_materialising()
+    test_stale_after_a_fix_or_load()
+    test_refresh_rebuilds_the_recorded_layout()
+    test_customer_history_falls_back_while_stale()
+    print("✅ Storage layout tests passed!")
@@ -0,0 +1,143 @@
+"""
+Test Time Travel Diff
+
+This script tests the vectorised before/after diff engine:
+- Only changed cells are reported, in long format
+- Missing values on both sides are treated as equal
+- Chunked diffing of key-sorted snapshots matches the in-memory diff
+- get_before_after_comparison falls back to aggregates when the key is not unique
+"""
+
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from dq_agents.bonus_features import TimeTravelDiff
+from dq_agents.remediator import tools as remediator_tools
+
+
+def test_only_changed_cells_are_reported():
+    original_df = pd.DataFrame({
+        'policy_id': [1, 2, 3],
+        'date_of_birth': ['2099-01-01', None, '2025-12-31'],
+        'premium': [-500.0, np.nan, 300.0]
+    })
+    fixed_df = pd.DataFrame({
+        'policy_id': [1, 2, 3],
+        'date_of_birth': ['1999-01-01', None, '2025-12-31'],
+        'premium': [500.0, np.nan, np.nan]
+    })
+
+    diff = TimeTravelDiff.generate_diff(original_df, fixed_df, {'0_premium': 0.92})
+
+    assert list(diff.columns) == TimeTravelDiff.DIFF_COLUMNS
+    assert list(zip(diff['Row'], diff['Column'])) == [(0, 'date_of_birth'), (0, 'premium'), (2, 'premium')]
+    assert list(diff['Original']) == ['2099-01-01', '-500.0', '300.0']
+    assert list(diff['Confidence']) == ['0.0%', '92.0%', '0.0%']
+
+
+def test_no_changes_gives_empty_diff():
+    df = pd.DataFrame({'a': [1, None], 'b': ['x', None]})
+    assert TimeTravelDiff.generate_diff(df, df.copy()).empty
+
+
+def test_chunked_diff_matches_in_memory_diff():
+    rng = np.random.default_rng(0)
+    n = 5000
+    original_df = pd.DataFrame({
+        'policy_id': np.arange(n),
+        'premium': rng.random(n),
+        'status': rng.choice(['ACTIVE', 'LAPSED'], n)
+    })
+    fixed_df = original_df.copy()
+    fixed_df.loc[fixed_df.index % 7 == 0, 'premium'] = np.nan
+    fixed_df.loc[fixed_df.index % 11 == 0, 'status'] = 'CANCELLED'
+    fixed_df = fixed_df.drop(index=[3, 4])  # rows missing from the fixed snapshot
+
+    def chunks(df, size):
+        return (df.iloc[i:i + size] for i in range(0, len(df), size))
+
+    chunked = pd.concat(
+        TimeTravelDiff.generate_diff_chunked(chunks(original_df, 700), chunks(fixed_df, 900), key='policy_id')
+    )
+    expected = TimeTravelDiff.generate_diff(original_df.set_index('policy_id'), fixed_df.set_index('policy_id'))
+
+    pd.testing.assert_frame_equal(chunked.reset_index(drop=True), expected.reset_index(drop=True))
+
+
+class SnapshotClient:
+    """BigQuery client double answering the duplicate-key check and the comparison queries."""
+
+    def __init__(self, duplicates):
+        self.duplicates = duplicates
+        self.queries = []
+
+    def get_table(self, table_ref):
+        return SimpleNamespace(schema=[SimpleNamespace(name=name) for name in ('CUS_ID', 'PREMIUM')])
+
+    def query(self, sql, job_config=None):
+        if job_config is not None and job_config.dry_run:
+            return SimpleNamespace(total_bytes_processed=0, referenced_tables=[])
+        self.queries.append(sql)
+        if "before_duplicates" in sql:
+            rows = [SimpleNamespace(before_duplicates=self.duplicates, after_duplicates=self.duplicates)]
+        elif "rows_not_in_other" in sql:
+            rows = [
+                SimpleNamespace(side='before', row_count=4, rows_not_in_other=1,
+                                columns=[{'column_name': 'PREMIUM', 'nulls': 0, 'distinct_values': 3}]),
+                SimpleNamespace(side='after', row_count=4, rows_not_in_other=1,
+                                columns=[{'column_name': 'PREMIUM', 'nulls': 1, 'distinct_values': 2}]),
+            ]
+        else:
+            rows = [SimpleNamespace(row_key='C1', change_type='modified', total_changed_rows=1,
+                                    changes=[{'column_name': 'PREMIUM', 'before': '-5', 'after': '5'}])]
+        return SimpleNamespace(result=lambda: iter(rows), total_bytes_processed=100)
+
+
+def _compare(client):
+    original = (remediator_tools.bigquery.Client, remediator_tools.get_policy_id_column)
+    remediator_tools.bigquery.Client = lambda project=None: client
+    remediator_tools.get_policy_id_column = lambda: 'CUS_ID'
+    os.environ.update(BQ_DATA_PROJECT_ID='proj', BQ_DATASET_ID='dq')
+    try:
+        return json.loads(remediator_tools.get_before_after_comparison(
+            'policies_week1', before_timestamp='2026-01-05T00:00:00+00:00'
+        ))
+    finally:
+        remediator_tools.bigquery.Client, remediator_tools.get_policy_id_column = original
+
+
+def test_non_unique_key_falls_back_to_aggregates():
+    client = SnapshotClient(duplicates=2)
+    comparison = _compare(client)
+
+    assert comparison["status"] == "aggregate"
+    assert comparison["duplicate_keys"] == {"before": 2, "after": 2}
+    assert (comparison["distinct_rows_removed"], comparison["distinct_rows_added"]) == (1, 1)
+    assert [c["column"] for c in comparison["changed_columns"]] == ["PREMIUM"]
+    assert not any("FULL OUTER JOIN" in sql for sql in client.queries)
+
+
+def test_unique_key_gives_row_level_diff():
+    client = SnapshotClient(duplicates=0)
+    comparison = _compare(client)
+
+    assert "status" not in comparison and comparison["total_changed_rows"] == 1
+    assert comparison["changes"][0]["before"] == {"PREMIUM": -5}
+    assert any("FULL OUTER JOIN" in sql for sql in client.queries)
+
+
+if __name__ == "__main__":
+    test_only_changed_cells_are_reported()
+    test_no_changes_gives_empty_diff()
+    test_chunked_diff_matches_in_memory_diff()
+    test_non_unique_key_falls_back_to_aggregates()
+    test_unique_key_gives_row_level_diff()
+    print("✅ Time travel diff tests passed!")
@@ -0,0 +1,122 @@
+"""
+Test Tool Response Shaping
+
+This script tests the compact response layer used by all DQ agent tools:
+- Tabular encoding of row lists
+- Per-tool token budgets with truncation and summaries
+- SQL kept whole when long strings are truncated
+- Schema column lists never shortened; approval requests exempt from budgets
+- Token metrics recording
+"""
+
+import json
+import os
+import sys
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from dq_agents.tool_responses import (
+    decode_table,
+    estimate_tokens,
+    get_token_metrics,
+    reset_token_metrics,
+    shape_response,
+)
+
+
+def test_rows_are_encoded_as_table():
+    rows = [{"CUS_ID": 1, "CUS_DOB": "2099-01-01"}, {"CUS_ID": 2, "CUS_DOB": None}]
+    shaped = json.loads(shape_response({"status": "success", "sample_issues": rows}, "unit_test_tool"))
+
+    assert shaped["sample_issues"] == {
+        "columns": ["CUS_ID", "CUS_DOB"],
+        "rows": [[1, "2099-01-01"], [2, None]],
+    }
+    assert decode_table(shaped["sample_issues"]) == rows
+
+
+def test_response_is_compact():
+    shaped = shape_response({"status": "success", "count": 3}, "unit_test_tool")
+    assert shaped == '{"status":"success","count":3}'
+
+
+def test_over_budget_response_is_truncated_and_summarised():
+    rows = [{"CUS_ID": i, "CUS_SURNAME": "SMITH" * 5} for i in range(400)]
+    shaped_text = shape_response({"issue_count": 400, "sample_issues": rows}, "execute_dq_rule")
+    shaped = json.loads(shaped_text)
+
+    assert estimate_tokens(shaped_text) <= 2500 + 200  # budget plus truncation notes
+    assert shaped["issue_count"] == 400
+    assert shaped["_truncated"]["lists"]["sample_issues.rows"]["total"] == 400
+    assert len(shaped["sample_issues"]["rows"]) < 400
+    assert shaped["sample_issues"]["summary"]["CUS_ID"] == {"nulls": 0, "distinct": 400, "min": 0, "max": 399}
+
+
+def test_sql_is_never_truncated():
+    sql = "SELECT CUS_ID FROM `proj.dq.policies_week1` WHERE " + " OR ".join(
+        f"CUS_FIELD_{i} IS NULL" for i in range(60)
+    )
+    rules = [{"rule_id": f"R{i}", "sql": sql, "description": "d" * 1000} for i in range(3)]
+    os.environ["TOOL_TOKEN_BUDGET_UNIT_TEST_SQL"] = "100"
+    try:
+        shaped = json.loads(shape_response(
+            {"rule_sql": sql, "dry_run_sql": sql, "message": "m" * 1000, "rules": rules}, "unit_test_sql"
+        ))
+    finally:
+        del os.environ["TOOL_TOKEN_BUDGET_UNIT_TEST_SQL"]
+
+    assert shaped["rule_sql"] == sql and shaped["dry_run_sql"] == sql
+    assert shaped["message"].endswith("chars truncated]")
+    kept = decode_table(shaped["rules"])
+    assert kept and all(rule["sql"] == sql for rule in kept)
+    assert all(rule["description"].endswith("chars truncated]") for rule in kept)
+
+
+def test_schema_columns_are_never_truncated():
+    columns = [
+        {"name": f"CUS_FIELD_{i}", "type": "STRING", "mode": "NULLABLE", "sample_values": [f"value-{j}" * 3 for j in range(10)]}
+        for i in range(120)
+    ]
+    shaped = json.loads(shape_response({"table_name": "policies_week1", "columns": columns}, "get_table_schema_with_samples"))
+
+    kept = decode_table(shaped["columns"])
+    assert [c["name"] for c in kept] == [c["name"] for c in columns]
+    assert all(len(c["sample_values"]) < 10 for c in kept)
+    assert not any(key.endswith("columns.rows") for key in shaped["_truncated"]["lists"])
+
+
+def test_approval_requests_are_not_truncated():
+    details = "UPDATE `proj.dq.policies_week1` SET CUS_DOB = NULL WHERE ...\n" * 2000
+    assert shape_response(details, "request_human_approval") == details
+
+
+def test_budget_can_be_disabled_per_tool():
+    os.environ["TOOL_TOKEN_BUDGET_UNIT_TEST_UNBOUNDED"] = "0"
+    try:
+        text = "x" * 100000
+        assert shape_response(text, "unit_test_unbounded") == text
+    finally:
+        del os.environ["TOOL_TOKEN_BUDGET_UNIT_TEST_UNBOUNDED"]
+
+
+def test_token_metrics_are_recorded():
+    reset_token_metrics()
+    shape_response({"status": "ok"}, "unit_test_metrics")
+    shape_response({"status": "ok"}, "unit_test_metrics")
+
+    stats = get_token_metrics()["unit_test_metrics"]
+    assert stats["calls"] == 2
+    assert stats["tokens"] == 2 * estimate_tokens('{"status":"ok"}')
+
+
+if __name__ == "__main__":
+    test_rows_are_encoded_as_table()
+    test_response_is_compact()
+    test_over_budget_response_is_truncated_and_summarised()
+    test_sql_is_never_truncated()
+    test_schema_columns_are_never_truncated()
+    test_approval_requests_are_not_truncated()
+    test_budget_can_be_disabled_per_tool()
+    test_token_metrics_are_recorded()
+    print("✅ Tool response shaping tests passed!")
@@ -0,0 +1,107 @@
+"""
+Test Data Science Tracing Setup
+
+This script tests the configurable OpenTelemetry setup of the data science agents:
+- Exporter selection from the environment (auto, disabled, invalid)
+- Spans exported in batches to a local JSON-lines file
+- Head sampling of new traces
+- Tail sampling keeping only failed or slow traces
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.trace import Status, StatusCode
+
+from data_science.tracing import TracingConfig, build_tracer_provider
+
+TRACING_ENV = ("TRACING_ENABLED", "TRACING_EXPORTER", "TRACING_FILE_PATH", "WANDB_API_KEY", "WANDB_PROJECT_ID")
+
+
+def _clear_env():
+    for name in TRACING_ENV:
+        os.environ.pop(name, None)
+
+
+def _trace(tracer, name, children=1):
+    with tracer.start_as_current_span(name):
+        for _ in range(children):
+            with tracer.start_as_current_span(f"{name}.child"):
+                pass
+
+
+def test_exporter_selection_from_env():
+    _clear_env()
+    assert TracingConfig.from_env().resolved_exporter() == "none"
+    assert build_tracer_provider(TracingConfig.from_env()) is None
+
+    os.environ["WANDB_API_KEY"] = "key"
+    os.environ["WANDB_PROJECT_ID"] = "team/project"
+    assert TracingConfig.from_env().resolved_exporter() == "otlp"
+
+    os.environ["TRACING_ENABLED"] = "false"
+    assert TracingConfig.from_env().resolved_exporter() == "none"
+
+    os.environ["TRACING_EXPORTER"] = "stdout"
+    try:
+        TracingConfig.from_env()
+        assert False, "invalid exporter accepted"
+    except ValueError:
+        pass
+    _clear_env()
+
+
+def test_file_exporter_writes_json_lines():
+    path = os.path.join(tempfile.mkdtemp(), "traces.jsonl")
+    provider = build_tracer_provider(TracingConfig(exporter="file", file_path=path))
+    _trace(provider.get_tracer("test"), "request", children=2)
+    provider.force_flush()
+
+    with open(path) as f:
+        names = sorted(json.loads(line)["name"] for line in f)
+    assert names == ["request", "request.child", "request.child"]
+
+
+def test_head_sampling_keeps_whole_traces():
+    exporter = InMemorySpanExporter()
+    provider = build_tracer_provider(TracingConfig(sample_ratio=0.2), exporter=exporter)
+    tracer = provider.get_tracer("test")
+    for _ in range(500):
+        _trace(tracer, "request")
+    provider.force_flush()
+
+    spans = exporter.get_finished_spans()
+    roots = [s for s in spans if s.parent is None]
+    assert len(spans) == 2 * len(roots)
+    assert 50 <= len(roots) <= 150
+
+
+def test_tail_sampling_keeps_failed_and_slow_traces():
+    exporter = InMemorySpanExporter()
+    provider = build_tracer_provider(TracingConfig(tail_sampling=True, tail_latency_ms=50), exporter=exporter)
+    tracer = provider.get_tracer("test")
+
+    _trace(tracer, "fast")
+    with tracer.start_as_current_span("slow"):
+        time.sleep(0.06)
+    with tracer.start_as_current_span("failed"):
+        with tracer.start_as_current_span("failed.child") as child:
+            child.set_status(Status(StatusCode.ERROR, "query failed"))
+    provider.force_flush()
+
+    assert sorted(s.name for s in exporter.get_finished_spans()) == ["failed", "failed.child", "slow"]
+
+
+if __name__ == "__main__":
+    test_exporter_selection_from_env()
+    test_file_exporter_writes_json_lines()
+    test_head_sampling_keeps_whole_traces()
+    test_tail_sampling_keeps_failed_and_slow_traces()
+    print("✅ Tracing tests passed!")
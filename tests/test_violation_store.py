@@ -0,0 +1,80 @@
+"""
+Test Violation Store
+
+This script tests the persistent rule-result history (SQLite backend):
+- Recording rule runs with sampled violating keys
+- Latest result per rule/table
+- Daily trend, top rules and per-table summaries
+"""
+
+import os
+import sys
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from dq_agents.violation_store import (
+    SQLiteViolationStore,
+    get_latest_results,
+    get_table_summary,
+    get_top_rules,
+    get_violation_trend,
+    record_rule_results,
+)
+
+DOB_RULE = {"rule_id": "DQ_001", "name": "DOB in future", "severity": "critical", "dq_dimension": "Validity"}
+EMAIL_RULE = {"name": "Email missing", "sql": "SELECT * FROM {table} WHERE email IS NULL", "severity": "low"}
+
+
+def _store():
+    return SQLiteViolationStore(":memory:")
+
+
+def test_latest_result_per_rule_and_table():
+    store = _store()
+    record_rule_results([
+        {"rule": DOB_RULE, "table": "policies_week1", "total_count": 5,
+         "violations": [{"CUS_ID": 1}, {"CUS_ID": 2}], "key_column": "CUS_ID"},
+        {"rule": EMAIL_RULE, "table": "policies_week1", "total_count": 0},
+    ], store=store)
+    record_rule_results([
+        {"rule": DOB_RULE, "table": "policies_week1", "total_count": 2,
+         "violations": [{"CUS_ID": 2}], "key_column": "CUS_ID"},
+    ], store=store)
+
+    latest = {r["rule_id"]: r for r in get_latest_results(store=store)}
+
+    assert latest["DQ_001"]["violation_count"] == 2
+    assert latest["DQ_001"]["sample_keys"] == [2]
+    assert len(latest) == 2  # the email rule is keyed by its SQL hash
+
+
+def test_trend_top_rules_and_tables():
+    store = _store()
+    record_rule_results([
+        {"rule": DOB_RULE, "table": "policies_week1", "total_count": 5},
+        {"rule": EMAIL_RULE, "table": "policies_week2", "total_count": 1},
+    ], store=store)
+    record_rule_results([
+        {"rule": DOB_RULE, "table": "policies_week1", "total_count": 3},
+    ], store=store)
+
+    trend = get_violation_trend(store=store)
+    assert {(r["table_name"], r["violations"], r["runs"]) for r in trend} == {
+        ("policies_week1", 8, 2),
+        ("policies_week2", 1, 1),
+    }
+    assert get_violation_trend(table_name="policies_week2", store=store)[0]["violations"] == 1
+
+    top = get_top_rules(limit=1, store=store)
+    assert [(r["rule_id"], r["total_violations"], r["runs"]) for r in top] == [("DQ_001", 8, 2)]
+
+    tables = {r["table_name"]: r for r in get_table_summary(store=store)}
+    assert tables["policies_week1"]["total_violations"] == 8
+    assert tables["policies_week2"]["rules"] == 1
+
+
+if __name__ == "__main__":
+    test_latest_result_per_rule_and_table()
+    test_trend_top_rules_and_tables()
+    print("✅ Violation store tests passed!")
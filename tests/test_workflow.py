@@ -0,0 +1,152 @@
+"""
+Test Orchestrator Workflow DAG
+
+This script tests the workflow executor behind run_dq_workflow:
+- Per-table pipelines run in parallel and metrics overlaps treatment
+- The run stops at unapproved HITL barriers and resumes after approval
+- Steps after an approved barrier receive the barrier's fix summary
+- Failed steps skip their dependents; cycles are rejected
+- run_dq_workflow resumes only the run waiting for approval; approvals never
+  carry over to a new run
+"""
+
+import asyncio
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from dq_agents.orchestrator.workflow import Workflow, WorkflowNode, build_dq_workflow
+
+TABLES = ["policies_week1", "policies_week2"]
+
+
+def _steps(calls, delay=0.05):
+    def step(name):
+        async def run(table, inputs):
+            calls.append(f"{name}:{table}")
+            await asyncio.sleep(delay)
+            return f"{name} output for {table}"
+        return run
+    return step("identify"), step("treat"), step("remediate"), step("measure")
+
+
+def test_tables_run_in_parallel_and_stop_at_barrier():
+    calls = []
+    workflow = build_dq_workflow(TABLES, *_steps(calls))
+
+    result = asyncio.run(workflow.run(max_concurrency=8))
+
+    assert result["status"] == "waiting_approval"
+    assert result["pending_approvals"] == ["approve_fixes:policies_week1", "approve_fixes:policies_week2"]
+    assert not any(c.startswith("remediate") for c in calls)
+    assert result["nodes"]["remediate:policies_week1"]["status"] == "blocked"
+    # identify (both tables at once) followed by treat + measure side by side: ~2 steps, not 6
+    assert result["wall_clock_ms"] < 250
+    assert set(result["phase_timings_ms"]) == {"identifier", "treatment", "metrics"}
+
+
+def test_resume_after_approval_skips_finished_steps():
+    calls = []
+    workflow = build_dq_workflow(TABLES, *_steps(calls, delay=0))
+    first = asyncio.run(workflow.run())
+
+    calls.clear()
+    second = asyncio.run(workflow.run(approved=["approve_fixes:policies_week1"], completed=first["nodes"]))
+
+    assert calls == ["remediate:policies_week1"]
+    assert second["nodes"]["remediate:policies_week1"]["output"] == "remediate output for policies_week1"
+    assert second["pending_approvals"] == ["approve_fixes:policies_week2"]
+
+
+def test_remediate_receives_the_approved_fix_summary():
+    received = {}
+
+    async def remediate(table, inputs):
+        received[table] = inputs
+        return f"remediate output for {table}"
+
+    def summarise(table, inputs):
+        return f"fixes to approve for {table}: {inputs[f'treat:{table}']}"
+
+    identify, treat, _, measure = _steps([], delay=0)
+    workflow = build_dq_workflow(TABLES, identify, treat, remediate, measure, summarise)
+    first = asyncio.run(workflow.run())
+
+    second = asyncio.run(workflow.run(approved=["approve_fixes:policies_week1"], completed=first["nodes"]))
+    assert second["nodes"]["approve_fixes:policies_week1"]["status"] == "success"
+    assert received["policies_week1"] == {
+        "approve_fixes:policies_week1": "fixes to approve for policies_week1: treat output for policies_week1"
+    }
+
+    # Approved before the barrier was ever reached: its summary is prepared on approval
+    received.clear()
+    asyncio.run(workflow.run(approved=["approve_fixes:policies_week2"]))
+    assert received["policies_week2"]["approve_fixes:policies_week2"].startswith("fixes to approve for policies_week2")
+
+
+def test_failures_skip_dependents_and_cycles_are_rejected():
+    def fail(inputs):
+        raise RuntimeError("quota exceeded")
+
+    workflow = Workflow([
+        WorkflowNode("a", "identifier", fail),
+        WorkflowNode("b", "treatment", lambda inputs: "ok", ["a"]),
+        WorkflowNode("c", "metrics", lambda inputs: "ok"),
+    ])
+    result = asyncio.run(workflow.run())
+
+    assert result["status"] == "failed"
+    assert result["nodes"]["a"]["error"] == "quota exceeded"
+    assert result["nodes"]["b"]["status"] == "skipped"
+    assert result["nodes"]["c"]["status"] == "success"
+
+    try:
+        Workflow([WorkflowNode("x", "p", fail, ["y"]), WorkflowNode("y", "p", fail, ["x"])])
+        assert False, "expected ValueError"
+    except ValueError as e:
+        assert "cycle" in str(e)
+
+
+def test_approvals_do_not_carry_over_to_a_new_run():
+    from dq_agents.orchestrator import tools
+
+    calls = []
+
+    async def run_agent(agent_name, request, tool_context):
+        calls.append(agent_name)
+        return f"{agent_name} output"
+
+    original = tools._run_agent
+    tools._run_agent = run_agent
+    os.environ["FAST_PATH_ENABLED"] = "false"
+    context = SimpleNamespace(state={})
+    try:
+        first = json.loads(asyncio.run(tools.run_dq_workflow(["policies_week1"], context)))
+        assert first["pending_approvals"] == ["approve_fixes:policies_week1"]
+        tools.approve_checkpoints(["approve_fixes:policies_week1"], context)
+        resumed = json.loads(asyncio.run(tools.run_dq_workflow(["policies_week1"], context)))
+        assert resumed["status"] == "completed" and resumed["run_id"] == first["run_id"]
+        assert calls.count("identifier") == 1 and calls.count("remediator") == 1
+
+        # The same tables again: a new run that stops at the checkpoint again
+        calls.clear()
+        second = json.loads(asyncio.run(tools.run_dq_workflow(["policies_week1"], context)))
+        assert second["run_id"] != first["run_id"]
+        assert second["pending_approvals"] == ["approve_fixes:policies_week1"]
+        assert "identifier" in calls and "remediator" not in calls
+    finally:
+        tools._run_agent = original
+        del os.environ["FAST_PATH_ENABLED"]
+
+
+if __name__ == "__main__":
+    test_tables_run_in_parallel_and_stop_at_barrier()
+    test_resume_after_approval_skips_finished_steps()
+    test_remediate_receives_the_approved_fix_summary()
+    test_failures_skip_dependents_and_cycles_are_rejected()
+    test_approvals_do_not_carry_over_to_a_new_run()
+    print("✅ Workflow tests passed!")